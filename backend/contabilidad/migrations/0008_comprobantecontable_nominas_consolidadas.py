@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nomina", "0015_contrato_proyecto_nominasimple_proyecto"),
+        ("contabilidad", "0007_alter_centrocosto_codigo_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comprobantecontable",
+            name="nominas_consolidadas",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="Nóminas incluidas en un comprobante consolidado de período",
+                related_name="comprobantes_consolidados",
+                to="nomina.nominasimple",
+                verbose_name="Nóminas consolidadas",
+            ),
+        ),
+    ]
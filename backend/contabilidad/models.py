@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -222,6 +222,14 @@ class ComprobanteContable(TenantAwareModel):
         verbose_name=_("Préstamo relacionado")
     )
     
+    nominas_consolidadas = models.ManyToManyField(
+        'nomina.NominaSimple',
+        blank=True,
+        related_name='comprobantes_consolidados',
+        verbose_name=_("Nóminas consolidadas"),
+        help_text=_("Nóminas incluidas en un comprobante consolidado de período")
+    )
+    
     proyecto = models.ForeignKey(
         'dashboard.Project',
         on_delete=models.SET_NULL,
@@ -270,19 +278,33 @@ class ComprobanteContable(TenantAwareModel):
         return f"{self.numero} - {self.descripcion}"
 
     def save(self, *args, **kwargs):
-        if not self.numero:
-            today = timezone.now().strftime('%Y%m%d')
-            prefix = f"CB-{today}-"
-            last = ComprobanteContable.objects.filter(numero__startswith=prefix).order_by('-numero').first()
-            if last and last.numero.startswith(prefix):
-                try:
-                    last_seq = int(last.numero.replace(prefix, ''))
-                except ValueError:
-                    last_seq = 0
-            else:
-                last_seq = 0
-            self.numero = f"{prefix}{last_seq + 1:04d}"
-        super().save(*args, **kwargs)
+        if self.numero:
+            return super().save(*args, **kwargs)
+
+        from core.secuencias import siguiente_numero, ultimo_consecutivo
+
+        hoy = timezone.now()
+        prefix = f"CB-{hoy.strftime('%Y%m%d')}-"
+
+        def semilla():
+            return ultimo_consecutivo(
+                ComprobanteContable.objects.all_tenants().filter(
+                    organization_id=self.organization_id,
+                    numero__startswith=prefix
+                ).values_list('numero', flat=True),
+                prefix
+            )
+
+        # El consecutivo y el comprobante se confirman (o revierten) juntos
+        try:
+            with transaction.atomic():
+                seq = siguiente_numero(self.organization_id, prefix.rstrip('-'), anio=hoy.year, semilla=semilla)
+                self.numero = f"{prefix}{seq:04d}"
+                super().save(*args, **kwargs)
+        except Exception:
+            # El número revertido no queda asignado a la instancia
+            self.numero = ''
+            raise
 
     def clean(self):
         super().clean()
@@ -1023,7 +1045,9 @@ def generar_comprobante_nomina_simple(instance, force=False):
     if instance.estado != 'pagada':
         return None
 
-    if not force and ComprobanteContable.objects.filter(nomina_relacionada=instance).exists():
+    if not force and ComprobanteContable.objects.filter(
+        models.Q(nomina_relacionada=instance) | models.Q(nominas_consolidadas=instance)
+    ).exists():
         return None
 
     organization = getattr(instance, 'organization', None)
@@ -1222,6 +1246,174 @@ def generar_comprobante_nomina_simple(instance, force=False):
     return comprobante
 
 
+def generar_comprobante_nomina_periodo(organization, nominas, usuario, periodo_inicio, periodo_fin,
+                                      proyecto=None):
+    """
+    Genera UN comprobante contable consolidado para las nóminas pagadas de un
+    período (en lugar de uno por nómina).
+
+    Usa las mismas cuentas que ``generar_comprobante_nomina_simple`` y
+    agrupa los movimientos por cuenta. Los descuentos de salud y pensión se
+    obtienen con una sola consulta agregada por nómina.
+    """
+    from django.db.models import Sum, Case, When
+
+    nominas = list(nominas)
+    if not nominas:
+        return None
+
+    from nomina.models import NominaConcepto
+
+    configuracion = _obtener_configuracion(organization)
+    if not configuracion:
+        raise ValidationError(_("No existe configuración contable activa"))
+
+    _validar_configuracion_puc(configuracion, [
+        'cuenta_efectivo_defecto',
+        'cuenta_nomina_defecto',
+    ])
+
+    cuenta_efectivo = _find_account(
+        organization,
+        getattr(configuracion, 'cuenta_efectivo_defecto', None),
+        fallback_codes=['1105', '110505', '1110', '111005']
+    )
+    cuenta_nomina = _find_account(
+        organization,
+        getattr(configuracion, 'cuenta_nomina_defecto', None),
+        fallback_codes=['5105']
+    )
+    cuenta_prestamos = _find_account(
+        organization,
+        getattr(configuracion, 'cuenta_prestamos_defecto', None),
+        fallback_codes=['1365', '136505', '1305', '130505', '1300']
+    )
+    cuenta_pasivo_salud = _find_account(
+        organization,
+        '237005',
+        fallback_codes=['2370', '237005']
+    )
+    cuenta_pasivo_pension = _find_account(
+        organization,
+        '238030',
+        fallback_codes=['2380', '238030']
+    )
+    cuenta_pasivo_otras = _find_account(
+        organization,
+        getattr(configuracion, 'cuenta_otras_deducciones_defecto', None) or '2370',
+        fallback_codes=['2370', '2380']
+    )
+
+    # Salud y pensión del empleado por nómina (una sola consulta)
+    seguridad_social = {
+        fila['nomina_id']: fila
+        for fila in NominaConcepto.objects.for_tenant(organization).filter(
+            nomina__in=nominas,
+            tipo='DEDUCCION',
+        ).values('nomina_id').annotate(
+            salud=Sum(Case(When(concepto__codigo__contains='SALUD', then='valor'), default=Decimal('0.00'))),
+            pension=Sum(Case(When(concepto__codigo__contains='PENSION', then='valor'), default=Decimal('0.00'))),
+        )
+    }
+
+    total_pagar = Decimal('0.00')
+    total_prestamos = Decimal('0.00')
+    total_deducciones = Decimal('0.00')
+    salud_empleado = Decimal('0.00')
+    pension_empleado = Decimal('0.00')
+    otras_deducciones = Decimal('0.00')
+    for nomina in nominas:
+        deducciones = nomina.total_deducciones or Decimal('0.00')
+        fila = seguridad_social.get(nomina.id, {})
+        salud = fila.get('salud') or Decimal('0.00')
+        pension = fila.get('pension') or Decimal('0.00')
+        total_pagar += nomina.total_pagar or Decimal('0.00')
+        total_prestamos += nomina.total_prestamos or Decimal('0.00')
+        total_deducciones += deducciones
+        salud_empleado += salud
+        pension_empleado += pension
+        otras_deducciones += max(deducciones - salud - pension, Decimal('0.00'))
+
+    if total_prestamos > 0:
+        _validar_configuracion_puc(configuracion, ['cuenta_prestamos_defecto'])
+    if total_deducciones > 0:
+        _validar_configuracion_puc(configuracion, ['cuenta_otras_deducciones_defecto'])
+
+    total_debito = total_pagar + total_deducciones + (total_prestamos if cuenta_prestamos else Decimal('0.00'))
+    if total_debito <= 0:
+        return None
+
+    cuentas_requeridas = {
+        'cuenta_efectivo_defecto': cuenta_efectivo,
+        'cuenta_nomina_defecto': cuenta_nomina,
+    }
+    if total_prestamos > 0:
+        cuentas_requeridas['cuenta_prestamos_defecto'] = cuenta_prestamos
+    if salud_empleado > 0:
+        cuentas_requeridas['237005'] = cuenta_pasivo_salud
+    if pension_empleado > 0:
+        cuentas_requeridas['238030'] = cuenta_pasivo_pension
+    if otras_deducciones > 0:
+        cuentas_requeridas['cuenta_otras_deducciones_defecto'] = cuenta_pasivo_otras
+
+    _validar_cuentas_puc(cuentas_requeridas)
+
+    fecha_pago = nominas[0].fecha_pago or periodo_fin
+    descripcion = f"Nómina período {periodo_inicio} - {periodo_fin} ({len(nominas)} empleados)"
+
+    comprobante = ComprobanteContable.objects.create(
+        organization=organization,
+        tipo_comprobante='nomina',
+        fecha=fecha_pago,
+        descripcion=descripcion,
+        estado='contabilizado',
+        proyecto=proyecto,
+        creado_por=usuario,
+        contabilizado_por=usuario,
+        fecha_contabilizacion=timezone.now(),
+    )
+
+    lineas = [
+        (cuenta_nomina, f"Gasto nómina - {descripcion}", total_debito, Decimal('0.00')),
+        (cuenta_efectivo, f"Pago nómina - {descripcion}", Decimal('0.00'), total_pagar),
+    ]
+    if cuenta_prestamos:
+        lineas.append((cuenta_prestamos, f"Descuento préstamos - {descripcion}", Decimal('0.00'), total_prestamos))
+    lineas += [
+        (cuenta_pasivo_salud, f"Aportes EPS (empleado) - {descripcion}", Decimal('0.00'), salud_empleado),
+        (cuenta_pasivo_pension, f"Aportes pensión (empleado) - {descripcion}", Decimal('0.00'), pension_empleado),
+        (cuenta_pasivo_otras, f"Otras deducciones - {descripcion}", Decimal('0.00'), otras_deducciones),
+    ]
+
+    MovimientoContable.objects.bulk_create([
+        MovimientoContable(
+            organization=organization,
+            comprobante=comprobante,
+            cuenta=cuenta,
+            descripcion=detalle,
+            valor_debito=debito,
+            valor_credito=credito,
+        )
+        for cuenta, detalle, debito, credito in lineas
+        if cuenta and (debito > 0 or credito > 0)
+    ])
+    comprobante.recalcular_totales()
+    comprobante.nominas_consolidadas.add(*nominas)
+
+    if total_pagar > 0:
+        FlujoCaja.objects.create(
+            organization=organization,
+            fecha=fecha_pago,
+            tipo_movimiento='egreso',
+            concepto=descripcion,
+            valor=total_pagar,
+            comprobante=comprobante,
+            proyecto=proyecto
+        )
+
+    return comprobante
+
+
 @receiver(post_save, sender='prestamos.PagoPrestamo')
 def crear_comprobante_pago_prestamo(sender, instance, created, **kwargs):
     """Crea automáticamente comprobante contable para pagos de préstamos"""
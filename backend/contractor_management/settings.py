@@ -386,6 +386,28 @@ else:
         }
     }
 
+# ============================================
+# CHANNELS (WebSockets)
+# ============================================
+ASGI_APPLICATION = 'contractor_management.asgi.application'
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            },
+        }
+    }
+else:
+    # Solo para desarrollo y pruebas: no comparte mensajes entre procesos
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
 # ============================================
 # DJANGO REST FRAMEWORK
 # ============================================
@@ -590,6 +612,8 @@ TENANT_REQUIRED_PATHS = [
 # ============================================
 PERMISOS_CONFIG = {
     'CACHE_TIMEOUT': 300,
+    # Permisos efectivos compilados por usuario (se invalidan por versión)
+    'COMPILED_CACHE_TIMEOUT': int(os.environ.get('PERMISOS_COMPILED_CACHE_TIMEOUT', 3600)),
     'ENABLE_AUDIT': True,
     'ENABLE_CONDITIONS': True,
     'ENABLE_HIERARCHY': True,
@@ -735,6 +759,34 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'America/Bogota'
+# Ejecutar tareas en el mismo proceso (desarrollo/pruebas sin worker)
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'false').lower() in ('true', '1', 'yes')
+CELERY_TASK_EAGER_PROPAGATES = CELERY_TASK_ALWAYS_EAGER
+
+# Nóminas por bloque en el cálculo de períodos en segundo plano
+NOMINA_TRABAJO_TAMANO_BLOQUE = int(os.environ.get('NOMINA_TRABAJO_TAMANO_BLOQUE', 200))
+
+# Filas por lectura del cursor al generar la planilla PILA
+NOMINA_PILA_TAMANO_BLOQUE = int(os.environ.get('NOMINA_PILA_TAMANO_BLOQUE', 2000))
+
+# Filas por lectura del cursor al generar el archivo de dispersión bancaria
+NOMINA_DISPERSION_TAMANO_BLOQUE = int(os.environ.get('NOMINA_DISPERSION_TAMANO_BLOQUE', 2000))
+
+# Layouts de dispersión adicionales o que reemplazan los incluidos (misma estructura que nomina.dispersion.LAYOUTS)
+NOMINA_DISPERSION_LAYOUTS = {}
+
+# Filas por bloque (lectura del cursor y escritura) en la exportación columnar del histórico
+NOMINA_EXPORTACION_TAMANO_BLOQUE = int(os.environ.get('NOMINA_EXPORTACION_TAMANO_BLOQUE', 5000))
+
+# Variación porcentual entre períodos a partir de la cual se marca una línea para revisión
+NOMINA_VARIACION_UMBRAL_PORCENTAJE = float(os.environ.get('NOMINA_VARIACION_UMBRAL_PORCENTAJE', 20))
+
+# Segundos tras los cuales una transición de nómina en proceso (clave de idempotencia) se considera abandonada
+NOMINA_TRANSICION_TIMEOUT = int(os.environ.get('NOMINA_TRANSICION_TIMEOUT', 300))
+
+# Nómina electrónica: ambiente DIAN (1 producción, 2 pruebas) y PIN del software para el CUNE
+NOMINA_ELECTRONICA_AMBIENTE = os.environ.get('NOMINA_ELECTRONICA_AMBIENTE', '2')
+NOMINA_ELECTRONICA_SOFTWARE_PIN = os.environ.get('NOMINA_ELECTRONICA_SOFTWARE_PIN', '')
 
 # Configuración de tareas programadas (Celery Beat)
 CELERY_BEAT_SCHEDULE = {
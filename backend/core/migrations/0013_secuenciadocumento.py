@@ -0,0 +1,95 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0012_add_rbac_rol_to_invitacion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SecuenciaDocumento",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        db_index=True,
+                        verbose_name="Fecha de creación",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        db_index=True,
+                        verbose_name="Fecha de modificación",
+                    ),
+                ),
+                (
+                    "prefijo",
+                    models.CharField(
+                        help_text="Tipo de documento, ej: NOM, PR, CB-20260131",
+                        max_length=60,
+                        verbose_name="Prefijo",
+                    ),
+                ),
+                (
+                    "anio",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="0 para consecutivos que no reinician por año",
+                        verbose_name="Año",
+                    ),
+                ),
+                (
+                    "ultimo_valor",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Último valor asignado"
+                    ),
+                ),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="secuencias_documento",
+                        to="core.organizacion",
+                        verbose_name="Organización",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Secuencia de documento",
+                "verbose_name_plural": "Secuencias de documentos",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="secuenciadocumento",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "prefijo", "anio"),
+                name="uniq_secuencia_org_prefijo_anio",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="secuenciadocumento",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("organization__isnull", True)),
+                fields=("prefijo", "anio"),
+                name="uniq_secuencia_global_prefijo_anio",
+            ),
+        ),
+    ]
@@ -1302,3 +1302,58 @@ class Invitacion(TimestampedModel):
         self.accepted_at = timezone.now()
         self.accepted_by = user
         self.save(update_fields=['estado', 'accepted_at', 'accepted_by', 'updated_at'])
+
+
+# ==================== SECUENCIAS DE DOCUMENTOS ====================
+
+class SecuenciaDocumento(TimestampedModel):
+    """
+    Consecutivo de documentos por organización, prefijo y año.
+
+    Reemplaza la búsqueda del último número en cada tabla: la asignación es
+    un UPDATE atómico sobre una sola fila (ver ``core.secuencias``).
+    """
+
+    organization = models.ForeignKey(
+        Organizacion,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='secuencias_documento',
+        verbose_name=_('Organización')
+    )
+
+    prefijo = models.CharField(
+        max_length=60,
+        verbose_name=_('Prefijo'),
+        help_text=_('Tipo de documento, ej: NOM, PR, CB-20260131')
+    )
+
+    anio = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Año'),
+        help_text=_('0 para consecutivos que no reinician por año')
+    )
+
+    ultimo_valor = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name=_('Último valor asignado')
+    )
+
+    class Meta:
+        verbose_name = _('Secuencia de documento')
+        verbose_name_plural = _('Secuencias de documentos')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'prefijo', 'anio'],
+                name='uniq_secuencia_org_prefijo_anio',
+            ),
+            models.UniqueConstraint(
+                fields=['prefijo', 'anio'],
+                condition=models.Q(organization__isnull=True),
+                name='uniq_secuencia_global_prefijo_anio',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.prefijo}/{self.anio}: {self.ultimo_valor}"
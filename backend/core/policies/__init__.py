@@ -13,6 +13,7 @@ from .utils import (
 	get_user_permissions_cache,
 	invalidate_user_permissions_cache,
 )
+from .permisos_efectivos import incrementar_version_permisos, permisos_efectivos
 
 __all__ = [
 	'BaseAccessPolicy',
@@ -27,4 +28,6 @@ __all__ = [
 	'check_resource_action_permission',
 	'get_user_permissions_cache',
 	'invalidate_user_permissions_cache',
+	'incrementar_version_permisos',
+	'permisos_efectivos',
 ]
@@ -0,0 +1,315 @@
+"""
+Permisos efectivos compilados por usuario (RBAC + ABAC)
+=======================================================
+
+Compila en una sola estructura los permisos de un usuario:
+
+- Permisos directos concedidos y denegados (``PermisoDirecto``).
+- Roles asignados (``AsignacionRol``) y los permisos heredables de sus
+  roles padre (``Rol.rol_padre`` con ``hereda_permisos``).
+- Ventanas de vigencia de asignaciones y permisos, restricción horaria
+  del rol y condiciones ABAC (``CondicionPermiso``) de cada permiso.
+
+La compilación hace unas pocas consultas (una por tabla y una por nivel
+de jerarquía) y se guarda en caché bajo una versión por usuario. Las
+ventanas, horarios y condiciones se evalúan en cada verificación contra
+la estructura compilada, sin consultas.
+
+La versión se incrementa con cualquier cambio de ``PermisoDirecto``,
+``AsignacionRol``, ``Rol``, ``Permiso`` o sus condiciones (signals en
+``core.signals``); la compilación anterior queda huérfana y expira.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+
+ESTADOS_ASIGNACION_VIGENTES = ('ACTIVA', 'APROBADA')
+
+CAMPOS_CONDICION = (
+    'id', 'codigo', 'tipo', 'configuracion', 'codigo_evaluacion', 'cacheable', 'tiempo_cache',
+)
+
+
+def _timeout():
+    return getattr(settings, 'PERMISOS_CONFIG', {}).get('COMPILED_CACHE_TIMEOUT', 3600)
+
+
+def _clave_version(usuario_id):
+    return f"rbac:version:{usuario_id}"
+
+
+def _clave_compilado(usuario_id, organization_id, version):
+    return f"rbac:compilado:{usuario_id}:{organization_id}:{version}"
+
+
+def version_permisos(usuario_id):
+    """Versión vigente de los permisos del usuario."""
+    clave = _clave_version(usuario_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time_ns(), None)
+        version = cache.get(clave) or 0
+    return version
+
+
+def incrementar_version_permisos(usuario_ids):
+    """Invalida los permisos compilados de los usuarios."""
+    usuario_ids = {usuario_id for usuario_id in usuario_ids if usuario_id is not None}
+    if usuario_ids:
+        version = time.time_ns()
+        cache.set_many({_clave_version(usuario_id): version for usuario_id in usuario_ids}, None)
+
+
+def _ventana(*intervalos):
+    """Intersección de intervalos ``(desde, hasta)``; ``None`` es abierto."""
+    desdes = [desde for desde, _ in intervalos if desde is not None]
+    hastas = [hasta for _, hasta in intervalos if hasta is not None]
+    return (max(desdes) if desdes else None, min(hastas) if hastas else None)
+
+
+def _en_ventana(ventana, ahora):
+    desde, hasta = ventana
+    return (desde is None or ahora >= desde) and (hasta is None or ahora <= hasta)
+
+
+def _permiso_de_organizacion(permiso, organization_id):
+    # Compatibilidad con doble campo (Organizacion y organization)
+    for campo in ('Organizacion_id', 'organization_id'):
+        permiso_org_id = getattr(permiso, campo, None)
+        if permiso_org_id and permiso_org_id != organization_id:
+            return False
+    return True
+
+
+class PermisosCompilados:
+    """
+    Permisos efectivos de un usuario.
+
+    - ``denegados``: {código: [ventana]}
+    - ``concedidos``: {código: [(ventana, rol_id | None, ids de condiciones)]}
+    - ``roles``: {rol_id: {'ventanas': [ventana], 'horario': Rol | None}}
+      (``horario`` solo si el rol tiene restricción horaria)
+    - ``condiciones``: {id: campos de ``CondicionPermiso``}
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.denegados = {}
+        self.concedidos = {}
+        self.roles = {}
+        self.condiciones = {}
+
+    def _rol_habilitado(self, rol_id, ahora):
+        rol = self.roles.get(rol_id)
+        if rol is None or not any(_en_ventana(ventana, ahora) for ventana in rol['ventanas']):
+            return False
+        return rol['horario'] is None or rol['horario'].puede_acceder_ahora()
+
+    def _cumple_condiciones(self, condicion_ids, usuario, contexto):
+        from permisos.models import CondicionPermiso
+
+        for condicion_id in condicion_ids:
+            condicion = CondicionPermiso(activa=True, **self.condiciones[condicion_id])
+            if not condicion.evaluar(usuario, contexto):
+                return False
+        return True
+
+    def permite(self, usuario, codes, contexto=None):
+        """Evalúa los códigos: una denegación vigente tiene prioridad."""
+        ahora = timezone.now()
+        for codigo in codes:
+            if any(_en_ventana(ventana, ahora) for ventana in self.denegados.get(codigo, ())):
+                return False
+
+        for codigo in codes:
+            for ventana, rol_id, condicion_ids in self.concedidos.get(codigo, ()):
+                if not _en_ventana(ventana, ahora):
+                    continue
+                if rol_id is not None and not self._rol_habilitado(rol_id, ahora):
+                    continue
+                if self._cumple_condiciones(condicion_ids, usuario, contexto or {}):
+                    return True
+        return False
+
+
+def _ancestros(rol_ids):
+    """
+    {rol_id: [ancestros de los que hereda permisos]}, una consulta por
+    nivel de jerarquía.
+    """
+    from roles.models import Rol
+
+    limite = getattr(settings, 'PERMISOS_CONFIG', {}).get('MAX_HIERARCHY_DEPTH', 10)
+    padre = {}
+    pendientes = set(rol_ids)
+    for _ in range(limite + 1):
+        if not pendientes:
+            break
+        nivel = dict(
+            Rol.objects.filter(id__in=pendientes, hereda_permisos=True, rol_padre__isnull=False)
+            .values_list('id', 'rol_padre_id')
+        )
+        for rol_id in pendientes:
+            padre[rol_id] = nivel.get(rol_id)
+        pendientes = set(nivel.values()) - set(padre)
+
+    ancestros = {}
+    for rol_id in rol_ids:
+        cadena = []
+        actual = padre.get(rol_id)
+        while actual is not None and actual != rol_id and actual not in cadena and len(cadena) < limite:
+            cadena.append(actual)
+            actual = padre.get(actual)
+        ancestros[rol_id] = cadena
+    return ancestros
+
+
+def compilar_permisos(usuario, version=None):
+    """Compila los permisos efectivos del usuario (sin caché)."""
+    from permisos.models import Permiso, PermisoDirecto
+    from roles.models import AsignacionRol, Rol
+
+    organization_id = getattr(usuario, 'organization_id', None)
+    compilado = PermisosCompilados(version)
+    permisos = set()
+
+    # 1) Permisos directos
+    for asignacion in PermisoDirecto.objects.filter(
+        usuario=usuario, activo=True, permiso__activo=True
+    ).select_related('permiso'):
+        permiso = asignacion.permiso
+        ventana = _ventana(
+            (asignacion.fecha_inicio, asignacion.fecha_fin),
+            (permiso.vigencia_inicio, permiso.vigencia_fin),
+        )
+        if asignacion.tipo == 'deny':
+            compilado.denegados.setdefault(permiso.codigo, []).append(ventana)
+        elif asignacion.tipo in ('grant', 'temporary') and _permiso_de_organizacion(permiso, organization_id):
+            permisos.add(permiso.pk)
+            compilado.concedidos.setdefault(permiso.codigo, []).append((ventana, None, permiso.pk))
+
+    # 2) Roles asignados
+    estado_vigente = Q()
+    for estado in ESTADOS_ASIGNACION_VIGENTES:
+        estado_vigente |= Q(estado__nombre__iexact=estado)
+    asignaciones = AsignacionRol.objects.filter(
+        estado_vigente, usuario=usuario, activa=True, rol__activo=True,
+    ).select_related('rol')
+    if organization_id:
+        asignaciones = asignaciones.filter(
+            Q(tenant_id=organization_id) | Q(tenant_id__isnull=True) | Q(tenant_id='')
+        )
+    for asignacion in asignaciones:
+        rol = compilado.roles.setdefault(asignacion.rol_id, {
+            'ventanas': [],
+            'horario': asignacion.rol if asignacion.rol.tiene_restriccion_horario else None,
+        })
+        rol['ventanas'].append((asignacion.fecha_inicio, asignacion.fecha_fin))
+
+    if compilado.roles:
+        ancestros = _ancestros(list(compilado.roles))
+        origen = {}
+        for rol_id, cadena in ancestros.items():
+            origen.setdefault(rol_id, set()).add((rol_id, False))
+            for ancestro in cadena:
+                origen.setdefault(ancestro, set()).add((rol_id, True))
+
+        for rol_permiso in Rol.permisos.through.objects.filter(
+            rol_id__in=list(origen), permiso__activo=True
+        ).select_related('permiso'):
+            permiso = rol_permiso.permiso
+            if not _permiso_de_organizacion(permiso, organization_id):
+                continue
+            for rol_id, heredado in origen[rol_permiso.rol_id]:
+                if heredado and not permiso.es_heredable:
+                    continue
+                permisos.add(permiso.pk)
+                compilado.concedidos.setdefault(permiso.codigo, []).append(
+                    ((permiso.vigencia_inicio, permiso.vigencia_fin), rol_id, permiso.pk)
+                )
+
+    # 3) Condiciones ABAC de los permisos concedidos
+    condiciones_por_permiso = {}
+    for relacion in Permiso.condiciones.through.objects.filter(
+        permiso_id__in=list(permisos), condicionpermiso__activa=True
+    ).select_related('condicionpermiso'):
+        condicion = relacion.condicionpermiso
+        compilado.condiciones[condicion.pk] = {campo: getattr(condicion, campo) for campo in CAMPOS_CONDICION}
+        condiciones_por_permiso.setdefault(relacion.permiso_id, []).append(condicion.pk)
+
+    for codigo, reglas in compilado.concedidos.items():
+        compilado.concedidos[codigo] = [
+            (ventana, rol_id, tuple(condiciones_por_permiso.get(permiso_id, ())))
+            for ventana, rol_id, permiso_id in reglas
+        ]
+    return compilado
+
+
+def permisos_efectivos(usuario):
+    """Permisos compilados del usuario desde la caché de su versión vigente."""
+    version = version_permisos(usuario.pk)
+    clave = _clave_compilado(usuario.pk, getattr(usuario, 'organization_id', None), version)
+    compilado = cache.get(clave)
+    if compilado is None:
+        compilado = compilar_permisos(usuario, version)
+        cache.set(clave, compilado, _timeout())
+    return compilado
+
+
+def permisos_compilados_en_cache(usuario):
+    """Compilación vigente en caché, o ``None`` si no se ha compilado."""
+    version = version_permisos(usuario.pk)
+    return cache.get(_clave_compilado(usuario.pk, getattr(usuario, 'organization_id', None), version))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# USUARIOS AFECTADOS POR CAMBIOS (para incrementar su versión)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _roles_con_descendientes(rol_ids):
+    """Los roles y sus descendientes que heredan permisos."""
+    from roles.models import Rol
+
+    todos = set(rol_ids)
+    nivel = set(rol_ids)
+    while nivel:
+        nivel = set(
+            Rol.objects.filter(rol_padre_id__in=nivel, hereda_permisos=True).values_list('id', flat=True)
+        ) - todos
+        todos |= nivel
+    return todos
+
+
+def usuarios_de_roles(rol_ids):
+    """Usuarios con asignación a los roles o a roles que heredan de ellos."""
+    from roles.models import AsignacionRol
+
+    if not rol_ids:
+        return set()
+    return set(
+        AsignacionRol.objects.filter(rol_id__in=_roles_con_descendientes(rol_ids))
+        .values_list('usuario_id', flat=True).distinct()
+    )
+
+
+def usuarios_de_permisos(permiso_ids):
+    """Usuarios con los permisos por asignación directa o por rol."""
+    from permisos.models import PermisoDirecto
+    from roles.models import Rol
+
+    if not permiso_ids:
+        return set()
+    usuarios = set(
+        PermisoDirecto.objects.filter(permiso_id__in=permiso_ids)
+        .values_list('usuario_id', flat=True).distinct()
+    )
+    rol_ids = set(
+        Rol.permisos.through.objects.filter(permiso_id__in=permiso_ids)
+        .values_list('rol_id', flat=True)
+    )
+    return usuarios | usuarios_de_roles(rol_ids)
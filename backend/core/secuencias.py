@@ -0,0 +1,116 @@
+"""
+Consecutivos de documentos (nóminas, préstamos, pagos, comprobantes)
+=====================================================================
+
+Asigna números desde ``SecuenciaDocumento`` (una fila por organización,
+prefijo y año) en lugar de buscar el último número en la tabla del
+documento:
+
+- ``siguiente_numero``: un número; en PostgreSQL es un solo
+  ``UPDATE ... RETURNING``.
+- ``reservar_bloque``: N números consecutivos en la misma consulta, para
+  procesos por lotes.
+
+El UPDATE bloquea la fila de la secuencia hasta el fin de la transacción:
+si el documento no se guarda y la transacción se revierte, el número
+vuelve a quedar libre (sin huecos). Por eso debe llamarse dentro de la
+misma transacción que inserta el documento.
+
+La primera vez que se usa una secuencia se inicializa con ``semilla``
+(el último número ya emitido con el esquema anterior), de modo que no
+se repiten números de documentos existentes.
+"""
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+
+def _organization_id(organization):
+    return getattr(organization, 'pk', organization)
+
+
+def _incrementar(organization_id, prefijo, anio, cantidad):
+    """Suma ``cantidad`` a la secuencia y devuelve el nuevo último valor (o None si no existe)."""
+    from .models import SecuenciaDocumento
+
+    if connection.vendor == 'postgresql':
+        tabla = connection.ops.quote_name(SecuenciaDocumento._meta.db_table)
+        filtro_org = 'organization_id IS NULL' if organization_id is None else 'organization_id = %s'
+        parametros = [cantidad, prefijo, anio]
+        if organization_id is not None:
+            parametros.append(organization_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {tabla} SET ultimo_valor = ultimo_valor + %s, updated_at = NOW() '
+                f'WHERE prefijo = %s AND anio = %s AND {filtro_org} '
+                f'RETURNING ultimo_valor',
+                parametros,
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila else None
+
+    secuencias = SecuenciaDocumento.objects.filter(
+        organization_id=organization_id, prefijo=prefijo, anio=anio
+    )
+    if not secuencias.update(ultimo_valor=F('ultimo_valor') + cantidad):
+        return None
+    return secuencias.values_list('ultimo_valor', flat=True).get()
+
+
+def reservar_bloque(organization, prefijo, cantidad, anio=0, semilla=None) -> range:
+    """
+    Reserva ``cantidad`` números consecutivos de la secuencia.
+
+    Args:
+        organization: organización (o su id); None para secuencias globales
+        prefijo: tipo de documento
+        cantidad: números a reservar
+        anio: año de la secuencia (0 si no reinicia por año)
+        semilla: callable que devuelve el último número ya emitido; solo se
+            llama la primera vez que se usa la secuencia
+
+    Returns:
+        range: números asignados, en orden
+    """
+    from .models import SecuenciaDocumento
+
+    if cantidad < 1:
+        return range(0)
+
+    organization_id = _organization_id(organization)
+    with transaction.atomic():
+        ultimo = _incrementar(organization_id, prefijo, anio, cantidad)
+        if ultimo is None:
+            try:
+                with transaction.atomic():
+                    SecuenciaDocumento.objects.create(
+                        organization_id=organization_id,
+                        prefijo=prefijo,
+                        anio=anio,
+                        ultimo_valor=semilla() if semilla else 0,
+                    )
+            except IntegrityError:
+                # Otro proceso la creó primero; se incrementa la suya
+                pass
+            ultimo = _incrementar(organization_id, prefijo, anio, cantidad)
+    return range(ultimo - cantidad + 1, ultimo + 1)
+
+
+def siguiente_numero(organization, prefijo, anio=0, semilla=None) -> int:
+    """Siguiente número de la secuencia (ver ``reservar_bloque``)."""
+    return reservar_bloque(organization, prefijo, 1, anio=anio, semilla=semilla)[0]
+
+
+def ultimo_consecutivo(numeros, prefijo) -> int:
+    """
+    Mayor consecutivo entre números con formato ``<prefijo><entero>``.
+
+    Sirve como ``semilla`` a partir de los documentos ya existentes.
+    """
+    maximo = 0
+    for numero in numeros:
+        try:
+            maximo = max(maximo, int(numero[len(prefijo):]))
+        except (TypeError, ValueError):
+            continue
+    return maximo
@@ -1,7 +1,14 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from permisos.models import CondicionPermiso, Permiso, PermisoDirecto
+from roles.models import AsignacionRol, Rol
 from .models import LogAuditoria
+from .policies.permisos_efectivos import (
+    incrementar_version_permisos,
+    usuarios_de_permisos,
+    usuarios_de_roles,
+)
 
 User = get_user_model()
 
@@ -54,3 +61,68 @@ def log_user_deletion(sender, instance, **kwargs):
         datos_despues=None,
         metadata={'source': 'signal'}
     )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# VERSIÓN DE PERMISOS COMPILADOS (core.policies.permisos_efectivos)
+# ══════════════════════════════════════════════════════════════════════════════
+
+@receiver(post_save, sender=PermisoDirecto)
+@receiver(post_delete, sender=PermisoDirecto)
+@receiver(post_save, sender=AsignacionRol)
+@receiver(post_delete, sender=AsignacionRol)
+def invalidar_permisos_usuario(sender, instance, **kwargs):
+    """Cambió un permiso directo o una asignación de rol del usuario"""
+    incrementar_version_permisos([instance.usuario_id])
+
+
+@receiver(post_save, sender=Rol)
+def invalidar_permisos_rol(sender, instance, **kwargs):
+    """
+    Cambió un rol: usuarios del rol y de los roles que heredan de él.
+    Al eliminarlo, la cascada de AsignacionRol invalida a sus usuarios.
+    """
+    incrementar_version_permisos(usuarios_de_roles([instance.pk]))
+
+
+@receiver(post_save, sender=Permiso)
+@receiver(pre_delete, sender=Permiso)
+def invalidar_permisos_permiso(sender, instance, **kwargs):
+    """Cambió un permiso: usuarios que lo tienen directo o por rol"""
+    incrementar_version_permisos(usuarios_de_permisos([instance.pk]))
+
+
+@receiver(post_save, sender=CondicionPermiso)
+@receiver(pre_delete, sender=CondicionPermiso)
+def invalidar_permisos_condicion(sender, instance, **kwargs):
+    """Cambió una condición ABAC: usuarios de los permisos que la usan"""
+    permiso_ids = list(instance.permisos.values_list('id', flat=True))
+    incrementar_version_permisos(usuarios_de_permisos(permiso_ids))
+
+
+@receiver(m2m_changed, sender=Rol.permisos.through)
+def invalidar_permisos_de_rol(sender, instance, action, reverse, pk_set, **kwargs):
+    """Se agregaron o quitaron permisos de un rol (desde cualquiera de los lados)"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        rol_ids = [instance.pk]
+    elif pk_set:
+        rol_ids = list(pk_set)
+    else:
+        rol_ids = list(instance.roles_asignados.values_list('id', flat=True))
+    incrementar_version_permisos(usuarios_de_roles(rol_ids))
+
+
+@receiver(m2m_changed, sender=Permiso.condiciones.through)
+def invalidar_condiciones_de_permiso(sender, instance, action, reverse, pk_set, **kwargs):
+    """Se agregaron o quitaron condiciones de un permiso"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        permiso_ids = [instance.pk]
+    elif pk_set:
+        permiso_ids = list(pk_set)
+    else:
+        permiso_ids = list(instance.permisos.values_list('id', flat=True))
+    incrementar_version_permisos(usuarios_de_permisos(permiso_ids))
@@ -1,7 +1,13 @@
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
-from core.models import ConfiguracionSistema, LogAuditoria, Notificacion
+from core.models import ConfiguracionSistema, LogAuditoria, Notificacion, Organizacion
+from core.secuencias import siguiente_numero, reservar_bloque
+from core.policies.utils import check_permission
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from permisos.models import ModuloSistema, TipoPermiso, Permiso, PermisoDirecto
+from roles.models import Rol, AsignacionRol, EstadoAsignacion
 
 
 class ConfiguracionModelTest(TestCase):
@@ -126,3 +132,78 @@ class CoreViewsTest(TestCase):
         self.client.login(username='testuser', password='testpass123')
         response = self.client.get(reverse('core:notificaciones'))
         self.assertEqual(response.status_code, 200)
+
+
+class SecuenciaDocumentoTest(TestCase):
+    def setUp(self):
+        self.organization = Organizacion.objects.create(
+            nombre='Org Secuencias',
+            codigo='SEQ',
+            activa=True
+        )
+
+    def test_numeros_consecutivos_desde_semilla(self):
+        """La secuencia arranca después del último número existente"""
+        self.assertEqual(siguiente_numero(self.organization, 'NOM', anio=2026, semilla=lambda: 41), 42)
+        self.assertEqual(siguiente_numero(self.organization, 'NOM', anio=2026, semilla=lambda: 0), 43)
+        self.assertEqual(siguiente_numero(self.organization, 'NOM', anio=2027), 1)
+
+    def test_reservar_bloque(self):
+        """Un bloque reserva números contiguos y la secuencia continúa después"""
+        bloque = reservar_bloque(self.organization, 'PR', 500, anio=2026)
+        self.assertEqual((bloque[0], bloque[-1]), (1, 500))
+        self.assertEqual(siguiente_numero(self.organization, 'PR', anio=2026), 501)
+        self.assertEqual(siguiente_numero(None, 'PR', anio=2026), 1)
+
+
+class PermisosEfectivosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organizacion.objects.create(nombre='Org RBAC', codigo='RBAC', activa=True)
+        usuarios = get_user_model().objects
+        self.usuario = usuarios.create_user(
+            username='rbac', email='rbac@test.com', password='testpass123', organization=self.organization
+        )
+        self.admin = usuarios.create_user(
+            username='rbac-admin', email='rbac-admin@test.com', password='testpass123',
+            organization=self.organization
+        )
+        activa = EstadoAsignacion.objects.create(nombre='ACTIVA')
+        EstadoAsignacion.objects.create(nombre='INACTIVA')
+        modulo = ModuloSistema.objects.create(nombre='Nómina', codigo='nomina')
+        tipo = TipoPermiso.objects.create(nombre='Ver', codigo='view', categoria='crud')
+        self.permiso = Permiso.objects.create(
+            nombre='Ver nómina', codigo='nomina.view', modulo=modulo, tipo_permiso=tipo
+        )
+        self.padre = Rol.objects.create(nombre='Contador', codigo='CONTADOR')
+        self.padre.permisos.add(self.permiso)
+        self.rol = Rol.objects.create(nombre='Auxiliar', codigo='AUXILIAR', rol_padre=self.padre)
+        self.asignacion = AsignacionRol.objects.create(
+            usuario=self.usuario, rol=self.rol, estado=activa, asignado_por=self.admin
+        )
+
+    def test_permiso_heredado_sin_consultas_repetidas(self):
+        """El permiso del rol padre se concede y la segunda verificación no consulta la BD"""
+        self.assertTrue(check_permission(self.usuario, ['nomina.view']))
+        with self.assertNumQueries(0):
+            self.assertTrue(check_permission(self.usuario, ['nomina.view']))
+        self.assertFalse(check_permission(self.usuario, ['nomina.delete']))
+
+    def test_cambios_invalidan_la_compilacion(self):
+        """Denegar, desactivar la asignación o quitar el permiso del rol se refleja de inmediato"""
+        self.assertTrue(check_permission(self.usuario, ['nomina.view']))
+
+        denegacion = PermisoDirecto.objects.create(
+            usuario=self.usuario, permiso=self.permiso, tipo='deny', asignado_por=self.admin
+        )
+        self.assertFalse(check_permission(self.usuario, ['nomina.view']))
+        denegacion.delete()
+        self.assertTrue(check_permission(self.usuario, ['nomina.view']))
+
+        self.padre.permisos.remove(self.permiso)
+        self.assertFalse(check_permission(self.usuario, ['nomina.view']))
+        self.padre.permisos.add(self.permiso)
+
+        self.asignacion.activa = False
+        self.asignacion.save()
+        self.assertFalse(check_permission(self.usuario, ['nomina.view']))
@@ -27,6 +27,9 @@ websocket_urlpatterns = [
     
     # Canal general para administradores
     re_path(r'ws/admin/(?P<organization_id>\w+)/$', websocket_consumer.AdminConsumer.as_asgi()),
+    
+    # Avance de trabajos de cálculo de nómina
+    re_path(r'ws/nomina/trabajos/(?P<trabajo_id>[0-9a-f-]+)/$', websocket_consumer.NominaTrabajoConsumer.as_asgi()),
 ]
 
 # Grupos de WebSocket para diferentes tipos de usuarios
@@ -39,6 +42,7 @@ WEBSOCKET_GROUPS = {
     'tracking': 'tracking_updates_{organization_id}',
     'alerts': 'alerts_{organization_id}',
     'admin': 'admin_channel_{organization_id}',
+    'nomina_trabajos': 'nomina_trabajo_{trabajo_id}',
 }
 
 # Configuración de permisos por canal
@@ -51,6 +55,7 @@ CHANNEL_PERMISSIONS = {
     'tracking': ['admin', 'manager'],
     'alerts': ['admin', 'manager'],
     'admin': ['admin'],
+    'nomina_trabajos': ['admin', 'manager'],
 }
 
 # Configuración de rate limiting
@@ -141,6 +146,9 @@ MESSAGE_TYPES = {
         'user_management',
         'broadcast_message',
         'emergency_notification'
+    ],
+    'nomina_trabajos': [
+        'get_progress'
     ]
 }
 
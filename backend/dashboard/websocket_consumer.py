@@ -729,3 +729,68 @@ class AdminConsumer(BaseConsumer):
             self.group_name,
             self.channel_name
         )
+
+class NominaTrabajoConsumer(BaseConsumer):
+    """Consumidor para el avance de un trabajo de cálculo de nómina"""
+    
+    async def connect(self):
+        """Conectar al trabajo indicado en la URL"""
+        self.trabajo_id = self.scope['url_route']['kwargs']['trabajo_id']
+        await super().connect()
+    
+    @database_sync_to_async
+    def validate_organization_access(self):
+        """El trabajo debe pertenecer a la organización del usuario"""
+        from nomina.models import TrabajoCalculoNomina
+        
+        user_org = getattr(self.user, 'organization', None) or getattr(self.user, 'organizacion', None)
+        if not user_org:
+            return False
+        return TrabajoCalculoNomina.objects.for_tenant(user_org).filter(id=self.trabajo_id).exists()
+    
+    async def join_groups(self):
+        """Unirse al grupo del trabajo y enviar el estado actual"""
+        self.group_name = f"nomina_trabajo_{self.trabajo_id}"
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        await self.send_progreso()
+    
+    async def leave_groups(self):
+        """Salir del grupo del trabajo"""
+        await self.channel_layer.group_discard(
+            self.group_name,
+            self.channel_name
+        )
+    
+    async def handle_message(self, message_type, data):
+        """Manejar mensajes del trabajo"""
+        if message_type == 'get_progress':
+            await self.send_progreso()
+        else:
+            await super().handle_message(message_type, data)
+    
+    @database_sync_to_async
+    def get_progreso(self):
+        from nomina.models import TrabajoCalculoNomina
+        
+        trabajo = TrabajoCalculoNomina.objects.all_tenants().filter(id=self.trabajo_id).first()
+        return trabajo.progreso() if trabajo else None
+    
+    async def send_progreso(self):
+        """Enviar el avance actual leído de la BD"""
+        progreso = await self.get_progreso()
+        if progreso is not None:
+            await self.send(text_data=json.dumps({
+                'type': 'nomina_progreso',
+                'data': progreso
+            }))
+    
+    # Handlers de grupo
+    async def nomina_progreso(self, event):
+        """Recibir avance publicado por las tareas de Celery"""
+        await self.send(text_data=json.dumps({
+            'type': 'nomina_progreso',
+            'data': event['data']
+        }))
@@ -0,0 +1,127 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║              APERTURA DE PERÍODO (NÓMINAS EN BORRADOR EN BLOQUE)              ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Crea en una sola pasada la nómina en borrador de cada contrato activo de
+la organización (o del proyecto) para un período:
+
+1. Se bloquean los contratos vigentes en el período y, en una segunda
+   consulta de la misma transacción, se marcan con ``EXISTS`` los que ya
+   tienen nómina no anulada que se solape con el período. Separar el
+   bloqueo de la marca hace que, con READ COMMITTED, una apertura
+   simultánea espere el bloqueo y luego vea las nóminas ya confirmadas
+   por la otra, en lugar de evaluar el ``EXISTS`` con una foto anterior.
+2. Los números ``NOM-AAAA-NNNNNN`` se reservan en bloque en la secuencia
+   de la organización (``core.secuencias.reservar_bloque``), con el mismo
+   esquema que ``NominaSimple.save``.
+3. Un ``bulk_create`` inserta todas las nóminas.
+
+``bulk_create`` no dispara signals: el resumen del período se actualiza
+explícitamente con ``AcumuladorResumen``.
+"""
+
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Contrato, NominaSimple
+from .resumen_periodo import AcumuladorResumen, huella
+
+
+class AperturaPeriodoError(Exception):
+    """El período no se puede abrir."""
+    pass
+
+
+def _solapadas(periodo_inicio, periodo_fin):
+    """Nóminas no anuladas del contrato (``OuterRef``) que se solapan con el período."""
+    return NominaSimple._base_manager.filter(
+        contrato_id=OuterRef('pk'),
+        periodo_inicio__lte=periodo_fin,
+        periodo_fin__gte=periodo_inicio,
+    ).exclude(estado='anulada')
+
+
+def abrir_periodo(organization, periodo_inicio, periodo_fin, proyecto=None, fecha_pago=None) -> dict:
+    """
+    Crea las nóminas en borrador del período.
+
+    Raises:
+        AperturaPeriodoError: período inválido o cerrado
+
+    Returns:
+        dict: nóminas creadas, contratos omitidos por tener ya nómina en el
+        período y rango de números asignados
+    """
+    from core.secuencias import reservar_bloque, ultimo_consecutivo
+    from .cierre_periodo import periodo_cerrado
+
+    if periodo_fin < periodo_inicio:
+        raise AperturaPeriodoError('El fin del período debe ser posterior al inicio.')
+    if periodo_cerrado(organization, periodo_inicio, periodo_fin):
+        raise AperturaPeriodoError('El período está cerrado.')
+
+    contratos = Contrato.objects.for_tenant(organization).filter(
+        Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=periodo_inicio),
+        activo=True,
+        fecha_inicio__lte=periodo_fin,
+    )
+    if proyecto is not None:
+        contratos = contratos.filter(proyecto=proyecto)
+
+    with transaction.atomic():
+        bloqueados = list(
+            contratos.select_for_update(of=('self',)).order_by('pk').values_list('id', flat=True)
+        )
+        filas = list(
+            Contrato._base_manager.filter(pk__in=bloqueados).annotate(
+                tiene_nomina=Exists(_solapadas(periodo_inicio, periodo_fin))
+            ).order_by('pk').values_list('id', 'salario', 'proyecto_id', 'tiene_nomina')
+        )
+        pendientes = [fila for fila in filas if not fila[3]]
+        if not pendientes:
+            return {'creadas': 0, 'omitidas': len(filas), 'numero_desde': None, 'numero_hasta': None}
+
+        organization_id = getattr(organization, 'pk', organization)
+        year = datetime.now().year
+        prefix = f"NOM-{year}-"
+
+        def semilla():
+            return ultimo_consecutivo(
+                NominaSimple.objects.all_tenants().filter(
+                    organization_id=organization_id,
+                    numero__startswith=prefix
+                ).values_list('numero', flat=True),
+                prefix
+            )
+
+        consecutivos = reservar_bloque(organization_id, 'NOM', len(pendientes), anio=year, semilla=semilla)
+        nominas = [
+            NominaSimple(
+                organization_id=organization_id,
+                numero=f"{prefix}{consecutivo:06d}",
+                contrato_id=contrato_id,
+                proyecto_id=proyecto_id,
+                periodo_inicio=periodo_inicio,
+                periodo_fin=periodo_fin,
+                fecha_pago=fecha_pago,
+                salario_base=salario,
+            )
+            for (contrato_id, salario, proyecto_id, _), consecutivo in zip(pendientes, consecutivos)
+        ]
+        NominaSimple.objects.bulk_create(nominas, batch_size=1000)
+
+        resumen = AcumuladorResumen(organization_id)
+        for nomina in nominas:
+            resumen.registrar(None, huella(nomina))
+        resumen.aplicar()
+
+    return {
+        'creadas': len(nominas),
+        'omitidas': len(filas) - len(nominas),
+        'numero_desde': nominas[0].numero,
+        'numero_hasta': nominas[-1].numero,
+    }
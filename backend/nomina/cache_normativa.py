@@ -0,0 +1,159 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║          CACHÉ DE NORMATIVA (PARÁMETROS LEGALES Y CONCEPTOS LABORALES)        ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Mantiene en memoria del proceso una foto (snapshot) por organización de
+``ParametroLegal`` y ``ConceptoLaboral``. Las consultas "valor vigente a la
+fecha X" se resuelven con un índice de intervalos sin ir a la BD.
+
+Invalidación:
+- Cada organización tiene un contador de versión en la caché de Django
+  (compartida entre procesos cuando se usa Redis).
+- Guardar o eliminar un parámetro o concepto incrementa el contador
+  (ver ``nomina/signals.py``); los procesos recargan su snapshot cuando la
+  versión guardada ya no coincide.
+
+NOTA: ``bulk_create``/``update()`` no disparan signals. Quien los use sobre
+estos modelos debe llamar ``invalidar_snapshot`` manualmente.
+"""
+
+import hashlib
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.core.cache import cache
+
+
+VERSION_CACHE_KEY = 'nomina_normativa_version_{}'
+
+# Snapshots del proceso: organization_id -> SnapshotNormativo
+_snapshots = {}
+_lock = threading.Lock()
+
+
+class SnapshotNormativo:
+    """Foto inmutable de la normativa de una organización en una versión."""
+
+    def __init__(self, organization_id, version):
+        from .models import ParametroLegal, ConceptoLaboral
+
+        self.organization_id = organization_id
+        self.version = version
+
+        # Índice de intervalos: por concepto, vigencias ordenadas por fecha de inicio
+        parametros = defaultdict(list)
+        for parametro in ParametroLegal.objects.for_tenant(organization_id).filter(
+            activo=True
+        ).order_by('vigente_desde'):
+            parametros[parametro.concepto].append(parametro)
+        self._parametros = dict(parametros)
+        self._desdes = {
+            concepto: [p.vigente_desde for p in lista]
+            for concepto, lista in self._parametros.items()
+        }
+
+        # Conceptos en el orden por defecto del modelo (tipo, orden, nombre)
+        self._conceptos = list(ConceptoLaboral.objects.for_tenant(organization_id))
+        self._conceptos_por_codigo = {c.codigo: c for c in self._conceptos}
+        self._conceptos_por_id = {str(c.id): c for c in self._conceptos}
+        self._huellas = {}
+
+    def parametro(self, concepto, fecha):
+        """
+        Parámetro vigente a la fecha: el de inicio más reciente que no haya
+        vencido (mismo criterio que ``ParametroLegal.obtener_vigente``).
+        """
+        lista = self._parametros.get(concepto)
+        if not lista:
+            return None
+        for i in range(bisect_right(self._desdes[concepto], fecha) - 1, -1, -1):
+            parametro = lista[i]
+            if parametro.vigente_hasta is None or parametro.vigente_hasta >= fecha:
+                return parametro
+        return None
+
+    def huella(self, fecha) -> str:
+        """
+        Huella de los parámetros vigentes a la fecha y de los conceptos
+        (id + última modificación). No depende del contador de versión, por
+        lo que se mantiene aunque la caché se reinicie.
+        """
+        if fecha not in self._huellas:
+            partes = []
+            for concepto in sorted(self._parametros):
+                parametro = self.parametro(concepto, fecha)
+                if parametro is not None:
+                    partes.append((concepto, str(parametro.id), parametro.updated_at.isoformat()))
+            partes.extend((str(c.id), c.updated_at.isoformat()) for c in self._conceptos)
+            self._huellas[fecha] = hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()
+        return self._huellas[fecha]
+
+    def concepto(self, codigos, solo_activos=True):
+        """Primer concepto (en el orden del modelo) con alguno de los códigos dados."""
+        if len(codigos) == 1:
+            candidatos = [self._conceptos_por_codigo.get(codigos[0])]
+        else:
+            candidatos = [c for c in self._conceptos if c.codigo in codigos]
+        for concepto in candidatos:
+            if concepto is not None and (concepto.activo or not solo_activos):
+                return concepto
+        return None
+
+    def conceptos_seleccionados(self, tipo, seleccionados, incluir_legales=True):
+        """Conceptos activos del tipo dado entre los seleccionados, por ``orden``."""
+        conceptos = [
+            self._conceptos_por_id[str(concepto_id)]
+            for concepto_id in dict.fromkeys(str(s) for s in seleccionados)
+            if str(concepto_id) in self._conceptos_por_id
+        ]
+        conceptos = [
+            c for c in conceptos
+            if c.tipo == tipo and c.activo and (incluir_legales or not c.es_legal)
+        ]
+        return sorted(conceptos, key=lambda c: c.orden)
+
+
+def _organization_id(organization):
+    return getattr(organization, 'pk', organization)
+
+
+def obtener_version(organization) -> int:
+    """Versión actual de la normativa de la organización."""
+    key = VERSION_CACHE_KEY.format(_organization_id(organization))
+    version = cache.get(key)
+    if version is None:
+        # Si la clave se perdió (expiración, reinicio), se arranca desde un
+        # valor mayor que cualquier versión previa para forzar la recarga.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidar_snapshot(organization):
+    """Incrementa la versión de la organización para que todos los procesos recarguen."""
+    organization_id = _organization_id(organization)
+    key = VERSION_CACHE_KEY.format(organization_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+    with _lock:
+        _snapshots.pop(organization_id, None)
+
+
+def obtener_snapshot(organization) -> SnapshotNormativo:
+    """Snapshot vigente de la organización, recargándolo si cambió la versión."""
+    organization_id = _organization_id(organization)
+    version = obtener_version(organization_id)
+    snapshot = _snapshots.get(organization_id)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    snapshot = SnapshotNormativo(organization_id, version)
+    with _lock:
+        _snapshots[organization_id] = snapshot
+    return snapshot
@@ -0,0 +1,256 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║             CÁLCULO DE NÓMINA POR LOTES (PERÍODO COMPLETO)                    ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Calcula todas las nóminas de una organización y período con un número fijo
+de consultas, sin importar cuántos empleados tenga el período:
+
+1. Precarga una sola vez items, préstamos y cuotas ya pagadas
+   (``DatosCalculoLote``); la normativa sale de ``cache_normativa``.
+2. Aplica las mismas reglas de ``CalculadorNomina`` a cada nómina en memoria.
+3. Persiste todo en una transacción, escribiendo solo las líneas que
+   cambiaron (``sincronizar_lineas``) y los totales con ``bulk_update``.
+   Las nóminas ya calculadas cuyas entradas no cambiaron (misma
+   ``huella_entradas``) no se recalculan: se reportan en ``sin_cambios``
+   con el resultado armado desde las líneas guardadas (una consulta para
+   todo el lote) y no se escriben.
+
+Las nóminas que no superan la validación se reportan en ``errores`` y no
+detienen el resto del lote.
+
+NOTA: ``bulk_update`` no dispara signals, por lo que no se genera una
+notificación por cada nómina del lote; el resumen del período se
+actualiza explícitamente (``AcumuladorResumen``).
+"""
+
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import (
+    NominaSimple,
+    NominaConcepto,
+    NominaItem,
+    NominaPrestamo,
+    NominaPrestamoArchivo,
+)
+from .cache_normativa import obtener_snapshot
+from .resumen_periodo import AcumuladorResumen, huella
+from .services import (
+    CalculadorNomina,
+    NominaValidationError,
+    ESTADOS_PRESTAMO_DESCONTABLE,
+    sincronizar_lineas,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Estados en los que una nómina puede (re)calcularse
+ESTADOS_CALCULABLES = ['borrador', 'calculada']
+
+# Campos de NominaSimple que escribe el cálculo
+CAMPOS_CALCULADOS = [
+    'salario_base',
+    'ibc',
+    'total_items',
+    'total_devengado',
+    'total_deducciones',
+    'total_prestamos',
+    'total_pagar',
+    'aporte_salud_empleador',
+    'aporte_pension_empleador',
+    'aporte_arl',
+    'aporte_caja',
+    'aporte_sena',
+    'aporte_icbf',
+    'estado',
+    'calculada_at',
+    'huella_calculo',
+    'updated_at',
+]
+
+
+class DatosCalculoLote:
+    """
+    Datos de referencia precargados para calcular un lote de nóminas.
+
+    Implementa las búsquedas de items y préstamos que ``CalculadorNomina``
+    hace contra la BD, pero resueltas en memoria. La normativa se toma de
+    la caché versionada por organización.
+    """
+
+    def __init__(self, organization, nominas):
+        self.organization = organization
+        nomina_ids = [n.id for n in nominas]
+        empleado_ids = {n.contrato.empleado_id for n in nominas}
+
+        # Parámetros legales y conceptos laborales
+        self.normativa = obtener_snapshot(organization)
+
+        # Items de trabajo agrupados por nómina
+        self._items = defaultdict(list)
+        for item in NominaItem.objects.for_tenant(organization).filter(nomina_id__in=nomina_ids):
+            self._items[item.nomina_id].append(item)
+
+        # Préstamos descontables de los empleados del lote
+        from prestamos.models import Prestamo
+
+        self._prestamos = defaultdict(list)
+        prestamos = Prestamo.objects.for_tenant(organization).filter(
+            empleado_id__in=empleado_ids,
+            estado__in=ESTADOS_PRESTAMO_DESCONTABLE,
+        ).annotate(num_pagos=Count('pagos'))
+        for prestamo in prestamos:
+            self._prestamos[prestamo.empleado_id].append(prestamo)
+
+        # Cuotas descontadas en nóminas pagadas, incluidas las de períodos
+        # cerrados (las del lote nunca están pagadas)
+        self._cuotas_en_nominas_pagadas = defaultdict(int)
+        for modelo in (NominaPrestamo, NominaPrestamoArchivo):
+            for prestamo_id, total in modelo.objects.for_tenant(organization).filter(
+                prestamo__in=prestamos,
+                nomina__estado='pagada',
+            ).values('prestamo_id').annotate(total=Count('id')).values_list('prestamo_id', 'total'):
+                self._cuotas_en_nominas_pagadas[prestamo_id] += total
+        self._pagos_directos = {p.id: p.num_pagos for ps in self._prestamos.values() for p in ps}
+
+    def items(self, nomina_id):
+        return self._items.get(nomina_id, [])
+
+    def prestamos(self, empleado_id, seleccionados):
+        prestamos = self._prestamos.get(empleado_id, [])
+        if seleccionados is None:
+            return prestamos
+        seleccionados = {str(s) for s in seleccionados}
+        return [p for p in prestamos if str(p.id) in seleccionados]
+
+    def cuotas_pagadas(self, prestamo_id):
+        return max(
+            self._pagos_directos.get(prestamo_id, 0),
+            self._cuotas_en_nominas_pagadas.get(prestamo_id, 0),
+        )
+
+
+class CalculadorNominaLote:
+    """
+    Calcula en bloque todas las nóminas calculables de un período.
+
+    Uso:
+        resultado = CalculadorNominaLote(organization, nominas).calcular()
+    """
+
+    def __init__(self, organization, nominas):
+        self.organization = organization
+        self.nominas = list(
+            nominas.filter(estado__in=ESTADOS_CALCULABLES).select_related(
+                'contrato',
+                'contrato__empleado',
+                'contrato__tipo_contrato',
+            ).prefetch_related(None)
+        )
+        for nomina in self.nominas:
+            # Evita una consulta por nómina al leer nomina.organization
+            nomina.organization = organization
+        # Aporte de cada nómina al resumen del período antes del cálculo
+        self.huellas = {nomina.id: huella(nomina) for nomina in self.nominas}
+        self.errores = []
+        self.calculadores = []
+        self.sin_cambios = []
+
+    @classmethod
+    def para_periodo(cls, organization, periodo_inicio, periodo_fin, proyecto=None):
+        """Construye el lote con las nóminas de la organización en el período."""
+        nominas = NominaSimple.objects.for_tenant(organization).filter(
+            periodo_inicio=periodo_inicio,
+            periodo_fin=periodo_fin,
+        )
+        if proyecto is not None:
+            nominas = nominas.filter(proyecto=proyecto)
+        return cls(organization, nominas)
+
+    def calcular(self) -> dict:
+        """
+        Ejecuta el cálculo del lote y lo persiste.
+
+        Returns:
+            dict: total, calculadas, errores y resúmenes por nómina
+        """
+        if self.nominas:
+            datos = DatosCalculoLote(self.organization, self.nominas)
+
+            for nomina in self.nominas:
+                calculador = CalculadorNomina(nomina, datos=datos)
+                huella_entradas = calculador.huella_entradas()
+                if calculador.sin_cambios(huella_entradas):
+                    # Mismo resultado que el guardado: no se aplican las reglas
+                    self.sin_cambios.append(calculador)
+                    continue
+                try:
+                    calculador.aplicar_reglas()
+                except NominaValidationError as e:
+                    self.errores.append({
+                        'nomina_id': str(nomina.id),
+                        'numero': nomina.numero,
+                        'error': str(e),
+                    })
+                    continue
+                nomina.huella_calculo = huella_entradas
+                self.calculadores.append(calculador)
+
+            self._cargar_sin_cambios()
+            self._persistir()
+
+        calculadores = self.calculadores + self.sin_cambios
+        return {
+            'total': len(self.nominas),
+            'calculadas': len(calculadores),
+            'sin_cambios': len(self.sin_cambios),
+            'errores': self.errores,
+            'resumenes': [c._generar_resumen() for c in calculadores],
+        }
+
+    def _cargar_sin_cambios(self):
+        """Arma el resultado de las nóminas sin cambios desde sus líneas guardadas."""
+        if not self.sin_cambios:
+            return
+
+        lineas = defaultdict(list)
+        for linea in NominaConcepto.objects.for_tenant(self.organization).filter(
+            nomina_id__in=[c.nomina.id for c in self.sin_cambios]
+        ).select_related('concepto'):
+            lineas[linea.nomina_id].append(linea)
+        for calculador in self.sin_cambios:
+            calculador._cargar_calculo_guardado(lineas[calculador.nomina.id])
+
+    @transaction.atomic
+    def _persistir(self):
+        """Escribe las líneas y totales de todo el lote en bloque."""
+        if not self.calculadores:
+            return
+
+        ahora = timezone.now()
+        for calculador in self.calculadores:
+            calculador.nomina.updated_at = ahora
+
+        resumen = AcumuladorResumen(self.organization)
+        cambios = sincronizar_lineas(self.organization, self.calculadores, resumen=resumen)
+        NominaSimple.objects.for_tenant(self.organization).bulk_update(
+            [c.nomina for c in self.calculadores],
+            CAMPOS_CALCULADOS,
+            batch_size=500,
+        )
+        for calculador in self.calculadores:
+            nomina = calculador.nomina
+            resumen.registrar(self.huellas[nomina.id], huella(nomina))
+        resumen.aplicar()
+
+        logger.info(
+            'Lote de nómina calculado: %s nóminas, líneas insertadas=%s actualizadas=%s eliminadas=%s',
+            len(self.calculadores), cambios['insertadas'], cambios['actualizadas'], cambios['eliminadas']
+        )
@@ -0,0 +1,438 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║           CERTIFICADOS DE INGRESOS Y RETENCIONES (ACUMULADOS ANUALES)         ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Mantiene por empleado y año gravable los valores del certificado de
+ingresos y retenciones (``AcumuladoCertificado``) a medida que se pagan las
+nóminas, en lugar de sumar doce o más meses de nóminas y líneas de
+conceptos al cierre del año:
+
+- Pagos salariales, otros pagos (auxilio de transporte) e ingresos brutos.
+- Aportes obligatorios del empleado a salud y a pensión (incluye fondo de
+  solidaridad y subsistencia).
+- Renta exenta laboral (25% de los pagos netos de aportes).
+- Retención en la fuente.
+
+El año es el del pago (``fecha_pago``; si falta, el fin del período).
+``NominaSimple.anio_certificado`` marca las nóminas ya sumadas, de modo que
+registrar y revertir son idempotentes.
+
+Puntos de actualización (los mismos del libro de prestaciones):
+- ``NominaSimple.save()``: signal al pasar a (o salir de) estado pagada.
+- ``PagadorNominaLote.pagar()``: explícito, porque ``update()`` no dispara
+  signals.
+- Eliminación de una nómina pagada.
+
+``reconstruir_certificados`` recalcula los acumulados desde las nóminas
+pagadas (carga inicial o reparación).
+"""
+
+import io
+import zipfile
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .prestaciones import CODIGOS_AUXILIO
+
+
+CERO = Decimal('0.00')
+
+CODIGOS_SALUD = ('SALUD_EMPLEADO',)
+CODIGOS_PENSION = ('PENSION_EMPLEADO', 'FSP', 'SUBSISTENCIA')
+CODIGOS_RETENCION = ('RETENCION',)
+
+# Renta exenta laboral (art. 206 num. 10 E.T.): 25% con límite anual en UVT
+PORCENTAJE_RENTA_EXENTA = Decimal('25')
+LIMITE_RENTA_EXENTA_UVT = 790
+
+CAMPOS = (
+    'pagos_salariales',
+    'otros_pagos',
+    'ingresos_brutos',
+    'aportes_salud',
+    'aportes_pension',
+    'rentas_exentas',
+    'retencion_fuente',
+)
+
+
+def _organization_id(organization):
+    return getattr(organization, 'pk', organization)
+
+
+def _redondear(valor: Decimal) -> Decimal:
+    return valor.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def valores_nominas(organization, nomina_ids) -> list:
+    """
+    Aporte de cada nómina a su acumulado anual.
+
+    Usa dos consultas para todo el lote: las nóminas y las líneas de los
+    conceptos del certificado agrupadas por nómina (una más si hay nóminas
+    de períodos cerrados).
+
+    Returns:
+        list: dicts con nomina_id, empleado_id, anio y los ``CAMPOS``
+    """
+    from .models import NominaConcepto, NominaConceptoArchivo, NominaSimple
+
+    nominas = list(
+        NominaSimple._base_manager.filter(
+            organization_id=_organization_id(organization), id__in=nomina_ids
+        ).values(
+            'id', 'contrato__empleado_id', 'total_devengado', 'fecha_pago', 'periodo_fin',
+            'cerrada', 'anio_certificado',
+        )
+    )
+    if not nominas:
+        return []
+
+    deducciones = CODIGOS_SALUD + CODIGOS_PENSION + CODIGOS_RETENCION
+    codigos = {
+        **{codigo: 'otros_pagos' for codigo in CODIGOS_AUXILIO},
+        **{codigo: 'aportes_salud' for codigo in CODIGOS_SALUD},
+        **{codigo: 'aportes_pension' for codigo in CODIGOS_PENSION},
+        **{codigo: 'retencion_fuente' for codigo in CODIGOS_RETENCION},
+    }
+    # Las líneas de períodos cerrados están en el archivo
+    modelos_lineas = [NominaConcepto]
+    if any(n['cerrada'] for n in nominas):
+        modelos_lineas.append(NominaConceptoArchivo)
+    por_nomina = defaultdict(lambda: defaultdict(lambda: CERO))
+    for modelo in modelos_lineas:
+        filas = modelo._base_manager.filter(
+            Q(tipo='DEVENGADO', concepto__codigo__in=CODIGOS_AUXILIO)
+            | Q(tipo='DEDUCCION', concepto__codigo__in=deducciones),
+            nomina_id__in=[n['id'] for n in nominas],
+        ).order_by().values('nomina_id', 'concepto__codigo').annotate(total=Sum('valor'))
+        for fila in filas:
+            por_nomina[fila['nomina_id']][codigos[fila['concepto__codigo']]] += fila['total'] or CERO
+
+    valores = []
+    for nomina in nominas:
+        lineas = por_nomina[nomina['id']]
+        ingresos_brutos = nomina['total_devengado'] or CERO
+        neto_aportes = ingresos_brutos - lineas['aportes_salud'] - lineas['aportes_pension']
+        valores.append({
+            'nomina_id': nomina['id'],
+            'empleado_id': nomina['contrato__empleado_id'],
+            'anio': (nomina['fecha_pago'] or nomina['periodo_fin']).year,
+            'anio_certificado': nomina['anio_certificado'],
+            'pagos_salariales': ingresos_brutos - lineas['otros_pagos'],
+            'otros_pagos': lineas['otros_pagos'],
+            'ingresos_brutos': ingresos_brutos,
+            'aportes_salud': lineas['aportes_salud'],
+            'aportes_pension': lineas['aportes_pension'],
+            'rentas_exentas': _redondear(max(neto_aportes, CERO) * PORCENTAJE_RENTA_EXENTA / 100),
+            'retencion_fuente': lineas['retencion_fuente'],
+        })
+    return valores
+
+
+def registrar_pagos(organization, nomina_ids) -> int:
+    """
+    Suma al acumulado de su año las nóminas pagadas indicadas.
+
+    Es idempotente: las nóminas ya sumadas (con ``anio_certificado``) se
+    omiten.
+
+    Returns:
+        int: nóminas sumadas
+    """
+    from .models import NominaSimple
+
+    organization_id = _organization_id(organization)
+    with transaction.atomic():
+        pendientes = list(
+            NominaSimple._base_manager.select_for_update(of=('self',)).filter(
+                organization_id=organization_id,
+                id__in=nomina_ids,
+                estado='pagada',
+                anio_certificado__isnull=True,
+            ).values_list('id', flat=True)
+        )
+        if not pendientes:
+            return 0
+        valores = valores_nominas(organization_id, pendientes)
+        _aplicar(organization_id, valores, 1)
+
+        por_anio = defaultdict(list)
+        for fila in valores:
+            por_anio[fila['anio']].append(fila['nomina_id'])
+        for anio, ids in por_anio.items():
+            NominaSimple._base_manager.filter(id__in=ids).update(anio_certificado=anio)
+    return len(valores)
+
+
+def revertir_nomina(organization, nomina_id) -> bool:
+    """
+    Resta del acumulado una nómina que deja de estar pagada o se elimina.
+    Idempotente: solo se resta si estaba sumada.
+
+    Returns:
+        bool: si se revirtió
+    """
+    from .models import NominaSimple
+
+    organization_id = _organization_id(organization)
+    with transaction.atomic():
+        valores = [
+            # Se resta del año en que se sumó, aunque cambie la fecha de pago
+            {**fila, 'anio': fila['anio_certificado']}
+            for fila in valores_nominas(organization_id, [nomina_id])
+            if fila['anio_certificado'] is not None
+        ]
+        if not valores:
+            return False
+        _aplicar(organization_id, valores, -1)
+        NominaSimple._base_manager.filter(pk=nomina_id).update(anio_certificado=None)
+    return True
+
+
+def _aplicar(organization_id, valores, signo):
+    """
+    Aplica los valores de las nóminas a los acumulados: bloquea las filas
+    afectadas (en orden fijo para evitar interbloqueos) y escribe con
+    ``bulk_create``/``bulk_update``.
+    """
+    from .models import AcumuladoCertificado
+
+    if not valores:
+        return
+
+    claves = sorted({(fila['empleado_id'], fila['anio']) for fila in valores}, key=str)
+    AcumuladoCertificado._base_manager.bulk_create(
+        [
+            AcumuladoCertificado(organization_id=organization_id, empleado_id=empleado_id, anio=anio)
+            for empleado_id, anio in claves
+        ],
+        ignore_conflicts=True,
+    )
+    acumulados = {
+        (a.empleado_id, a.anio): a
+        for a in AcumuladoCertificado._base_manager.select_for_update().filter(
+            organization_id=organization_id,
+            empleado_id__in={empleado_id for empleado_id, _ in claves},
+            anio__in={anio for _, anio in claves},
+        ).order_by('empleado_id', 'anio')
+    }
+
+    ahora = timezone.now()
+    for fila in valores:
+        acumulado = acumulados[(fila['empleado_id'], fila['anio'])]
+        for campo in CAMPOS:
+            setattr(acumulado, campo, getattr(acumulado, campo) + signo * fila[campo])
+        acumulado.nominas += signo
+        acumulado.updated_at = ahora
+
+    AcumuladoCertificado._base_manager.bulk_update(
+        [acumulados[clave] for clave in claves],
+        [*CAMPOS, 'nominas', 'updated_at'],
+    )
+
+
+def reconstruir_certificados(organization, anio=None) -> int:
+    """
+    Recalcula desde cero los acumulados (de un año o de todos) a partir de
+    las nóminas pagadas de la organización.
+
+    Returns:
+        int: nóminas sumadas
+    """
+    from .models import AcumuladoCertificado, NominaSimple
+
+    organization_id = _organization_id(organization)
+    acumulados = AcumuladoCertificado._base_manager.filter(organization_id=organization_id)
+    nominas = NominaSimple._base_manager.filter(organization_id=organization_id)
+    pagadas = nominas.filter(estado='pagada')
+    if anio is not None:
+        acumulados = acumulados.filter(anio=anio)
+        nominas = nominas.filter(anio_certificado=anio)
+        pagadas = pagadas.filter(
+            Q(fecha_pago__year=anio) | Q(fecha_pago__isnull=True, periodo_fin__year=anio)
+        )
+
+    with transaction.atomic():
+        acumulados.delete()
+        nominas.update(anio_certificado=None)
+        return registrar_pagos(organization_id, list(pagadas.values_list('id', flat=True)))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CERTIFICADOS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def datos_certificados(organization, anio, empleados=None) -> list:
+    """
+    Dicts planos de los certificados del año a partir de los acumulados
+    (una consulta indexada por organización y año).
+
+    La renta exenta se limita a ``LIMITE_RENTA_EXENTA_UVT`` UVT si el
+    parámetro UVT del año está configurado.
+    """
+    from .cache_normativa import obtener_snapshot
+    from .models import AcumuladoCertificado
+
+    uvt = obtener_snapshot(organization).parametro('UVT', date(anio, 12, 31))
+    limite_exenta = uvt.valor_fijo * LIMITE_RENTA_EXENTA_UVT if uvt and uvt.valor_fijo else None
+
+    acumulados = AcumuladoCertificado.objects.for_tenant(organization).filter(
+        anio=anio, nominas__gt=0
+    ).select_related('empleado')
+    if empleados:
+        acumulados = acumulados.filter(empleado_id__in=empleados)
+
+    certificados = []
+    for acumulado in acumulados.order_by('empleado__numero_documento'):
+        empleado = acumulado.empleado
+        rentas_exentas = acumulado.rentas_exentas
+        if limite_exenta is not None:
+            rentas_exentas = min(rentas_exentas, limite_exenta)
+        certificados.append({
+            'anio': anio,
+            'empleador_nit': getattr(organization, 'nit', '') or '',
+            'empleador_nombre': getattr(organization, 'razon_social', '') or str(organization),
+            'empleado_id': str(empleado.pk),
+            'empleado_tipo_documento': empleado.tipo_documento,
+            'empleado_documento': empleado.numero_documento,
+            'empleado_nombre': empleado.nombre_completo,
+            'pagos_salariales': acumulado.pagos_salariales,
+            'otros_pagos': acumulado.otros_pagos,
+            'ingresos_brutos': acumulado.ingresos_brutos,
+            'aportes_salud': acumulado.aportes_salud,
+            'aportes_pension': acumulado.aportes_pension,
+            'rentas_exentas': rentas_exentas,
+            'retencion_fuente': acumulado.retencion_fuente,
+            'nominas': acumulado.nominas,
+        })
+    return certificados
+
+
+class RenderizadorCertificado:
+    """Plantilla reportlab del certificado; se construye una vez y se reutiliza."""
+
+    FILAS = [
+        ('Ingresos', [
+            ('Pagos por salarios', 'pagos_salariales'),
+            ('Otros pagos (auxilio de transporte)', 'otros_pagos'),
+            ('Total ingresos brutos', 'ingresos_brutos'),
+        ]),
+        ('Aportes y rentas exentas', [
+            ('Aportes obligatorios por salud', 'aportes_salud'),
+            ('Aportes obligatorios a fondos de pensiones y solidaridad pensional', 'aportes_pension'),
+            ('Renta exenta laboral', 'rentas_exentas'),
+        ]),
+        ('Retenciones', [
+            ('Valor de la retención en la fuente por rentas de trabajo', 'retencion_fuente'),
+        ]),
+    ]
+
+    def __init__(self):
+        from reportlab.lib.pagesizes import letter
+
+        self.pagesize = letter
+        page_w, page_h = letter
+        margin = 40
+        self.left = margin
+        self.right = page_w - margin
+        self.top = page_h - margin
+        self.font = "Helvetica"
+        self.font_bold = "Helvetica-Bold"
+
+    def nuevo_canvas(self, buffer):
+        from reportlab.pdfgen import canvas
+
+        return canvas.Canvas(buffer, pagesize=self.pagesize)
+
+    def renderizar(self, datos: dict) -> bytes:
+        """PDF de un certificado."""
+        buffer = io.BytesIO()
+        c = self.nuevo_canvas(buffer)
+        self.dibujar(c, datos)
+        c.save()
+        return buffer.getvalue()
+
+    def dibujar(self, c, datos: dict):
+        """Dibuja un certificado en el canvas (termina con ``showPage``)."""
+        left, right, y = self.left, self.right, self.top
+
+        c.setFont(self.font_bold, 13)
+        c.drawString(left, y, f"Certificado de Ingresos y Retenciones - Año Gravable {datos['anio']}")
+        y -= 22
+        c.setFont(self.font, 10)
+        c.drawString(left, y, f"Retenedor: {datos['empleador_nombre']}   NIT: {datos['empleador_nit']}")
+        y -= 14
+        c.drawString(
+            left, y,
+            f"Trabajador: {datos['empleado_nombre']}   "
+            f"{datos['empleado_tipo_documento']} {datos['empleado_documento']}"
+        )
+        y -= 24
+
+        for titulo, filas in self.FILAS:
+            c.setFont(self.font_bold, 11)
+            c.drawString(left, y, titulo)
+            y -= 12
+            c.setLineWidth(0.5)
+            c.line(left, y, right, y)
+            y -= 14
+            c.setFont(self.font, 9)
+            for etiqueta, campo in filas:
+                c.drawString(left + 4, y, etiqueta)
+                c.drawRightString(right - 4, y, f"{datos[campo]:,.2f}")
+                y -= 14
+            y -= 8
+
+        c.setFont(self.font, 8)
+        c.drawString(left, y, f"Nóminas pagadas en el año: {datos['nominas']}")
+        c.showPage()
+
+
+_renderizador = None
+
+
+def obtener_renderizador() -> RenderizadorCertificado:
+    global _renderizador
+    if _renderizador is None:
+        _renderizador = RenderizadorCertificado()
+    return _renderizador
+
+
+def generar_zip_certificados(lista_datos: list):
+    """
+    Genera (en streaming) un ZIP con un PDF por certificado.
+
+    Yields:
+        bytes: fragmentos del ZIP a medida que se renderiza cada PDF
+    """
+    from .desprendibles import _BufferSalida
+
+    renderizador = obtener_renderizador()
+    salida = _BufferSalida()
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for datos in lista_datos:
+            nombre = f"certificado_{datos['anio']}_{datos['empleado_documento']}.pdf"
+            zf.writestr(nombre, renderizador.renderizar(datos))
+            fragmento = salida.vaciar()
+            if fragmento:
+                yield fragmento
+    yield salida.vaciar()
+
+
+def generar_pdf_certificados(lista_datos: list) -> bytes:
+    """Un solo PDF con todos los certificados (una página por empleado)."""
+    renderizador = obtener_renderizador()
+    buffer = io.BytesIO()
+    c = renderizador.nuevo_canvas(buffer)
+    for datos in lista_datos:
+        renderizador.dibujar(c, datos)
+    c.save()
+    return buffer.getvalue()
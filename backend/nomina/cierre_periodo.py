@@ -0,0 +1,275 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║               CIERRE DE PERÍODO DE NÓMINA (SNAPSHOT Y ARCHIVO)                ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Cerrar un período congela sus nóminas y saca su detalle de las tablas de
+trabajo:
+
+1. Bloquea las nóminas del período; todas deben estar pagadas o anuladas.
+2. Crea un ``SnapshotNomina`` por nómina (datos del empleado, totales y
+   líneas en JSON con la forma de sus serializers), con tres consultas
+   para todo el período.
+3. Mueve ``NominaConcepto``, ``NominaItem`` y ``NominaPrestamo`` a sus
+   tablas de archivo con un ``INSERT ... SELECT`` y un ``DELETE`` por
+   tabla (sin pasar las filas por Python y conservando ids y fechas).
+4. Marca las nóminas como ``cerrada``.
+
+Las nóminas cerradas se sirven desde su snapshot (detalle, desprendible);
+los procesos que reconstruyen a partir de las líneas (resumen del período,
+libro de prestaciones, nómina electrónica) leen también el archivo.
+
+``reabrir_periodo`` hace el proceso inverso.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .models import (
+    CierrePeriodoNomina,
+    ConceptoLaboral,
+    NominaConcepto,
+    NominaConceptoArchivo,
+    NominaItem,
+    NominaItemArchivo,
+    NominaPrestamo,
+    NominaPrestamoArchivo,
+    NominaSimple,
+    SnapshotNomina,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Estados finales: solo se cierra un período sin nóminas en trámite
+ESTADOS_CERRABLES = ['pagada', 'anulada']
+
+# (tabla de trabajo, tabla de archivo)
+TABLAS_DETALLE = [
+    (NominaConcepto, NominaConceptoArchivo),
+    (NominaItem, NominaItemArchivo),
+    (NominaPrestamo, NominaPrestamoArchivo),
+]
+
+TIPOS_CONCEPTO = dict(ConceptoLaboral.TIPO_CHOICES)
+
+
+class CierrePeriodoError(Exception):
+    """Error al cerrar o reabrir un período, con mensaje para el usuario."""
+    pass
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def _snapshot_conceptos(nomina_ids) -> dict:
+    """Líneas de conceptos por nómina con la forma de ``NominaConceptoSerializer``."""
+    lineas = {}
+    for fila in NominaConcepto._base_manager.filter(nomina_id__in=nomina_ids).order_by(
+        'tipo', 'concepto__orden'
+    ).values(
+        'id', 'nomina_id', 'concepto_id', 'concepto__codigo', 'concepto__nombre',
+        'tipo', 'base', 'porcentaje_aplicado', 'valor', 'observaciones',
+    ):
+        lineas.setdefault(fila['nomina_id'], []).append({
+            'id': str(fila['id']),
+            'concepto': str(fila['concepto_id']),
+            'concepto_codigo': fila['concepto__codigo'],
+            'concepto_nombre': fila['concepto__nombre'],
+            'tipo': fila['tipo'],
+            'tipo_display': TIPOS_CONCEPTO.get(fila['tipo'], fila['tipo']),
+            'base': _texto(fila['base']),
+            'porcentaje_aplicado': _texto(fila['porcentaje_aplicado']),
+            'valor': _texto(fila['valor']),
+            'observaciones': fila['observaciones'],
+        })
+    return lineas
+
+
+def _snapshot_items(nomina_ids) -> dict:
+    """Items por nómina con la forma de ``NominaItemSerializer``."""
+    lineas = {}
+    for fila in NominaItem._base_manager.filter(nomina_id__in=nomina_ids).order_by(
+        'item__nombre'
+    ).values(
+        'id', 'nomina_id', 'item_id', 'item__nombre', 'item__tipo_cantidad',
+        'cantidad', 'valor_unitario', 'valor_total', 'observaciones',
+    ):
+        lineas.setdefault(fila['nomina_id'], []).append({
+            'id': str(fila['id']),
+            'item': str(fila['item_id']),
+            'item_nombre': fila['item__nombre'],
+            'item_tipo_cantidad': fila['item__tipo_cantidad'],
+            'cantidad': _texto(fila['cantidad']),
+            'valor_unitario': _texto(fila['valor_unitario']),
+            'valor_total': _texto(fila['valor_total']),
+            'observaciones': fila['observaciones'],
+        })
+    return lineas
+
+
+def _snapshot_prestamos(nomina_ids) -> dict:
+    """Descuentos de préstamo por nómina con la forma de ``NominaPrestamoSerializer``."""
+    lineas = {}
+    for fila in NominaPrestamo._base_manager.filter(nomina_id__in=nomina_ids).order_by(
+        'prestamo__created_at'
+    ).values(
+        'id', 'nomina_id', 'prestamo_id', 'prestamo__tipo_prestamo__nombre',
+        'prestamo__saldo_pendiente', 'valor_cuota', 'numero_cuota', 'observaciones',
+    ):
+        lineas.setdefault(fila['nomina_id'], []).append({
+            'id': str(fila['id']),
+            'prestamo': str(fila['prestamo_id']),
+            'prestamo_tipo': fila['prestamo__tipo_prestamo__nombre'],
+            'prestamo_saldo': _texto(fila['prestamo__saldo_pendiente']),
+            'valor_cuota': _texto(fila['valor_cuota']),
+            'numero_cuota': fila['numero_cuota'],
+            'observaciones': fila['observaciones'],
+        })
+    return lineas
+
+
+def _mover_detalle(origen, destino, nomina_ids) -> int:
+    """Copia las filas de las nóminas a ``destino`` y las borra de ``origen``."""
+    columnas = ', '.join(
+        connection.ops.quote_name(campo.column) for campo in destino._meta.concrete_fields
+    )
+    ids = [str(pk) for pk in nomina_ids]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(destino._meta.db_table)} ({columnas}) '
+            f'SELECT {columnas} FROM {connection.ops.quote_name(origen._meta.db_table)} '
+            'WHERE nomina_id = ANY(%s::uuid[])',
+            [ids],
+        )
+        movidas = cursor.rowcount
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(origen._meta.db_table)} '
+            'WHERE nomina_id = ANY(%s::uuid[])',
+            [ids],
+        )
+    return movidas
+
+
+def periodo_cerrado(organization, periodo_inicio, periodo_fin) -> bool:
+    """Indica si el período de la organización está cerrado."""
+    return CierrePeriodoNomina.objects.for_tenant(organization).filter(
+        periodo_inicio=periodo_inicio,
+        periodo_fin=periodo_fin,
+    ).exists()
+
+
+def cerrar_periodo(organization, usuario, periodo_inicio, periodo_fin) -> dict:
+    """
+    Cierra el período de la organización.
+
+    Raises:
+        CierrePeriodoError: período ya cerrado, sin nóminas o con nóminas
+            que no están pagadas ni anuladas
+
+    Returns:
+        dict: cierre, nóminas cerradas y filas archivadas por tabla
+    """
+    with transaction.atomic():
+        nominas = list(
+            NominaSimple.objects.for_tenant(organization).filter(
+                periodo_inicio=periodo_inicio,
+                periodo_fin=periodo_fin,
+            ).select_related(
+                'contrato__empleado', 'contrato__tipo_contrato'
+            ).select_for_update(of=('self',)).order_by('numero')
+        )
+        if periodo_cerrado(organization, periodo_inicio, periodo_fin):
+            raise CierrePeriodoError('El período ya está cerrado')
+        if not nominas:
+            raise CierrePeriodoError('No hay nóminas en el período indicado')
+        pendientes = [n.numero for n in nominas if n.estado not in ESTADOS_CERRABLES]
+        if pendientes:
+            raise CierrePeriodoError(
+                f'Hay {len(pendientes)} nóminas sin pagar ni anular: {", ".join(pendientes[:10])}'
+            )
+
+        ids = [nomina.id for nomina in nominas]
+        conceptos = _snapshot_conceptos(ids)
+        items = _snapshot_items(ids)
+        prestamos = _snapshot_prestamos(ids)
+
+        vigentes = [n for n in nominas if n.estado != 'anulada']
+        cierre = CierrePeriodoNomina.objects.create(
+            organization=organization,
+            periodo_inicio=periodo_inicio,
+            periodo_fin=periodo_fin,
+            nominas=len(nominas),
+            total_pagar=sum((n.total_pagar for n in vigentes), Decimal('0.00')),
+            costo_total_empleador=sum((n.costo_total_empleador for n in vigentes), Decimal('0.00')),
+            cerrado_por=usuario,
+        )
+        SnapshotNomina.objects.bulk_create([
+            SnapshotNomina(
+                organization=organization,
+                cierre=cierre,
+                nomina=nomina,
+                numero=nomina.numero,
+                estado=nomina.estado,
+                periodo_inicio=nomina.periodo_inicio,
+                periodo_fin=nomina.periodo_fin,
+                fecha_pago=nomina.fecha_pago,
+                empleado_nombre=nomina.contrato.empleado.nombre_completo,
+                empleado_documento=nomina.contrato.empleado.numero_documento,
+                tipo_contrato=nomina.contrato.tipo_contrato.nombre,
+                salario_base=nomina.salario_base,
+                total_devengado=nomina.total_devengado,
+                total_deducciones=nomina.total_deducciones,
+                total_prestamos=nomina.total_prestamos,
+                total_pagar=nomina.total_pagar,
+                costo_total_empleador=nomina.costo_total_empleador,
+                conceptos=conceptos.get(nomina.id, []),
+                items=items.get(nomina.id, []),
+                prestamos=prestamos.get(nomina.id, []),
+            )
+            for nomina in nominas
+        ], batch_size=500)
+
+        archivadas = {
+            origen._meta.model_name: _mover_detalle(origen, destino, ids)
+            for origen, destino in TABLAS_DETALLE
+        }
+        NominaSimple.objects.for_tenant(organization).filter(id__in=ids).update(cerrada=True)
+
+    logger.info(
+        'Período %s - %s cerrado: %d nóminas, filas archivadas %s',
+        periodo_inicio, periodo_fin, len(nominas), archivadas,
+    )
+    return {'cierre': cierre, 'nominas': len(nominas), 'archivadas': archivadas}
+
+
+def reabrir_periodo(organization, periodo_inicio, periodo_fin) -> dict:
+    """
+    Reabre un período cerrado: devuelve el detalle a las tablas de trabajo
+    y elimina los snapshots.
+
+    Raises:
+        CierrePeriodoError: el período no está cerrado
+    """
+    with transaction.atomic():
+        cierre = CierrePeriodoNomina.objects.for_tenant(organization).select_for_update().filter(
+            periodo_inicio=periodo_inicio,
+            periodo_fin=periodo_fin,
+        ).first()
+        if cierre is None:
+            raise CierrePeriodoError('El período no está cerrado')
+
+        ids = list(cierre.snapshots.values_list('nomina_id', flat=True))
+        restauradas = {
+            origen._meta.model_name: _mover_detalle(destino, origen, ids)
+            for origen, destino in TABLAS_DETALLE
+        }
+        NominaSimple.objects.for_tenant(organization).filter(id__in=ids).update(cerrada=False)
+        cierre.delete()
+
+    return {'nominas': len(ids), 'restauradas': restauradas}
+
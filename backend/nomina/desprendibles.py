@@ -0,0 +1,367 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║                 DESPRENDIBLES DE NÓMINA (PDF) - CORTESEC                      ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Generación de desprendibles de pago en PDF:
+
+- ``datos_desprendible``: extrae de una nómina (con relaciones precargadas)
+  un dict plano con todo lo que se imprime. No consulta la BD si la nómina
+  viene de ``nominas_para_desprendible``.
+- ``RenderizadorDesprendible``: plantilla reportlab (tamaño de página,
+  márgenes, fuentes y geometría) preparada UNA vez y reutilizada para
+  dibujar cualquier cantidad de desprendibles.
+- ``generar_zip_periodo`` / ``generar_pdf_periodo``: renderizan los
+  desprendibles de un período en un pool de procesos y devuelven un ZIP
+  en streaming o un solo PDF combinado.
+"""
+
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+
+# Por debajo de este número de desprendibles no vale la pena crear procesos
+MINIMO_PARA_POOL = 20
+
+
+def _workers() -> int:
+    return getattr(settings, 'NOMINA_DESPRENDIBLES_WORKERS', min(4, os.cpu_count() or 1))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DATOS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def nominas_para_desprendible(queryset):
+    """Precarga (número fijo de consultas) todo lo que imprime un desprendible."""
+    from .models import NominaItem, NominaConcepto
+
+    return queryset.select_related(
+        'contrato', 'contrato__empleado', 'contrato__tipo_contrato', 'snapshot'
+    ).prefetch_related(
+        None
+    ).prefetch_related(
+        Prefetch('items', queryset=NominaItem.objects.all_tenants().select_related('item')),
+        Prefetch('conceptos', queryset=NominaConcepto.objects.all_tenants().select_related('concepto')),
+    )
+
+
+def _cantidad_concepto(porcentaje):
+    if porcentaje and porcentaje > 0:
+        return f"{porcentaje}%"
+    return "1"
+
+
+def _lineas(nomina):
+    """
+    Items (nombre, cantidad, total) y conceptos (nombre, tipo, porcentaje,
+    valor) de la nómina; las de períodos cerrados salen de su snapshot.
+    """
+    if nomina.cerrada:
+        snapshot = nomina.snapshot
+        items = [
+            (item['item_nombre'], Decimal(item['cantidad']), Decimal(item['valor_total']))
+            for item in snapshot.items
+        ]
+        conceptos = [
+            (cpto['concepto_nombre'], cpto['tipo'], Decimal(cpto['porcentaje_aplicado']), Decimal(cpto['valor']))
+            for cpto in snapshot.conceptos
+        ]
+        return items, conceptos
+    items = [(item.item.nombre, item.cantidad, item.valor_total) for item in nomina.items.all()]
+    conceptos = [
+        (cpto.concepto.nombre, cpto.tipo, cpto.porcentaje_aplicado, cpto.valor)
+        for cpto in nomina.conceptos.all()
+    ]
+    return items, conceptos
+
+
+def datos_desprendible(nomina) -> dict:
+    """Dict plano (serializable entre procesos) con el contenido del desprendible."""
+    contrato = nomina.contrato
+    empleado = contrato.empleado
+    items, conceptos = _lineas(nomina)
+
+    ingresos = []
+    total_items_qty = sum((cantidad or 0) for _, cantidad, _ in items)
+    if nomina.total_items and nomina.total_items > 0:
+        ingresos.append(("Items de trabajo", total_items_qty, nomina.total_items))
+    if nomina.incluir_salario_base or nomina.total_items == 0:
+        ingresos.append(("Salario base", "1", nomina.salario_base))
+    for nombre, tipo, porcentaje, valor in conceptos:
+        if tipo == 'DEVENGADO':
+            ingresos.append((nombre, _cantidad_concepto(porcentaje), valor))
+
+    deducciones = [
+        (nombre, _cantidad_concepto(porcentaje), valor)
+        for nombre, tipo, porcentaje, valor in conceptos if tipo == 'DEDUCCION'
+    ]
+    if nomina.total_prestamos and nomina.total_prestamos > 0:
+        deducciones.append(("Préstamos", "1", nomina.total_prestamos))
+
+    return {
+        'numero': nomina.numero,
+        'periodo_inicio': nomina.periodo_inicio,
+        'periodo_fin': nomina.periodo_fin,
+        'fecha_pago': nomina.fecha_pago,
+        'estado': nomina.get_estado_display(),
+        'empleado_nombre': empleado.nombre_completo,
+        'empleado_documento': empleado.numero_documento,
+        'tipo_contrato': contrato.tipo_contrato.nombre,
+        'salario_base': nomina.salario_base,
+        'contrato_vigencia': (
+            f"{contrato.fecha_inicio} - {contrato.fecha_fin}" if contrato.fecha_fin else "Indefinido"
+        ),
+        'incluir_salario_base': nomina.incluir_salario_base,
+        'ingresos': ingresos,
+        'deducciones': deducciones,
+        'total_devengado': nomina.total_devengado,
+        'total_deducciones': nomina.total_deducciones,
+        'total_pagar': nomina.total_pagar,
+        'items': items,
+    }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PLANTILLA
+# ══════════════════════════════════════════════════════════════════════════════
+
+class RenderizadorDesprendible:
+    """Plantilla reportlab del desprendible; se construye una vez y se reutiliza."""
+
+    def __init__(self):
+        from reportlab.lib.pagesizes import letter
+
+        self.pagesize = letter
+        page_w, page_h = letter
+        margin = 40
+        self.left = margin
+        self.right = page_w - margin
+        self.top = page_h - margin
+
+        col_gap = 20
+        self.col_w = (self.right - self.left - col_gap) / 2
+        self.col1_x = self.left
+        self.col2_x = self.left + self.col_w + col_gap
+
+        self.font = "Helvetica"
+        self.font_bold = "Helvetica-Bold"
+
+    @staticmethod
+    def fmt(valor):
+        if valor is None:
+            return "0"
+        if isinstance(valor, Decimal):
+            return f"{valor:,.2f}"
+        return f"{valor}"
+
+    def nuevo_canvas(self, buffer):
+        from reportlab.pdfgen import canvas
+
+        return canvas.Canvas(buffer, pagesize=self.pagesize)
+
+    def renderizar(self, datos: dict) -> bytes:
+        """PDF de un desprendible."""
+        buffer = io.BytesIO()
+        c = self.nuevo_canvas(buffer)
+        self.dibujar(c, datos)
+        c.save()
+        return buffer.getvalue()
+
+    def dibujar(self, c, datos: dict):
+        """Dibuja un desprendible en el canvas (termina con ``showPage``)."""
+        left, right, top = self.left, self.right, self.top
+        fmt = self.fmt
+        y = top
+
+        def draw_section_title(text):
+            nonlocal y
+            c.setFont(self.font_bold, 11)
+            c.drawString(left, y, text)
+            y -= 12
+            c.setLineWidth(0.5)
+            c.line(left, y, right, y)
+            y -= 8
+
+        def draw_kv(x, y_pos, label, value):
+            c.setFont(self.font_bold, 9)
+            c.drawString(x, y_pos, f"{label}:")
+            c.setFont(self.font, 9)
+            c.drawString(x + 90, y_pos, str(value))
+
+        def draw_table(x, y_pos, width, title, rows):
+            row_h = 14
+            header_h = 16
+            c.setFont(self.font_bold, 10)
+            c.drawString(x, y_pos, title)
+            y_pos -= 6
+            c.setLineWidth(0.5)
+            c.rect(x, y_pos - header_h, width, header_h, stroke=1, fill=0)
+            c.setFont(self.font_bold, 8)
+            c.drawString(x + 4, y_pos - 12, "Concepto")
+            c.drawString(x + width * 0.62, y_pos - 12, "Cantidad")
+            c.drawRightString(x + width - 4, y_pos - 12, "Valor")
+            y_pos -= header_h
+
+            c.setFont(self.font, 8)
+            for concepto, cantidad, valor in rows:
+                c.rect(x, y_pos - row_h, width, row_h, stroke=1, fill=0)
+                c.drawString(x + 4, y_pos - 11, str(concepto))
+                c.drawString(x + width * 0.62, y_pos - 11, str(cantidad) if cantidad else "-")
+                c.drawRightString(x + width - 4, y_pos - 11, fmt(valor))
+                y_pos -= row_h
+            return y_pos
+
+        # Encabezado
+        c.setFont(self.font_bold, 14)
+        c.drawString(left, y, f"Desprendible de Nómina {datos['numero']}")
+        y -= 18
+        c.setFont(self.font, 10)
+        c.drawString(left, y, f"Período: {datos['periodo_inicio']} a {datos['periodo_fin']}")
+        y -= 12
+        c.drawString(left, y, f"Fecha de Pago: {datos['fecha_pago'] or ''}")
+        y -= 12
+        c.drawString(left, y, f"Estado: {datos['estado']}")
+        y -= 18
+
+        # Información del empleado y contrato en dos columnas
+        info_y = y
+        c.setFont(self.font_bold, 10)
+        c.drawString(self.col1_x, info_y, "Empleado")
+        c.drawString(self.col2_x, info_y, "Contrato")
+        info_y -= 12
+
+        draw_kv(self.col1_x, info_y, "Nombre", datos['empleado_nombre'])
+        draw_kv(self.col2_x, info_y, "Tipo", datos['tipo_contrato'])
+        info_y -= 12
+        draw_kv(self.col1_x, info_y, "Documento", datos['empleado_documento'])
+        draw_kv(self.col2_x, info_y, "Salario Base", fmt(datos['salario_base']))
+        info_y -= 12
+        draw_kv(self.col1_x, info_y, "Contrato", datos['contrato_vigencia'])
+        draw_kv(self.col2_x, info_y, "Incluye Salario", "Sí" if datos['incluir_salario_base'] else "No")
+        info_y -= 18
+
+        y = info_y
+        draw_section_title("Ingresos y Deducciones")
+
+        table_top = y
+        y_left = draw_table(self.col1_x, table_top, self.col_w, "Ingresos", datos['ingresos'])
+        y_right = draw_table(self.col2_x, table_top, self.col_w, "Deducciones", datos['deducciones'])
+        y = min(y_left, y_right) - 14
+
+        # Totales
+        c.setFont(self.font_bold, 10)
+        c.drawString(left, y, f"Total Ingresos: {fmt(datos['total_devengado'])}")
+        c.drawRightString(right, y, f"Total Deducciones: {fmt(datos['total_deducciones'])}")
+        y -= 18
+        c.setFont(self.font_bold, 12)
+        c.drawRightString(right, y, f"NETO A PAGAR: {fmt(datos['total_pagar'])}")
+        y -= 20
+
+        # Detalle de items
+        if y < 120:
+            c.showPage()
+            y = top
+        draw_section_title("Detalle de Items")
+        for nombre, cantidad, valor_total in datos['items']:
+            if y < 80:
+                c.showPage()
+                y = top
+            c.setFont(self.font, 9)
+            c.drawString(left, y, f"{nombre}")
+            c.drawRightString(right - 120, y, f"Cantidad: {cantidad}")
+            c.drawRightString(right, y, f"Total: {fmt(valor_total)}")
+            y -= 12
+
+        c.showPage()
+
+
+# Plantilla por proceso (cada worker del pool prepara la suya una sola vez)
+_renderizador = None
+
+
+def obtener_renderizador() -> RenderizadorDesprendible:
+    global _renderizador
+    if _renderizador is None:
+        _renderizador = RenderizadorDesprendible()
+    return _renderizador
+
+
+def renderizar_desprendible(datos: dict) -> bytes:
+    """PDF de un desprendible (función de nivel de módulo para el pool)."""
+    return obtener_renderizador().renderizar(datos)
+
+
+def _renderizar_lote(lista_datos: list):
+    """Renderiza en paralelo y entrega los PDF en el mismo orden de entrada."""
+    workers = _workers()
+    if workers <= 1 or len(lista_datos) < MINIMO_PARA_POOL:
+        for datos in lista_datos:
+            yield renderizar_desprendible(datos)
+        return
+
+    chunksize = max(1, len(lista_datos) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(renderizar_desprendible, lista_datos, chunksize=chunksize)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SALIDA POR PERÍODO
+# ══════════════════════════════════════════════════════════════════════════════
+
+class _BufferSalida(io.RawIOBase):
+    """Archivo solo-escritura (no seekable) que acumula bytes para el streaming."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def vaciar(self) -> bytes:
+        contenido = b''.join(self._partes)
+        self._partes = []
+        return contenido
+
+
+def generar_zip_periodo(lista_datos: list):
+    """
+    Genera (en streaming) un ZIP con un PDF por desprendible.
+
+    Yields:
+        bytes: fragmentos del ZIP a medida que se renderiza cada PDF
+    """
+    salida = _BufferSalida()
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for datos, pdf in zip(lista_datos, _renderizar_lote(lista_datos)):
+            nombre = f"desprendible_{datos['numero']}_{datos['empleado_documento']}.pdf"
+            zf.writestr(nombre, pdf)
+            fragmento = salida.vaciar()
+            if fragmento:
+                yield fragmento
+    yield salida.vaciar()
+
+
+def generar_pdf_periodo(lista_datos: list) -> bytes:
+    """Un solo PDF con todos los desprendibles del período (uno tras otro)."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for pdf in _renderizar_lote(lista_datos):
+        for pagina in PdfReader(io.BytesIO(pdf)).pages:
+            writer.add_page(pagina)
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
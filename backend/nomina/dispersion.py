@@ -0,0 +1,322 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║              ARCHIVO DE DISPERSIÓN BANCARIA (PAGO DE NÓMINA)                  ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Genera el archivo de pagos por transferencia del neto de cada nómina de un
+período, para cargarlo en el portal empresarial del banco pagador:
+
+- Las nóminas se leen con un cursor del servidor (``iterator(chunk_size)``)
+  sobre ``NominaSimple`` + ``Empleado``: memoria constante y el archivo se
+  envía al cliente mientras se genera (igual que la planilla PILA).
+- El formato de cada banco es un layout configurable: de longitud fija
+  (encabezado + detalle, mismos tipos de campo que ``pila``) o CSV.
+  ``NOMINA_DISPERSION_LAYOUTS`` agrega layouts o reemplaza los incluidos.
+- Los datos bancarios son los del empleado (``banco``, ``tipo_cuenta``,
+  ``numero_cuenta``). Las nóminas de empleados sin cuenta no se incluyen;
+  ``sin_cuenta()`` las cuenta para avisar al usuario.
+
+Los layouts incluidos son subconjuntos de los formatos de pago de nómina
+de cada banco con los campos que existen en el sistema; se deben validar
+contra la versión vigente del banco antes de usarlos en producción.
+"""
+
+import csv
+import io
+import unicodedata
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .pila import FIN_LINEA, TIPOS_DOCUMENTO, formatear_registro
+
+
+# Códigos ACH Colombia por nombre normalizado del banco del empleado
+CODIGOS_BANCO = {
+    'BANCO DE BOGOTA': '1001',
+    'BANCO POPULAR': '1002',
+    'ITAU': '1006',
+    'BANCOLOMBIA': '1007',
+    'BBVA': '1013',
+    'SCOTIABANK COLPATRIA': '1019',
+    'COLPATRIA': '1019',
+    'BANCO DE OCCIDENTE': '1023',
+    'BANCO CAJA SOCIAL': '1032',
+    'BANCO AGRARIO': '1040',
+    'DAVIVIENDA': '1051',
+    'AV VILLAS': '1052',
+    'BANCO AV VILLAS': '1052',
+    'NEQUI': '1507',
+    'DAVIPLATA': '1551',
+}
+
+LAYOUTS = {
+    'csv': {
+        'nombre': 'CSV genérico',
+        'formato': 'csv',
+        'separador': ',',
+        'tipos_cuenta': {'ahorros': 'AH', 'corriente': 'CC'},
+        'columnas': [
+            'tipo_documento', 'numero_documento', 'nombre', 'banco', 'codigo_banco',
+            'tipo_cuenta', 'numero_cuenta', 'valor', 'referencia',
+        ],
+    },
+    'bancolombia_pab': {
+        'nombre': 'Bancolombia - Pagos a terceros (PAB)',
+        'formato': 'ancho_fijo',
+        'tipos_cuenta': {'ahorros': '37', 'corriente': '27'},
+        'encabezado': [
+            ('tipo_registro', 1, 'N'),
+            ('nit_pagador', 15, 'N'),
+            ('aplicacion', 1, 'A'),
+            ('relleno', 15, 'A'),
+            ('clase_transaccion', 3, 'N'),
+            ('descripcion', 10, 'A'),
+            ('fecha_transmision', 8, 'N'),
+            ('secuencia', 2, 'A'),
+            ('fecha_aplicacion', 8, 'N'),
+            ('numero_registros', 6, 'N'),
+            ('total_debitos', 17, 'N'),
+            ('total_creditos', 17, 'N'),
+            ('cuenta_origen', 11, 'N'),
+            ('tipo_cuenta_origen', 1, 'A'),
+        ],
+        'detalle': [
+            ('tipo_registro', 1, 'N'),
+            ('numero_documento', 15, 'A'),
+            ('nombre', 30, 'A'),
+            ('codigo_banco', 9, 'N'),
+            ('numero_cuenta', 17, 'A'),
+            ('lugar_pago', 1, 'A'),
+            ('tipo_cuenta', 2, 'N'),
+            ('valor', 17, 'N'),
+            ('fecha_aplicacion', 8, 'N'),
+            ('referencia', 21, 'A'),
+        ],
+        # Valores fijos por registro
+        'constantes': {
+            'encabezado': {'tipo_registro': 1, 'aplicacion': 'I', 'clase_transaccion': 225,
+                           'descripcion': 'NOMINA', 'secuencia': 'A'},
+            'detalle': {'tipo_registro': 6, 'lugar_pago': 'S'},
+        },
+    },
+    'davivienda': {
+        'nombre': 'Davivienda - Pago de nómina',
+        'formato': 'ancho_fijo',
+        'tipos_cuenta': {'ahorros': 'CA', 'corriente': 'CC'},
+        'encabezado': [
+            ('tipo_registro', 2, 'A'),
+            ('nit_pagador', 16, 'N'),
+            ('codigo_servicio', 4, 'A'),
+            ('cuenta_origen', 16, 'N'),
+            ('tipo_cuenta_origen', 2, 'A'),
+            ('total_creditos', 18, 'N'),
+            ('numero_registros', 6, 'N'),
+            ('fecha_aplicacion', 8, 'N'),
+        ],
+        'detalle': [
+            ('tipo_registro', 2, 'A'),
+            ('tipo_documento', 2, 'A'),
+            ('numero_documento', 16, 'A'),
+            ('nombre', 40, 'A'),
+            ('codigo_banco', 4, 'N'),
+            ('numero_cuenta', 16, 'A'),
+            ('tipo_cuenta', 2, 'A'),
+            ('valor', 18, 'N'),
+            ('referencia', 16, 'A'),
+        ],
+        'constantes': {
+            'encabezado': {'tipo_registro': 'RC', 'codigo_servicio': 'NOMI'},
+            'detalle': {'tipo_registro': 'TR'},
+        },
+    },
+}
+
+CAMPOS_CONSULTA = (
+    'numero',
+    'total_pagar',
+    'contrato__empleado__tipo_documento',
+    'contrato__empleado__numero_documento',
+    'contrato__empleado__primer_nombre',
+    'contrato__empleado__segundo_nombre',
+    'contrato__empleado__primer_apellido',
+    'contrato__empleado__segundo_apellido',
+    'contrato__empleado__banco',
+    'contrato__empleado__tipo_cuenta',
+    'contrato__empleado__numero_cuenta',
+)
+
+ESTADOS_DISPERSABLES = ('aprobada', 'pagada')
+
+
+def layouts() -> dict:
+    """Layouts incluidos más los de ``NOMINA_DISPERSION_LAYOUTS``."""
+    return {**LAYOUTS, **getattr(settings, 'NOMINA_DISPERSION_LAYOUTS', {})}
+
+
+def _normalizar(texto) -> str:
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ' '.join(texto.encode('ascii', 'ignore').decode('ascii').upper().split())
+
+
+def codigo_banco(nombre) -> str:
+    """Código ACH del banco a partir del nombre registrado en el empleado."""
+    return CODIGOS_BANCO.get(_normalizar(nombre), '')
+
+
+def _centavos(valor) -> int:
+    """Valor con dos decimales implícitos (formato de los archivos bancarios)."""
+    return int((Decimal(valor or 0) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+class GeneradorDispersion:
+    """
+    Archivo de dispersión de una organización y período en el layout de un banco.
+
+    Uso:
+        generador = GeneradorDispersion(organization, inicio, fin, 'bancolombia_pab')
+        response = StreamingHttpResponse(generador.stream())
+    """
+
+    def __init__(self, organization, periodo_inicio, periodo_fin, layout, proyecto=None,
+                 estado='aprobada', cuenta_origen='', tipo_cuenta_origen='ahorros', tamano_bloque=None):
+        disponibles = layouts()
+        if layout not in disponibles:
+            raise ValueError(f'Layout desconocido: {layout}. Disponibles: {", ".join(sorted(disponibles))}')
+        if estado not in ESTADOS_DISPERSABLES:
+            raise ValueError(f'Solo se dispersan nóminas en estado {" o ".join(ESTADOS_DISPERSABLES)}')
+        self.organization = organization
+        self.periodo_inicio = periodo_inicio
+        self.periodo_fin = periodo_fin
+        self.clave_layout = layout
+        self.layout = disponibles[layout]
+        self.constantes = self.layout.get('constantes', {})
+        self.proyecto = proyecto
+        self.estado = estado
+        self.cuenta_origen = cuenta_origen
+        self.tipo_cuenta_origen = tipo_cuenta_origen
+        self.fecha = timezone.now().date()
+        self.tamano_bloque = tamano_bloque or getattr(settings, 'NOMINA_DISPERSION_TAMANO_BLOQUE', 2000)
+
+    def _nominas_periodo(self):
+        """Nóminas del período en el estado pedido y con neto a pagar."""
+        from .models import NominaSimple
+
+        # for_tenant: el stream se consume después de que el middleware
+        # libera el tenant del hilo
+        queryset = NominaSimple.objects.for_tenant(self.organization).filter(
+            periodo_inicio=self.periodo_inicio,
+            periodo_fin=self.periodo_fin,
+            estado=self.estado,
+            total_pagar__gt=0,
+        )
+        if self.proyecto:
+            queryset = queryset.filter(proyecto=self.proyecto)
+        return queryset
+
+    @staticmethod
+    def _filtro_sin_cuenta() -> Q:
+        return Q(contrato__empleado__numero_cuenta='') | Q(contrato__empleado__banco='')
+
+    def nominas(self):
+        """Nóminas que van en el archivo (empleados con cuenta registrada)."""
+        return self._nominas_periodo().exclude(self._filtro_sin_cuenta())
+
+    def sin_cuenta(self) -> int:
+        """Nóminas del período que no se pueden dispersar por falta de cuenta."""
+        return self._nominas_periodo().filter(self._filtro_sin_cuenta()).count()
+
+    def totales(self) -> dict:
+        """Cantidad y valor total a dispersar (una consulta agregada)."""
+        totales = self.nominas().aggregate(cantidad=Count('id'), valor=Sum('total_pagar'))
+        return {'cantidad': totales['cantidad'], 'valor': totales['valor'] or Decimal('0.00')}
+
+    def _valores_comunes(self) -> dict:
+        nit = (getattr(self.organization, 'nit', '') or '').partition('-')[0]
+        return {
+            'nit_pagador': nit.replace('.', '').strip(),
+            'fecha_transmision': self.fecha.strftime('%Y%m%d'),
+            'fecha_aplicacion': self.fecha.strftime('%Y%m%d'),
+            'cuenta_origen': self.cuenta_origen,
+            'tipo_cuenta_origen': self.layout['tipos_cuenta'].get(self.tipo_cuenta_origen, ''),
+        }
+
+    def encabezado(self):
+        """Registro de control del lote (None si el layout no lleva)."""
+        if self.layout['formato'] == 'csv':
+            return self.layout.get('separador', ',').join(self.layout['columnas'])
+        if not self.layout.get('encabezado'):
+            return None
+        totales = self.totales()
+        valores = {
+            **self._valores_comunes(),
+            'numero_registros': totales['cantidad'],
+            'total_debitos': 0,
+            'total_creditos': _centavos(totales['valor']),
+            **self.constantes.get('encabezado', {}),
+        }
+        return formatear_registro(self.layout['encabezado'], valores)
+
+    def valores_detalle(self, fila) -> dict:
+        """Valores de un pago a partir de una fila de ``CAMPOS_CONSULTA``."""
+        (
+            numero, total_pagar, tipo_documento, numero_documento,
+            primer_nombre, segundo_nombre, primer_apellido, segundo_apellido,
+            banco, tipo_cuenta, numero_cuenta,
+        ) = fila
+        nombre = ' '.join(filter(None, [primer_nombre, segundo_nombre, primer_apellido, segundo_apellido]))
+        return {
+            **self._valores_comunes(),
+            'tipo_documento': TIPOS_DOCUMENTO.get(tipo_documento, tipo_documento),
+            'numero_documento': numero_documento,
+            'nombre': _normalizar(nombre),
+            'banco': _normalizar(banco),
+            'codigo_banco': codigo_banco(banco),
+            'tipo_cuenta': self.layout['tipos_cuenta'].get(tipo_cuenta, ''),
+            'numero_cuenta': ''.join(c for c in numero_cuenta if c.isalnum()),
+            'referencia': numero,
+            **self.constantes.get('detalle', {}),
+            'valor': total_pagar,
+        }
+
+    def registro(self, fila) -> str:
+        valores = self.valores_detalle(fila)
+        if self.layout['formato'] == 'csv':
+            valores['valor'] = f"{Decimal(valores['valor']):.2f}"
+            salida = io.StringIO()
+            csv.writer(
+                salida, delimiter=self.layout.get('separador', ','), lineterminator=''
+            ).writerow([valores.get(columna, '') for columna in self.layout['columnas']])
+            return salida.getvalue()
+        valores['valor'] = _centavos(valores['valor'])
+        return formatear_registro(self.layout['detalle'], valores)
+
+    def lineas(self):
+        """Encabezado y un registro por nómina, en orden de documento."""
+        encabezado = self.encabezado()
+        if encabezado is not None:
+            yield encabezado
+        filas = self.nominas().order_by(
+            'contrato__empleado__numero_documento', 'numero'
+        ).values_list(*CAMPOS_CONSULTA).iterator(chunk_size=self.tamano_bloque)
+        for fila in filas:
+            yield self.registro(fila)
+
+    def stream(self):
+        """Bytes del archivo en bloques de ``tamano_bloque`` líneas."""
+        bloque = []
+        for linea in self.lineas():
+            bloque.append(linea)
+            if len(bloque) >= self.tamano_bloque:
+                yield (FIN_LINEA.join(bloque) + FIN_LINEA).encode('ascii', 'ignore')
+                bloque = []
+        if bloque:
+            yield (FIN_LINEA.join(bloque) + FIN_LINEA).encode('ascii', 'ignore')
+
+    @property
+    def nombre_archivo(self) -> str:
+        extension = 'csv' if self.layout['formato'] == 'csv' else 'txt'
+        return f'dispersion_{self.clave_layout}_{self.periodo_inicio}_{self.periodo_fin}.{extension}'
@@ -0,0 +1,218 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║              EXPORTACIÓN COLUMNAR DEL HISTÓRICO DE NÓMINA                     ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Exporta el histórico de nómina para herramientas de BI: una fila por línea
+de concepto (con los datos de su nómina y empleado), particionada por año y
+mes del fin del período al estilo Hive::
+
+    anio=2026/mes=01/part-0000.parquet
+    anio=2026/mes=02/part-0000.parquet
+
+- Las filas se leen por bloques con un cursor del lado del servidor
+  (``iterator(chunk_size)``) y se escriben bloque a bloque: la memoria no
+  depende del tamaño del histórico.
+- Formato Parquet si ``pyarrow`` está instalado (dependencia opcional);
+  si no, CSV con la misma partición y columnas.
+- Incluye las líneas archivadas de los períodos cerrados.
+"""
+
+import csv
+import io
+import logging
+import os
+import zipfile
+from datetime import date
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# (columna de salida, campo del values_list, tipo pyarrow)
+COLUMNAS = [
+    ('nomina_id', 'nomina_id', 'string'),
+    ('numero', 'nomina__numero', 'string'),
+    ('estado', 'nomina__estado', 'string'),
+    ('periodo_inicio', 'nomina__periodo_inicio', 'date32'),
+    ('periodo_fin', 'nomina__periodo_fin', 'date32'),
+    ('fecha_pago', 'nomina__fecha_pago', 'date32'),
+    ('proyecto_id', 'nomina__proyecto_id', 'string'),
+    ('empleado_documento', 'nomina__contrato__empleado__numero_documento', 'string'),
+    ('empleado_primer_apellido', 'nomina__contrato__empleado__primer_apellido', 'string'),
+    ('empleado_primer_nombre', 'nomina__contrato__empleado__primer_nombre', 'string'),
+    ('tipo_contrato', 'nomina__contrato__tipo_contrato__codigo', 'string'),
+    ('salario_base', 'nomina__salario_base', 'decimal'),
+    ('concepto_codigo', 'concepto__codigo', 'string'),
+    ('concepto_nombre', 'concepto__nombre', 'string'),
+    ('tipo', 'tipo', 'string'),
+    ('base', 'base', 'decimal'),
+    ('porcentaje_aplicado', 'porcentaje_aplicado', 'decimal'),
+    ('valor', 'valor', 'decimal'),
+]
+
+FORMATOS = ('parquet', 'csv')
+
+
+def _tamano_bloque() -> int:
+    return getattr(settings, 'NOMINA_EXPORTACION_TAMANO_BLOQUE', 5000)
+
+
+def _pyarrow():
+    """Importa pyarrow si está instalado (None si no)."""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def formato_disponible(formato=None) -> str:
+    """Formato a usar: el pedido si es posible; Parquet cae a CSV sin pyarrow."""
+    if formato not in FORMATOS:
+        formato = 'parquet'
+    if formato == 'parquet' and _pyarrow() is None:
+        logger.info('pyarrow no está instalado; la exportación se genera en CSV')
+        return 'csv'
+    return formato
+
+
+def filas_conceptos(organization, desde=None, hasta=None, proyecto=None, tamano_bloque=None):
+    """
+    Genera tuplas (en el orden de ``COLUMNAS``) de las líneas de conceptos
+    de nóminas no anuladas, ordenadas por fin del período.
+
+    Lee primero las líneas archivadas (períodos cerrados, los más antiguos)
+    y luego las de trabajo.
+    """
+    from .models import NominaConcepto, NominaConceptoArchivo
+
+    tamano = tamano_bloque or _tamano_bloque()
+    campos = [campo for _, campo, _ in COLUMNAS]
+    for modelo in (NominaConceptoArchivo, NominaConcepto):
+        lineas = modelo.objects.for_tenant(organization).exclude(nomina__estado='anulada')
+        if desde:
+            lineas = lineas.filter(nomina__periodo_fin__gte=desde)
+        if hasta:
+            lineas = lineas.filter(nomina__periodo_fin__lte=hasta)
+        if proyecto:
+            lineas = lineas.filter(nomina__proyecto=proyecto)
+        yield from lineas.order_by('nomina__periodo_fin', 'nomina__numero', 'id').values_list(
+            *campos
+        ).iterator(chunk_size=tamano)
+
+
+def _particion(periodo_fin: date) -> str:
+    return os.path.join(f'anio={periodo_fin.year}', f'mes={periodo_fin.month:02d}')
+
+
+class _EscritorCSV:
+    """Un archivo CSV por partición."""
+
+    extension = 'csv'
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, 'w', newline='', encoding='utf-8')
+        self._csv = csv.writer(self._archivo)
+        self._csv.writerow([columna for columna, _, _ in COLUMNAS])
+
+    def escribir(self, bloque):
+        self._csv.writerows(
+            ['' if valor is None else valor for valor in fila] for fila in bloque
+        )
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class _EscritorParquet:
+    """Un archivo Parquet por partición; cada bloque es un row group."""
+
+    extension = 'parquet'
+
+    def __init__(self, ruta):
+        pa = _pyarrow()
+        tipos = {
+            'string': pa.string(),
+            'date32': pa.date32(),
+            'decimal': pa.decimal128(16, 3),
+        }
+        self._pa = pa
+        self._esquema = pa.schema([(columna, tipos[tipo]) for columna, _, tipo in COLUMNAS])
+        self._escritor = pa.parquet.ParquetWriter(ruta, self._esquema, compression='snappy')
+
+    def escribir(self, bloque):
+        columnas = list(zip(*bloque))
+        arreglos = []
+        for (columna, _, tipo), valores in zip(COLUMNAS, columnas):
+            if tipo == 'string':
+                valores = [None if v is None else str(v) for v in valores]
+            arreglos.append(self._pa.array(valores, type=self._esquema.field(columna).type))
+        self._escritor.write_table(self._pa.Table.from_arrays(arreglos, schema=self._esquema))
+
+    def cerrar(self):
+        self._escritor.close()
+
+
+def exportar_historico(organization, destino, formato=None, desde=None, hasta=None,
+                       proyecto=None, tamano_bloque=None) -> dict:
+    """
+    Escribe el histórico particionado en el directorio ``destino``.
+
+    Returns:
+        dict: formato usado, filas escritas y {partición: filas}
+    """
+    formato = formato_disponible(formato)
+    clase = _EscritorParquet if formato == 'parquet' else _EscritorCSV
+    tamano = tamano_bloque or _tamano_bloque()
+    indice_fin = [campo for campo, _, _ in COLUMNAS].index('periodo_fin')
+
+    escritores = {}
+    particiones = {}
+    bloque, particion_bloque = [], None
+
+    def vaciar():
+        if not bloque:
+            return
+        if particion_bloque not in escritores:
+            carpeta = os.path.join(destino, particion_bloque)
+            os.makedirs(carpeta, exist_ok=True)
+            escritores[particion_bloque] = clase(os.path.join(carpeta, f'part-0000.{clase.extension}'))
+        escritores[particion_bloque].escribir(bloque)
+        particiones[particion_bloque] = particiones.get(particion_bloque, 0) + len(bloque)
+        bloque.clear()
+
+    try:
+        for fila in filas_conceptos(organization, desde, hasta, proyecto, tamano):
+            particion = _particion(fila[indice_fin])
+            if particion != particion_bloque or len(bloque) >= tamano:
+                vaciar()
+                particion_bloque = particion
+            bloque.append(fila)
+        vaciar()
+    finally:
+        for escritor in escritores.values():
+            escritor.cerrar()
+
+    return {
+        'formato': formato,
+        'filas': sum(particiones.values()),
+        'particiones': dict(sorted(particiones.items())),
+    }
+
+
+def comprimir_directorio(directorio) -> io.BufferedRandom:
+    """ZIP (en archivo temporal) con el árbol de particiones, listo para descargar."""
+    import tempfile
+
+    salida = tempfile.TemporaryFile()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for raiz, _, archivos in sorted(os.walk(directorio)):
+            for nombre in sorted(archivos):
+                ruta = os.path.join(raiz, nombre)
+                zf.write(ruta, os.path.relpath(ruta, directorio).replace(os.sep, '/'))
+    salida.seek(0)
+    return salida
@@ -0,0 +1,312 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║            IMPORTACIÓN MASIVA DE NOVEDADES DE NÓMINA (EXCEL / CSV)            ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Carga las novedades de un período completo (producción de obra, horas
+extra, bonificaciones, descuentos) desde una hoja de cálculo, con una
+columna por dato y una fila por novedad:
+
+    documento | codigo | cantidad | valor_unitario | observaciones
+
+- ``codigo`` es un item de trabajo (código o nombre): se crea un
+  ``NominaItem`` con la cantidad y el valor unitario (por defecto el
+  precio del item).
+- O un ``ConceptoLaboral`` no legal (HED, BONIFICACION, LIBRANZA...): se
+  agrega a ``conceptos_seleccionados`` de la nómina.
+
+Las filas se validan contra diccionarios precargados (nóminas del período
+por documento, contratos activos, items y conceptos: una consulta cada uno)
+y se escriben con ``bulk_create``/``bulk_update`` en una transacción. El
+resultado incluye un reporte de errores por fila; las filas válidas se
+importan aunque otras fallen. Las novedades se asignan a las nóminas del
+período en borrador o calculadas, que quedan pendientes de recálculo.
+"""
+
+import csv
+import io
+import unicodedata
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import transaction
+
+
+COLUMNAS_REQUERIDAS = ('documento', 'codigo')
+COLUMNAS = ('documento', 'codigo', 'cantidad', 'valor_unitario', 'observaciones')
+
+ESTADOS_EDITABLES = ('borrador', 'calculada')
+
+MAX_FILAS = 20000
+
+
+class ArchivoNovedadesInvalido(Exception):
+    """El archivo no se puede leer o no tiene las columnas requeridas."""
+    pass
+
+
+def _normalizar(texto) -> str:
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ' '.join(texto.encode('ascii', 'ignore').decode('ascii').upper().split())
+
+
+def _celda(valor) -> str:
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        # Documentos numéricos leídos por Excel como 1234.0
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def leer_filas(archivo, nombre=''):
+    """
+    Lee la hoja (xlsx o csv) y genera ``(número de fila, dict)`` con las
+    columnas de ``COLUMNAS``.
+
+    Raises:
+        ArchivoNovedadesInvalido: formato no soportado o columnas faltantes
+    """
+    nombre = (nombre or getattr(archivo, 'name', '')).lower()
+    if nombre.endswith('.csv'):
+        contenido = archivo.read()
+        if isinstance(contenido, bytes):
+            contenido = contenido.decode('utf-8-sig')
+        filas = csv.reader(io.StringIO(contenido))
+    elif nombre.endswith('.xlsx'):
+        import openpyxl
+
+        try:
+            libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+        except Exception as e:
+            raise ArchivoNovedadesInvalido(f'No se pudo leer el archivo: {e}')
+        filas = libro.active.iter_rows(values_only=True)
+    else:
+        raise ArchivoNovedadesInvalido('El archivo debe ser Excel (.xlsx) o CSV')
+
+    encabezado = next(filas, None)
+    if not encabezado:
+        raise ArchivoNovedadesInvalido('El archivo está vacío')
+    posiciones = {}
+    for posicion, columna in enumerate(encabezado):
+        columna = _normalizar(columna).lower().replace(' ', '_')
+        if columna in COLUMNAS:
+            posiciones[columna] = posicion
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in posiciones]
+    if faltantes:
+        raise ArchivoNovedadesInvalido(f'Faltan columnas: {", ".join(faltantes)}')
+
+    for numero, fila in enumerate(filas, start=2):
+        datos = {
+            columna: _celda(fila[posicion]) if posicion < len(fila) else ''
+            for columna, posicion in posiciones.items()
+        }
+        if any(datos.values()):
+            yield numero, datos
+
+
+class ImportadorNovedades:
+    """
+    Valida e importa las novedades de un período.
+
+    Uso:
+        importador = ImportadorNovedades(organization, inicio, fin)
+        resultado = importador.importar(leer_filas(archivo))
+    """
+
+    def __init__(self, organization, periodo_inicio, periodo_fin, proyecto=None):
+        self.organization = organization
+        self.periodo_inicio = periodo_inicio
+        self.periodo_fin = periodo_fin
+        self.proyecto = proyecto
+        self.errores = []
+        self._cargar()
+
+    def _cargar(self):
+        """Diccionarios de búsqueda: una consulta por tabla."""
+        from items.models import Item
+        from .models import ConceptoLaboral, Contrato, NominaSimple
+
+        nominas = NominaSimple.objects.for_tenant(self.organization).filter(
+            periodo_inicio=self.periodo_inicio,
+            periodo_fin=self.periodo_fin,
+        ).exclude(estado='anulada').select_related('contrato__empleado')
+        if self.proyecto:
+            nominas = nominas.filter(proyecto=self.proyecto)
+        self.nominas = {}
+        self.nominas_no_editables = {}
+        for nomina in nominas.order_by('numero'):
+            documento = _normalizar(nomina.contrato.empleado.numero_documento)
+            destino = self.nominas if nomina.estado in ESTADOS_EDITABLES else self.nominas_no_editables
+            destino.setdefault(documento, nomina)
+
+        self.con_contrato = {
+            _normalizar(documento)
+            for documento in Contrato.objects.for_tenant(self.organization).filter(
+                activo=True
+            ).values_list('empleado__numero_documento', flat=True)
+        }
+
+        self.items = {}
+        for item in Item.objects.for_tenant(self.organization).filter(activo=True):
+            self.items.setdefault(_normalizar(item.nombre), item)
+            if item.codigo:
+                # El código tiene prioridad sobre un nombre igual
+                self.items[_normalizar(item.codigo)] = item
+
+        self.conceptos = {}
+        self.conceptos_legales = set()
+        for concepto in ConceptoLaboral.objects.for_tenant(self.organization).filter(activo=True):
+            if concepto.es_legal:
+                self.conceptos_legales.add(_normalizar(concepto.codigo))
+            else:
+                self.conceptos[_normalizar(concepto.codigo)] = concepto
+
+    def _error(self, fila, datos, mensaje):
+        self.errores.append({
+            'fila': fila,
+            'documento': datos.get('documento', ''),
+            'codigo': datos.get('codigo', ''),
+            'error': mensaje,
+        })
+
+    @staticmethod
+    def _decimal(valor, campo):
+        try:
+            numero = Decimal(str(valor).replace(',', '.'))
+        except InvalidOperation:
+            raise ValueError(f'{campo} no es un número válido: {valor}')
+        if not numero.is_finite():
+            raise ValueError(f'{campo} no es un número válido: {valor}')
+        return numero
+
+    def _nomina(self, fila, datos):
+        documento = _normalizar(datos.get('documento'))
+        if not documento:
+            self._error(fila, datos, 'El documento es obligatorio')
+            return None
+        nomina = self.nominas.get(documento)
+        if nomina is not None:
+            return nomina
+        if documento in self.nominas_no_editables:
+            no_editable = self.nominas_no_editables[documento]
+            self._error(fila, datos, f'La nómina {no_editable.numero} está {no_editable.estado} y no admite novedades')
+        elif documento in self.con_contrato:
+            self._error(fila, datos, 'El empleado no tiene nómina en el período')
+        else:
+            self._error(fila, datos, 'No hay un empleado con contrato activo con ese documento')
+        return None
+
+    def validar(self, filas):
+        """
+        Valida las filas y arma las novedades sin escribir en BD.
+
+        Returns:
+            (items, conceptos): ``NominaItem`` sin guardar y
+            {nomina: [ConceptoLaboral]}
+        """
+        from .models import NominaItem
+
+        items = []
+        conceptos = {}
+        for numero, (fila, datos) in enumerate(filas, start=1):
+            if numero > MAX_FILAS:
+                self._error(fila, datos, f'Se importan máximo {MAX_FILAS} filas por archivo')
+                break
+            nomina = self._nomina(fila, datos)
+            if nomina is None:
+                continue
+            codigo = _normalizar(datos.get('codigo'))
+            item = self.items.get(codigo)
+            concepto = self.conceptos.get(codigo)
+
+            if item is None and concepto is None:
+                if codigo in self.conceptos_legales:
+                    self._error(fila, datos, 'Los conceptos legales se calculan automáticamente')
+                else:
+                    self._error(fila, datos, 'Código desconocido (no es un item ni un concepto laboral activo)')
+                continue
+
+            if item is None:
+                conceptos.setdefault(nomina, []).append(concepto)
+                continue
+
+            try:
+                cantidad = self._decimal(datos.get('cantidad') or '1', 'cantidad')
+                valor_unitario = (
+                    self._decimal(datos['valor_unitario'], 'valor_unitario')
+                    if datos.get('valor_unitario') else item.precio_unitario
+                )
+            except ValueError as e:
+                self._error(fila, datos, str(e))
+                continue
+            if cantidad < Decimal('0.01'):
+                self._error(fila, datos, 'La cantidad debe ser mayor a cero')
+                continue
+            if valor_unitario < 0:
+                self._error(fila, datos, 'El valor unitario no puede ser negativo')
+                continue
+
+            # bulk_create no llama a save(): valor_total se calcula aquí
+            items.append(NominaItem(
+                organization_id=nomina.organization_id,
+                nomina=nomina,
+                item=item,
+                cantidad=cantidad.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                valor_unitario=valor_unitario.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                valor_total=(cantidad * valor_unitario).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                observaciones=datos.get('observaciones', ''),
+            ))
+        return items, conceptos
+
+    def importar(self, filas, reemplazar=False, simular=False) -> dict:
+        """
+        Valida e importa las novedades.
+
+        Args:
+            reemplazar: borra antes los items de las nóminas con novedades
+            simular: solo valida (no escribe)
+
+        Returns:
+            dict: filas procesadas, items creados, conceptos agregados,
+            nóminas afectadas y errores por fila
+        """
+        from .models import NominaItem, NominaSimple
+
+        filas = list(filas)
+        items, conceptos = self.validar(filas)
+        nominas = {item.nomina for item in items} | set(conceptos)
+
+        agregados = 0
+        actualizar = []
+        for nomina, lista in conceptos.items():
+            seleccionados = [str(c) for c in (nomina.conceptos_seleccionados or [])]
+            nuevos = [str(c.pk) for c in lista if str(c.pk) not in seleccionados]
+            nuevos = list(dict.fromkeys(nuevos))
+            if nuevos:
+                nomina.conceptos_seleccionados = seleccionados + nuevos
+                actualizar.append(nomina)
+                agregados += len(nuevos)
+
+        if not simular:
+            with transaction.atomic():
+                if reemplazar and items:
+                    NominaItem.objects.for_tenant(self.organization).filter(
+                        nomina__in={item.nomina_id for item in items}
+                    ).delete()
+                NominaItem.objects.bulk_create(items, batch_size=500)
+                NominaSimple.objects.for_tenant(self.organization).bulk_update(
+                    actualizar, ['conceptos_seleccionados'], batch_size=500
+                )
+
+        return {
+            'simulacion': simular,
+            'filas': len(filas),
+            'filas_con_error': len({error['fila'] for error in self.errores}),
+            'items_creados': len(items),
+            'conceptos_agregados': agregados,
+            'nominas_afectadas': len(nominas),
+            # Los totales cambian: las nóminas se deben volver a calcular
+            'nominas_por_recalcular': sorted(str(n.pk) for n in nominas),
+            'errores': self.errores,
+        }
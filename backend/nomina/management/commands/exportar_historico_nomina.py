@@ -0,0 +1,56 @@
+"""
+Management Command: exportar_historico_nomina
+=============================================
+
+Escribe el histórico de conceptos de nómina en formato columnar,
+particionado por año y mes (``anio=AAAA/mes=MM/part-0000.parquet``), para
+cargarlo en herramientas de BI. Usa Parquet si pyarrow está instalado; si
+no, CSV.
+
+Uso:
+    python manage.py exportar_historico_nomina --organization CORTESEC --destino /tmp/nomina
+    python manage.py exportar_historico_nomina --organization CORTESEC --destino /tmp/nomina \\
+        --formato csv --desde 2025-01-01 --hasta 2025-12-31
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.models import Organizacion
+from nomina.exportacion_columnar import FORMATOS, exportar_historico
+
+
+class Command(BaseCommand):
+    help = 'Exporta el histórico de conceptos de nómina particionado por año y mes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=str, required=True, help='Código de la organización')
+        parser.add_argument('--destino', type=str, required=True, help='Directorio de salida')
+        parser.add_argument('--formato', choices=FORMATOS, default=None, help='parquet (por defecto) o csv')
+        parser.add_argument('--desde', type=str, default=None, help='Fin de período desde (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=str, default=None, help='Fin de período hasta (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        organization = Organizacion.objects.filter(codigo=options['organization']).first()
+        if organization is None:
+            raise CommandError(f"Organización {options['organization']} no encontrada")
+
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            fechas[nombre] = parse_date(options[nombre]) if options[nombre] else None
+            if options[nombre] and not fechas[nombre]:
+                raise CommandError(f'--{nombre} debe tener el formato AAAA-MM-DD')
+
+        resultado = exportar_historico(
+            organization,
+            options['destino'],
+            formato=options['formato'],
+            desde=fechas['desde'],
+            hasta=fechas['hasta'],
+        )
+        for particion, filas in resultado['particiones'].items():
+            self.stdout.write(f'{particion}: {filas} filas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas exportadas en {resultado['formato']} a {options['destino']}"
+        ))
@@ -0,0 +1,51 @@
+"""
+Management Command: reconstruir_certificados
+============================================
+
+Recalcula desde cero los acumulados anuales de los certificados de
+ingresos y retenciones (``AcumuladoCertificado``) a partir de las nóminas
+pagadas.
+
+Útil para la carga inicial de los acumulados o después de corregir
+nóminas ya pagadas.
+
+Uso:
+    python manage.py reconstruir_certificados
+    python manage.py reconstruir_certificados --organization CORTESEC --anio 2026
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Organizacion
+from nomina.certificados import reconstruir_certificados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los acumulados de los certificados de ingresos y retenciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            default=None,
+            help='Código de la organización (por defecto todas)'
+        )
+        parser.add_argument(
+            '--anio',
+            type=int,
+            default=None,
+            help='Año gravable (por defecto todos)'
+        )
+
+    def handle(self, *args, **options):
+        organizaciones = Organizacion.objects.all()
+        if options['organization']:
+            organizaciones = organizaciones.filter(codigo=options['organization'])
+            if not organizaciones.exists():
+                raise CommandError(f"Organización {options['organization']} no encontrada")
+
+        for organization in organizaciones:
+            nominas = reconstruir_certificados(organization, anio=options['anio'])
+            self.stdout.write(f'{organization.codigo}: {nominas} nóminas')
+
+        self.stdout.write(self.style.SUCCESS('Acumulados de certificados reconstruidos'))
@@ -0,0 +1,45 @@
+"""
+Management Command: reconstruir_prestaciones
+============================================
+
+Recalcula desde cero el libro de prestaciones sociales
+(``MovimientoPrestacion`` y ``SaldoPrestacion``) a partir de las nóminas
+pagadas. Los pagos de prestaciones registrados se conservan.
+
+Útil para la carga inicial del libro o después de corregir parámetros
+legales con nóminas ya pagadas.
+
+Uso:
+    python manage.py reconstruir_prestaciones
+    python manage.py reconstruir_prestaciones --organization CORTESEC
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Organizacion
+from nomina.prestaciones import reconstruir_prestaciones
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el libro de prestaciones sociales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            default=None,
+            help='Código de la organización (por defecto todas)'
+        )
+
+    def handle(self, *args, **options):
+        organizaciones = Organizacion.objects.all()
+        if options['organization']:
+            organizaciones = organizaciones.filter(codigo=options['organization'])
+            if not organizaciones.exists():
+                raise CommandError(f"Organización {options['organization']} no encontrada")
+
+        for organization in organizaciones:
+            movimientos = reconstruir_prestaciones(organization)
+            self.stdout.write(f'{organization.codigo}: {movimientos} movimientos')
+
+        self.stdout.write(self.style.SUCCESS('Libro de prestaciones reconstruido'))
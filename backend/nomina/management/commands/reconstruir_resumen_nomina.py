@@ -0,0 +1,44 @@
+"""
+Management Command: reconstruir_resumen_nomina
+==============================================
+
+Recalcula desde cero el resumen materializado por período
+(``ResumenPeriodoNomina``) a partir de las nóminas y sus líneas.
+
+Útil después de editar líneas de conceptos a mano o de cargas masivas
+que no pasaron por el cálculo de nómina.
+
+Uso:
+    python manage.py reconstruir_resumen_nomina
+    python manage.py reconstruir_resumen_nomina --organization CORTESEC
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Organizacion
+from nomina.resumen_periodo import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen de nómina por período'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            default=None,
+            help='Código de la organización (por defecto todas)'
+        )
+
+    def handle(self, *args, **options):
+        organizaciones = Organizacion.objects.all()
+        if options['organization']:
+            organizaciones = organizaciones.filter(codigo=options['organization'])
+            if not organizaciones.exists():
+                raise CommandError(f"Organización {options['organization']} no encontrada")
+
+        for organization in organizaciones:
+            filas = reconstruir_resumen(organization)
+            self.stdout.write(f'{organization.codigo}: {filas} períodos')
+
+        self.stdout.write(self.style.SUCCESS('Resumen de nómina reconstruido'))
@@ -0,0 +1,107 @@
+# Generated by Django 4.2 on 2026-10-18 10:00
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0013_secuenciadocumento"),
+        ("dashboard", "0004_activeproject_asignacionproyecto_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("nomina", "0015_contrato_proyecto_nominasimple_proyecto"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrabajoCalculoNomina",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("periodo_inicio", models.DateField(verbose_name="Inicio del Período")),
+                ("periodo_fin", models.DateField(verbose_name="Fin del Período")),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("pendiente", "Pendiente"),
+                            ("en_proceso", "En proceso"),
+                            ("completado", "Completado"),
+                            ("completado_con_errores", "Completado con errores"),
+                            ("fallido", "Fallido"),
+                        ],
+                        default="pendiente",
+                        max_length=25,
+                        verbose_name="Estado",
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(default=0, verbose_name="Total de Nóminas")),
+                ("procesadas", models.PositiveIntegerField(default=0, verbose_name="Nóminas Procesadas")),
+                ("calculadas", models.PositiveIntegerField(default=0, verbose_name="Nóminas Calculadas")),
+                ("total_bloques", models.PositiveIntegerField(default=0, verbose_name="Total de Bloques")),
+                (
+                    "bloques_completados",
+                    models.PositiveIntegerField(default=0, verbose_name="Bloques Completados"),
+                ),
+                ("errores", models.JSONField(blank=True, default=list, verbose_name="Errores")),
+                ("iniciado_at", models.DateTimeField(blank=True, null=True, verbose_name="Iniciado")),
+                ("finalizado_at", models.DateTimeField(blank=True, null=True, verbose_name="Finalizado")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "creado_por",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="trabajos_calculo_nomina",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Creado por",
+                    ),
+                ),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Organización a la que pertenece este registro",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="core.organizacion",
+                    ),
+                ),
+                (
+                    "proyecto",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="trabajos_calculo_nomina",
+                        to="dashboard.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Trabajo de Cálculo de Nómina",
+                "verbose_name_plural": "Trabajos de Cálculo de Nómina",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["organization", "estado"],
+                        name="nomina_trab_organiz_c7684c_idx",
+                    )
+                ],
+            },
+        ),
+    ]
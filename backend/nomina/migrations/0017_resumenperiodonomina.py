@@ -0,0 +1,115 @@
+# Generated by Django 4.2 on 2026-10-18 11:00
+
+import uuid
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _decimal(**kwargs):
+    return models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=16, **kwargs)
+
+
+def reconstruir_resumenes(apps, schema_editor):
+    """Carga inicial del resumen a partir de las nóminas existentes."""
+    from nomina.resumen_periodo import reconstruir_resumen
+
+    NominaSimple = apps.get_model("nomina", "NominaSimple")
+    for organization_id in NominaSimple.objects.exclude(
+        organization__isnull=True
+    ).values_list("organization_id", flat=True).distinct():
+        reconstruir_resumen(
+            organization_id,
+            modelos=(
+                apps.get_model("nomina", "ResumenPeriodoNomina"),
+                NominaSimple,
+                apps.get_model("nomina", "NominaConcepto"),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0013_secuenciadocumento"),
+        ("dashboard", "0004_activeproject_asignacionproyecto_and_more"),
+        ("nomina", "0016_trabajocalculonomina"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumenPeriodoNomina",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("periodo_inicio", models.DateField(verbose_name="Inicio del Período")),
+                ("periodo_fin", models.DateField(verbose_name="Fin del Período")),
+                ("nominas", models.IntegerField(default=0, verbose_name="Nóminas (no anuladas)")),
+                ("anuladas", models.IntegerField(default=0, verbose_name="Nóminas Anuladas")),
+                ("total_devengado", _decimal()),
+                ("total_deducciones", _decimal()),
+                ("total_prestamos", _decimal()),
+                ("total_pagar", _decimal()),
+                ("aporte_salud_empleador", _decimal()),
+                ("aporte_pension_empleador", _decimal()),
+                ("aporte_arl", _decimal()),
+                ("aporte_caja", _decimal()),
+                ("aporte_sena", _decimal()),
+                ("aporte_icbf", _decimal()),
+                ("costo_total_empleador", _decimal()),
+                ("por_estado", models.JSONField(blank=True, default=dict, verbose_name="Totales por Estado")),
+                ("conceptos", models.JSONField(blank=True, default=dict, verbose_name="Totales por Concepto")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Organización a la que pertenece este registro",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="core.organizacion",
+                    ),
+                ),
+                (
+                    "proyecto",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="resumenes_nomina",
+                        to="dashboard.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Resumen de Nómina por Período",
+                "verbose_name_plural": "Resúmenes de Nómina por Período",
+                "ordering": ["-periodo_fin"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="resumenperiodonomina",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "periodo_inicio", "periodo_fin", "proyecto"),
+                name="uniq_resumen_nomina_periodo_proyecto",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="resumenperiodonomina",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("proyecto__isnull", True)),
+                fields=("organization", "periodo_inicio", "periodo_fin"),
+                name="uniq_resumen_nomina_periodo_sin_proyecto",
+            ),
+        ),
+        migrations.RunPython(reconstruir_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("nomina", "0017_resumenperiodonomina"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nominasimple",
+            name="huella_calculo",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="Hash de las entradas del último cálculo (ver CalculadorNomina.huella_entradas)",
+                max_length=64,
+                verbose_name="Huella del Cálculo",
+            ),
+        ),
+    ]
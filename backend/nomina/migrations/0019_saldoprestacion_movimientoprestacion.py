@@ -0,0 +1,188 @@
+# Generated by Django 4.2 on 2026-10-18 13:00
+
+import uuid
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+CONCEPTOS_PRESTACION = [
+    ("cesantias", "Cesantías"),
+    ("intereses_cesantias", "Intereses sobre Cesantías"),
+    ("prima", "Prima de Servicios"),
+    ("vacaciones", "Vacaciones"),
+]
+
+
+def _organization():
+    return models.ForeignKey(
+        blank=True,
+        help_text="Organización a la que pertenece este registro",
+        null=True,
+        on_delete=django.db.models.deletion.CASCADE,
+        related_name="%(app_label)s_%(class)s_set",
+        to="core.organizacion",
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0013_secuenciadocumento"),
+        ("nomina", "0018_nominasimple_huella_calculo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SaldoPrestacion",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "concepto",
+                    models.CharField(
+                        choices=CONCEPTOS_PRESTACION, max_length=30, verbose_name="Prestación"
+                    ),
+                ),
+                ("saldo", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=14)),
+                (
+                    "causado",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14, verbose_name="Total Causado"
+                    ),
+                ),
+                (
+                    "pagado",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14, verbose_name="Total Pagado"
+                    ),
+                ),
+                ("movimientos", models.IntegerField(default=0, verbose_name="Movimientos Asentados")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("organization", _organization()),
+                (
+                    "empleado",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="saldos_prestaciones",
+                        to="nomina.empleado",
+                        verbose_name="Empleado",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Saldo de Prestación",
+                "verbose_name_plural": "Saldos de Prestaciones",
+                "ordering": ["empleado", "concepto"],
+            },
+        ),
+        migrations.CreateModel(
+            name="MovimientoPrestacion",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "concepto",
+                    models.CharField(
+                        choices=CONCEPTOS_PRESTACION, max_length=30, verbose_name="Prestación"
+                    ),
+                ),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("causacion", "Causación"), ("pago", "Pago"), ("reverso", "Reverso")],
+                        max_length=20,
+                        verbose_name="Tipo",
+                    ),
+                ),
+                ("fecha", models.DateField(verbose_name="Fecha")),
+                ("base", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=14)),
+                ("valor", models.DecimalField(decimal_places=2, max_digits=14, verbose_name="Valor")),
+                (
+                    "saldo",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=14, verbose_name="Saldo Después del Movimiento"
+                    ),
+                ),
+                ("secuencia", models.IntegerField(verbose_name="Secuencia")),
+                ("descripcion", models.CharField(blank=True, max_length=200, verbose_name="Descripción")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("organization", _organization()),
+                (
+                    "empleado",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movimientos_prestaciones",
+                        to="nomina.empleado",
+                        verbose_name="Empleado",
+                    ),
+                ),
+                (
+                    "contrato",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="movimientos_prestaciones",
+                        to="nomina.contrato",
+                        verbose_name="Contrato",
+                    ),
+                ),
+                (
+                    "nomina",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="movimientos_prestaciones",
+                        to="nomina.nominasimple",
+                        verbose_name="Nómina",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Movimiento de Prestación",
+                "verbose_name_plural": "Movimientos de Prestaciones",
+                "ordering": ["empleado", "concepto", "secuencia"],
+                "indexes": [
+                    models.Index(
+                        fields=["organization", "empleado", "concepto", "fecha"],
+                        name="nomina_movi_organiz_62117f_idx",
+                    ),
+                    models.Index(
+                        fields=["organization", "concepto", "fecha"],
+                        name="nomina_movi_organiz_15b294_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="saldoprestacion",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "empleado", "concepto"),
+                name="uniq_saldo_prestacion_empleado_concepto",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="movimientoprestacion",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("nomina__isnull", False)),
+                fields=("nomina", "concepto", "tipo"),
+                name="uniq_movimiento_prestacion_nomina",
+            ),
+        ),
+    ]
@@ -0,0 +1,235 @@
+# Generated by Django 4.2 on 2026-10-18 14:00
+
+import uuid
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _decimal(max_digits=12, **kwargs):
+    return models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=max_digits, **kwargs)
+
+
+def _organization():
+    return models.ForeignKey(
+        blank=True,
+        help_text="Organización a la que pertenece este registro",
+        null=True,
+        on_delete=django.db.models.deletion.CASCADE,
+        related_name="%(app_label)s_%(class)s_set",
+        to="core.organizacion",
+    )
+
+
+def _nomina(related_name):
+    return models.ForeignKey(
+        on_delete=django.db.models.deletion.CASCADE,
+        related_name=related_name,
+        to="nomina.nominasimple",
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0013_secuenciadocumento"),
+        ("items", "0001_initial"),
+        ("prestamos", "0003_prestamo_proyecto"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("nomina", "0019_saldoprestacion_movimientoprestacion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nominasimple",
+            name="cerrada",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="El detalle está archivado y la nómina se sirve desde su snapshot",
+                verbose_name="Período Cerrado",
+            ),
+        ),
+        migrations.CreateModel(
+            name="CierrePeriodoNomina",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("periodo_inicio", models.DateField(verbose_name="Inicio del Período")),
+                ("periodo_fin", models.DateField(verbose_name="Fin del Período")),
+                ("nominas", models.IntegerField(default=0, verbose_name="Nóminas Cerradas")),
+                ("total_pagar", _decimal(16)),
+                ("costo_total_empleador", _decimal(16)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("organization", _organization()),
+                (
+                    "cerrado_por",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="cierres_nomina",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Cerrado por",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cierre de Período de Nómina",
+                "verbose_name_plural": "Cierres de Período de Nómina",
+                "ordering": ["-periodo_fin"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cierreperiodonomina",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "periodo_inicio", "periodo_fin"),
+                name="uniq_cierre_nomina_periodo",
+            ),
+        ),
+        migrations.CreateModel(
+            name="SnapshotNomina",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("numero", models.CharField(max_length=20, verbose_name="Número")),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("borrador", "Borrador"),
+                            ("calculada", "Calculada"),
+                            ("aprobada", "Aprobada"),
+                            ("pagada", "Pagada"),
+                            ("anulada", "Anulada"),
+                        ],
+                        max_length=20,
+                        verbose_name="Estado",
+                    ),
+                ),
+                ("periodo_inicio", models.DateField(verbose_name="Inicio del Período")),
+                ("periodo_fin", models.DateField(verbose_name="Fin del Período")),
+                ("fecha_pago", models.DateField(blank=True, null=True, verbose_name="Fecha de Pago")),
+                ("empleado_nombre", models.CharField(max_length=200, verbose_name="Empleado")),
+                ("empleado_documento", models.CharField(max_length=20, verbose_name="Documento")),
+                ("tipo_contrato", models.CharField(max_length=100, verbose_name="Tipo de Contrato")),
+                ("salario_base", _decimal()),
+                ("total_devengado", _decimal()),
+                ("total_deducciones", _decimal()),
+                ("total_prestamos", _decimal()),
+                ("total_pagar", _decimal()),
+                ("costo_total_empleador", _decimal()),
+                ("conceptos", models.JSONField(blank=True, default=list, verbose_name="Conceptos")),
+                ("items", models.JSONField(blank=True, default=list, verbose_name="Items de Trabajo")),
+                ("prestamos", models.JSONField(blank=True, default=list, verbose_name="Descuentos de Préstamos")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("organization", _organization()),
+                (
+                    "cierre",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="nomina.cierreperiodonomina",
+                        verbose_name="Cierre",
+                    ),
+                ),
+                (
+                    "nomina",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshot",
+                        to="nomina.nominasimple",
+                        verbose_name="Nómina",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Snapshot de Nómina",
+                "verbose_name_plural": "Snapshots de Nómina",
+                "ordering": ["-periodo_fin", "numero"],
+            },
+        ),
+        migrations.CreateModel(
+            name="NominaItemArchivo",
+            fields=[
+                ("id", models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ("cantidad", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("valor_unitario", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("valor_total", _decimal()),
+                ("observaciones", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("organization", _organization()),
+                ("nomina", _nomina("items_archivados")),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="nomina_items_archivados",
+                        to="items.item",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Item de Nómina (Archivo)",
+                "verbose_name_plural": "Items de Nómina (Archivo)",
+            },
+        ),
+        migrations.CreateModel(
+            name="NominaConceptoArchivo",
+            fields=[
+                ("id", models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ("base", _decimal()),
+                ("porcentaje_aplicado", models.DecimalField(decimal_places=3, default=Decimal("0.000"), max_digits=6)),
+                ("valor", _decimal()),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("DEVENGADO", "Devengado"), ("DEDUCCION", "Deducción")],
+                        max_length=10,
+                    ),
+                ),
+                ("observaciones", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("organization", _organization()),
+                ("nomina", _nomina("conceptos_archivados")),
+                (
+                    "concepto",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="nomina_conceptos_archivados",
+                        to="nomina.conceptolaboral",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Concepto de Nómina (Archivo)",
+                "verbose_name_plural": "Conceptos de Nómina (Archivo)",
+            },
+        ),
+        migrations.CreateModel(
+            name="NominaPrestamoArchivo",
+            fields=[
+                ("id", models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ("valor_cuota", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("numero_cuota", models.PositiveIntegerField(default=1)),
+                ("observaciones", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("organization", _organization()),
+                ("nomina", _nomina("prestamos_archivados")),
+                (
+                    "prestamo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="descuentos_nomina_archivados",
+                        to="prestamos.prestamo",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Descuento de Préstamo (Archivo)",
+                "verbose_name_plural": "Descuentos de Préstamos (Archivo)",
+            },
+        ),
+    ]
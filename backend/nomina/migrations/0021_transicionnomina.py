@@ -0,0 +1,105 @@
+# Generated by Django 4.2 on 2026-10-18 15:00
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0013_secuenciadocumento"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("nomina", "0020_cierre_periodo_nomina"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransicionNomina",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "accion",
+                    models.CharField(
+                        choices=[
+                            ("calcular", "Calcular"),
+                            ("aprobar", "Aprobar"),
+                            ("pagar", "Pagar"),
+                            ("anular", "Anular"),
+                        ],
+                        max_length=20,
+                        verbose_name="Acción",
+                    ),
+                ),
+                ("clave", models.CharField(max_length=255, verbose_name="Clave de Idempotencia")),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[("en_proceso", "En Proceso"), ("completada", "Completada")],
+                        default="en_proceso",
+                        max_length=20,
+                        verbose_name="Estado",
+                    ),
+                ),
+                (
+                    "codigo_respuesta",
+                    models.PositiveSmallIntegerField(blank=True, null=True, verbose_name="Código HTTP"),
+                ),
+                ("respuesta", models.JSONField(blank=True, null=True, verbose_name="Respuesta")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("completada_at", models.DateTimeField(blank=True, null=True, verbose_name="Completada")),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Organización a la que pertenece este registro",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="core.organizacion",
+                    ),
+                ),
+                (
+                    "nomina",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="transiciones",
+                        to="nomina.nominasimple",
+                        verbose_name="Nómina",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="transiciones_nomina",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Usuario",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Transición de Nómina",
+                "verbose_name_plural": "Transiciones de Nómina",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="transicionnomina",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "clave"),
+                name="uniq_transicion_nomina_clave",
+            ),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2 on 2026-10-18 16:00
+
+import uuid
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _decimal(**kwargs):
+    return models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=16, **kwargs)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0013_secuenciadocumento"),
+        ("nomina", "0021_transicionnomina"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nominasimple",
+            name="anio_certificado",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Año del acumulado de ingresos y retenciones en que se sumó la nómina pagada",
+                null=True,
+                verbose_name="Año del Certificado",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AcumuladoCertificado",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("anio", models.PositiveSmallIntegerField(verbose_name="Año Gravable")),
+                ("pagos_salariales", _decimal(verbose_name="Pagos por Salarios")),
+                ("otros_pagos", _decimal(help_text="Auxilio de transporte", verbose_name="Otros Pagos")),
+                ("ingresos_brutos", _decimal(verbose_name="Total Ingresos Brutos")),
+                ("aportes_salud", _decimal(verbose_name="Aportes Obligatorios a Salud")),
+                ("aportes_pension", _decimal(verbose_name="Aportes Obligatorios a Pensión y Solidaridad")),
+                (
+                    "rentas_exentas",
+                    _decimal(
+                        help_text="25% de los pagos laborales netos de aportes, antes del límite anual",
+                        verbose_name="Renta Exenta Laboral",
+                    ),
+                ),
+                ("retencion_fuente", _decimal(verbose_name="Retención en la Fuente")),
+                ("nominas", models.IntegerField(default=0, verbose_name="Nóminas Acumuladas")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Organización a la que pertenece este registro",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="core.organizacion",
+                    ),
+                ),
+                (
+                    "empleado",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="acumulados_certificado",
+                        to="nomina.empleado",
+                        verbose_name="Empleado",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Acumulado de Certificado de Ingresos",
+                "verbose_name_plural": "Acumulados de Certificados de Ingresos",
+                "ordering": ["-anio", "empleado"],
+                "indexes": [
+                    models.Index(fields=["organization", "anio"], name="nomina_acum_organiz_060c8e_idx"),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="acumuladocertificado",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "empleado", "anio"),
+                name="uniq_acumulado_certificado_empleado_anio",
+            ),
+        ),
+    ]
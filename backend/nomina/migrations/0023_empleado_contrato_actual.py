@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def poblar_contrato_actual(apps, schema_editor):
+    """Apunta cada empleado a su contrato activo más reciente."""
+    Empleado = apps.get_model("nomina", "Empleado")
+    Contrato = apps.get_model("nomina", "Contrato")
+
+    vigente = Contrato.objects.filter(
+        empleado_id=OuterRef("pk"), activo=True
+    ).order_by("-fecha_inicio", "-created_at")
+    Empleado.objects.update(
+        contrato_actual=Subquery(vigente.values("pk")[:1]),
+        cargo_actual=Subquery(vigente.values("cargo_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cargos", "0007_remove_dead_fields_from_cargo"),
+        ("nomina", "0022_acumuladocertificado"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="empleado",
+            name="contrato_actual",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="nomina.contrato",
+                verbose_name="Contrato Actual",
+            ),
+        ),
+        migrations.AddField(
+            model_name="empleado",
+            name="cargo_actual",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="cargos.cargo",
+                verbose_name="Cargo Actual",
+            ),
+        ),
+        migrations.RunPython(poblar_contrato_actual, migrations.RunPython.noop),
+    ]
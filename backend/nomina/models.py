@@ -16,7 +16,8 @@ Versión: 1.0.0
 Fecha: Enero 2026
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Round
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator, FileExtensionValidator
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
@@ -25,7 +26,7 @@ from django.conf import settings
 from decimal import Decimal, ROUND_HALF_UP
 import uuid
 
-from core.mixins import TenantAwareModel
+from core.mixins import TenantAwareModel, TenantManager, TenantQuerySet
 from locations.models import Departamento, Municipio
 from cargos.models import Cargo
 
@@ -34,6 +35,25 @@ from cargos.models import Cargo
 # MODELO: EMPLEADO
 # ══════════════════════════════════════════════════════════════════════════════
 
+class EmpleadoQuerySet(TenantQuerySet):
+    """QuerySet de empleados."""
+
+    def con_contrato_actual(self):
+        """
+        Trae en el mismo JOIN el contrato vigente (con tipo y cargo), el
+        cargo actual y el usuario vinculado: lo que muestran los
+        serializers de empleado, sin consultas por fila.
+        """
+        return self.select_related(
+            'contrato_actual__tipo_contrato',
+            'contrato_actual__cargo',
+            'cargo_actual',
+            'usuario',
+            'departamento',
+            'ciudad',
+        )
+
+
 class Empleado(TenantAwareModel):
     """
     Empleado de la empresa.
@@ -186,10 +206,32 @@ class Empleado(TenantAwareModel):
     # Observaciones
     observaciones = models.TextField(blank=True, verbose_name='Observaciones')
     
+    # Contrato vigente (desnormalizado: lo mantienen Contrato.save y signals)
+    contrato_actual = models.ForeignKey(
+        'Contrato',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name='Contrato Actual'
+    )
+    cargo_actual = models.ForeignKey(
+        Cargo,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name='Cargo Actual'
+    )
+    
     # Auditoría
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager.from_queryset(EmpleadoQuerySet)()
+    
     class Meta:
         verbose_name = 'Empleado'
         verbose_name_plural = 'Empleados'
@@ -212,8 +254,24 @@ class Empleado(TenantAwareModel):
     
     @property
     def contrato_activo(self):
-        """Retorna el contrato activo del empleado"""
-        return self.contratos.filter(activo=True).first()
+        """Retorna el contrato activo del empleado (``contrato_actual``)"""
+        return self.contrato_actual
+    
+    @classmethod
+    def sincronizar_contrato_actual(cls, empleado_ids):
+        """
+        Recalcula ``contrato_actual`` y ``cargo_actual`` de los empleados
+        con un solo UPDATE: el contrato activo más reciente de cada uno.
+        """
+        from django.db.models import OuterRef, Subquery
+
+        vigente = Contrato._base_manager.filter(
+            empleado_id=OuterRef('pk'), activo=True
+        ).order_by('-fecha_inicio', '-created_at')
+        cls._base_manager.filter(pk__in=empleado_ids).update(
+            contrato_actual=Subquery(vigente.values('pk')[:1]),
+            cargo_actual=Subquery(vigente.values('cargo_id')[:1]),
+        )
     
     @property
     def perfil(self):
@@ -456,19 +514,24 @@ class Contrato(TenantAwareModel):
     def save(self, *args, **kwargs):
         # Si este contrato se marca como activo, desactivar otros del mismo empleado
         if self.activo:
-            Contrato.objects.filter(
-                organization=self.organization,
+            Contrato.objects.for_tenant(self.organization).filter(
                 empleado=self.empleado,
                 activo=True
             ).exclude(pk=self.pk).update(activo=False)
         
         super().save(*args, **kwargs)
+        Empleado.sincronizar_contrato_actual([self.empleado_id])
     
     @property
     def ibc(self):
         """Calcula el Ingreso Base de Cotización según el tipo de contrato"""
-        porcentaje = self.tipo_contrato.ibc_porcentaje / Decimal('100')
-        return (self.salario * porcentaje).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return self.calcular_ibc(self.salario, self.tipo_contrato.ibc_porcentaje)
+
+    @staticmethod
+    def calcular_ibc(salario, ibc_porcentaje):
+        """IBC a partir de valores sueltos (consultas con ``values()``)."""
+        porcentaje = ibc_porcentaje / Decimal('100')
+        return (salario * porcentaje).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -629,17 +692,13 @@ class ParametroLegal(TenantAwareModel):
         Returns:
             ParametroLegal o None
         """
+        from .cache_normativa import obtener_snapshot
+        
         if fecha is None:
             fecha = timezone.now().date()
         
-        return cls.objects.filter(
-            organization=organization,
-            concepto=concepto,
-            activo=True,
-            vigente_desde__lte=fecha
-        ).filter(
-            models.Q(vigente_hasta__isnull=True) | models.Q(vigente_hasta__gte=fecha)
-        ).order_by('-vigente_desde').first()
+        # Resuelto en memoria con la caché versionada de normativa
+        return obtener_snapshot(organization).parametro(concepto, fecha)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -783,6 +842,187 @@ class ConceptoLaboral(TenantAwareModel):
 # MODELO: NÓMINA SIMPLE
 # ══════════════════════════════════════════════════════════════════════════════
 
+class NominaSimpleQuerySet(TenantQuerySet):
+    """
+    QuerySet de nóminas con el costo del empleador calculado en SQL.
+
+    ``con_costos()`` anota por fila:
+    - ``aportes_empleador``: seguridad social y parafiscales a cargo del empleador
+    - ``costo_empleador``: devengado + aportes (= ``costo_total_empleador``)
+    - ``provisiones_empleador``: provisiones de prestaciones sociales con las
+      reglas de ``calcular_provisiones`` (parámetro vigente al fin del período,
+      solo contratos laborales)
+    - ``costo_empleador_con_provisiones``
+
+    Así se puede filtrar, ordenar y agregar por costo sin cargar las filas.
+    """
+
+    CAMPOS_APORTES_EMPLEADOR = [
+        'aporte_salud_empleador',
+        'aporte_pension_empleador',
+        'aporte_arl',
+        'aporte_caja',
+        'aporte_sena',
+        'aporte_icbf',
+    ]
+
+    @staticmethod
+    def _decimal(expresion):
+        return models.ExpressionWrapper(
+            expresion, output_field=models.DecimalField(max_digits=16, decimal_places=2)
+        )
+
+    @staticmethod
+    def _auxilio_transporte(nomina):
+        """Subconsulta: auxilio de transporte de la nómina (líneas de trabajo o archivo)."""
+        from .prestaciones import CODIGOS_AUXILIO
+
+        def suma(modelo):
+            return models.Subquery(
+                modelo._base_manager.filter(
+                    nomina=nomina,
+                    concepto__codigo__in=CODIGOS_AUXILIO,
+                    tipo='DEVENGADO',
+                ).order_by().values('nomina').annotate(total=models.Sum('valor')).values('total')[:1],
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+
+        return Coalesce(
+            suma(NominaConcepto), suma(NominaConceptoArchivo), models.Value(Decimal('0.00'))
+        )
+
+    @staticmethod
+    def _devengado_base():
+        """Devengado antes de conceptos: mismas reglas que NominaSimple.calcular_devengado_base."""
+        return models.Case(
+            models.When(total_items=0, then=models.F('salario_base')),
+            models.When(incluir_salario_base=True, then=models.F('salario_base') + models.F('total_items')),
+            default=models.F('total_items'),
+            output_field=models.DecimalField(max_digits=16, decimal_places=2),
+        )
+
+    def _provisiones(self):
+        """
+        Subconsulta: suma de provisiones de la nómina.
+
+        Recorre en una sola consulta los parámetros de ``PROVISIONES``
+        vigentes al fin del período (el más reciente por concepto), de modo
+        que el auxilio de transporte y los porcentajes aparecen una sola vez
+        en el SQL. La base se toma del alias ``devengado_base_costos``.
+        """
+        from .services import PROVISIONES
+
+        cero = models.Value(Decimal('0.00'))
+        periodo_fin = models.OuterRef('periodo_fin')
+        vigentes = ParametroLegal._base_manager.filter(
+            concepto__in=[codigo for codigo, con_auxilio in PROVISIONES.values()],
+            activo=True,
+        )
+        posterior = vigentes.filter(
+            organization=models.OuterRef('organization'),
+            concepto=models.OuterRef('concepto'),
+            vigente_desde__lte=models.OuterRef(periodo_fin),
+        ).filter(
+            models.Q(vigente_hasta__isnull=True) |
+            models.Q(vigente_hasta__gte=models.OuterRef(periodo_fin))
+        ).filter(
+            models.Q(vigente_desde__gt=models.OuterRef('vigente_desde')) |
+            models.Q(vigente_desde=models.OuterRef('vigente_desde'), pk__gt=models.OuterRef('pk'))
+        )
+        base = models.OuterRef('devengado_base_costos') + models.Case(
+            models.When(
+                concepto__in=[codigo for codigo, con_auxilio in PROVISIONES.values() if con_auxilio],
+                then=self._auxilio_transporte(models.OuterRef(models.OuterRef('pk'))),
+            ),
+            default=cero,
+            output_field=models.DecimalField(max_digits=16, decimal_places=2),
+        )
+        provision = Round(
+            self._decimal(base * models.F('porcentaje_empleador') / models.Value(Decimal('100'))), 2
+        )
+        total = vigentes.filter(
+            organization=models.OuterRef('organization'),
+            vigente_desde__lte=periodo_fin,
+        ).filter(
+            models.Q(vigente_hasta__isnull=True) | models.Q(vigente_hasta__gte=periodo_fin)
+        ).filter(
+            ~models.Exists(posterior)
+        ).order_by().values('organization').annotate(
+            total=models.Sum(self._decimal(provision))
+        ).values('total')[:1]
+        return models.Case(
+            models.When(
+                contrato__tipo_contrato__aplica_parafiscales=True,
+                # Sin parámetros vigentes la provisión no aplica
+                then=Coalesce(
+                    models.Subquery(total, output_field=models.DecimalField(max_digits=16, decimal_places=2)),
+                    cero,
+                ),
+            ),
+            default=cero,
+            output_field=models.DecimalField(max_digits=16, decimal_places=2),
+        )
+
+    def _expresiones_costos(self, provisiones=True) -> dict:
+        """
+        Expresiones de costo por nombre de anotación.
+
+        Las provisiones requieren el alias ``devengado_base_costos``
+        (ver ``_con_devengado_base``).
+        """
+        cero = models.Value(Decimal('0.00'))
+        aportes = cero
+        for campo in self.CAMPOS_APORTES_EMPLEADOR:
+            aportes = aportes + models.F(campo)
+        costo = models.F('total_devengado') + aportes
+        expresiones = {
+            'aportes_empleador': self._decimal(aportes),
+            'costo_empleador': self._decimal(costo),
+        }
+        if not provisiones:
+            return expresiones
+
+        total_provisiones = self._provisiones()
+        expresiones['provisiones_empleador'] = self._decimal(total_provisiones)
+        expresiones['costo_empleador_con_provisiones'] = self._decimal(costo + total_provisiones)
+        return expresiones
+
+    def _con_devengado_base(self):
+        if 'devengado_base_costos' in self.query.annotations:
+            return self
+        return self.alias(devengado_base_costos=self._devengado_base())
+
+    def con_costos(self, provisiones=True):
+        """Anota aportes y costo del empleador (y provisiones si ``provisiones``)."""
+        # Idempotente: un queryset ya anotado (p. ej. el del ViewSet) se reutiliza
+        anotadas = self.query.annotations
+        if 'costo_empleador' in anotadas and (not provisiones or 'provisiones_empleador' in anotadas):
+            return self
+        queryset = self._con_devengado_base() if provisiones else self
+        return queryset.annotate(**{
+            nombre: expresion
+            for nombre, expresion in self._expresiones_costos(provisiones).items()
+            if nombre not in anotadas
+        })
+
+    def totales_costos(self) -> dict:
+        """Totales de costo del empleador y provisiones del queryset en una consulta."""
+        campos = ['aportes_empleador', 'costo_empleador', 'provisiones_empleador',
+                  'costo_empleador_con_provisiones']
+        # Se anota de nuevo sobre las filas (no sobre anotaciones del queryset
+        # original) y se agrega sobre esa subconsulta: cada costo se calcula
+        # una vez por nómina
+        nominas = type(self)(self.model, using=self._db).filter(
+            pk__in=self.order_by().values('pk')
+        ).con_costos()
+        # Alias distintos de las anotaciones, que el agregado no debe reemplazar
+        totales = nominas.aggregate(**{
+            f'total_{campo}': models.Sum(campo, default=Decimal('0.00'))
+            for campo in campos
+        })
+        return {campo: totales[f'total_{campo}'] for campo in campos}
+
+
 class NominaSimple(TenantAwareModel):
     """
     Modelo principal de la nómina.
@@ -1005,6 +1245,30 @@ class NominaSimple(TenantAwareModel):
         blank=True,
         verbose_name='Fecha de Cálculo'
     )
+    huella_calculo = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Huella del Cálculo',
+        help_text='Hash de las entradas del último cálculo (ver CalculadorNomina.huella_entradas)'
+    )
+    cerrada = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Período Cerrado',
+        help_text='El detalle está archivado y la nómina se sirve desde su snapshot'
+    )
+    anio_certificado = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Año del Certificado',
+        help_text='Año del acumulado de ingresos y retenciones en que se sumó la nómina pagada'
+    )
+    
+    # Manager con filtrado por tenant y anotaciones de costo (con_costos)
+    objects = TenantManager.from_queryset(NominaSimpleQuerySet)()
     
     class Meta:
         verbose_name = 'Nómina'
@@ -1029,6 +1293,43 @@ class NominaSimple(TenantAwareModel):
                 'periodo_fin': 'El fin del período debe ser posterior al inicio'
             })
     
+    def save(self, *args, **kwargs):
+        """
+        Asigna el número si no existe. Formato: NOM-YYYY-NNNNNN
+
+        El consecutivo sale de la secuencia de la organización para el año
+        (``core.secuencias``) dentro de la misma transacción que el INSERT:
+        si el guardado falla, el número no se consume. Los procesos por
+        lotes pueden reservar un bloque y asignar ``numero`` antes de guardar.
+        """
+        if self.numero:
+            return super().save(*args, **kwargs)
+        
+        from datetime import datetime
+        from core.secuencias import siguiente_numero, ultimo_consecutivo
+        
+        year = datetime.now().year
+        prefix = f"NOM-{year}-"
+        
+        def semilla():
+            return ultimo_consecutivo(
+                NominaSimple.objects.all_tenants().filter(
+                    organization_id=self.organization_id,
+                    numero__startswith=prefix
+                ).values_list('numero', flat=True),
+                prefix
+            )
+        
+        try:
+            with transaction.atomic():
+                consecutivo = siguiente_numero(self.organization_id, 'NOM', anio=year, semilla=semilla)
+                self.numero = f"{prefix}{consecutivo:06d}"
+                super().save(*args, **kwargs)
+        except Exception:
+            # El número revertido no queda asignado a la instancia
+            self.numero = ''
+            raise
+    
     @property
     def empleado(self):
         """Acceso directo al empleado"""
@@ -1046,6 +1347,15 @@ class NominaSimple(TenantAwareModel):
             self.aporte_sena +
             self.aporte_icbf
         )
+    
+    @staticmethod
+    def calcular_devengado_base(salario_base, total_items, incluir_salario_base):
+        """Devengado antes de conceptos: salario, producción (items) o ambos."""
+        if not total_items:
+            return salario_base
+        if incluir_salario_base:
+            return salario_base + total_items
+        return total_items
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1251,3 +1561,634 @@ class NominaPrestamo(TenantAwareModel):
     
     def __str__(self):
         return f"Préstamo {self.prestamo_id} - Cuota {self.numero_cuota}: ${self.valor_cuota}"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MODELO: TRABAJO DE CÁLCULO DE NÓMINA (SEGUNDO PLANO)
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TrabajoCalculoNomina(TenantAwareModel):
+    """
+    Cálculo de un período ejecutado en segundo plano (Celery).
+    
+    Las nóminas se dividen en bloques que se calculan en paralelo; cada
+    bloque suma su avance aquí y lo publica al grupo WebSocket del trabajo
+    (``ws/nomina/trabajos/<id>/``).
+    """
+    
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+        ('completado_con_errores', 'Completado con errores'),
+        ('fallido', 'Fallido'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    periodo_inicio = models.DateField(verbose_name='Inicio del Período')
+    periodo_fin = models.DateField(verbose_name='Fin del Período')
+    proyecto = models.ForeignKey(
+        'dashboard.Project',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='trabajos_calculo_nomina',
+        verbose_name='Proyecto'
+    )
+    
+    estado = models.CharField(
+        max_length=25,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name='Estado'
+    )
+    
+    # Avance
+    total = models.PositiveIntegerField(default=0, verbose_name='Total de Nóminas')
+    procesadas = models.PositiveIntegerField(default=0, verbose_name='Nóminas Procesadas')
+    calculadas = models.PositiveIntegerField(default=0, verbose_name='Nóminas Calculadas')
+    total_bloques = models.PositiveIntegerField(default=0, verbose_name='Total de Bloques')
+    bloques_completados = models.PositiveIntegerField(default=0, verbose_name='Bloques Completados')
+    errores = models.JSONField(default=list, blank=True, verbose_name='Errores')
+    
+    iniciado_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado')
+    finalizado_at = models.DateTimeField(null=True, blank=True, verbose_name='Finalizado')
+    
+    # Auditoría
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='trabajos_calculo_nomina',
+        verbose_name='Creado por'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Trabajo de Cálculo de Nómina'
+        verbose_name_plural = 'Trabajos de Cálculo de Nómina'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', 'estado']),
+        ]
+    
+    def __str__(self):
+        return f"Cálculo {self.periodo_inicio} - {self.periodo_fin} ({self.get_estado_display()})"
+    
+    @property
+    def grupo_ws(self):
+        """Grupo de Channels al que se publica el avance."""
+        return f"nomina_trabajo_{self.id}"
+    
+    @property
+    def porcentaje(self):
+        if not self.total:
+            return 100 if self.finalizado_at else 0
+        return round(self.procesadas * 100 / self.total, 1)
+    
+    @property
+    def eta_segundos(self):
+        """Tiempo restante estimado según el ritmo observado hasta ahora."""
+        if self.finalizado_at:
+            return 0
+        if not self.iniciado_at or not self.procesadas:
+            return None
+        transcurrido = (timezone.now() - self.iniciado_at).total_seconds()
+        return round(transcurrido / self.procesadas * (self.total - self.procesadas))
+    
+    def progreso(self):
+        """Mensaje de avance que se envía por WebSocket."""
+        return {
+            'trabajo_id': str(self.id),
+            'estado': self.estado,
+            'total': self.total,
+            'procesadas': self.procesadas,
+            'calculadas': self.calculadas,
+            'porcentaje': self.porcentaje,
+            'eta_segundos': self.eta_segundos,
+            'errores': self.errores,
+        }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MODELO: RESUMEN MATERIALIZADO POR PERÍODO
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ResumenPeriodoNomina(TenantAwareModel):
+    """
+    Totales de nómina por organización, período y proyecto.
+    
+    Se actualiza por diferencias cada vez que una nómina se calcula,
+    aprueba, paga o anula (ver ``nomina/resumen_periodo.py``), de modo que
+    los tableros leen una fila por período en lugar de sumar nóminas y
+    líneas de conceptos.
+    
+    - Los totales incluyen todas las nóminas no anuladas.
+    - ``por_estado``: {estado: {'cantidad': n, 'total_pagar': 'valor'}}
+    - ``conceptos``: {código: {'nombre', 'tipo', 'valor'}}
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    periodo_inicio = models.DateField(verbose_name='Inicio del Período')
+    periodo_fin = models.DateField(verbose_name='Fin del Período')
+    proyecto = models.ForeignKey(
+        'dashboard.Project',
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='resumenes_nomina',
+        verbose_name='Proyecto'
+    )
+    
+    nominas = models.IntegerField(default=0, verbose_name='Nóminas (no anuladas)')
+    anuladas = models.IntegerField(default=0, verbose_name='Nóminas Anuladas')
+    
+    total_devengado = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    total_deducciones = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    total_prestamos = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    total_pagar = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    aporte_salud_empleador = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    aporte_pension_empleador = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    aporte_arl = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    aporte_caja = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    aporte_sena = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    aporte_icbf = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    costo_total_empleador = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    
+    por_estado = models.JSONField(default=dict, blank=True, verbose_name='Totales por Estado')
+    conceptos = models.JSONField(default=dict, blank=True, verbose_name='Totales por Concepto')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Resumen de Nómina por Período'
+        verbose_name_plural = 'Resúmenes de Nómina por Período'
+        ordering = ['-periodo_fin']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'periodo_inicio', 'periodo_fin', 'proyecto'],
+                name='uniq_resumen_nomina_periodo_proyecto',
+            ),
+            models.UniqueConstraint(
+                fields=['organization', 'periodo_inicio', 'periodo_fin'],
+                condition=models.Q(proyecto__isnull=True),
+                name='uniq_resumen_nomina_periodo_sin_proyecto',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Resumen {self.periodo_inicio} - {self.periodo_fin}: {self.nominas} nóminas"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MODELO: LIBRO DE PRESTACIONES SOCIALES
+# ══════════════════════════════════════════════════════════════════════════════
+
+CONCEPTOS_PRESTACION = [
+    ('cesantias', 'Cesantías'),
+    ('intereses_cesantias', 'Intereses sobre Cesantías'),
+    ('prima', 'Prima de Servicios'),
+    ('vacaciones', 'Vacaciones'),
+]
+
+
+class SaldoPrestacion(TenantAwareModel):
+    """
+    Saldo acumulado de una prestación social por empleado.
+    
+    Se actualiza al asentar cada movimiento del libro (ver
+    ``nomina/prestaciones.py``): la consulta del pasivo laboral lee una fila
+    por empleado y prestación en lugar de sumar todas las nóminas pagadas.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    empleado = models.ForeignKey(
+        Empleado,
+        on_delete=models.CASCADE,
+        related_name='saldos_prestaciones',
+        verbose_name='Empleado'
+    )
+    concepto = models.CharField(
+        max_length=30,
+        choices=CONCEPTOS_PRESTACION,
+        verbose_name='Prestación'
+    )
+    
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    causado = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Total Causado'
+    )
+    pagado = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Total Pagado'
+    )
+    movimientos = models.IntegerField(default=0, verbose_name='Movimientos Asentados')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Saldo de Prestación'
+        verbose_name_plural = 'Saldos de Prestaciones'
+        ordering = ['empleado', 'concepto']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'empleado', 'concepto'],
+                name='uniq_saldo_prestacion_empleado_concepto',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.empleado} - {self.get_concepto_display()}: {self.saldo}"
+
+
+class MovimientoPrestacion(TenantAwareModel):
+    """
+    Movimiento del libro de prestaciones (solo se agregan filas).
+    
+    - causacion: provisión de una nómina pagada (valor positivo)
+    - pago: liquidación o pago al empleado (valor negativo)
+    - reverso: anulación de una causación (valor negativo)
+    
+    ``saldo`` es el saldo del empleado en la prestación después del
+    movimiento, de modo que el saldo a una fecha es la última fila.
+    """
+    
+    TIPO_CHOICES = [
+        ('causacion', 'Causación'),
+        ('pago', 'Pago'),
+        ('reverso', 'Reverso'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    empleado = models.ForeignKey(
+        Empleado,
+        on_delete=models.CASCADE,
+        related_name='movimientos_prestaciones',
+        verbose_name='Empleado'
+    )
+    contrato = models.ForeignKey(
+        Contrato,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='movimientos_prestaciones',
+        verbose_name='Contrato'
+    )
+    nomina = models.ForeignKey(
+        'NominaSimple',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='movimientos_prestaciones',
+        verbose_name='Nómina'
+    )
+    
+    concepto = models.CharField(
+        max_length=30,
+        choices=CONCEPTOS_PRESTACION,
+        verbose_name='Prestación'
+    )
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo')
+    fecha = models.DateField(verbose_name='Fecha')
+    
+    base = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    valor = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valor')
+    saldo = models.DecimalField(
+        max_digits=14, decimal_places=2,
+        verbose_name='Saldo Después del Movimiento'
+    )
+    secuencia = models.IntegerField(verbose_name='Secuencia')
+    descripcion = models.CharField(max_length=200, blank=True, verbose_name='Descripción')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Movimiento de Prestación'
+        verbose_name_plural = 'Movimientos de Prestaciones'
+        ordering = ['empleado', 'concepto', 'secuencia']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['nomina', 'concepto', 'tipo'],
+                condition=models.Q(nomina__isnull=False),
+                name='uniq_movimiento_prestacion_nomina',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['organization', 'empleado', 'concepto', 'fecha']),
+            models.Index(fields=['organization', 'concepto', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.get_concepto_display()} {self.valor} ({self.fecha})"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MODELO: CIERRE DE PERÍODO Y ARCHIVO DE DETALLE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class CierrePeriodoNomina(TenantAwareModel):
+    """
+    Cierre de un período de nómina de la organización.
+    
+    Al cerrar (ver ``nomina/cierre_periodo.py``) cada nómina del período
+    queda congelada en un ``SnapshotNomina`` y sus líneas de detalle
+    (conceptos, items y préstamos) se mueven a las tablas de archivo, de
+    modo que las tablas de trabajo solo contienen los períodos abiertos.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    periodo_inicio = models.DateField(verbose_name='Inicio del Período')
+    periodo_fin = models.DateField(verbose_name='Fin del Período')
+    
+    nominas = models.IntegerField(default=0, verbose_name='Nóminas Cerradas')
+    total_pagar = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    costo_total_empleador = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    
+    cerrado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='cierres_nomina',
+        verbose_name='Cerrado por'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Cierre de Período de Nómina'
+        verbose_name_plural = 'Cierres de Período de Nómina'
+        ordering = ['-periodo_fin']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'periodo_inicio', 'periodo_fin'],
+                name='uniq_cierre_nomina_periodo',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Cierre {self.periodo_inicio} - {self.periodo_fin}: {self.nominas} nóminas"
+
+
+class SnapshotNomina(TenantAwareModel):
+    """
+    Nómina congelada al cerrar su período (una fila por nómina).
+    
+    Guarda desnormalizados los datos del empleado y del contrato tal como
+    estaban al cierre, los totales y las líneas de detalle en JSON con la
+    misma forma que sus serializers, para reproducir la nómina exactamente
+    sin leer las tablas de detalle.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    cierre = models.ForeignKey(
+        CierrePeriodoNomina,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name='Cierre'
+    )
+    nomina = models.OneToOneField(
+        NominaSimple,
+        on_delete=models.CASCADE,
+        related_name='snapshot',
+        verbose_name='Nómina'
+    )
+    
+    numero = models.CharField(max_length=20, verbose_name='Número')
+    estado = models.CharField(max_length=20, choices=NominaSimple.ESTADO_CHOICES, verbose_name='Estado')
+    periodo_inicio = models.DateField(verbose_name='Inicio del Período')
+    periodo_fin = models.DateField(verbose_name='Fin del Período')
+    fecha_pago = models.DateField(null=True, blank=True, verbose_name='Fecha de Pago')
+    
+    empleado_nombre = models.CharField(max_length=200, verbose_name='Empleado')
+    empleado_documento = models.CharField(max_length=20, verbose_name='Documento')
+    tipo_contrato = models.CharField(max_length=100, verbose_name='Tipo de Contrato')
+    
+    salario_base = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_devengado = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_deducciones = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_prestamos = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_pagar = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    costo_total_empleador = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    
+    conceptos = models.JSONField(default=list, blank=True, verbose_name='Conceptos')
+    items = models.JSONField(default=list, blank=True, verbose_name='Items de Trabajo')
+    prestamos = models.JSONField(default=list, blank=True, verbose_name='Descuentos de Préstamos')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Snapshot de Nómina'
+        verbose_name_plural = 'Snapshots de Nómina'
+        ordering = ['-periodo_fin', 'numero']
+    
+    def __str__(self):
+        return f"Snapshot {self.numero} - {self.empleado_nombre}"
+
+
+class NominaItemArchivo(TenantAwareModel):
+    """Items de trabajo de nóminas de períodos cerrados (mismas columnas que NominaItem)."""
+    
+    id = models.UUIDField(primary_key=True, editable=False)
+    nomina = models.ForeignKey(NominaSimple, on_delete=models.CASCADE, related_name='items_archivados')
+    item = models.ForeignKey('items.Item', on_delete=models.PROTECT, related_name='nomina_items_archivados')
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    valor_unitario = models.DecimalField(max_digits=12, decimal_places=2)
+    valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    observaciones = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Item de Nómina (Archivo)'
+        verbose_name_plural = 'Items de Nómina (Archivo)'
+
+
+class NominaConceptoArchivo(TenantAwareModel):
+    """Conceptos de nóminas de períodos cerrados (mismas columnas que NominaConcepto)."""
+    
+    id = models.UUIDField(primary_key=True, editable=False)
+    nomina = models.ForeignKey(NominaSimple, on_delete=models.CASCADE, related_name='conceptos_archivados')
+    concepto = models.ForeignKey(
+        ConceptoLaboral, on_delete=models.PROTECT, related_name='nomina_conceptos_archivados'
+    )
+    base = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    porcentaje_aplicado = models.DecimalField(max_digits=6, decimal_places=3, default=Decimal('0.000'))
+    valor = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    tipo = models.CharField(max_length=10, choices=ConceptoLaboral.TIPO_CHOICES)
+    observaciones = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Concepto de Nómina (Archivo)'
+        verbose_name_plural = 'Conceptos de Nómina (Archivo)'
+
+
+class NominaPrestamoArchivo(TenantAwareModel):
+    """Descuentos de préstamos de períodos cerrados (mismas columnas que NominaPrestamo)."""
+    
+    id = models.UUIDField(primary_key=True, editable=False)
+    nomina = models.ForeignKey(NominaSimple, on_delete=models.CASCADE, related_name='prestamos_archivados')
+    prestamo = models.ForeignKey(
+        'prestamos.Prestamo', on_delete=models.PROTECT, related_name='descuentos_nomina_archivados'
+    )
+    valor_cuota = models.DecimalField(max_digits=12, decimal_places=2)
+    numero_cuota = models.PositiveIntegerField(default=1)
+    observaciones = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Descuento de Préstamo (Archivo)'
+        verbose_name_plural = 'Descuentos de Préstamos (Archivo)'
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MODELO: TRANSICIÓN DE ESTADO (IDEMPOTENCIA)
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TransicionNomina(TenantAwareModel):
+    """
+    Registro de una transición de estado (calcular, aprobar, pagar, anular)
+    pedida con clave de idempotencia.
+    
+    Guarda la respuesta de la transición completada para devolverla tal cual
+    si el cliente reintenta con la misma clave (ver ``nomina/transiciones.py``).
+    """
+    
+    ACCION_CHOICES = [
+        ('calcular', 'Calcular'),
+        ('aprobar', 'Aprobar'),
+        ('pagar', 'Pagar'),
+        ('anular', 'Anular'),
+    ]
+    
+    ESTADO_CHOICES = [
+        ('en_proceso', 'En Proceso'),
+        ('completada', 'Completada'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    nomina = models.ForeignKey(
+        NominaSimple,
+        on_delete=models.CASCADE,
+        related_name='transiciones',
+        verbose_name='Nómina'
+    )
+    accion = models.CharField(max_length=20, choices=ACCION_CHOICES, verbose_name='Acción')
+    clave = models.CharField(max_length=255, verbose_name='Clave de Idempotencia')
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='en_proceso',
+        verbose_name='Estado'
+    )
+    
+    # Respuesta de la transición completada (JSON tal como se envió al cliente)
+    codigo_respuesta = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Código HTTP')
+    respuesta = models.JSONField(null=True, blank=True, verbose_name='Respuesta')
+    
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='transiciones_nomina',
+        verbose_name='Usuario'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completada_at = models.DateTimeField(null=True, blank=True, verbose_name='Completada')
+    
+    class Meta:
+        verbose_name = 'Transición de Nómina'
+        verbose_name_plural = 'Transiciones de Nómina'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'clave'],
+                name='uniq_transicion_nomina_clave',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_accion_display()} {self.nomina_id} ({self.clave})"
+
+
+class AcumuladoCertificado(TenantAwareModel):
+    """
+    Acumulado anual de ingresos y retenciones por empleado.
+    
+    Se actualiza al pagar una nómina (o al revertir una nómina pagada) y es
+    la fuente del certificado de ingresos y retenciones (ver
+    ``nomina/certificados.py``): el certificado del año lee una fila por
+    empleado en lugar de sumar todas sus nóminas y líneas de conceptos.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    empleado = models.ForeignKey(
+        Empleado,
+        on_delete=models.CASCADE,
+        related_name='acumulados_certificado',
+        verbose_name='Empleado'
+    )
+    anio = models.PositiveSmallIntegerField(verbose_name='Año Gravable')
+    
+    # Ingresos
+    pagos_salariales = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Pagos por Salarios'
+    )
+    otros_pagos = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Otros Pagos',
+        help_text='Auxilio de transporte'
+    )
+    ingresos_brutos = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Total Ingresos Brutos'
+    )
+    
+    # Aportes obligatorios del empleado (ingresos no constitutivos de renta)
+    aportes_salud = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Aportes Obligatorios a Salud'
+    )
+    aportes_pension = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Aportes Obligatorios a Pensión y Solidaridad'
+    )
+    
+    rentas_exentas = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Renta Exenta Laboral',
+        help_text='25% de los pagos laborales netos de aportes, antes del límite anual'
+    )
+    retencion_fuente = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00'),
+        verbose_name='Retención en la Fuente'
+    )
+    
+    nominas = models.IntegerField(default=0, verbose_name='Nóminas Acumuladas')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Acumulado de Certificado de Ingresos'
+        verbose_name_plural = 'Acumulados de Certificados de Ingresos'
+        ordering = ['-anio', 'empleado']
+        indexes = [
+            models.Index(fields=['organization', 'anio']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'empleado', 'anio'],
+                name='uniq_acumulado_certificado_empleado_anio',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.empleado} - {self.anio}: {self.ingresos_brutos}"
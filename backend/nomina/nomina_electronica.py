@@ -0,0 +1,364 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║           NÓMINA ELECTRÓNICA (XML NominaIndividual) POR PERÍODO               ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Genera el documento soporte de nómina electrónica de cada nómina pagada
+de un período:
+
+- ``documentos_periodo``: tres consultas para todo el período (nóminas
+  con contrato y empleado, líneas de conceptos y tabla de conceptos de
+  la organización). La tabla ``ConceptoLaboral`` -> elemento DIAN se arma
+  una sola vez por lote; cada documento se reduce a un dict plano.
+- ``generar_documento``: renderiza la plantilla Jinja2 y la valida contra
+  el XSD local (``nomina/dian``). Plantilla y esquema se compilan una vez
+  por proceso.
+- ``generar_zip_documentos``: reparte los documentos en un pool de
+  procesos y escribe el ZIP en streaming a medida que llegan. Los
+  documentos que no pasan la validación se incluyen junto con
+  ``validacion.json``.
+
+El XML y el XSD cubren el subconjunto del Anexo Técnico que maneja el
+sistema (no se firman ni se envían a la DIAN).
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.utils import timezone
+
+from .desprendibles import _BufferSalida
+from .pila import dias_cotizados
+
+
+DIRECTORIO_DIAN = os.path.join(os.path.dirname(__file__), 'dian')
+PLANTILLA = 'nomina_individual.xml.j2'
+ESQUEMA = 'nomina_individual.xsd'
+
+# Por debajo de este número de documentos no vale la pena crear procesos
+MINIMO_PARA_POOL = 50
+
+TIPO_XML = '102'
+
+# Tipo de documento del empleado -> código DIAN
+TIPOS_DOCUMENTO = {'TI': '12', 'CC': '13', 'CE': '22', 'NIT': '31', 'PA': '41'}
+
+# Código de TipoContrato -> tipo de contrato DIAN
+TIPOS_CONTRATO = {'FIJO': '1', 'INDEFINIDO': '2', 'OBRA_LABOR': '3', 'APRENDIZ': '4'}
+
+# Código de ConceptoLaboral -> grupo del XML (el resto va a otros conceptos/deducciones)
+DEVENGADOS_DIAN = {
+    'AUX_TRANSPORTE': 'transporte',
+    'AUXILIO_TRANSPORTE': 'transporte',
+    'BONIFICACION': 'bonificaciones',
+    'COMISIONES': 'comisiones',
+}
+DEDUCCIONES_DIAN = {
+    'SALUD_EMPLEADO': 'salud',
+    'PENSION_EMPLEADO': 'pension',
+    'FSP': 'fsp',
+    'SUBSISTENCIA': 'subsistencia',
+    'LIBRANZA': 'libranzas',
+    'COOPERATIVA': 'cooperativa',
+    'EMBARGO': 'embargo',
+    'RETENCION': 'retencion',
+}
+
+
+def _workers() -> int:
+    return getattr(settings, 'NOMINA_ELECTRONICA_WORKERS', min(4, os.cpu_count() or 1))
+
+
+def _valor(valor) -> str:
+    return str(Decimal(valor or 0).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DATOS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TablaConceptos:
+    """Conceptos laborales de la organización resueltos a su grupo DIAN (una consulta)."""
+
+    def __init__(self, organization):
+        from .models import ConceptoLaboral
+
+        self._conceptos = {
+            concepto_id: (codigo, nombre)
+            for concepto_id, codigo, nombre in ConceptoLaboral.objects.for_tenant(
+                organization
+            ).values_list('id', 'codigo', 'nombre')
+        }
+
+    def grupo(self, concepto_id, tipo):
+        """(grupo, nombre) de una línea según su tipo (DEVENGADO o DEDUCCION)."""
+        codigo, nombre = self._conceptos.get(concepto_id, ('', 'Otro concepto'))
+        if tipo == 'DEVENGADO':
+            return DEVENGADOS_DIAN.get(codigo, 'otros'), nombre
+        return DEDUCCIONES_DIAN.get(codigo, 'otras'), nombre
+
+
+def _periodo_nomina(periodo_inicio, periodo_fin) -> str:
+    """Código DIAN de periodicidad: 1 semanal, 4 quincenal, 5 mensual."""
+    dias = (periodo_fin - periodo_inicio).days + 1
+    if dias <= 7:
+        return '1'
+    if dias <= 16:
+        return '4'
+    return '5'
+
+
+def _consecutivo(numero) -> int:
+    """Consecutivo numérico de ``NOM-AAAA-NNNNNN``."""
+    try:
+        return int(str(numero).rsplit('-', 1)[-1])
+    except ValueError:
+        return 0
+
+
+def documentos_periodo(organization, periodo_inicio, periodo_fin, proyecto=None) -> list:
+    """
+    Dicts planos (serializables entre procesos) de las nóminas pagadas del período.
+    """
+    from .models import NominaSimple, NominaConcepto, NominaConceptoArchivo
+
+    nominas = NominaSimple.objects.for_tenant(organization).filter(
+        periodo_inicio=periodo_inicio,
+        periodo_fin=periodo_fin,
+        estado='pagada',
+    )
+    if proyecto:
+        nominas = nominas.filter(proyecto=proyecto)
+    filas = list(nominas.order_by('numero').values(
+        'id', 'numero', 'periodo_inicio', 'periodo_fin', 'fecha_pago',
+        'salario_base', 'total_items', 'incluir_salario_base',
+        'total_devengado', 'total_deducciones', 'total_prestamos', 'total_pagar',
+        'contrato__salario', 'contrato__tipo_contrato__codigo',
+        'contrato__empleado__tipo_documento', 'contrato__empleado__numero_documento',
+        'contrato__empleado__primer_nombre', 'contrato__empleado__segundo_nombre',
+        'contrato__empleado__primer_apellido', 'contrato__empleado__segundo_apellido',
+        'contrato__empleado__fecha_ingreso', 'contrato__empleado__fecha_retiro',
+        'contrato__empleado__numero_cuenta', 'cerrada',
+    ))
+    if not filas:
+        return []
+
+    # Las líneas de períodos cerrados están en el archivo
+    modelos_lineas = [NominaConcepto]
+    if any(fila['cerrada'] for fila in filas):
+        modelos_lineas.append(NominaConceptoArchivo)
+    lineas = {}
+    for modelo in modelos_lineas:
+        for nomina_id, concepto_id, tipo, porcentaje, valor in modelo.objects.for_tenant(
+            organization
+        ).filter(nomina_id__in=[fila['id'] for fila in filas]).values_list(
+            'nomina_id', 'concepto_id', 'tipo', 'porcentaje_aplicado', 'valor'
+        ):
+            lineas.setdefault(nomina_id, []).append((concepto_id, tipo, porcentaje, valor))
+
+    tabla = TablaConceptos(organization)
+    ahora = timezone.localtime()
+    nit, _, dv = (getattr(organization, 'nit', '') or '').partition('-')
+    comun = {
+        'empleador': {
+            'razon_social': getattr(organization, 'razon_social', '') or organization.nombre,
+            'nit': nit.replace('.', '').strip(),
+            'dv': dv.strip(),
+        },
+        'fecha_gen': ahora.date().isoformat(),
+        'hora_gen': ahora.strftime('%H:%M:%S-05:00'),
+        'ambiente': str(getattr(settings, 'NOMINA_ELECTRONICA_AMBIENTE', '2')),
+        'software_pin': getattr(settings, 'NOMINA_ELECTRONICA_SOFTWARE_PIN', ''),
+        'tipo_xml': TIPO_XML,
+    }
+    return [_datos_documento(fila, lineas.get(fila['id'], []), tabla, comun) for fila in filas]
+
+
+def _datos_documento(fila, lineas, tabla, comun) -> dict:
+    from .models import NominaSimple
+
+    devengados = {'transporte': None, 'bonificaciones': [], 'comisiones': [], 'otros': []}
+    deducciones = {
+        'salud': {'porcentaje': '0.00', 'valor': '0.00'},
+        'pension': {'porcentaje': '0.00', 'valor': '0.00'},
+        'fsp': None, 'subsistencia': None,
+        'libranzas': [], 'otras': [],
+        'cooperativa': None, 'embargo': None, 'retencion': None,
+    }
+    for concepto_id, tipo, porcentaje, valor in lineas:
+        grupo, nombre = tabla.grupo(concepto_id, tipo)
+        if tipo == 'DEVENGADO':
+            if grupo == 'transporte':
+                devengados['transporte'] = _valor(valor)
+            elif grupo == 'otros':
+                devengados['otros'].append((nombre, _valor(valor)))
+            else:
+                devengados[grupo].append(_valor(valor))
+        elif grupo in ('salud', 'pension', 'fsp', 'subsistencia'):
+            deducciones[grupo] = {'porcentaje': _valor(porcentaje), 'valor': _valor(valor)}
+        elif grupo in ('libranzas', 'otras'):
+            deducciones[grupo].append((nombre, _valor(valor)))
+        else:
+            deducciones[grupo] = _valor(valor)
+    deducciones['deuda'] = _valor(fila['total_prestamos']) if fila['total_prestamos'] else None
+
+    basico = NominaSimple.calcular_devengado_base(
+        fila['salario_base'], fila['total_items'], fila['incluir_salario_base']
+    )
+
+    empleado = {
+        campo: fila[f'contrato__empleado__{campo}']
+        for campo in ('tipo_documento', 'numero_documento', 'primer_nombre', 'segundo_nombre',
+                      'primer_apellido', 'segundo_apellido', 'fecha_ingreso', 'fecha_retiro',
+                      'numero_cuenta')
+    }
+    dias = dias_cotizados(
+        fila['periodo_inicio'], fila['periodo_fin'], empleado['fecha_ingreso'], empleado['fecha_retiro']
+    )
+    consecutivo = _consecutivo(fila['numero'])
+    fecha_pago = fila['fecha_pago'] or fila['periodo_fin']
+
+    return {
+        **comun,
+        'numero_nomina': fila['numero'],
+        'prefijo': 'NOM',
+        'consecutivo': consecutivo,
+        'numero': f'NOM{consecutivo}',
+        'periodo_inicio': fila['periodo_inicio'].isoformat(),
+        'periodo_fin': fila['periodo_fin'].isoformat(),
+        'periodo_nomina': _periodo_nomina(fila['periodo_inicio'], fila['periodo_fin']),
+        'tiempo_laborado': (fila['periodo_fin'] - empleado['fecha_ingreso']).days + 1,
+        'fecha_pago': fecha_pago.isoformat(),
+        'metodo_pago': '42' if empleado['numero_cuenta'] else '10',
+        'trabajador': {
+            'tipo_documento': TIPOS_DOCUMENTO.get(empleado['tipo_documento'], '13'),
+            'numero_documento': empleado['numero_documento'],
+            'primer_nombre': empleado['primer_nombre'],
+            'otros_nombres': empleado['segundo_nombre'] or '',
+            'primer_apellido': empleado['primer_apellido'],
+            'segundo_apellido': empleado['segundo_apellido'] or '',
+            'fecha_ingreso': empleado['fecha_ingreso'].isoformat(),
+            'tipo_contrato': TIPOS_CONTRATO.get(fila['contrato__tipo_contrato__codigo'], '2'),
+            'sueldo': _valor(fila['contrato__salario']),
+        },
+        'devengados': {**devengados, 'dias': dias, 'basico': _valor(basico)},
+        'deducciones': deducciones,
+        'devengados_total': _valor(fila['total_devengado']),
+        'deducciones_total': _valor(fila['total_deducciones'] + fila['total_prestamos']),
+        'comprobante_total': _valor(fila['total_pagar']),
+    }
+
+
+def calcular_cune(datos: dict) -> str:
+    """CUNE (SHA-384) con los campos y el orden del Anexo Técnico."""
+    cadena = ''.join([
+        datos['numero'],
+        datos['fecha_gen'],
+        datos['hora_gen'],
+        datos['devengados_total'],
+        datos['deducciones_total'],
+        datos['comprobante_total'],
+        datos['empleador']['nit'],
+        datos['trabajador']['numero_documento'],
+        datos['tipo_xml'],
+        datos['software_pin'],
+        datos['ambiente'],
+    ])
+    return hashlib.sha384(cadena.encode('utf-8')).hexdigest()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GENERACIÓN Y VALIDACIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+# Plantilla y esquema por proceso (cada worker del pool los compila una sola vez)
+_plantilla = None
+_esquema = None
+
+
+def obtener_plantilla():
+    global _plantilla
+    if _plantilla is None:
+        from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+        entorno = Environment(
+            loader=FileSystemLoader(DIRECTORIO_DIAN),
+            autoescape=True,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            undefined=StrictUndefined,
+        )
+        _plantilla = entorno.get_template(PLANTILLA)
+    return _plantilla
+
+
+def obtener_esquema():
+    global _esquema
+    if _esquema is None:
+        from lxml import etree
+
+        _esquema = etree.XMLSchema(etree.parse(os.path.join(DIRECTORIO_DIAN, ESQUEMA)))
+    return _esquema
+
+
+def generar_documento(datos: dict) -> tuple:
+    """
+    XML de un documento y sus errores de validación (función de nivel de
+    módulo para el pool).
+
+    Returns:
+        tuple: (bytes del XML, lista de errores del XSD)
+    """
+    from lxml import etree
+
+    xml = obtener_plantilla().render(cune=calcular_cune(datos), **datos).encode('utf-8')
+    esquema = obtener_esquema()
+    try:
+        documento = etree.fromstring(xml)
+    except etree.XMLSyntaxError as exc:
+        return xml, [str(exc)]
+    if esquema.validate(documento):
+        return xml, []
+    return xml, [f'línea {error.line}: {error.message}' for error in esquema.error_log]
+
+
+def _generar_lote(lista_datos: list):
+    """Genera en paralelo y entrega los documentos en el mismo orden de entrada."""
+    workers = _workers()
+    if workers <= 1 or len(lista_datos) < MINIMO_PARA_POOL:
+        for datos in lista_datos:
+            yield generar_documento(datos)
+        return
+
+    chunksize = max(1, len(lista_datos) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(generar_documento, lista_datos, chunksize=chunksize)
+
+
+def generar_zip_documentos(lista_datos: list):
+    """
+    Genera (en streaming) un ZIP con un XML por nómina.
+
+    Yields:
+        bytes: fragmentos del ZIP a medida que se genera cada documento
+    """
+    salida = _BufferSalida()
+    rechazados = {}
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for datos, (xml, errores) in zip(lista_datos, _generar_lote(lista_datos)):
+            nombre = f"{datos['numero_nomina']}_{datos['trabajador']['numero_documento']}.xml"
+            zf.writestr(nombre, xml)
+            if errores:
+                rechazados[nombre] = errores
+            fragmento = salida.vaciar()
+            if fragmento:
+                yield fragmento
+        if rechazados:
+            zf.writestr('validacion.json', json.dumps(rechazados, ensure_ascii=False, indent=2))
+    yield salida.vaciar()
@@ -0,0 +1,227 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║              PAGO DE NÓMINA POR LOTES (PERÍODO COMPLETO)                      ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Marca como pagadas todas las nóminas aprobadas de un período en una sola
+transacción:
+
+1. Bloquea las nóminas aprobadas del período y valida sus totales.
+2. Actualiza su estado con un único UPDATE.
+3. Registra las cuotas de préstamo descontadas con ``bulk_create`` de
+   ``PagoPrestamo`` y ``bulk_update`` de ``Prestamo`` (saldo, total pagado,
+   estado y avance de ``fecha_primer_pago``).
+4. Genera UN comprobante contable consolidado para el período.
+
+NOTA: las operaciones en bloque no disparan signals; no se crean
+comprobantes por nómina ni por pago de préstamo (el consolidado ya incluye
+el crédito a la cartera de préstamos). El resumen del período, el libro
+de prestaciones y los acumulados de certificados de ingresos se
+actualizan explícitamente.
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NominaSimple, NominaPrestamo
+from .prestaciones import registrar_causaciones
+from .certificados import registrar_pagos
+from .resumen_periodo import AcumuladorResumen, huella
+
+logger = logging.getLogger(__name__)
+
+
+class PagadorNominaLote:
+    """
+    Paga en bloque las nóminas aprobadas de un período.
+
+    Uso:
+        resultado = PagadorNominaLote(organization, usuario, inicio, fin).pagar()
+    """
+
+    def __init__(self, organization, usuario, periodo_inicio, periodo_fin, proyecto=None):
+        self.organization = organization
+        self.usuario = usuario
+        self.periodo_inicio = periodo_inicio
+        self.periodo_fin = periodo_fin
+        self.proyecto = proyecto
+        self.errores = []
+
+    def _nominas_aprobadas(self):
+        nominas = NominaSimple.objects.for_tenant(self.organization).filter(
+            periodo_inicio=self.periodo_inicio,
+            periodo_fin=self.periodo_fin,
+            estado='aprobada',
+        )
+        if self.proyecto is not None:
+            nominas = nominas.filter(proyecto=self.proyecto)
+        return nominas
+
+    @transaction.atomic
+    def pagar(self) -> dict:
+        """
+        Ejecuta el pago del período.
+
+        Returns:
+            dict: total, pagadas, pagos de préstamo, comprobante y errores
+        """
+        from contabilidad.models import generar_comprobante_nomina_periodo
+
+        nominas = list(self._nominas_aprobadas().select_for_update(of=('self',)))
+        fecha_pago = timezone.now().date()
+        huellas = {nomina.id: huella(nomina) for nomina in nominas}
+
+        pagadas = []
+        for nomina in nominas:
+            # Las deducciones no pueden exceder el total devengado
+            total_deducciones = (nomina.total_deducciones or Decimal('0')) + (nomina.total_prestamos or Decimal('0'))
+            if total_deducciones > nomina.total_devengado:
+                self.errores.append({
+                    'nomina_id': str(nomina.id),
+                    'numero': nomina.numero,
+                    'error': 'Las deducciones totales exceden el total devengado. Revise los montos.',
+                })
+                continue
+            nomina.estado = 'pagada'
+            nomina.fecha_pago = fecha_pago
+            pagadas.append(nomina)
+
+        if not pagadas:
+            return self._resultado(nominas, pagadas, [], None)
+
+        NominaSimple.objects.for_tenant(self.organization).filter(
+            id__in=[n.id for n in pagadas]
+        ).update(estado='pagada', fecha_pago=fecha_pago, updated_at=timezone.now())
+        
+        resumen = AcumuladorResumen(self.organization)
+        for nomina in pagadas:
+            resumen.registrar(huellas[nomina.id], huella(nomina))
+        resumen.aplicar()
+        registrar_causaciones(self.organization, [n.id for n in pagadas])
+        registrar_pagos(self.organization, [n.id for n in pagadas])
+
+        comprobante = generar_comprobante_nomina_periodo(
+            self.organization,
+            pagadas,
+            self.usuario,
+            self.periodo_inicio,
+            self.periodo_fin,
+            proyecto=self.proyecto,
+        )
+
+        pagos = self._aplicar_prestamos(pagadas, fecha_pago, comprobante)
+
+        self._notificar(pagadas)
+        return self._resultado(nominas, pagadas, pagos, comprobante)
+
+    def _aplicar_prestamos(self, nominas, fecha_pago, comprobante) -> list:
+        """Registra en bloque las cuotas descontadas en las nóminas pagadas."""
+        from prestamos.models import Prestamo, PagoPrestamo
+
+        descuentos = list(
+            NominaPrestamo.objects.for_tenant(self.organization).filter(
+                nomina__in=nominas,
+                prestamo__isnull=False,
+            ).select_related('nomina').order_by('nomina__numero', 'numero_cuota')
+        )
+        if not descuentos:
+            return []
+
+        prestamos = {
+            p.id: p
+            for p in Prestamo.objects.for_tenant(self.organization).select_for_update().filter(
+                id__in={d.prestamo_id for d in descuentos}
+            )
+        }
+
+        # Pagos que ya existen (reintentos): se omiten igual que en el pago individual
+        numeros = {
+            f'PAG-{prestamos[d.prestamo_id].numero_prestamo}-{d.numero_cuota:03d}'
+            for d in descuentos
+        }
+        existentes = set(
+            PagoPrestamo.objects.for_tenant(self.organization).filter(
+                prestamo_id__in=prestamos.keys(),
+                numero_pago__in=numeros,
+            ).values_list('prestamo_id', 'numero_pago')
+        )
+
+        pagos = []
+        cuotas_por_prestamo = defaultdict(int)
+        for descuento in descuentos:
+            prestamo = prestamos[descuento.prestamo_id]
+            numero_pago = f'PAG-{prestamo.numero_prestamo}-{descuento.numero_cuota:03d}'
+            cuotas_por_prestamo[prestamo.id] += 1
+            if (prestamo.id, numero_pago) in existentes:
+                continue
+
+            monto, saldo_anterior, saldo_nuevo = prestamo.aplicar_cuota(descuento.valor_cuota, fecha_pago)
+            if monto <= Decimal('0.00'):
+                continue
+            pagos.append(PagoPrestamo(
+                organization=self.organization,
+                prestamo=prestamo,
+                numero_pago=numero_pago,
+                fecha_pago=fecha_pago,
+                tipo_pago='cuota',
+                metodo_pago='descuento_nomina',
+                monto_pago=monto,
+                monto_capital=monto,
+                monto_interes=Decimal('0.00'),
+                monto_mora=Decimal('0.00'),
+                saldo_anterior=saldo_anterior,
+                saldo_nuevo=saldo_nuevo,
+                observaciones=f'Pago automático vía nómina {descuento.nomina.numero}',
+                comprobante=comprobante.numero if comprobante else '',
+                registrado_por=self.usuario,
+            ))
+
+        # Avanzar la fecha de pago según las cuotas descontadas en el período
+        for prestamo_id, cuotas in cuotas_por_prestamo.items():
+            prestamo = prestamos[prestamo_id]
+            if prestamo.fecha_primer_pago:
+                prestamo.fecha_primer_pago = prestamo.fecha_primer_pago + relativedelta(months=cuotas)
+
+        PagoPrestamo.objects.bulk_create(pagos, batch_size=1000)
+        Prestamo.objects.for_tenant(self.organization).bulk_update(
+            list(prestamos.values()),
+            ['saldo_pendiente', 'total_pagado', 'fecha_ultimo_pago', 'estado', 'fecha_primer_pago'],
+            batch_size=500,
+        )
+        return pagos
+
+    def _notificar(self, nominas):
+        """Una sola notificación para el período en lugar de una por nómina."""
+        from core.notification_engine import NotificationEngine
+
+        try:
+            NotificationEngine.notify_admins(
+                organization=self.organization,
+                titulo=f'Período de nómina pagado: {self.periodo_inicio} - {self.periodo_fin}',
+                mensaje=f'Se pagaron {len(nominas)} nóminas del período.',
+                tipo='success',
+                categoria='nomina',
+                prioridad='normal',
+                url_accion='/dashboard/nomina',
+                texto_accion='Ver nóminas',
+                origen_tipo='nomina',
+                origen_id=f'{self.periodo_inicio}:{self.periodo_fin}',
+                enviar_email=True,
+            )
+        except Exception as exc:
+            logger.error('Error creando notificación de pago de período: %s', exc)
+
+    def _resultado(self, nominas, pagadas, pagos, comprobante) -> dict:
+        return {
+            'total': len(nominas),
+            'pagadas': len(pagadas),
+            'pagos_prestamo': len(pagos),
+            'comprobante': comprobante.numero if comprobante else None,
+            'errores': self.errores,
+        }
@@ -0,0 +1,342 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║              PLANILLA PILA (ARCHIVO PLANO DE APORTES)                         ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Genera el archivo plano de autoliquidación de aportes de un período
+directamente desde la BD, sin pasar por Excel:
+
+- Las nóminas del período se leen con un cursor del servidor
+  (``iterator(chunk_size=...)``) sobre ``NominaSimple`` + ``Contrato`` +
+  ``Empleado``: una consulta por bloque y memoria constante.
+- El IBC es el guardado en la nómina al calcularla (``Contrato.ibc``) o,
+  si aún no se ha calculado, el del contrato.
+- Las cotizaciones siguen las reglas de ``CalculadorNomina``: mismos
+  parámetros legales vigentes a la fecha de fin del período, mismos
+  indicadores ``aplica_*`` del tipo de contrato y mismo redondeo
+  (parte empleado + parte empleador).
+
+El formato es un subconjunto de longitud fija de la Resolución 2388 de
+2016: registro tipo 01 (aportante) y tipo 02 (cotizante) con los campos
+que existen en el sistema. Los códigos de administradoras (EPS, AFP,
+CCF) no se manejan y quedan en blanco para completarse en el operador.
+"""
+
+import calendar
+import unicodedata
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .cache_normativa import obtener_snapshot
+
+
+# (campo, longitud, tipo) — 'A': alfanumérico a la izquierda, 'N': numérico con ceros
+REGISTRO_APORTANTE = [
+    ('tipo_registro', 2, 'N'),
+    ('modalidad', 1, 'N'),
+    ('secuencia', 4, 'N'),
+    ('razon_social', 200, 'A'),
+    ('tipo_documento', 2, 'A'),
+    ('nit', 16, 'A'),
+    ('digito_verificacion', 1, 'N'),
+    ('tipo_planilla', 1, 'A'),
+    ('periodo_pension', 7, 'A'),
+    ('periodo_salud', 7, 'A'),
+    ('numero_cotizantes', 5, 'N'),
+    ('valor_nomina', 12, 'N'),
+]
+
+REGISTRO_COTIZANTE = [
+    ('tipo_registro', 2, 'N'),
+    ('secuencia', 5, 'N'),
+    ('tipo_documento', 2, 'A'),
+    ('numero_documento', 16, 'A'),
+    ('tipo_cotizante', 2, 'N'),
+    ('subtipo_cotizante', 2, 'N'),
+    ('primer_apellido', 20, 'A'),
+    ('segundo_apellido', 30, 'A'),
+    ('primer_nombre', 20, 'A'),
+    ('segundo_nombre', 30, 'A'),
+    ('ingreso', 1, 'A'),
+    ('retiro', 1, 'A'),
+    ('dias_pension', 2, 'N'),
+    ('dias_salud', 2, 'N'),
+    ('dias_arl', 2, 'N'),
+    ('dias_caja', 2, 'N'),
+    ('salario_basico', 9, 'N'),
+    ('ibc_pension', 9, 'N'),
+    ('ibc_salud', 9, 'N'),
+    ('ibc_arl', 9, 'N'),
+    ('ibc_caja', 9, 'N'),
+    ('tarifa_pension', 7, 'T'),
+    ('cotizacion_pension', 9, 'N'),
+    ('fondo_solidaridad', 9, 'N'),
+    ('fondo_subsistencia', 9, 'N'),
+    ('tarifa_salud', 7, 'T'),
+    ('cotizacion_salud', 9, 'N'),
+    ('tarifa_arl', 9, 'T'),
+    ('clase_riesgo', 1, 'N'),
+    ('cotizacion_arl', 9, 'N'),
+    ('tarifa_caja', 7, 'T'),
+    ('valor_caja', 9, 'N'),
+    ('tarifa_sena', 7, 'T'),
+    ('valor_sena', 9, 'N'),
+    ('tarifa_icbf', 7, 'T'),
+    ('valor_icbf', 9, 'N'),
+]
+
+TIPOS_DOCUMENTO = {'CC': 'CC', 'CE': 'CE', 'TI': 'TI', 'PA': 'PA', 'NIT': 'NI'}
+
+CLASES_RIESGO = {'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5}
+
+CAMPOS_CONSULTA = (
+    'contrato__empleado__tipo_documento',
+    'contrato__empleado__numero_documento',
+    'contrato__empleado__primer_apellido',
+    'contrato__empleado__segundo_apellido',
+    'contrato__empleado__primer_nombre',
+    'contrato__empleado__segundo_nombre',
+    'contrato__empleado__fecha_ingreso',
+    'contrato__empleado__fecha_retiro',
+    'contrato__salario',
+    'contrato__nivel_arl',
+    'contrato__tipo_contrato__ibc_porcentaje',
+    'contrato__tipo_contrato__aplica_salud',
+    'contrato__tipo_contrato__aplica_pension',
+    'contrato__tipo_contrato__aplica_arl',
+    'contrato__tipo_contrato__aplica_parafiscales',
+    'ibc',
+)
+
+FIN_LINEA = '\r\n'
+
+
+def _texto(valor) -> str:
+    """Mayúsculas sin tildes (el operador solo acepta ASCII)."""
+    texto = unicodedata.normalize('NFKD', str(valor or ''))
+    return texto.encode('ascii', 'ignore').decode('ascii').upper()
+
+
+def _pesos(valor) -> int:
+    return int(Decimal(valor or 0).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _redondear(valor: Decimal) -> Decimal:
+    """Mismo redondeo que ``CalculadorNomina._redondear``."""
+    return valor.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _sobre_ibc(porcentaje, ibc) -> Decimal:
+    """Mismo cálculo que ``CalculadorNomina._calcular_sobre_ibc``."""
+    return _redondear(ibc * (porcentaje or Decimal('0')) / Decimal('100'))
+
+
+def formatear_registro(layout, valores: dict) -> str:
+    """Arma una línea de longitud fija según el layout."""
+    partes = []
+    for campo, longitud, tipo in layout:
+        valor = valores.get(campo)
+        if tipo == 'N':
+            partes.append(str(int(valor or 0)).zfill(longitud)[-longitud:])
+        elif tipo == 'T':
+            # Tarifa como fracción decimal: 12.5 % -> 0.12500
+            fraccion = Decimal(valor or 0) / Decimal('100')
+            partes.append(f'{fraccion:.{longitud - 2}f}'[:longitud])
+        else:
+            partes.append(_texto(valor)[:longitud].ljust(longitud))
+    return ''.join(partes)
+
+
+def dias_cotizados(periodo_inicio, periodo_fin, fecha_ingreso=None, fecha_retiro=None) -> int:
+    """
+    Días del período dentro de la relación laboral, en meses de 30 días
+    (un mes completo siempre cotiza 30).
+    """
+    inicio = max(periodo_inicio, fecha_ingreso) if fecha_ingreso else periodo_inicio
+    fin = min(periodo_fin, fecha_retiro) if fecha_retiro else periodo_fin
+    if fin < inicio:
+        return 0
+    ultimo_dia = calendar.monthrange(fin.year, fin.month)[1]
+    if inicio.day == 1 and fin.day == ultimo_dia and (inicio.year, inicio.month) == (fin.year, fin.month):
+        return 30
+    return min((fin - inicio).days + 1, 30)
+
+
+class GeneradorPila:
+    """
+    Planilla PILA de una organización y período.
+
+    Uso:
+        generador = GeneradorPila(organization, inicio, fin)
+        response = StreamingHttpResponse(generador.stream())
+    """
+
+    def __init__(self, organization, periodo_inicio, periodo_fin, proyecto=None, tamano_bloque=None):
+        self.organization = organization
+        self.periodo_inicio = periodo_inicio
+        self.periodo_fin = periodo_fin
+        self.proyecto = proyecto
+        self.tamano_bloque = tamano_bloque or getattr(settings, 'NOMINA_PILA_TAMANO_BLOQUE', 2000)
+        self._tarifas = self._cargar_tarifas()
+
+    def nominas(self):
+        """Nóminas del período (sin anuladas), filtradas explícitamente por tenant."""
+        from .models import NominaSimple
+
+        # for_tenant: el stream se consume después de que el middleware
+        # libera el tenant del hilo
+        queryset = NominaSimple.objects.for_tenant(self.organization).filter(
+            periodo_inicio=self.periodo_inicio,
+            periodo_fin=self.periodo_fin,
+        ).exclude(estado='anulada')
+        if self.proyecto:
+            queryset = queryset.filter(proyecto=self.proyecto)
+        return queryset
+
+    def _cargar_tarifas(self) -> dict:
+        """Parámetros vigentes a la fecha de fin (la ``fecha_calculo`` del calculador)."""
+        parametro = obtener_snapshot(self.organization).parametro
+        fecha = self.periodo_fin
+        return {
+            concepto: parametro(concepto, fecha)
+            for concepto in (
+                'SALUD', 'PENSION', 'FSP', 'TOPE_FSP', 'SUBSISTENCIA', 'TOPE_SUBSISTENCIA',
+                'CAJA_COMPENSACION', 'SENA', 'ICBF',
+                *(f'ARL_NIVEL_{nivel}' for nivel in CLASES_RIESGO),
+            )
+        }
+
+    def _porcentaje(self, concepto, campo):
+        param = self._tarifas.get(concepto)
+        return getattr(param, campo) if param else Decimal('0')
+
+    def _tope(self, concepto):
+        param = self._tarifas.get(concepto)
+        return param.valor_fijo if param and param.valor_fijo else None
+
+    def encabezado(self) -> str:
+        """Registro tipo 01 (una consulta agregada)."""
+        totales = self.nominas().aggregate(cantidad=Count('id'), valor=Sum('total_devengado'))
+        nit, _, dv = (getattr(self.organization, 'nit', '') or '').partition('-')
+        # Salud se cotiza por el mes siguiente al de pensión
+        periodo_salud = self.periodo_inicio.replace(day=28) + timedelta(days=4)
+        return formatear_registro(REGISTRO_APORTANTE, {
+            'tipo_registro': 1,
+            'modalidad': 1,
+            'secuencia': 1,
+            'razon_social': getattr(self.organization, 'razon_social', '') or self.organization.nombre,
+            'tipo_documento': 'NI',
+            'nit': nit.replace('.', '').strip(),
+            'digito_verificacion': dv.strip() or 0,
+            'tipo_planilla': 'E',
+            'periodo_pension': self.periodo_inicio.strftime('%Y-%m'),
+            'periodo_salud': periodo_salud.strftime('%Y-%m'),
+            'numero_cotizantes': totales['cantidad'],
+            'valor_nomina': _pesos(totales['valor']),
+        })
+
+    def registro(self, secuencia, fila) -> str:
+        """Registro tipo 02 de una fila de ``CAMPOS_CONSULTA``."""
+        from .models import Contrato
+
+        (
+            tipo_documento, numero_documento, primer_apellido, segundo_apellido,
+            primer_nombre, segundo_nombre, fecha_ingreso, fecha_retiro,
+            salario, nivel_arl, ibc_porcentaje,
+            aplica_salud, aplica_pension, aplica_arl, aplica_parafiscales, ibc_nomina,
+        ) = fila
+
+        ibc = ibc_nomina or Contrato.calcular_ibc(salario, ibc_porcentaje)
+        dias = dias_cotizados(self.periodo_inicio, self.periodo_fin, fecha_ingreso, fecha_retiro)
+        valores = {
+            'tipo_registro': 2,
+            'secuencia': secuencia,
+            'tipo_documento': TIPOS_DOCUMENTO.get(tipo_documento, tipo_documento),
+            'numero_documento': numero_documento,
+            'tipo_cotizante': 1,
+            'subtipo_cotizante': 0,
+            'primer_apellido': primer_apellido,
+            'segundo_apellido': segundo_apellido,
+            'primer_nombre': primer_nombre,
+            'segundo_nombre': segundo_nombre,
+            'ingreso': 'X' if fecha_ingreso and self.periodo_inicio <= fecha_ingreso <= self.periodo_fin else '',
+            'retiro': 'X' if fecha_retiro and self.periodo_inicio <= fecha_retiro <= self.periodo_fin else '',
+            'salario_basico': _pesos(salario),
+        }
+
+        if aplica_pension:
+            empleado = self._porcentaje('PENSION', 'porcentaje_empleado')
+            empleador = self._porcentaje('PENSION', 'porcentaje_empleador')
+            valores.update({
+                'dias_pension': dias,
+                'ibc_pension': _pesos(ibc),
+                'tarifa_pension': empleado + empleador,
+                'cotizacion_pension': _pesos(_sobre_ibc(empleado, ibc) + _sobre_ibc(empleador, ibc)),
+            })
+            tope_fsp = self._tope('TOPE_FSP')
+            if tope_fsp and ibc > tope_fsp:
+                valores['fondo_solidaridad'] = _pesos(
+                    _sobre_ibc(self._porcentaje('FSP', 'porcentaje_empleado'), ibc)
+                )
+            tope_sub = self._tope('TOPE_SUBSISTENCIA')
+            if tope_sub and ibc > tope_sub:
+                valores['fondo_subsistencia'] = _pesos(
+                    _sobre_ibc(self._porcentaje('SUBSISTENCIA', 'porcentaje_empleado'), ibc)
+                )
+
+        if aplica_salud:
+            empleado = self._porcentaje('SALUD', 'porcentaje_empleado')
+            empleador = self._porcentaje('SALUD', 'porcentaje_empleador')
+            valores.update({
+                'dias_salud': dias,
+                'ibc_salud': _pesos(ibc),
+                'tarifa_salud': empleado + empleador,
+                'cotizacion_salud': _pesos(_sobre_ibc(empleado, ibc) + _sobre_ibc(empleador, ibc)),
+            })
+
+        if aplica_arl:
+            tarifa = self._porcentaje(f'ARL_NIVEL_{nivel_arl}', 'porcentaje_total')
+            valores.update({
+                'dias_arl': dias,
+                'ibc_arl': _pesos(ibc),
+                'tarifa_arl': tarifa,
+                'clase_riesgo': CLASES_RIESGO.get(nivel_arl, 1),
+                'cotizacion_arl': _pesos(_sobre_ibc(tarifa, ibc)),
+            })
+
+        if aplica_parafiscales:
+            valores.update({'dias_caja': dias, 'ibc_caja': _pesos(ibc)})
+            for concepto, sufijo in (('CAJA_COMPENSACION', 'caja'), ('SENA', 'sena'), ('ICBF', 'icbf')):
+                tarifa = self._porcentaje(concepto, 'porcentaje_total')
+                valores[f'tarifa_{sufijo}'] = tarifa
+                valores[f'valor_{sufijo}'] = _pesos(_sobre_ibc(tarifa, ibc))
+
+        return formatear_registro(REGISTRO_COTIZANTE, valores)
+
+    def lineas(self):
+        """Encabezado y registros de cotizantes, en orden de documento."""
+        yield self.encabezado()
+        filas = self.nominas().order_by(
+            'contrato__empleado__numero_documento', 'numero'
+        ).values_list(*CAMPOS_CONSULTA).iterator(chunk_size=self.tamano_bloque)
+        for secuencia, fila in enumerate(filas, 1):
+            yield self.registro(secuencia, fila)
+
+    def stream(self):
+        """Bytes del archivo en bloques de ``tamano_bloque`` líneas."""
+        bloque = []
+        for linea in self.lineas():
+            bloque.append(linea)
+            if len(bloque) >= self.tamano_bloque:
+                yield (FIN_LINEA.join(bloque) + FIN_LINEA).encode('ascii')
+                bloque = []
+        if bloque:
+            yield (FIN_LINEA.join(bloque) + FIN_LINEA).encode('ascii')
+
+    @property
+    def nombre_archivo(self) -> str:
+        return f'pila_{self.periodo_inicio}_{self.periodo_fin}.txt'
@@ -32,11 +32,29 @@ class NominaAccessPolicy(BaseAccessPolicy):
 
     CUSTOM_ACTION_MAP = {
         'calcular':     'calcular',
+        'calcular_periodo': 'calcular',
+        'calcular_periodo_async': 'calcular',
+        'trabajo_calculo': 'view',
+        'importar_novedades': 'change',
         'aprobar':      'aprobar',
         'pagar':        'pagar',
+        'pagar_periodo': 'pagar',
+        'abrir_periodo': 'add',
+        'cerrar_periodo': 'cerrar',
+        'reabrir_periodo': 'cerrar',
         'anular':       'anular',
         'desprendible': 'view',
+        'desprendibles_periodo': 'view',
+        'pila':         'view',
+        'dispersion_bancaria': 'pagar',
+        'nomina_electronica': 'view',
+        'provisiones_prestaciones': 'view',
+        'certificados_ingresos': 'view',
+        'simular':      'view',
+        'simular_costos': 'view',
         'por_periodo':  'view',
+        'variaciones':  'view',
         'estadisticas': 'view',
         'export_excel': 'view',
+        'export_columnar': 'view',
     }
@@ -0,0 +1,321 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║                  LIBRO DE PRESTACIONES SOCIALES (CAUSACIÓN)                   ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Acumula las provisiones de prestaciones sociales (cesantías, intereses,
+prima y vacaciones) a medida que se pagan las nóminas, en lugar de volver a
+sumar todo el historial en cada consulta:
+
+- ``MovimientoPrestacion``: una fila por movimiento (causación de una
+  nómina pagada, pago al empleado o reverso), con el saldo resultante.
+- ``SaldoPrestacion``: saldo vigente por empleado y prestación.
+
+Las provisiones se calculan con ``calcular_provisiones`` (las mismas reglas
+y parámetros que ``CalculadorNomina``) a la fecha de fin del período.
+
+Puntos de actualización:
+- ``NominaSimple.save()``: signal al pasar a (o salir de) estado pagada.
+- ``PagadorNominaLote.pagar()``: explícito, porque ``update()`` no dispara
+  signals.
+- Eliminación de una nómina pagada: reverso de sus causaciones.
+
+``reconstruir_prestaciones`` recalcula el libro desde cero a partir de las
+nóminas pagadas (carga inicial o reparación).
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .services import PROVISIONES, calcular_provisiones
+
+
+CERO = Decimal('0.00')
+
+CODIGOS_AUXILIO = ('AUX_TRANSPORTE', 'AUXILIO_TRANSPORTE')
+
+
+def _organization_id(organization):
+    return getattr(organization, 'pk', organization)
+
+
+def causaciones_nominas(organization, nomina_ids) -> list:
+    """
+    Movimientos de causación de las nóminas pagadas indicadas (sin asentar).
+
+    Usa dos consultas para todo el lote: las nóminas (con su contrato) y la
+    suma del auxilio de transporte por nómina (una más si hay nóminas de
+    períodos cerrados).
+
+    Returns:
+        list: dicts con empleado_id, contrato_id, nomina_id, concepto,
+        fecha, base, valor y descripcion
+    """
+    from .cache_normativa import obtener_snapshot
+    from .models import NominaConcepto, NominaConceptoArchivo, NominaSimple
+
+    organization_id = _organization_id(organization)
+    nominas = list(
+        NominaSimple._base_manager.filter(
+            organization_id=organization_id,
+            id__in=nomina_ids,
+            estado='pagada',
+            # Solo los contratos laborales causan prestaciones
+            contrato__tipo_contrato__aplica_parafiscales=True,
+        ).values(
+            'id', 'numero', 'contrato_id', 'contrato__empleado_id', 'periodo_fin',
+            'salario_base', 'total_items', 'incluir_salario_base', 'cerrada',
+        )
+    )
+    if not nominas:
+        return []
+
+    # Las líneas de períodos cerrados están en el archivo
+    modelos_lineas = [NominaConcepto]
+    if any(n['cerrada'] for n in nominas):
+        modelos_lineas.append(NominaConceptoArchivo)
+    auxilios = {}
+    for modelo in modelos_lineas:
+        auxilios.update(
+            modelo._base_manager.filter(
+                nomina_id__in=[n['id'] for n in nominas],
+                concepto__codigo__in=CODIGOS_AUXILIO,
+                tipo='DEVENGADO',
+            ).values('nomina_id').annotate(total=Sum('valor')).values_list('nomina_id', 'total')
+        )
+
+    normativa = obtener_snapshot(organization_id)
+    movimientos = []
+    for nomina in nominas:
+        devengado_base = NominaSimple.calcular_devengado_base(
+            nomina['salario_base'], nomina['total_items'], nomina['incluir_salario_base']
+        )
+        provisiones = calcular_provisiones(
+            normativa, nomina['periodo_fin'], devengado_base, auxilios.get(nomina['id']) or CERO
+        )
+        for concepto, (base, valor) in provisiones.items():
+            if not valor:
+                continue
+            movimientos.append({
+                'empleado_id': nomina['contrato__empleado_id'],
+                'contrato_id': nomina['contrato_id'],
+                'nomina_id': nomina['id'],
+                'concepto': concepto,
+                'tipo': 'causacion',
+                'fecha': nomina['periodo_fin'],
+                'base': base,
+                'valor': valor,
+                'descripcion': f"Causación nómina {nomina['numero']}",
+            })
+    return movimientos
+
+
+def registrar_causaciones(organization, nomina_ids) -> int:
+    """
+    Causa en el libro las provisiones de nóminas pagadas.
+
+    Es idempotente: las nóminas que ya tienen causaciones se omiten.
+
+    Returns:
+        int: movimientos asentados
+    """
+    from .models import MovimientoPrestacion
+
+    organization_id = _organization_id(organization)
+    causadas = set(
+        MovimientoPrestacion._base_manager.filter(
+            organization_id=organization_id,
+            nomina_id__in=nomina_ids,
+            tipo='causacion',
+        ).values_list('nomina_id', flat=True)
+    )
+    pendientes = [pk for pk in nomina_ids if pk not in causadas]
+    if not pendientes:
+        return 0
+    return _asentar(organization_id, causaciones_nominas(organization_id, pendientes))
+
+
+def registrar_reverso(organization, nomina_id) -> int:
+    """
+    Reversa las causaciones de una nómina (eliminada o que dejó de estar
+    pagada). Idempotente: una nómina se reversa una sola vez.
+
+    Returns:
+        int: movimientos asentados
+    """
+    from .models import MovimientoPrestacion
+
+    organization_id = _organization_id(organization)
+    filas = MovimientoPrestacion._base_manager.filter(
+        organization_id=organization_id, nomina_id=nomina_id
+    )
+    if filas.filter(tipo='reverso').exists():
+        return 0
+    movimientos = [
+        {
+            'empleado_id': causacion['empleado_id'],
+            'contrato_id': causacion['contrato_id'],
+            'nomina_id': nomina_id,
+            'concepto': causacion['concepto'],
+            'tipo': 'reverso',
+            'fecha': causacion['fecha'],
+            'base': causacion['base'],
+            'valor': -causacion['valor'],
+            'descripcion': f"Reverso de {causacion['descripcion']}"[:200],
+        }
+        for causacion in filas.filter(tipo='causacion').values(
+            'empleado_id', 'contrato_id', 'concepto', 'fecha', 'base', 'valor', 'descripcion'
+        )
+    ]
+    return _asentar(organization_id, movimientos)
+
+
+def registrar_pago(organization, empleado, concepto, valor, fecha, descripcion='') -> int:
+    """
+    Registra un pago de la prestación al empleado (liquidación, prima,
+    consignación de cesantías, vacaciones disfrutadas).
+
+    Raises:
+        ValueError: prestación desconocida o valor no positivo
+    """
+    if concepto not in PROVISIONES:
+        raise ValueError(f'Prestación desconocida: {concepto}')
+    valor = Decimal(str(valor))
+    if valor <= 0:
+        raise ValueError('El valor del pago debe ser mayor a cero')
+    return _asentar(_organization_id(organization), [{
+        'empleado_id': getattr(empleado, 'pk', empleado),
+        'contrato_id': None,
+        'nomina_id': None,
+        'concepto': concepto,
+        'tipo': 'pago',
+        'fecha': fecha,
+        'base': CERO,
+        'valor': -valor,
+        'descripcion': descripcion[:200],
+    }])
+
+
+def _asentar(organization_id, movimientos) -> int:
+    """
+    Asienta movimientos: bloquea los saldos afectados (en orden fijo para
+    evitar interbloqueos), encadena el saldo de cada movimiento y escribe
+    todo con ``bulk_create``/``bulk_update``.
+    """
+    from .models import MovimientoPrestacion, SaldoPrestacion
+
+    if not movimientos:
+        return 0
+
+    claves = sorted({(m['empleado_id'], m['concepto']) for m in movimientos}, key=str)
+    empleados = {empleado_id for empleado_id, _ in claves}
+
+    with transaction.atomic():
+        SaldoPrestacion._base_manager.bulk_create(
+            [
+                SaldoPrestacion(organization_id=organization_id, empleado_id=e, concepto=c)
+                for e, c in claves
+            ],
+            ignore_conflicts=True,
+        )
+        saldos = {
+            (s.empleado_id, s.concepto): s
+            for s in SaldoPrestacion._base_manager.select_for_update().filter(
+                organization_id=organization_id, empleado_id__in=empleados
+            ).order_by('empleado_id', 'concepto')
+        }
+
+        ahora = timezone.now()
+        filas = []
+        for datos in sorted(movimientos, key=lambda m: (m['fecha'], m['tipo'] != 'causacion')):
+            saldo = saldos[(datos['empleado_id'], datos['concepto'])]
+            saldo.saldo += datos['valor']
+            if datos['tipo'] == 'pago':
+                saldo.pagado -= datos['valor']
+            else:
+                saldo.causado += datos['valor']
+            saldo.movimientos += 1
+            saldo.updated_at = ahora
+            filas.append(MovimientoPrestacion(
+                organization_id=organization_id,
+                saldo=saldo.saldo,
+                secuencia=saldo.movimientos,
+                **datos,
+            ))
+
+        MovimientoPrestacion._base_manager.bulk_create(filas, batch_size=500)
+        SaldoPrestacion._base_manager.bulk_update(
+            [saldos[clave] for clave in claves],
+            ['saldo', 'causado', 'pagado', 'movimientos', 'updated_at'],
+        )
+    return len(filas)
+
+
+def saldos_a_fecha(organization, fecha, empleado=None) -> dict:
+    """
+    Saldo de cada prestación a una fecha (pasivo laboral), con una consulta
+    agrupada sobre el libro.
+
+    Returns:
+        dict: {empleado_id: {prestación: saldo}}
+    """
+    from .models import MovimientoPrestacion
+
+    movimientos = MovimientoPrestacion._base_manager.filter(
+        organization_id=_organization_id(organization), fecha__lte=fecha
+    )
+    if empleado is not None:
+        movimientos = movimientos.filter(empleado_id=getattr(empleado, 'pk', empleado))
+
+    saldos = defaultdict(dict)
+    for fila in movimientos.values('empleado_id', 'concepto').annotate(saldo=Sum('valor')):
+        saldos[fila['empleado_id']][fila['concepto']] = fila['saldo'] or CERO
+    return dict(saldos)
+
+
+def totales_a_fecha(organization, fecha) -> dict:
+    """Pasivo total por prestación a una fecha: {prestación: saldo}."""
+    from .models import MovimientoPrestacion
+
+    return {
+        fila['concepto']: fila['saldo'] or CERO
+        for fila in MovimientoPrestacion._base_manager.filter(
+            organization_id=_organization_id(organization), fecha__lte=fecha
+        ).values('concepto').annotate(saldo=Sum('valor'))
+    }
+
+
+def reconstruir_prestaciones(organization) -> int:
+    """
+    Recalcula desde cero las causaciones del libro a partir de las nóminas
+    pagadas de la organización. Los pagos registrados se conservan.
+
+    Returns:
+        int: movimientos asentados
+    """
+    from .models import MovimientoPrestacion, NominaSimple, SaldoPrestacion
+
+    organization_id = _organization_id(organization)
+    with transaction.atomic():
+        pagos = list(
+            MovimientoPrestacion._base_manager.filter(
+                organization_id=organization_id, tipo='pago'
+            ).values(
+                'empleado_id', 'contrato_id', 'nomina_id', 'concepto', 'tipo',
+                'fecha', 'base', 'valor', 'descripcion',
+            )
+        )
+        MovimientoPrestacion._base_manager.filter(organization_id=organization_id).delete()
+        SaldoPrestacion._base_manager.filter(organization_id=organization_id).delete()
+
+        nomina_ids = list(
+            NominaSimple._base_manager.filter(
+                organization_id=organization_id, estado='pagada'
+            ).values_list('id', flat=True)
+        )
+        return _asentar(organization_id, causaciones_nominas(organization_id, nomina_ids) + pagos)
@@ -0,0 +1,305 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║               RESUMEN MATERIALIZADO DE NÓMINA POR PERÍODO                     ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Mantiene ``ResumenPeriodoNomina`` (una fila por organización, período y
+proyecto) aplicando diferencias en lugar de volver a sumar las nóminas:
+
+- Cada nómina aporta una "huella" (estado, clave del período y totales).
+  Un cambio resta la huella anterior y suma la nueva.
+- Las líneas de conceptos aportan su valor al total por código; al
+  recalcular solo se aplica la diferencia entre líneas guardadas y nuevas.
+
+Puntos de actualización:
+- ``NominaSimple.save()`` / ``delete()``: signals (calcular, aprobar, pagar
+  y anular individuales).
+- Operaciones en bloque (``calculo_lote``, ``pago_lote``,
+  ``sincronizar_lineas``): usan ``AcumuladorResumen`` explícitamente porque
+  ``bulk_update``/``update()`` no disparan signals.
+
+``reconstruir_resumen`` recalcula todo desde cero (carga inicial o
+reparación tras cambios manuales de líneas).
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+
+
+CAMPOS_TOTALES = [
+    'total_devengado',
+    'total_deducciones',
+    'total_prestamos',
+    'total_pagar',
+    'aporte_salud_empleador',
+    'aporte_pension_empleador',
+    'aporte_arl',
+    'aporte_caja',
+    'aporte_sena',
+    'aporte_icbf',
+]
+
+# Campos de NominaSimple que determinan su aporte al resumen
+CAMPOS_HUELLA = CAMPOS_TOTALES + ['estado', 'periodo_inicio', 'periodo_fin', 'proyecto_id']
+
+# Componentes de ``costo_total_empleador`` (ver NominaSimple)
+CAMPOS_COSTO_EMPLEADOR = [
+    'total_devengado',
+    'aporte_salud_empleador',
+    'aporte_pension_empleador',
+    'aporte_arl',
+    'aporte_caja',
+    'aporte_sena',
+    'aporte_icbf',
+]
+
+CERO = Decimal('0.00')
+
+
+def huella(nomina) -> dict:
+    """Aporte de la nómina (en memoria) al resumen."""
+    return {campo: getattr(nomina, campo) for campo in CAMPOS_HUELLA}
+
+
+def huella_guardada(nomina_id):
+    """Aporte de la nómina tal como está guardada (None si no existe)."""
+    from .models import NominaSimple
+
+    return NominaSimple._base_manager.filter(pk=nomina_id).values(*CAMPOS_HUELLA).first()
+
+
+def lineas_nomina(nomina_id) -> list:
+    """Líneas de conceptos guardadas de una nómina (código, nombre, tipo, valor)."""
+    from .models import NominaConcepto
+
+    return list(
+        NominaConcepto._base_manager.filter(nomina_id=nomina_id).values_list(
+            'concepto__codigo', 'concepto__nombre', 'tipo', 'valor'
+        )
+    )
+
+
+def _clave(h):
+    return (h['periodo_inicio'], h['periodo_fin'], h['proyecto_id'])
+
+
+class _Delta:
+    """Diferencias acumuladas para una fila del resumen."""
+
+    def __init__(self):
+        self.nominas = 0
+        self.anuladas = 0
+        self.totales = defaultdict(Decimal)
+        self.por_estado = defaultdict(lambda: [0, Decimal('0')])
+        self.conceptos = {}
+
+    def vacio(self) -> bool:
+        return (
+            not self.nominas
+            and not self.anuladas
+            and not any(self.totales.values())
+            and not any(c or t for c, t in self.por_estado.values())
+            and not any(valor for _, _, valor in self.conceptos.values())
+        )
+
+
+class AcumuladorResumen:
+    """
+    Acumula cambios de varias nóminas y los aplica con una escritura por
+    fila de resumen afectada.
+
+    Uso:
+        resumen = AcumuladorResumen(organization)
+        resumen.registrar(huella_antes, huella(nomina))
+        resumen.aplicar()
+    """
+
+    def __init__(self, organization):
+        self.organization_id = getattr(organization, 'pk', organization)
+        self._deltas = defaultdict(_Delta)
+
+    def registrar(self, antes, despues):
+        """Reemplaza el aporte ``antes`` por ``despues`` (cualquiera puede ser None)."""
+        if antes:
+            self._sumar(antes, -1)
+        if despues:
+            self._sumar(despues, 1)
+
+    def _sumar(self, h, signo):
+        delta = self._deltas[_clave(h)]
+        if h['estado'] == 'anulada':
+            delta.anuladas += signo
+            return
+        delta.nominas += signo
+        for campo in CAMPOS_TOTALES:
+            delta.totales[campo] += signo * (h[campo] or CERO)
+        por_estado = delta.por_estado[h['estado']]
+        por_estado[0] += signo
+        por_estado[1] += signo * (h['total_pagar'] or CERO)
+
+    def concepto(self, h, codigo, nombre, tipo, valor, signo=1):
+        """Suma (o resta) el valor de una línea de concepto de la nómina ``h``."""
+        if h['estado'] == 'anulada' or not valor:
+            return
+        conceptos = self._deltas[_clave(h)].conceptos
+        _, _, acumulado = conceptos.get(codigo, (nombre, tipo, Decimal('0')))
+        conceptos[codigo] = (nombre, tipo, acumulado + signo * valor)
+
+    def lineas(self, h, lineas, signo=1):
+        """Aplica ``concepto`` a una lista de (código, nombre, tipo, valor)."""
+        for codigo, nombre, tipo, valor in lineas:
+            self.concepto(h, codigo, nombre, tipo, valor, signo)
+
+    def aplicar(self):
+        """Escribe las diferencias acumuladas (bloqueando cada fila del resumen)."""
+        from .models import ResumenPeriodoNomina
+
+        deltas = {clave: delta for clave, delta in self._deltas.items() if not delta.vacio()}
+        self._deltas = defaultdict(_Delta)
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            # Orden fijo de bloqueo para evitar interbloqueos entre procesos
+            for clave in sorted(deltas, key=str):
+                resumen = self._bloquear(ResumenPeriodoNomina, clave)
+                self._aplicar_delta(ResumenPeriodoNomina, resumen, deltas[clave])
+
+    def _bloquear(self, modelo, clave):
+        periodo_inicio, periodo_fin, proyecto_id = clave
+        filas = modelo._base_manager.select_for_update().filter(
+            organization_id=self.organization_id,
+            periodo_inicio=periodo_inicio,
+            periodo_fin=periodo_fin,
+            proyecto_id=proyecto_id,
+        )
+        resumen = filas.first()
+        if resumen is None:
+            try:
+                with transaction.atomic():
+                    resumen = modelo._base_manager.create(
+                        organization_id=self.organization_id,
+                        periodo_inicio=periodo_inicio,
+                        periodo_fin=periodo_fin,
+                        proyecto_id=proyecto_id,
+                    )
+            except IntegrityError:
+                # Otro proceso creó la fila primero
+                resumen = filas.get()
+        return resumen
+
+    @staticmethod
+    def _aplicar_delta(modelo, resumen, delta):
+        cambios = {
+            'nominas': resumen.nominas + delta.nominas,
+            'anuladas': resumen.anuladas + delta.anuladas,
+        }
+        for campo in CAMPOS_TOTALES:
+            cambios[campo] = getattr(resumen, campo) + delta.totales[campo]
+        cambios['costo_total_empleador'] = sum(
+            (cambios[campo] for campo in CAMPOS_COSTO_EMPLEADOR), CERO
+        )
+
+        por_estado = dict(resumen.por_estado or {})
+        for estado, (cantidad, total) in delta.por_estado.items():
+            actual = por_estado.get(estado, {'cantidad': 0, 'total_pagar': '0'})
+            nuevo = {
+                'cantidad': actual['cantidad'] + cantidad,
+                'total_pagar': str(Decimal(actual['total_pagar']) + total),
+            }
+            if nuevo['cantidad']:
+                por_estado[estado] = nuevo
+            else:
+                por_estado.pop(estado, None)
+        cambios['por_estado'] = por_estado
+
+        conceptos = dict(resumen.conceptos or {})
+        for codigo, (nombre, tipo, valor) in delta.conceptos.items():
+            actual = Decimal(conceptos.get(codigo, {}).get('valor', '0')) + valor
+            if actual:
+                conceptos[codigo] = {'nombre': nombre, 'tipo': tipo, 'valor': str(actual)}
+            else:
+                conceptos.pop(codigo, None)
+        cambios['conceptos'] = conceptos
+
+        modelo._base_manager.filter(pk=resumen.pk).update(**cambios)
+
+
+def reconstruir_resumen(organization, modelos=None):
+    """
+    Recalcula desde cero el resumen de una organización.
+
+    Args:
+        organization: organización (o su id)
+        modelos: (ResumenPeriodoNomina, NominaSimple, modelos de líneas de
+            conceptos...); permite usar los modelos históricos desde una
+            migración. Por defecto las líneas se leen de ``NominaConcepto`` y
+            de su archivo (períodos cerrados).
+    """
+    if modelos is None:
+        from .models import ResumenPeriodoNomina, NominaSimple, NominaConcepto, NominaConceptoArchivo
+        modelos = (ResumenPeriodoNomina, NominaSimple, NominaConcepto, NominaConceptoArchivo)
+    Resumen, Nomina, *modelos_lineas = modelos
+    organization_id = getattr(organization, 'pk', organization)
+    clave = ['periodo_inicio', 'periodo_fin', 'proyecto_id']
+
+    filas = {}
+
+    def fila(valores):
+        k = tuple(valores[c] for c in clave)
+        if k not in filas:
+            filas[k] = Resumen(
+                organization_id=organization_id,
+                periodo_inicio=k[0], periodo_fin=k[1], proyecto_id=k[2],
+                por_estado={}, conceptos={},
+            )
+        return filas[k]
+
+    nominas = Nomina._base_manager.filter(organization_id=organization_id)
+    for grupo in nominas.values(*clave, 'estado').annotate(
+        cantidad=Count('id'), **{campo: Sum(campo) for campo in CAMPOS_TOTALES}
+    ):
+        resumen = fila(grupo)
+        if grupo['estado'] == 'anulada':
+            resumen.anuladas += grupo['cantidad']
+            continue
+        resumen.nominas += grupo['cantidad']
+        for campo in CAMPOS_TOTALES:
+            setattr(resumen, campo, getattr(resumen, campo) + (grupo[campo] or CERO))
+        resumen.por_estado[grupo['estado']] = {
+            'cantidad': grupo['cantidad'],
+            'total_pagar': str(grupo['total_pagar'] or CERO),
+        }
+
+    for Concepto in modelos_lineas:
+        lineas = Concepto._base_manager.filter(
+            organization_id=organization_id
+        ).exclude(nomina__estado='anulada').values(
+            'nomina__periodo_inicio', 'nomina__periodo_fin', 'nomina__proyecto_id',
+            'concepto__codigo', 'concepto__nombre', 'tipo',
+        ).annotate(valor=Sum('valor'))
+        for grupo in lineas:
+            resumen = fila({c: grupo[f'nomina__{c}'] for c in clave})
+            if not grupo['valor']:
+                continue
+            actual = resumen.conceptos.get(grupo['concepto__codigo'])
+            valor = grupo['valor'] + (Decimal(actual['valor']) if actual else 0)
+            resumen.conceptos[grupo['concepto__codigo']] = {
+                'nombre': grupo['concepto__nombre'],
+                'tipo': grupo['tipo'],
+                'valor': str(valor),
+            }
+
+    for resumen in filas.values():
+        resumen.costo_total_empleador = sum(
+            (getattr(resumen, campo) for campo in CAMPOS_COSTO_EMPLEADOR), CERO
+        )
+
+    with transaction.atomic():
+        Resumen._base_manager.filter(organization_id=organization_id).delete()
+        Resumen._base_manager.bulk_create(filas.values(), batch_size=500)
+    return len(filas)
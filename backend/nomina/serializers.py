@@ -26,6 +26,11 @@ from .models import (
     NominaItem,
     NominaConcepto,
     NominaPrestamo,
+    TrabajoCalculoNomina,
+    ResumenPeriodoNomina,
+    SaldoPrestacion,
+    MovimientoPrestacion,
+    CierrePeriodoNomina,
 )
 from locations.models import Departamento, Municipio
 
@@ -107,17 +112,16 @@ class EmpleadoListSerializer(serializers.ModelSerializer):
     
     def get_cargo_actual(self, obj):
         """Retorna el cargo del contrato activo"""
-        contrato = obj.contrato_activo
-        if contrato and contrato.cargo:
+        if obj.cargo_actual:
             return {
-                'id': contrato.cargo.id,
-                'nombre': contrato.cargo.nombre,
+                'id': obj.cargo_actual.id,
+                'nombre': obj.cargo_actual.nombre,
             }
         return None
     
     def get_contrato_activo(self, obj):
         """Retorna información básica del contrato activo"""
-        contrato = obj.contrato_activo
+        contrato = obj.contrato_actual
         if contrato:
             cargo_data = None
             if contrato.cargo:
@@ -192,17 +196,16 @@ class EmpleadoDetailSerializer(serializers.ModelSerializer):
     
     def get_cargo_actual(self, obj):
         """Retorna el cargo del contrato activo"""
-        contrato = obj.contrato_activo
-        if contrato and contrato.cargo:
+        if obj.cargo_actual:
             return {
-                'id': contrato.cargo.id,
-                'nombre': contrato.cargo.nombre,
+                'id': obj.cargo_actual.id,
+                'nombre': obj.cargo_actual.nombre,
             }
         return None
     
     def get_contrato_activo(self, obj):
         """Retorna información del contrato activo"""
-        contrato = obj.contrato_activo
+        contrato = obj.contrato_actual
         if contrato:
             return ContratoSerializer(contrato).data
         return None
@@ -524,6 +527,10 @@ class NominaSimpleListSerializer(serializers.ModelSerializer):
     empleado_nombre = serializers.CharField(source='contrato.empleado.nombre_completo', read_only=True)
     empleado_documento = serializers.CharField(source='contrato.empleado.numero_documento', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    # Anotados en SQL por NominaSimpleQuerySet.con_costos()
+    aportes_empleador = serializers.DecimalField(max_digits=16, decimal_places=2, read_only=True, default=None)
+    costo_empleador = serializers.DecimalField(max_digits=16, decimal_places=2, read_only=True, default=None)
+    provisiones_empleador = serializers.DecimalField(max_digits=16, decimal_places=2, read_only=True, default=None)
 
     class Meta:
         model = NominaSimple
@@ -531,8 +538,9 @@ class NominaSimpleListSerializer(serializers.ModelSerializer):
             'id', 'numero', 'contrato',
             'empleado_nombre', 'empleado_documento',
             'periodo_inicio', 'periodo_fin', 'fecha_pago',
-            'estado', 'estado_display',
+            'estado', 'estado_display', 'cerrada',
             'total_devengado', 'total_deducciones', 'total_pagar',
+            'aportes_empleador', 'costo_empleador', 'provisiones_empleador',
             'created_at',
         ]
         read_only_fields = [
@@ -565,7 +573,7 @@ class NominaSimpleDetailSerializer(serializers.ModelSerializer):
             'id', 'numero', 'contrato',
             'empleado_nombre', 'empleado_documento', 'tipo_contrato',
             'periodo_inicio', 'periodo_fin', 'fecha_pago',
-            'estado', 'estado_display',
+            'estado', 'estado_display', 'cerrada',
             # Valores calculados
             'salario_base', 'ibc',
             'total_items', 'total_devengado', 'total_deducciones',
@@ -589,13 +597,27 @@ class NominaSimpleDetailSerializer(serializers.ModelSerializer):
     
     def get_devengados(self, obj):
         """Retorna solo los conceptos de tipo DEVENGADO"""
+        if obj.cerrada:
+            return [c for c in obj.snapshot.conceptos if c['tipo'] == 'DEVENGADO']
         conceptos = obj.conceptos.filter(tipo='DEVENGADO')
         return NominaConceptoSerializer(conceptos, many=True).data
     
     def get_deducciones(self, obj):
         """Retorna solo los conceptos de tipo DEDUCCION"""
+        if obj.cerrada:
+            return [c for c in obj.snapshot.conceptos if c['tipo'] == 'DEDUCCION']
         conceptos = obj.conceptos.filter(tipo='DEDUCCION')
         return NominaConceptoSerializer(conceptos, many=True).data
+    
+    def to_representation(self, instance):
+        """Las nóminas de períodos cerrados se sirven desde su snapshot."""
+        data = super().to_representation(instance)
+        if instance.cerrada:
+            snapshot = instance.snapshot
+            for campo in ('empleado_nombre', 'empleado_documento', 'tipo_contrato',
+                          'items', 'conceptos', 'prestamos'):
+                data[campo] = getattr(snapshot, campo)
+        return data
 
 
 class NominaSimpleCreateSerializer(serializers.ModelSerializer):
@@ -635,8 +657,15 @@ class NominaSimpleCreateSerializer(serializers.ModelSerializer):
                 'periodo_fin': 'El fin del período debe ser posterior al inicio.'
             })
         
-        # Validar que no exista nómina con período solapado
+        # Los períodos cerrados no admiten cambios
+        from .cierre_periodo import periodo_cerrado
         organization = self.context['request'].user.organization
+        if self.instance is not None and self.instance.cerrada:
+            raise serializers.ValidationError('La nómina pertenece a un período cerrado.')
+        if periodo_inicio and periodo_fin and periodo_cerrado(organization, periodo_inicio, periodo_fin):
+            raise serializers.ValidationError('El período está cerrado.')
+        
+        # Validar que no exista nómina con período solapado
         if contrato and periodo_inicio and periodo_fin:
             solapada = NominaSimple.objects.filter(
                 organization=organization,
@@ -732,6 +761,172 @@ class CalculoNominaSerializer(serializers.Serializer):
             raise serializers.ValidationError('Nómina no encontrada.')
 
 
+class SimulacionNominaSerializer(serializers.Serializer):
+    """Serializer para simular una nómina sin guardarla"""
+    
+    contrato = serializers.PrimaryKeyRelatedField(queryset=Contrato.objects.all())
+    periodo_inicio = serializers.DateField()
+    periodo_fin = serializers.DateField()
+    items = NominaItemCreateSerializer(many=True, required=False)
+    conceptos_seleccionados = serializers.ListField(
+        child=serializers.CharField(), required=False, default=list
+    )
+    prestamos_seleccionados = serializers.ListField(
+        child=serializers.CharField(), required=False, allow_null=True, default=None
+    )
+    cuotas_a_descontar = serializers.DictField(
+        child=serializers.IntegerField(min_value=1), required=False, default=dict
+    )
+    tiene_deduccion_restaurante = serializers.BooleanField(required=False, default=False)
+    valor_restaurante = serializers.DecimalField(
+        max_digits=12, decimal_places=2, required=False, default=Decimal('0.00')
+    )
+    incluir_salario_base = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, attrs):
+        """Validaciones de la simulación"""
+        organization = self.context['request'].user.organization
+        if attrs['contrato'].organization_id != organization.id:
+            raise serializers.ValidationError({'contrato': 'Contrato no encontrado.'})
+        if attrs['periodo_fin'] < attrs['periodo_inicio']:
+            raise serializers.ValidationError({
+                'periodo_fin': 'El fin del período debe ser posterior al inicio.'
+            })
+        return attrs
+
+
+class EscenarioCostoSerializer(serializers.Serializer):
+    """Escenario hipotético para el simulador de costo empleador"""
+    
+    NIVELES_ARL = ['I', 'II', 'III', 'IV', 'V']
+    
+    nombre = serializers.CharField(max_length=100, required=False, default='Escenario')
+    smmlv = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, allow_null=True, default=None)
+    auxilio_transporte = serializers.DecimalField(
+        max_digits=12, decimal_places=2, required=False, allow_null=True, default=None
+    )
+    porcentajes = serializers.DictField(
+        child=serializers.DecimalField(max_digits=6, decimal_places=3, min_value=Decimal('0')),
+        required=False, default=dict
+    )
+    nivel_arl = serializers.JSONField(required=False, allow_null=True, default=None)
+    incremento_salarial = serializers.DecimalField(
+        max_digits=6, decimal_places=2, required=False, default=Decimal('0')
+    )
+    indexar_salario_minimo = serializers.BooleanField(required=False, default=True)
+    
+    def validate_porcentajes(self, value):
+        from .simulador_costos import PARAMETROS_EMPLEADOR
+        invalidos = sorted(set(value) - set(PARAMETROS_EMPLEADOR))
+        if invalidos:
+            raise serializers.ValidationError(f'Conceptos no soportados: {", ".join(invalidos)}')
+        return value
+    
+    def validate_nivel_arl(self, value):
+        if value is None:
+            return value
+        niveles = [value] if isinstance(value, str) else (
+            list(value.keys()) + list(value.values()) if isinstance(value, dict) else None
+        )
+        if niveles is None or any(n not in self.NIVELES_ARL for n in niveles):
+            raise serializers.ValidationError('Use un nivel (I-V) o un mapeo {"I": "II", ...}.')
+        return value
+
+
+class SimulacionCostosSerializer(serializers.Serializer):
+    """Serializer para el simulador de costo empleador"""
+    
+    fecha = serializers.DateField(required=False)
+    escenarios = EscenarioCostoSerializer(many=True)
+    
+    def validate_escenarios(self, value):
+        if not value:
+            raise serializers.ValidationError('Envíe al menos un escenario.')
+        return value
+
+
+class TrabajoCalculoNominaSerializer(serializers.ModelSerializer):
+    """Serializer para el estado de un cálculo de período en segundo plano"""
+    
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    porcentaje = serializers.FloatField(read_only=True)
+    eta_segundos = serializers.IntegerField(read_only=True, allow_null=True)
+    ws_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TrabajoCalculoNomina
+        fields = [
+            'id', 'periodo_inicio', 'periodo_fin', 'proyecto',
+            'estado', 'estado_display', 'total', 'procesadas', 'calculadas',
+            'total_bloques', 'bloques_completados', 'porcentaje', 'eta_segundos',
+            'errores', 'iniciado_at', 'finalizado_at', 'created_at', 'ws_url',
+        ]
+        read_only_fields = fields
+    
+    def get_ws_url(self, obj):
+        return f"/ws/nomina/trabajos/{obj.id}/"
+
+
+class ResumenPeriodoNominaSerializer(serializers.ModelSerializer):
+    """Serializer para el resumen materializado de un período"""
+    
+    class Meta:
+        model = ResumenPeriodoNomina
+        fields = [
+            'periodo_inicio', 'periodo_fin', 'proyecto', 'nominas', 'anuladas',
+            'total_devengado', 'total_deducciones', 'total_prestamos', 'total_pagar',
+            'aporte_salud_empleador', 'aporte_pension_empleador', 'aporte_arl',
+            'aporte_caja', 'aporte_sena', 'aporte_icbf', 'costo_total_empleador',
+            'por_estado', 'conceptos', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class SaldoPrestacionSerializer(serializers.ModelSerializer):
+    """Serializer para el saldo de una prestación social de un empleado"""
+    
+    concepto_display = serializers.CharField(source='get_concepto_display', read_only=True)
+    
+    class Meta:
+        model = SaldoPrestacion
+        fields = [
+            'concepto', 'concepto_display', 'saldo', 'causado', 'pagado',
+            'movimientos', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class MovimientoPrestacionSerializer(serializers.ModelSerializer):
+    """Serializer para un movimiento del libro de prestaciones"""
+    
+    concepto_display = serializers.CharField(source='get_concepto_display', read_only=True)
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    
+    class Meta:
+        model = MovimientoPrestacion
+        fields = [
+            'id', 'concepto', 'concepto_display', 'tipo', 'tipo_display',
+            'fecha', 'base', 'valor', 'saldo', 'secuencia', 'nomina',
+            'contrato', 'descripcion', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class CierrePeriodoNominaSerializer(serializers.ModelSerializer):
+    """Serializer para el cierre de un período de nómina"""
+    
+    cerrado_por_nombre = serializers.CharField(source='cerrado_por.get_full_name', read_only=True, default='')
+    
+    class Meta:
+        model = CierrePeriodoNomina
+        fields = [
+            'id', 'periodo_inicio', 'periodo_fin', 'nominas',
+            'total_pagar', 'costo_total_empleador',
+            'cerrado_por', 'cerrado_por_nombre', 'created_at',
+        ]
+        read_only_fields = fields
+
+
 class ResumenNominaSerializer(serializers.Serializer):
     """Serializer para resumen de cálculo"""
     
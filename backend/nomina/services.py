@@ -21,27 +21,208 @@ Versión: 2.0.0
 Fecha: Febrero 2026
 """
 
+import hashlib
+import json
 import logging
+from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Q
 
 from .models import (
     NominaSimple,
+    NominaItem,
     NominaConcepto,
     NominaPrestamo,
+    NominaPrestamoArchivo,
     ParametroLegal,
     ConceptoLaboral,
 )
+from .cache_normativa import obtener_snapshot
 
 logger = logging.getLogger(__name__)
 
 
+# Estados de préstamo que se descuentan en nómina
+ESTADOS_PRESTAMO_DESCONTABLE = ['aprobado', 'desembolsado', 'activo', 'en_mora']
+
+
 class NominaValidationError(Exception):
     """Error de validación de nómina con mensajes claros para el usuario."""
     pass
 
 
+# Incrementar cuando cambien las reglas de cálculo: invalida todas las huellas guardadas
+VERSION_REGLAS = 1
+
+# Campos de NominaSimple que configuran el cálculo (además de items y préstamos)
+CAMPOS_ENTRADA_NOMINA = [
+    'periodo_inicio',
+    'periodo_fin',
+    'incluir_salario_base',
+    'conceptos_seleccionados',
+    'prestamos_seleccionados',
+    'cuotas_a_descontar',
+    'tiene_deduccion_restaurante',
+    'valor_restaurante',
+]
+
+# Provisión de prestaciones -> (parámetro legal, la base incluye auxilio de transporte)
+PROVISIONES = {
+    'cesantias': ('CESANTIAS', True),
+    'intereses_cesantias': ('INTERESES_CESANTIAS', True),
+    'prima': ('PRIMA_SERVICIOS', True),
+    'vacaciones': ('VACACIONES', False),
+}
+
+# Campos comparados para decidir si una línea guardada cambió
+CAMPOS_NOMINA_CONCEPTO = ['base', 'porcentaje_aplicado', 'valor', 'tipo']
+CAMPOS_NOMINA_PRESTAMO = ['valor_cuota']
+
+
+def filtro_conceptos_gestionados(concepto_ids) -> Q:
+    """
+    Filtro de las líneas NominaConcepto que el calculador gestiona:
+    conceptos no legales y los conceptos que recalculó o retiró.
+    """
+    return Q(concepto__es_legal=False) | Q(concepto_id__in=concepto_ids)
+
+
+def _diferencias(previas: dict, nuevas: dict, campos: list, crear: list, actualizar: list, eliminar: list):
+    """
+    Compara líneas guardadas contra calculadas (ambas indexadas por la misma
+    clave) y reparte el resultado en inserciones, actualizaciones y borrados.
+    """
+    for clave, nueva in nuevas.items():
+        previa = previas.pop(clave, None)
+        if previa is None:
+            crear.append(nueva)
+        elif any(getattr(previa, campo) != getattr(nueva, campo) for campo in campos):
+            for campo in campos:
+                setattr(previa, campo, getattr(nueva, campo))
+            actualizar.append(previa)
+    eliminar.extend(linea.id for linea in previas.values())
+
+
+def sincronizar_lineas(organization, calculadores, resumen=None) -> dict:
+    """
+    Persiste las líneas calculadas comparándolas con las guardadas: solo se
+    insertan, actualizan o eliminan las filas que cambiaron.
+    
+    Líneas gestionadas por el calculador:
+    - Conceptos no legales y conceptos recalculados o retirados (las líneas
+      legales que el calculador no tocó se conservan).
+    - Todas las cuotas de préstamo, identificadas por (préstamo, cuota).
+    
+    Funciona igual para una nómina o para un lote: usa un número fijo de
+    consultas.
+    
+    La diferencia de valor por concepto se suma al resumen del período
+    (``resumen``: un ``AcumuladorResumen``; si no se pasa, se aplica aquí).
+    
+    Returns:
+        dict: cantidad de filas insertadas, actualizadas y eliminadas
+    """
+    from .resumen_periodo import AcumuladorResumen, huella
+    
+    por_nomina = {c.nomina.id: c for c in calculadores}
+    gestionados = {nomina_id: c.conceptos_gestionados_ids() for nomina_id, c in por_nomina.items()}
+    
+    conceptos_guardados = defaultdict(dict)
+    for linea in NominaConcepto.objects.for_tenant(organization).filter(
+        filtro_conceptos_gestionados(set().union(*gestionados.values())),
+        nomina_id__in=por_nomina.keys(),
+    ).select_related('concepto'):
+        if linea.concepto.es_legal and linea.concepto_id not in gestionados[linea.nomina_id]:
+            continue
+        conceptos_guardados[linea.nomina_id][linea.concepto_id] = linea
+    
+    prestamos_guardados = defaultdict(dict)
+    prestamos_duplicados = []
+    for linea in NominaPrestamo.objects.for_tenant(organization).filter(
+        nomina_id__in=por_nomina.keys()
+    ):
+        clave = (linea.prestamo_id, linea.numero_cuota)
+        if clave in prestamos_guardados[linea.nomina_id]:
+            prestamos_duplicados.append(linea.id)
+            continue
+        prestamos_guardados[linea.nomina_id][clave] = linea
+    
+    aplicar_resumen = resumen is None
+    if aplicar_resumen:
+        resumen = AcumuladorResumen(organization)
+    
+    conceptos_crear, conceptos_actualizar, conceptos_eliminar = [], [], []
+    prestamos_crear, prestamos_actualizar, prestamos_eliminar = [], [], prestamos_duplicados
+    for nomina_id, calculador in por_nomina.items():
+        h = huella(calculador.nomina)
+        for lineas, signo in ((conceptos_guardados[nomina_id].values(), -1),
+                              (calculador.conceptos_calculados.values(), 1)):
+            for linea in lineas:
+                resumen.concepto(
+                    h, linea.concepto.codigo, linea.concepto.nombre, linea.tipo, linea.valor, signo
+                )
+        _diferencias(
+            conceptos_guardados[nomina_id], calculador.conceptos_calculados,
+            CAMPOS_NOMINA_CONCEPTO, conceptos_crear, conceptos_actualizar, conceptos_eliminar
+        )
+        _diferencias(
+            prestamos_guardados[nomina_id],
+            {(p.prestamo_id, p.numero_cuota): p for p in calculador.prestamos_calculados},
+            CAMPOS_NOMINA_PRESTAMO, prestamos_crear, prestamos_actualizar, prestamos_eliminar
+        )
+    
+    if conceptos_eliminar:
+        NominaConcepto.objects.for_tenant(organization).filter(id__in=conceptos_eliminar).delete()
+    if prestamos_eliminar:
+        NominaPrestamo.objects.for_tenant(organization).filter(id__in=prestamos_eliminar).delete()
+    if conceptos_crear:
+        NominaConcepto.objects.bulk_create(conceptos_crear, batch_size=1000)
+    if prestamos_crear:
+        NominaPrestamo.objects.bulk_create(prestamos_crear, batch_size=1000)
+    if conceptos_actualizar:
+        NominaConcepto.objects.for_tenant(organization).bulk_update(
+            conceptos_actualizar, CAMPOS_NOMINA_CONCEPTO, batch_size=1000
+        )
+    if prestamos_actualizar:
+        NominaPrestamo.objects.for_tenant(organization).bulk_update(
+            prestamos_actualizar, CAMPOS_NOMINA_PRESTAMO, batch_size=1000
+        )
+    
+    if aplicar_resumen:
+        resumen.aplicar()
+    
+    return {
+        'insertadas': len(conceptos_crear) + len(prestamos_crear),
+        'actualizadas': len(conceptos_actualizar) + len(prestamos_actualizar),
+        'eliminadas': len(conceptos_eliminar) + len(prestamos_eliminar),
+    }
+
+
+def calcular_provisiones(normativa, fecha, devengado_base, auxilio_transporte) -> dict:
+    """
+    Provisiones de prestaciones sociales a cargo del empleador.
+    
+    - Cesantías, intereses y prima: sobre el devengado base más el
+      auxilio de transporte.
+    - Vacaciones: sobre el devengado base.
+    
+    Returns:
+        dict: {provisión: (base, valor)} solo para los parámetros vigentes
+    """
+    provisiones = {}
+    for clave, (codigo, con_auxilio) in PROVISIONES.items():
+        param = normativa.parametro(codigo, fecha)
+        if param:
+            base = devengado_base + auxilio_transporte if con_auxilio else devengado_base
+            valor = (base * param.porcentaje_empleador / Decimal('100')).quantize(
+                Decimal('0.01'), rounding=ROUND_HALF_UP
+            )
+            provisiones[clave] = (base, valor)
+    return provisiones
+
+
 class CalculadorNomina:
     """
     Servicio para calcular la nómina de un empleado.
@@ -52,40 +233,157 @@ class CalculadorNomina:
     - Cuenta solo cuotas de nóminas PAGADAS como descontadas
     - Compara ingreso real contra 2 SMMLV para auxilio de transporte
     
+    El cálculo ocurre en dos fases:
+    1. Reglas: se construyen en memoria las líneas de conceptos y préstamos
+       (``conceptos_calculados`` y ``prestamos_calculados``).
+    2. Persistencia: solo se escriben en BD las líneas que cambiaron
+       (``_persistir`` / ``sincronizar_lineas``).
+    
+    Antes de calcular se obtiene la huella de las entradas
+    (``huella_entradas``). Si la nómina ya está calculada con la misma
+    huella, el resultado guardado sigue vigente y no se escribe nada.
+    
+    Parámetros legales y conceptos laborales se leen de la caché versionada
+    de normativa (``cache_normativa``). Items y préstamos pasan por métodos
+    ``_obtener_*`` que usan ``datos`` (precargados por el cálculo por lotes)
+    si se entregan.
+    
     Uso:
         calculador = CalculadorNomina(nomina)
         resultado = calculador.calcular()
     """
     
-    def __init__(self, nomina: NominaSimple):
+    def __init__(self, nomina: NominaSimple, datos=None, items=None):
         self.nomina = nomina
+        self.datos = datos
+        self._items = items
+        self._prestamos = None
+        self._cuotas_pagadas = {}
         self.contrato = nomina.contrato
         self.empleado = nomina.contrato.empleado
         self.tipo_contrato = nomina.contrato.tipo_contrato
         self.organization = nomina.organization
         self.fecha_calculo = nomina.periodo_fin or timezone.now().date()
         
-        # Caché de parámetros legales
-        self._parametros_cache = {}
+        # Parámetros legales y conceptos laborales (caché versionada por organización)
+        self.normativa = datos.normativa if datos is not None else obtener_snapshot(self.organization)
+        
+        # Líneas calculadas (aún no persistidas)
+        self.conceptos_calculados = {}
+        self.conceptos_retirados = set()
+        self.prestamos_calculados = []
         
         # Acumuladores
         self.total_devengado = Decimal('0.00')
         self.total_deducciones = Decimal('0.00')
         self.total_items = Decimal('0.00')
         self.total_prestamos = Decimal('0.00')
+        self.devengado_base = Decimal('0.00')
+        self.auxilio_transporte = Decimal('0.00')
+        self.provisiones = {}
         
         # Errores de validación (advertencias no fatales)
         self.advertencias = []
     
     def _obtener_parametro(self, concepto: str) -> ParametroLegal:
-        """Obtiene un parámetro legal de la caché o BD."""
-        if concepto not in self._parametros_cache:
-            self._parametros_cache[concepto] = ParametroLegal.obtener_vigente(
-                self.organization,
-                concepto,
-                self.fecha_calculo
-            )
-        return self._parametros_cache[concepto]
+        """Obtiene el parámetro legal vigente a la fecha de cálculo."""
+        return self.normativa.parametro(concepto, self.fecha_calculo)
+    
+    def _obtener_concepto(self, *codigos, solo_activos=True):
+        """Obtiene el concepto laboral con alguno de los códigos dados."""
+        return self.normativa.concepto(codigos, solo_activos=solo_activos)
+    
+    def _obtener_conceptos_seleccionados(self, tipo: str, incluir_legales=True) -> list:
+        """Conceptos activos del tipo dado elegidos por el usuario, ordenados."""
+        seleccionados = getattr(self.nomina, 'conceptos_seleccionados', None) or []
+        if not seleccionados:
+            return []
+        return self.normativa.conceptos_seleccionados(
+            tipo, seleccionados, incluir_legales=incluir_legales
+        )
+    
+    def _obtener_items(self) -> list:
+        """Items de trabajo de la nómina (o los hipotéticos de una simulación)."""
+        if self._items is not None:
+            return self._items
+        if self.datos is not None:
+            return self.datos.items(self.nomina.id)
+        # Se guardan: la huella y las reglas leen los mismos items
+        self._items = list(self.nomina.items.all())
+        return self._items
+    
+    def _obtener_prestamos(self) -> list:
+        """Préstamos vigentes del empleado (filtrados por la selección de la nómina)."""
+        if self._prestamos is None:
+            self._prestamos = self._consultar_prestamos()
+        return self._prestamos
+    
+    def _consultar_prestamos(self) -> list:
+        if self.datos is not None:
+            return self.datos.prestamos(self.empleado.id, self.nomina.prestamos_seleccionados)
+        
+        from prestamos.models import Prestamo
+        
+        prestamos = Prestamo.objects.filter(
+            organization=self.organization,
+            empleado=self.empleado,
+            estado__in=ESTADOS_PRESTAMO_DESCONTABLE
+        )
+
+        seleccionados = getattr(self.nomina, 'prestamos_seleccionados', None)
+        if seleccionados is not None:
+            if len(seleccionados) == 0:
+                return []
+            prestamos = prestamos.filter(id__in=seleccionados)
+        return list(prestamos)
+    
+    def _contar_cuotas_pagadas(self, prestamo) -> int:
+        """
+        Cuotas REALMENTE pagadas de un préstamo: el mayor entre pagos
+        directos registrados y cuotas descontadas en nóminas PAGADAS.
+        """
+        if self.datos is not None:
+            return self.datos.cuotas_pagadas(prestamo.id)
+        if prestamo.id not in self._cuotas_pagadas:
+            self._cuotas_pagadas[prestamo.id] = self._consultar_cuotas_pagadas(prestamo)
+        return self._cuotas_pagadas[prestamo.id]
+    
+    def _consultar_cuotas_pagadas(self, prestamo) -> int:
+        # Pagos directos registrados
+        cuotas_pagadas = prestamo.pagos.count()
+        
+        # Cuotas descontadas en nóminas que ya fueron PAGADAS
+        # (excluir la nómina actual para no doble-contar al recalcular)
+        cuotas_en_nominas_pagadas = NominaPrestamo.objects.filter(
+            prestamo=prestamo,
+            nomina__estado='pagada'
+        ).exclude(
+            nomina_id=self.nomina.pk
+        ).count() + NominaPrestamoArchivo.objects.filter(
+            prestamo=prestamo,
+            nomina__estado='pagada'
+        ).count()
+        
+        return max(cuotas_pagadas, cuotas_en_nominas_pagadas)
+    
+    def _registrar_concepto(self, concepto: ConceptoLaboral, tipo: str,
+                            base: Decimal, porcentaje: Decimal, valor: Decimal):
+        """Agrega (o reemplaza) la línea de un concepto en memoria."""
+        self.conceptos_retirados.discard(concepto.id)
+        self.conceptos_calculados[concepto.id] = NominaConcepto(
+            organization=self.organization,
+            nomina=self.nomina,
+            concepto=concepto,
+            base=base,
+            porcentaje_aplicado=porcentaje,
+            valor=valor,
+            tipo=tipo,
+        )
+    
+    def _retirar_concepto(self, concepto: ConceptoLaboral):
+        """Marca un concepto que ya no aplica para eliminar su línea guardada."""
+        self.conceptos_calculados.pop(concepto.id, None)
+        self.conceptos_retirados.add(concepto.id)
     
     def _redondear(self, valor: Decimal) -> Decimal:
         """Redondea a 2 decimales"""
@@ -119,11 +417,7 @@ class CalculadorNomina:
         # Validar conceptos legales necesarios según tipo de contrato
         if self.tipo_contrato:
             if self.tipo_contrato.aplica_salud:
-                concepto = ConceptoLaboral.objects.filter(
-                    organization=self.organization,
-                    codigo='SALUD_EMPLEADO',
-                    activo=True
-                ).first()
+                concepto = self._obtener_concepto('SALUD_EMPLEADO')
                 if not concepto:
                     errores.append(
                         'No existe el concepto laboral "SALUD_EMPLEADO". '
@@ -137,11 +431,7 @@ class CalculadorNomina:
                     )
             
             if self.tipo_contrato.aplica_pension:
-                concepto = ConceptoLaboral.objects.filter(
-                    organization=self.organization,
-                    codigo='PENSION_EMPLEADO',
-                    activo=True
-                ).first()
+                concepto = self._obtener_concepto('PENSION_EMPLEADO')
                 if not concepto:
                     errores.append(
                         'No existe el concepto laboral "PENSION_EMPLEADO". '
@@ -181,11 +471,103 @@ class CalculadorNomina:
     @transaction.atomic
     def calcular(self) -> dict:
         """
-        Ejecuta el cálculo completo de la nómina.
+        Ejecuta el cálculo completo de la nómina y lo persiste.
+        
+        Si las entradas no cambiaron desde el último cálculo no se aplican
+        las reglas ni se escribe nada: el resumen se arma con los totales y
+        líneas guardados e incluye ``sin_cambios: True``.
         
         Returns:
             dict: Resumen del cálculo
             
+        Raises:
+            NominaValidationError: Si faltan configuraciones necesarias
+        """
+        huella = self.huella_entradas()
+        if self.sin_cambios(huella):
+            self._cargar_calculo_guardado()
+            resumen = self._generar_resumen()
+            resumen['sin_cambios'] = True
+            return resumen
+        
+        self.aplicar_reglas()
+        self.nomina.huella_calculo = huella
+        self._persistir()
+        return self._generar_resumen()
+    
+    def huella_entradas(self) -> str:
+        """
+        Hash estable de todo lo que determina el resultado del cálculo:
+        configuración de la nómina, términos del contrato, items, estado de
+        los préstamos y normativa vigente a la fecha de cálculo.
+        """
+        tipo = self.tipo_contrato
+        entradas = {
+            'reglas': VERSION_REGLAS,
+            'nomina': [getattr(self.nomina, campo, None) for campo in CAMPOS_ENTRADA_NOMINA],
+            'contrato': [
+                self.contrato.id, self.contrato.salario, self.contrato.nivel_arl,
+                tipo.id, tipo.ibc_porcentaje, tipo.aplica_salud, tipo.aplica_pension,
+                tipo.aplica_arl, tipo.aplica_parafiscales,
+            ] if tipo else [self.contrato.id],
+            'items': sorted(
+                [str(item.id), str(item.item_id), str(item.cantidad),
+                 str(item.valor_unitario), str(item.valor_total)]
+                for item in self._obtener_items()
+            ),
+            'prestamos': sorted(
+                [str(p.id), p.estado, str(p.fecha_primer_pago), str(p.plazo_meses),
+                 str(p.cuota_mensual), str(p.updated_at), self._contar_cuotas_pagadas(p)]
+                for p in self._obtener_prestamos()
+            ),
+            'normativa': self.normativa.huella(self.fecha_calculo),
+        }
+        contenido = json.dumps(entradas, sort_keys=True, default=str)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    
+    def sin_cambios(self, huella: str) -> bool:
+        """True si la nómina ya está calculada con exactamente estas entradas."""
+        return self.nomina.estado == 'calculada' and self.nomina.huella_calculo == huella
+    
+    def _cargar_calculo_guardado(self, lineas=None):
+        """
+        Carga las líneas guardadas y deriva las provisiones de los totales
+        guardados (sin aplicar las reglas) para armar el resumen.
+        
+        Args:
+            lineas: líneas guardadas ya precargadas (cálculo por lotes); si
+                es None se consultan
+        """
+        from .prestaciones import CODIGOS_AUXILIO
+        
+        if lineas is None:
+            lineas = NominaConcepto.objects.for_tenant(self.organization).filter(
+                nomina=self.nomina
+            ).select_related('concepto')
+        self.conceptos_calculados = {linea.concepto_id: linea for linea in lineas}
+        if not (self.tipo_contrato and self.tipo_contrato.aplica_parafiscales):
+            return
+        
+        self.devengado_base = NominaSimple.calcular_devengado_base(
+            self.nomina.salario_base, self.nomina.total_items,
+            getattr(self.nomina, 'incluir_salario_base', False)
+        )
+        self.auxilio_transporte = sum(
+            (
+                linea.valor for linea in self.conceptos_calculados.values()
+                if linea.tipo == 'DEVENGADO' and linea.concepto.codigo in CODIGOS_AUXILIO
+            ),
+            Decimal('0.00')
+        )
+        self._calcular_provisiones()
+    
+    def aplicar_reglas(self):
+        """
+        Aplica todas las reglas de cálculo sin escribir en BD.
+        
+        Deja los totales en ``self.nomina`` y las líneas en
+        ``conceptos_calculados`` / ``prestamos_calculados``.
+        
         Raises:
             NominaValidationError: Si faltan configuraciones necesarias
         """
@@ -203,13 +585,10 @@ class CalculadorNomina:
         self._calcular_items()
         
         # 3. Calcular devengado inicial (items por defecto)
-        incluir_salario = getattr(self.nomina, 'incluir_salario_base', False)
-        if self.total_items == 0:
-            self.total_devengado = salario
-        elif incluir_salario:
-            self.total_devengado = salario + self.total_items
-        else:
-            self.total_devengado = self.total_items
+        self.total_devengado = NominaSimple.calcular_devengado_base(
+            salario, self.total_items, getattr(self.nomina, 'incluir_salario_base', False)
+        )
+        self.devengado_base = self.total_devengado
         
         # 4. Calcular auxilio de transporte (si aplica)
         self._calcular_auxilio_transporte()
@@ -232,20 +611,66 @@ class CalculadorNomina:
         # 9. Calcular aportes empleador (informativos)
         self._calcular_aportes_empleador()
         
+        # 9.1 Calcular provisiones de prestaciones sociales (informativas)
+        self._calcular_provisiones()
+        
         # 10. Calcular totales finales
         self._calcular_totales()
         
         # 11. Actualizar estado
         self.nomina.estado = 'calculada'
         self.nomina.calculada_at = timezone.now()
-        self.nomina.save()
+    
+    def simular(self) -> dict:
+        """
+        Calcula la nómina en modo simulación: aplica todas las reglas y
+        devuelve el resumen sin abrir transacción ni escribir en BD.
         
-        return self._generar_resumen()
+        Returns:
+            dict: Resumen del cálculo (incluye provisiones)
+            
+        Raises:
+            NominaValidationError: Si faltan configuraciones necesarias
+        """
+        self.aplicar_reglas()
+        resumen = self._generar_resumen()
+        resumen['conceptos'] = [
+            {
+                'codigo': linea.concepto.codigo,
+                'nombre': linea.concepto.nombre,
+                'tipo': linea.tipo,
+                'base': linea.base,
+                'porcentaje_aplicado': linea.porcentaje_aplicado,
+                'valor': linea.valor,
+            }
+            for linea in self.conceptos_calculados.values()
+        ]
+        resumen['prestamos'] = [
+            {
+                'prestamo': str(linea.prestamo_id),
+                'numero_cuota': linea.numero_cuota,
+                'valor_cuota': linea.valor_cuota,
+            }
+            for linea in self.prestamos_calculados
+        ]
+        return resumen
+    
+    def _persistir(self):
+        """
+        Guarda la nómina y sincroniza sus líneas gestionadas por el calculador
+        (ver ``sincronizar_lineas``).
+        """
+        self.nomina.save()
+        sincronizar_lineas(self.organization, [self])
+    
+    def conceptos_gestionados_ids(self) -> set:
+        """IDs de conceptos cuyas líneas guardadas debe reemplazar el cálculo."""
+        return set(self.conceptos_calculados) | self.conceptos_retirados
     
     def _calcular_items(self):
         """Calcula el total de items de trabajo"""
-        items = self.nomina.items.all()
-        self.total_items = sum(item.valor_total for item in items)
+        items = self._obtener_items()
+        self.total_items = sum((item.valor_total for item in items), Decimal('0.00'))
         self.nomina.total_items = self.total_items
     
     def _calcular_auxilio_transporte(self):
@@ -277,11 +702,7 @@ class CalculadorNomina:
         ingreso_real = self.total_devengado
         
         # Buscar concepto existente (NO crear automáticamente)
-        concepto_aux = ConceptoLaboral.objects.filter(
-            organization=self.organization,
-            codigo__in=['AUX_TRANSPORTE', 'AUXILIO_TRANSPORTE'],
-            activo=True
-        ).first()
+        concepto_aux = self._obtener_concepto('AUX_TRANSPORTE', 'AUXILIO_TRANSPORTE')
         
         if ingreso_real <= (smmlv * 2):
             if not concepto_aux:
@@ -291,41 +712,20 @@ class CalculadorNomina:
                 )
                 return
 
-            NominaConcepto.objects.update_or_create(
-                organization=self.organization,
-                nomina=self.nomina,
-                concepto=concepto_aux,
-                defaults={
-                    'base': ingreso_real,
-                    'porcentaje_aplicado': Decimal('0'),
-                    'valor': aux_transporte,
-                    'tipo': 'DEVENGADO',
-                }
+            self._registrar_concepto(
+                concepto_aux, 'DEVENGADO', ingreso_real, Decimal('0'), aux_transporte
             )
             self.total_devengado += aux_transporte
+            self.auxilio_transporte = aux_transporte
         else:
             # Si no aplica, limpiar concepto de auxilio si existía
             if concepto_aux:
-                self.nomina.conceptos.filter(concepto=concepto_aux).delete()
+                self._retirar_concepto(concepto_aux)
     
     def _calcular_conceptos_devengados(self):
         """Calcula conceptos laborales de tipo DEVENGADO seleccionados por el usuario"""
-        # Limpiar conceptos devengados anteriores (no legales)
-        self.nomina.conceptos.filter(
-            tipo='DEVENGADO',
-            concepto__es_legal=False
-        ).delete()
-
-        seleccionados = getattr(self.nomina, 'conceptos_seleccionados', None) or []
-        if not seleccionados:
-            return
-
-        conceptos = ConceptoLaboral.objects.filter(
-            organization=self.organization,
-            tipo='DEVENGADO',
-            activo=True,
-            id__in=seleccionados,
-        ).order_by('orden')
+        # Las líneas no legales anteriores se reemplazan al persistir
+        conceptos = self._obtener_conceptos_seleccionados('DEVENGADO')
         
         for concepto in conceptos:
             if concepto.base_calculo == 'SALARIO':
@@ -338,16 +738,10 @@ class CalculadorNomina:
             valor = concepto.calcular_valor(base)
             
             if valor > 0:
-                NominaConcepto.objects.update_or_create(
-                    organization=self.organization,
-                    nomina=self.nomina,
-                    concepto=concepto,
-                    defaults={
-                        'base': base,
-                        'porcentaje_aplicado': concepto.porcentaje if concepto.aplica_porcentaje else Decimal('0'),
-                        'valor': valor,
-                        'tipo': 'DEVENGADO',
-                    }
+                self._registrar_concepto(
+                    concepto, 'DEVENGADO', base,
+                    concepto.porcentaje if concepto.aplica_porcentaje else Decimal('0'),
+                    valor
                 )
                 self.total_devengado += valor
     
@@ -387,11 +781,7 @@ class CalculadorNomina:
             param_tope_fsp = self._obtener_parametro('TOPE_FSP')
             param_fsp = self._obtener_parametro('FSP')
             if param_tope_fsp and param_fsp and ibc > param_tope_fsp.valor_fijo:
-                concepto_fsp = ConceptoLaboral.objects.filter(
-                    organization=self.organization,
-                    codigo='FSP',
-                    activo=True
-                ).first()
+                concepto_fsp = self._obtener_concepto('FSP')
                 if concepto_fsp:
                     valor_fsp = self._calcular_sobre_ibc(param_fsp.porcentaje_empleado, ibc)
                     self._aplicar_concepto_legal(
@@ -409,11 +799,7 @@ class CalculadorNomina:
             param_tope_sub = self._obtener_parametro('TOPE_SUBSISTENCIA')
             param_sub = self._obtener_parametro('SUBSISTENCIA')
             if param_tope_sub and param_sub and ibc > param_tope_sub.valor_fijo:
-                concepto_sub = ConceptoLaboral.objects.filter(
-                    organization=self.organization,
-                    codigo='SUBSISTENCIA',
-                    activo=True
-                ).first()
+                concepto_sub = self._obtener_concepto('SUBSISTENCIA')
                 if concepto_sub:
                     valor_sub = self._calcular_sobre_ibc(param_sub.porcentaje_empleado, ibc)
                     self._aplicar_concepto_legal(
@@ -429,23 +815,9 @@ class CalculadorNomina:
     
     def _calcular_conceptos_deducciones(self):
         """Calcula conceptos laborales de tipo DEDUCCION seleccionados por el usuario"""
-        # Limpiar conceptos deducciones anteriores (no legales), excepto restaurante
-        self.nomina.conceptos.filter(
-            tipo='DEDUCCION',
-            concepto__es_legal=False
-        ).exclude(concepto__codigo='RESTAURANTE').delete()
-
-        seleccionados = getattr(self.nomina, 'conceptos_seleccionados', None) or []
-        if not seleccionados:
-            return
-
-        conceptos = ConceptoLaboral.objects.filter(
-            organization=self.organization,
-            tipo='DEDUCCION',
-            activo=True,
-            es_legal=False,
-            id__in=seleccionados,
-        ).order_by('orden')
+        # Las líneas no legales anteriores se reemplazan al persistir
+        # (restaurante se gestiona aparte en _calcular_restaurante)
+        conceptos = self._obtener_conceptos_seleccionados('DEDUCCION', incluir_legales=False)
         
         for concepto in conceptos:
             if concepto.codigo == 'RESTAURANTE':
@@ -461,16 +833,10 @@ class CalculadorNomina:
             valor = concepto.calcular_valor(base)
             
             if valor > 0:
-                NominaConcepto.objects.update_or_create(
-                    organization=self.organization,
-                    nomina=self.nomina,
-                    concepto=concepto,
-                    defaults={
-                        'base': base,
-                        'porcentaje_aplicado': concepto.porcentaje if concepto.aplica_porcentaje else Decimal('0'),
-                        'valor': valor,
-                        'tipo': 'DEDUCCION',
-                    }
+                self._registrar_concepto(
+                    concepto, 'DEDUCCION', base,
+                    concepto.porcentaje if concepto.aplica_porcentaje else Decimal('0'),
+                    valor
                 )
                 self.total_deducciones += valor
 
@@ -482,14 +848,11 @@ class CalculadorNomina:
         valor_restaurante = getattr(self.nomina, 'valor_restaurante', Decimal('0.00')) or Decimal('0.00')
         tiene_descuento = getattr(self.nomina, 'tiene_deduccion_restaurante', False)
 
-        concepto = ConceptoLaboral.objects.filter(
-            organization=self.organization,
-            codigo='RESTAURANTE'
-        ).first()
+        concepto = self._obtener_concepto('RESTAURANTE', solo_activos=False)
 
         if not tiene_descuento or valor_restaurante <= 0:
             if concepto:
-                self.nomina.conceptos.filter(concepto=concepto).delete()
+                self._retirar_concepto(concepto)
             return
 
         if not concepto:
@@ -499,16 +862,9 @@ class CalculadorNomina:
             )
             return
 
-        NominaConcepto.objects.update_or_create(
-            organization=self.organization,
-            nomina=self.nomina,
-            concepto=concepto,
-            defaults={
-                'base': self.nomina.salario_base,
-                'porcentaje_aplicado': Decimal('0'),
-                'valor': valor_restaurante,
-                'tipo': 'DEDUCCION',
-            }
+        self._registrar_concepto(
+            concepto, 'DEDUCCION', self.nomina.salario_base,
+            Decimal('0'), valor_restaurante
         )
 
         self.total_deducciones += valor_restaurante
@@ -523,24 +879,8 @@ class CalculadorNomina:
         
         Cuenta solo cuotas de nóminas PAGADAS como realmente descontadas.
         """
-        from prestamos.models import Prestamo
-        
-        # Obtener préstamos vigentes del empleado
-        prestamos = Prestamo.objects.filter(
-            organization=self.organization,
-            empleado=self.empleado,
-            estado__in=['aprobado', 'desembolsado', 'activo', 'en_mora']
-        )
-
+        prestamos = self._obtener_prestamos()
         seleccionados = getattr(self.nomina, 'prestamos_seleccionados', None)
-        if seleccionados is not None:
-            if len(seleccionados) == 0:
-                prestamos = Prestamo.objects.none()
-            else:
-                prestamos = prestamos.filter(id__in=seleccionados)
-        
-        # Limpiar préstamos anteriores de esta nómina
-        self.nomina.prestamos.all().delete()
         
         periodo_inicio = self.nomina.periodo_inicio
         periodo_fin = self.nomina.periodo_fin
@@ -559,20 +899,7 @@ class CalculadorNomina:
                 # Contar cuotas REALMENTE pagadas (solo nóminas pagadas + pagos directos)
                 try:
                     total_cuotas = int(prestamo.plazo_meses or 0)
-                    
-                    # Pagos directos registrados
-                    cuotas_pagadas = prestamo.pagos.count()
-                    
-                    # Cuotas descontadas en nóminas que ya fueron PAGADAS
-                    # (excluir la nómina actual para no doble-contar al recalcular)
-                    cuotas_en_nominas_pagadas = NominaPrestamo.objects.filter(
-                        prestamo=prestamo,
-                        nomina__estado='pagada'
-                    ).exclude(
-                        nomina=self.nomina
-                    ).count()
-                    
-                    cuotas_pagadas = max(cuotas_pagadas, cuotas_en_nominas_pagadas)
+                    cuotas_pagadas = self._contar_cuotas_pagadas(prestamo)
                     cuotas_pendientes = max(total_cuotas - cuotas_pagadas, 0)
                 except Exception:
                     cuotas_pendientes = 1
@@ -591,13 +918,13 @@ class CalculadorNomina:
                     
                     # Procesar cada cuota
                     for i in range(cuotas_a_descontar):
-                        NominaPrestamo.objects.create(
+                        self.prestamos_calculados.append(NominaPrestamo(
                             organization=self.organization,
                             nomina=self.nomina,
                             prestamo=prestamo,
                             valor_cuota=valor_cuota,
                             numero_cuota=cuotas_pagadas + i + 1,
-                        )
+                        ))
                         self.total_prestamos += valor_cuota
 
             except Exception as e:
@@ -658,6 +985,21 @@ class CalculadorNomina:
                     param.porcentaje_total, ibc
                 )
     
+    def _calcular_provisiones(self):
+        """
+        Calcula las provisiones mensuales de prestaciones sociales a cargo
+        del empleador (no afectan el neto a pagar; ver ``calcular_provisiones``).
+        
+        Solo aplica a contratos laborales (los que pagan parafiscales).
+        """
+        if not self.tipo_contrato.aplica_parafiscales:
+            return
+        
+        provisiones = calcular_provisiones(
+            self.normativa, self.fecha_calculo, self.devengado_base, self.auxilio_transporte
+        )
+        self.provisiones = {clave: valor for clave, (_, valor) in provisiones.items()}
+    
     def _calcular_totales(self):
         """Calcula los totales finales de la nómina"""
         self.nomina.total_devengado = self._redondear(self.total_devengado)
@@ -685,11 +1027,7 @@ class CalculadorNomina:
         Aplica un concepto legal existente a la nómina.
         El concepto DEBE existir previamente (creado por el usuario o setup).
         """
-        concepto = ConceptoLaboral.objects.filter(
-            organization=self.organization,
-            codigo=codigo,
-            activo=True
-        ).first()
+        concepto = self._obtener_concepto(codigo)
         
         if not concepto:
             self.advertencias.append(
@@ -698,34 +1036,24 @@ class CalculadorNomina:
             )
             return
         
-        NominaConcepto.objects.update_or_create(
-            organization=self.organization,
-            nomina=self.nomina,
-            concepto=concepto,
-            defaults={
-                'base': base,
-                'porcentaje_aplicado': porcentaje,
-                'valor': valor,
-                'tipo': tipo,
-            }
-        )
+        self._registrar_concepto(concepto, tipo, base, porcentaje, valor)
     
     def _generar_resumen(self) -> dict:
-        """Genera el resumen del cálculo"""
-        conceptos = self.nomina.conceptos.all()
-        devengados = conceptos.filter(tipo='DEVENGADO')
-        deducciones = conceptos.filter(tipo='DEDUCCION')
+        """Genera el resumen del cálculo a partir de las líneas en memoria"""
+        lineas = list(self.conceptos_calculados.values())
+        devengados = [c for c in lineas if c.tipo == 'DEVENGADO']
+        deducciones = [c for c in lineas if c.tipo == 'DEDUCCION']
         
         salud_empleado = sum(
-            c.valor for c in deducciones 
-            if 'SALUD' in c.concepto.codigo
+            (c.valor for c in deducciones if 'SALUD' in c.concepto.codigo),
+            Decimal('0.00')
         )
         pension_empleado = sum(
-            c.valor for c in deducciones 
-            if 'PENSION' in c.concepto.codigo
+            (c.valor for c in deducciones if 'PENSION' in c.concepto.codigo),
+            Decimal('0.00')
         )
         otras_deducciones = self.nomina.total_deducciones - salud_empleado - pension_empleado
-        otros_devengados = sum(c.valor for c in devengados)
+        otros_devengados = sum((c.valor for c in devengados), Decimal('0.00'))
         
         resumen = {
             'numero': self.nomina.numero,
@@ -752,6 +1080,10 @@ class CalculadorNomina:
                 'total': self.nomina.costo_total_empleador - self.nomina.total_devengado,
             },
             'costo_total_empleador': self.nomina.costo_total_empleador,
+            'provisiones': {
+                **self.provisiones,
+                'total': sum(self.provisiones.values(), Decimal('0.00')),
+            },
         }
         
         if self.advertencias:
@@ -779,3 +1111,38 @@ def calcular_nomina(nomina: NominaSimple) -> dict:
     
     calculador = CalculadorNomina(nomina)
     return calculador.calcular()
+
+
+def simular_nomina(contrato, periodo_inicio, periodo_fin, items=None, **configuracion) -> dict:
+    """
+    Simula la nómina de un contrato para un período sin escribir en BD.
+    
+    Args:
+        contrato: Contrato a simular
+        periodo_inicio, periodo_fin: Período de la nómina
+        items: Lista de dicts hipotéticos {item, cantidad, valor_unitario}
+        **configuracion: Campos de NominaSimple que afectan el cálculo
+            (conceptos_seleccionados, prestamos_seleccionados,
+            cuotas_a_descontar, tiene_deduccion_restaurante,
+            valor_restaurante, incluir_salario_base)
+    
+    Returns:
+        dict: Resumen completo del cálculo simulado
+    """
+    nomina = NominaSimple(
+        organization=contrato.organization,
+        contrato=contrato,
+        proyecto_id=contrato.proyecto_id,
+        periodo_inicio=periodo_inicio,
+        periodo_fin=periodo_fin,
+        **configuracion
+    )
+    lineas_items = []
+    for item_data in items or []:
+        item = NominaItem(organization=contrato.organization, nomina=nomina, **item_data)
+        item.valor_total = (item.cantidad * item.valor_unitario).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+        lineas_items.append(item)
+    
+    return CalculadorNomina(nomina, items=lineas_items).simular()
@@ -6,9 +6,12 @@
 
 Señales Django para automatizar procesos de nómina.
 
-- Generación automática de número de nómina (pre_save)
 - Cálculo de valor total de item (pre_save)
 - Auto-creación de conceptos legales al crear organización (post_save)
+- Invalidación de la caché de normativa (post_save / post_delete)
+- Resumen materializado por período (pre_save / post_save / pre_delete)
+- Libro de prestaciones sociales al pagar o eliminar nóminas (post_save / pre_delete)
+- Contrato vigente del empleado al eliminar contratos (post_delete)
 
 NOTA: Los signals de recalculación de totales (items, conceptos, préstamos)
 fueron eliminados porque interferían con el servicio CalculadorNomina que
@@ -23,56 +26,156 @@ Fecha: Febrero 2026
 import logging
 from decimal import Decimal
 
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 from .models import (
+    Contrato,
+    Empleado,
     NominaSimple,
     NominaItem,
+    ParametroLegal,
     ConceptoLaboral,
 )
+from .cache_normativa import invalidar_snapshot
 
 logger = logging.getLogger(__name__)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-# SEÑALES PARA NÓMINA
+# SEÑALES PARA EL RESUMEN POR PERÍODO
 # ══════════════════════════════════════════════════════════════════════════════
 
 @receiver(pre_save, sender=NominaSimple)
-def generar_numero_nomina(sender, instance, **kwargs):
+def capturar_resumen_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda el aporte al resumen que tenía la nómina antes de este save()."""
+    from .resumen_periodo import huella_guardada
+    
+    if raw or instance._state.adding:
+        instance._resumen_anterior = None
+        return
+    instance._resumen_anterior = huella_guardada(instance.pk)
+
+
+@receiver(post_save, sender=NominaSimple)
+def actualizar_resumen_periodo(sender, instance, created, raw=False, **kwargs):
     """
-    Genera automáticamente el número de nómina si no existe.
-    Formato: NOM-YYYY-NNNNNN
+    Aplica al resumen del período la diferencia entre el aporte anterior y
+    el nuevo (calcular, aprobar, pagar y anular individuales).
+    """
+    from .resumen_periodo import AcumuladorResumen, huella, lineas_nomina
+    
+    if raw or not instance.organization_id:
+        return
+    
+    antes = getattr(instance, '_resumen_anterior', None)
+    despues = huella(instance)
+    resumen = AcumuladorResumen(instance.organization_id)
+    resumen.registrar(antes, despues)
     
-    Usa Max() para encontrar el último número secuencial,
-    evitando colisiones cuando se borran nóminas intermedias.
+    # Si la nómina cambia de fila (período/proyecto) o se anula, sus líneas
+    # de conceptos se mueven con ella
+    if antes and (
+        (antes['periodo_inicio'], antes['periodo_fin'], antes['proyecto_id'])
+        != (despues['periodo_inicio'], despues['periodo_fin'], despues['proyecto_id'])
+        or (antes['estado'] == 'anulada') != (despues['estado'] == 'anulada')
+    ):
+        lineas = lineas_nomina(instance.pk)
+        resumen.lineas(antes, lineas, -1)
+        resumen.lineas(despues, lineas, 1)
+    
+    resumen.aplicar()
+
+
+@receiver(pre_delete, sender=NominaSimple)
+def descontar_resumen_periodo(sender, instance, **kwargs):
+    """Retira del resumen el aporte de una nómina eliminada."""
+    from .resumen_periodo import AcumuladorResumen, huella_guardada, lineas_nomina
+    
+    antes = huella_guardada(instance.pk)
+    if not antes or not instance.organization_id:
+        return
+    resumen = AcumuladorResumen(instance.organization_id)
+    resumen.registrar(antes, None)
+    resumen.lineas(antes, lineas_nomina(instance.pk), -1)
+    resumen.aplicar()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SEÑALES PARA EL LIBRO DE PRESTACIONES
+# ══════════════════════════════════════════════════════════════════════════════
+
+@receiver(post_save, sender=NominaSimple)
+def actualizar_libro_prestaciones(sender, instance, created, raw=False, **kwargs):
+    """Causa las prestaciones al pagar la nómina (o las reversa si deja de estar pagada)."""
+    from .prestaciones import registrar_causaciones, registrar_reverso
+    
+    if raw or not instance.organization_id:
+        return
+    
+    antes = getattr(instance, '_resumen_anterior', None)
+    estado_anterior = antes['estado'] if antes else None
+    if instance.estado == 'pagada' and estado_anterior != 'pagada':
+        registrar_causaciones(instance.organization_id, [instance.pk])
+    elif estado_anterior == 'pagada' and instance.estado != 'pagada':
+        registrar_reverso(instance.organization_id, instance.pk)
+
+
+@receiver(pre_delete, sender=NominaSimple)
+def reversar_libro_prestaciones(sender, instance, **kwargs):
+    """Reversa las causaciones de una nómina pagada que se elimina."""
+    from .prestaciones import registrar_reverso
+    
+    if instance.organization_id and instance.estado == 'pagada':
+        registrar_reverso(instance.organization_id, instance.pk)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SEÑALES PARA LOS CERTIFICADOS DE INGRESOS Y RETENCIONES
+# ══════════════════════════════════════════════════════════════════════════════
+
+@receiver(post_save, sender=NominaSimple)
+def actualizar_acumulado_certificado(sender, instance, created, raw=False, **kwargs):
+    """Suma la nómina al acumulado anual al pagarla (o la resta si deja de estar pagada)."""
+    from .certificados import registrar_pagos, revertir_nomina
+    
+    if raw or not instance.organization_id:
+        return
+    
+    antes = getattr(instance, '_resumen_anterior', None)
+    estado_anterior = antes['estado'] if antes else None
+    # La marca se escribe con update(): se refleja en la instancia para que
+    # un save() posterior no la pise
+    if instance.estado == 'pagada' and estado_anterior != 'pagada':
+        if registrar_pagos(instance.organization_id, [instance.pk]):
+            instance.anio_certificado = (instance.fecha_pago or instance.periodo_fin).year
+    elif estado_anterior == 'pagada' and instance.estado != 'pagada':
+        revertir_nomina(instance.organization_id, instance.pk)
+        instance.anio_certificado = None
+
+
+@receiver(pre_delete, sender=NominaSimple)
+def revertir_acumulado_certificado(sender, instance, **kwargs):
+    """Resta del acumulado anual una nómina pagada que se elimina."""
+    from .certificados import revertir_nomina
+    
+    if instance.organization_id and instance.estado == 'pagada':
+        revertir_nomina(instance.organization_id, instance.pk)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SEÑALES PARA CONTRATO VIGENTE DEL EMPLEADO
+# ══════════════════════════════════════════════════════════════════════════════
+
+@receiver(post_delete, sender=Contrato)
+def sincronizar_contrato_eliminado(sender, instance, **kwargs):
     """
-    if not instance.numero:
-        from datetime import datetime
-        from django.db.models import Max
-        
-        year = datetime.now().year
-        prefix = f"NOM-{year}-"
-        
-        # Buscar el último número para este año y organización
-        ultimo = NominaSimple.objects.filter(
-            organization=instance.organization,
-            numero__startswith=prefix
-        ).aggregate(
-            max_numero=Max('numero')
-        )['max_numero']
-        
-        if ultimo:
-            try:
-                ultimo_secuencia = int(ultimo.replace(prefix, ''))
-                nueva_secuencia = ultimo_secuencia + 1
-            except ValueError:
-                nueva_secuencia = 1
-        else:
-            nueva_secuencia = 1
-        
-        instance.numero = f"{prefix}{nueva_secuencia:06d}"
+    Al eliminar un contrato (también desde un queryset) el empleado apunta
+    a su siguiente contrato activo. Crear o modificar contratos se maneja
+    en Contrato.save().
+    """
+    Empleado.sincronizar_contrato_actual([instance.empleado_id])
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -181,6 +284,29 @@ def crear_conceptos_legales_para_organizacion(organization):
     return creados
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# SEÑALES PARA CACHÉ DE NORMATIVA
+# ══════════════════════════════════════════════════════════════════════════════
+
+@receiver(post_save, sender=ParametroLegal)
+@receiver(post_delete, sender=ParametroLegal)
+@receiver(post_save, sender=ConceptoLaboral)
+@receiver(post_delete, sender=ConceptoLaboral)
+def invalidar_cache_normativa(sender, instance, **kwargs):
+    """
+    Incrementa la versión de la normativa de la organización.
+    
+    Se invalida de inmediato (para la transacción actual) y otra vez al
+    confirmar, para que ningún proceso quede con una foto leída antes del
+    commit.
+    """
+    organization_id = instance.organization_id
+    if not organization_id:
+        return
+    invalidar_snapshot(organization_id)
+    transaction.on_commit(lambda: invalidar_snapshot(organization_id))
+
+
 try:
     from core.models import Organizacion
 
@@ -0,0 +1,215 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║            SIMULADOR DE COSTO EMPLEADOR (ESCENARIOS WHAT-IF)                  ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Proyecta el costo mensual del empleador para TODOS los contratos activos de
+una organización bajo escenarios hipotéticos:
+- Nuevo SMMLV / auxilio de transporte
+- Nuevos porcentajes de aportes, parafiscales o provisiones
+- Cambio de clase de riesgo ARL
+- Incrementos salariales
+
+Los datos de ``Contrato``, ``ParametroLegal`` y ``ConceptoLaboral`` se leen
+una sola vez y se convierten en arreglos NumPy; cada escenario se evalúa con
+operaciones vectorizadas sobre esos arreglos (sin consultas adicionales).
+
+La proyección usa el salario del contrato (no items ni novedades) y
+redondea solo los totales, por lo que es una estimación para planeación,
+no un reemplazo del cálculo de nómina.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+from django.utils import timezone
+
+from .cache_normativa import obtener_snapshot
+
+
+NIVELES_ARL = ['I', 'II', 'III', 'IV', 'V']
+
+# Parámetro legal -> campo de porcentaje que paga el empleador
+PARAMETROS_EMPLEADOR = {
+    'SALUD': 'porcentaje_empleador',
+    'PENSION': 'porcentaje_empleador',
+    'CAJA_COMPENSACION': 'porcentaje_total',
+    'SENA': 'porcentaje_total',
+    'ICBF': 'porcentaje_total',
+    'CESANTIAS': 'porcentaje_empleador',
+    'INTERESES_CESANTIAS': 'porcentaje_empleador',
+    'PRIMA_SERVICIOS': 'porcentaje_empleador',
+    'VACACIONES': 'porcentaje_empleador',
+    **{f'ARL_NIVEL_{nivel}': 'porcentaje_total' for nivel in NIVELES_ARL},
+}
+
+
+@dataclass
+class EscenarioCosto:
+    """
+    Escenario hipotético. Los campos en None conservan el valor vigente.
+
+    - porcentajes: {concepto ParametroLegal: % a cargo del empleador}
+    - nivel_arl: un nivel para todos ('III') o un mapeo {'I': 'II', ...}
+    - incremento_salarial: % de aumento para todos los salarios
+    - indexar_salario_minimo: quienes ganan hoy el SMMLV pasan al nuevo SMMLV
+    """
+    nombre: str = 'Escenario'
+    smmlv: Optional[Decimal] = None
+    auxilio_transporte: Optional[Decimal] = None
+    porcentajes: dict = field(default_factory=dict)
+    nivel_arl: Optional[object] = None
+    incremento_salarial: Decimal = Decimal('0')
+    indexar_salario_minimo: bool = True
+
+
+class SimuladorCostos:
+    """
+    Base vectorizada de contratos activos de una organización.
+
+    Uso:
+        simulador = SimuladorCostos(organization)
+        resultados = simulador.evaluar([EscenarioCosto(smmlv=Decimal('1500000'))])
+    """
+
+    def __init__(self, organization, fecha=None):
+        from .models import Contrato
+
+        self.organization = organization
+        self.fecha = fecha or timezone.now().date()
+        normativa = obtener_snapshot(organization)
+
+        filas = list(
+            Contrato.objects.for_tenant(organization).filter(activo=True).values_list(
+                'salario',
+                'nivel_arl',
+                'proyecto_id',
+                'tipo_contrato__ibc_porcentaje',
+                'tipo_contrato__aplica_salud',
+                'tipo_contrato__aplica_pension',
+                'tipo_contrato__aplica_arl',
+                'tipo_contrato__aplica_parafiscales',
+            )
+        )
+        columnas = list(zip(*filas)) if filas else [()] * 8
+
+        self.total_contratos = len(filas)
+        self.salario = np.array(columnas[0], dtype=np.float64)
+        self.nivel_arl = np.array(
+            [NIVELES_ARL.index(n) if n in NIVELES_ARL else 0 for n in columnas[1]], dtype=np.int8
+        )
+        proyectos = [str(p) if p else None for p in columnas[2]]
+        self.proyectos = sorted(set(proyectos), key=lambda p: (p is None, p or ''))
+        self.proyecto_idx = np.array([self.proyectos.index(p) for p in proyectos], dtype=np.int32)
+        self.ibc_porcentaje = np.array(columnas[3], dtype=np.float64)
+        self.aplica_salud = np.array(columnas[4], dtype=bool)
+        self.aplica_pension = np.array(columnas[5], dtype=bool)
+        self.aplica_arl = np.array(columnas[6], dtype=bool)
+        self.aplica_parafiscales = np.array(columnas[7], dtype=bool)
+
+        # Parámetros vigentes a la fecha
+        parametro = normativa.parametro
+        smmlv = parametro('SMMLV', self.fecha)
+        aux = parametro('AUXILIO_TRANSPORTE', self.fecha)
+        self.smmlv = float(smmlv.valor_fijo) if smmlv and smmlv.valor_fijo else 0.0
+        self.auxilio_transporte = float(aux.valor_fijo) if aux and aux.valor_fijo else 0.0
+        self.porcentajes = {}
+        for concepto, campo in PARAMETROS_EMPLEADOR.items():
+            param = parametro(concepto, self.fecha)
+            self.porcentajes[concepto] = float(getattr(param, campo) or 0) if param else 0.0
+
+        # El auxilio solo se paga si existe el concepto laboral (igual que el calculador)
+        self.paga_auxilio = normativa.concepto(('AUX_TRANSPORTE', 'AUXILIO_TRANSPORTE')) is not None
+
+    def _calcular(self, escenario: EscenarioCosto) -> dict:
+        """Costo por contrato (arreglos) para un escenario."""
+        smmlv = float(escenario.smmlv) if escenario.smmlv is not None else self.smmlv
+        aux_valor = (
+            float(escenario.auxilio_transporte)
+            if escenario.auxilio_transporte is not None else self.auxilio_transporte
+        )
+        pct = {**self.porcentajes, **{k: float(v) for k, v in escenario.porcentajes.items()}}
+
+        salario = self.salario * (1 + float(escenario.incremento_salarial) / 100)
+        if escenario.indexar_salario_minimo and self.smmlv:
+            salario = np.where(self.salario <= self.smmlv, np.maximum(salario, smmlv), salario)
+
+        ibc = salario * self.ibc_porcentaje / 100
+
+        nivel = self.nivel_arl
+        if isinstance(escenario.nivel_arl, str):
+            nivel = np.full_like(nivel, NIVELES_ARL.index(escenario.nivel_arl))
+        elif isinstance(escenario.nivel_arl, dict):
+            mapa = np.array([
+                NIVELES_ARL.index(escenario.nivel_arl.get(n, n)) for n in NIVELES_ARL
+            ], dtype=np.int8)
+            nivel = mapa[nivel]
+        tasas_arl = np.array([pct[f'ARL_NIVEL_{n}'] for n in NIVELES_ARL])
+
+        auxilio = np.where(salario <= 2 * smmlv, aux_valor, 0.0) if self.paga_auxilio else np.zeros_like(salario)
+        base_prestaciones = salario + auxilio
+        parafiscal = self.aplica_parafiscales
+
+        return {
+            'salarios': salario,
+            'auxilio_transporte': auxilio,
+            'salud': np.where(self.aplica_salud, ibc * pct['SALUD'] / 100, 0.0),
+            'pension': np.where(self.aplica_pension, ibc * pct['PENSION'] / 100, 0.0),
+            'arl': np.where(self.aplica_arl, ibc * tasas_arl[nivel] / 100, 0.0),
+            'caja': np.where(parafiscal, ibc * pct['CAJA_COMPENSACION'] / 100, 0.0),
+            'sena': np.where(parafiscal, ibc * pct['SENA'] / 100, 0.0),
+            'icbf': np.where(parafiscal, ibc * pct['ICBF'] / 100, 0.0),
+            'cesantias': np.where(parafiscal, base_prestaciones * pct['CESANTIAS'] / 100, 0.0),
+            'intereses_cesantias': np.where(
+                parafiscal, base_prestaciones * pct['INTERESES_CESANTIAS'] / 100, 0.0
+            ),
+            'prima': np.where(parafiscal, base_prestaciones * pct['PRIMA_SERVICIOS'] / 100, 0.0),
+            'vacaciones': np.where(parafiscal, salario * pct['VACACIONES'] / 100, 0.0),
+        }
+
+    def evaluar(self, escenarios) -> list:
+        """
+        Evalúa los escenarios y los compara contra el escenario vigente.
+
+        Returns:
+            list: un dict por escenario con totales, desglose, costo por
+            proyecto y diferencia contra el costo actual
+        """
+        costo_actual = self._costo_total(self._calcular(EscenarioCosto(nombre='Actual')))
+        total_actual = float(costo_actual.sum())
+
+        resultados = []
+        for escenario in escenarios:
+            componentes = self._calcular(escenario)
+            costo = self._costo_total(componentes)
+            total = float(costo.sum())
+            por_proyecto = np.bincount(self.proyecto_idx, weights=costo, minlength=len(self.proyectos))
+            resultados.append({
+                'nombre': escenario.nombre,
+                'contratos': self.total_contratos,
+                'desglose': {
+                    clave: _dinero(valores.sum()) for clave, valores in componentes.items()
+                },
+                'costo_total_mensual': _dinero(total),
+                'costo_total_anual': _dinero(total * 12),
+                'diferencia_mensual': _dinero(total - total_actual),
+                'variacion_porcentual': (
+                    round((total - total_actual) / total_actual * 100, 2) if total_actual else None
+                ),
+                'por_proyecto': {
+                    (proyecto or 'sin_proyecto'): _dinero(valor)
+                    for proyecto, valor in zip(self.proyectos, por_proyecto)
+                },
+            })
+        return resultados
+
+    @staticmethod
+    def _costo_total(componentes: dict):
+        return np.sum(np.vstack(list(componentes.values())), axis=0)
+
+
+def _dinero(valor) -> Decimal:
+    return Decimal(str(round(float(valor), 2))).quantize(Decimal('0.01'))
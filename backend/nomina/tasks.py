@@ -0,0 +1,176 @@
+"""
+Celery Tasks de Nómina — CorteSec
+==================================
+
+Cálculo de un período en segundo plano (``TrabajoCalculoNomina``):
+
+1. ``calcular_periodo_trabajo`` divide las nóminas calculables del período
+   en bloques de ``NOMINA_TRABAJO_TAMANO_BLOQUE`` y los encola en paralelo.
+2. ``calcular_bloque_nomina`` calcula un bloque con ``CalculadorNominaLote``;
+   si el bloque falla por un error inesperado se recalcula nómina por
+   nómina, de modo que un contrato con datos dañados no detiene el resto.
+3. Cada bloque suma su avance al trabajo y lo publica en el grupo
+   WebSocket del trabajo (progreso, errores y tiempo restante estimado).
+   El último bloque en terminar cierra el trabajo.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from celery import group, shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _tamano_bloque() -> int:
+    return getattr(settings, 'NOMINA_TRABAJO_TAMANO_BLOQUE', 200)
+
+
+def publicar_progreso(trabajo):
+    """Envía el avance del trabajo a su grupo de Channels (si hay capa configurada)."""
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            trabajo.grupo_ws,
+            {
+                'type': 'nomina_progreso',
+                'data': trabajo.progreso(),
+            }
+        )
+    except Exception as exc:
+        # El avance queda en la BD aunque no se pueda publicar
+        logger.warning('No se pudo publicar el avance del trabajo %s: %s', trabajo.id, exc)
+
+
+def iniciar_trabajo_calculo(organization, usuario, periodo_inicio, periodo_fin, proyecto=None):
+    """
+    Crea el trabajo y lo encola al confirmar la transacción actual.
+
+    Returns:
+        TrabajoCalculoNomina: el trabajo en estado pendiente
+    """
+    from .models import TrabajoCalculoNomina
+
+    trabajo = TrabajoCalculoNomina.objects.create(
+        organization=organization,
+        periodo_inicio=periodo_inicio,
+        periodo_fin=periodo_fin,
+        proyecto=proyecto,
+        creado_por=usuario,
+    )
+    transaction.on_commit(lambda: calcular_periodo_trabajo.delay(str(trabajo.id)))
+    return trabajo
+
+
+@shared_task(name='nomina.tasks.calcular_periodo_trabajo')
+def calcular_periodo_trabajo(trabajo_id):
+    """Divide el período del trabajo en bloques y los encola en paralelo."""
+    from .calculo_lote import ESTADOS_CALCULABLES
+    from .models import NominaSimple, TrabajoCalculoNomina
+
+    trabajo = TrabajoCalculoNomina.objects.all_tenants().get(pk=trabajo_id)
+
+    nominas = NominaSimple.objects.for_tenant(trabajo.organization_id).filter(
+        periodo_inicio=trabajo.periodo_inicio,
+        periodo_fin=trabajo.periodo_fin,
+        estado__in=ESTADOS_CALCULABLES,
+    )
+    if trabajo.proyecto_id:
+        nominas = nominas.filter(proyecto_id=trabajo.proyecto_id)
+    ids = [str(pk) for pk in nominas.order_by('numero').values_list('id', flat=True)]
+
+    tamano = _tamano_bloque()
+    bloques = [ids[i:i + tamano] for i in range(0, len(ids), tamano)]
+
+    trabajo.total = len(ids)
+    trabajo.total_bloques = len(bloques)
+    trabajo.estado = 'en_proceso'
+    trabajo.iniciado_at = timezone.now()
+    if not bloques:
+        trabajo.estado = 'completado'
+        trabajo.finalizado_at = trabajo.iniciado_at
+    trabajo.save(update_fields=[
+        'total', 'total_bloques', 'estado', 'iniciado_at', 'finalizado_at', 'updated_at'
+    ])
+    publicar_progreso(trabajo)
+
+    if bloques:
+        try:
+            group(calcular_bloque_nomina.s(str(trabajo.id), bloque) for bloque in bloques).apply_async()
+        except Exception as exc:
+            logger.exception('No se pudieron encolar los bloques del trabajo %s', trabajo.id)
+            trabajo.estado = 'fallido'
+            trabajo.finalizado_at = timezone.now()
+            trabajo.errores = [{'nomina_id': None, 'numero': None, 'error': str(exc)}]
+            trabajo.save(update_fields=['estado', 'finalizado_at', 'errores', 'updated_at'])
+            publicar_progreso(trabajo)
+            raise
+    return {'trabajo_id': str(trabajo.id), 'total': len(ids), 'bloques': len(bloques)}
+
+
+def _calcular_nominas(organization, nomina_ids) -> dict:
+    """Calcula un bloque; si falla inesperadamente, aísla la nómina culpable."""
+    from .calculo_lote import CalculadorNominaLote
+    from .models import NominaSimple
+
+    def lote(ids):
+        return CalculadorNominaLote(
+            organization,
+            NominaSimple.objects.for_tenant(organization).filter(id__in=ids),
+        ).calcular()
+
+    try:
+        resultado = lote(nomina_ids)
+        return {'calculadas': resultado['calculadas'], 'errores': resultado['errores']}
+    except Exception:
+        logger.exception('Bloque de nómina fallido; se recalcula nómina por nómina')
+
+    calculadas = 0
+    errores = []
+    for nomina_id in nomina_ids:
+        try:
+            resultado = lote([nomina_id])
+        except Exception as exc:
+            errores.append({'nomina_id': nomina_id, 'numero': None, 'error': str(exc)})
+            continue
+        calculadas += resultado['calculadas']
+        errores.extend(resultado['errores'])
+    return {'calculadas': calculadas, 'errores': errores}
+
+
+@shared_task(name='nomina.tasks.calcular_bloque_nomina')
+def calcular_bloque_nomina(trabajo_id, nomina_ids):
+    """Calcula un bloque de nóminas y registra su avance en el trabajo."""
+    from core.models import Organizacion
+    from .models import TrabajoCalculoNomina
+
+    organization_id = TrabajoCalculoNomina.objects.all_tenants().values_list(
+        'organization_id', flat=True
+    ).get(pk=trabajo_id)
+    organization = Organizacion.objects.get(pk=organization_id)
+
+    resultado = _calcular_nominas(organization, nomina_ids)
+
+    with transaction.atomic():
+        trabajo = TrabajoCalculoNomina.objects.all_tenants().select_for_update().get(pk=trabajo_id)
+        trabajo.procesadas += len(nomina_ids)
+        trabajo.calculadas += resultado['calculadas']
+        trabajo.bloques_completados += 1
+        trabajo.errores = trabajo.errores + resultado['errores']
+        if trabajo.bloques_completados >= trabajo.total_bloques:
+            trabajo.estado = 'completado_con_errores' if trabajo.errores else 'completado'
+            trabajo.finalizado_at = timezone.now()
+        trabajo.save(update_fields=[
+            'procesadas', 'calculadas', 'bloques_completados', 'errores',
+            'estado', 'finalizado_at', 'updated_at',
+        ])
+
+    publicar_progreso(trabajo)
+    return {'calculadas': resultado['calculadas'], 'errores': len(resultado['errores'])}
@@ -11,7 +11,11 @@ Versión: 1.0.0
 Fecha: Enero 2026
 """
 
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
 from datetime import date
 
@@ -23,8 +27,40 @@ from .models import (
     ParametroLegal,
     ConceptoLaboral,
     NominaSimple,
+    ResumenPeriodoNomina,
+    SaldoPrestacion,
+    MovimientoPrestacion,
+    NominaConcepto,
+    NominaConceptoArchivo,
+    NominaItem,
+    TransicionNomina,
+    AcumuladoCertificado,
+)
+from .services import CalculadorNomina, sincronizar_lineas, simular_nomina
+from .calculo_lote import CalculadorNominaLote
+from .cache_normativa import obtener_snapshot, obtener_version
+from .pago_lote import PagadorNominaLote
+from .tasks import iniciar_trabajo_calculo
+from .resumen_periodo import reconstruir_resumen
+from .pila import GeneradorPila, REGISTRO_COTIZANTE
+from .prestaciones import registrar_causaciones, registrar_pago, reconstruir_prestaciones, saldos_a_fecha
+from .cierre_periodo import CierrePeriodoError, cerrar_periodo, reabrir_periodo
+from .exportacion_columnar import COLUMNAS, exportar_historico
+from .variaciones import variaciones_periodos
+from .transiciones import ClaveIdempotenciaInvalida, ejecutar_transicion
+from .dispersion import GeneradorDispersion, LAYOUTS
+from .certificados import datos_certificados, reconstruir_certificados, registrar_pagos
+from .importacion_novedades import ImportadorNovedades, leer_filas
+from .apertura_periodo import abrir_periodo
+from .serializers import EmpleadoListSerializer, NominaSimpleDetailSerializer
+from .nomina_electronica import documentos_periodo, generar_documento, generar_zip_documentos
+from .simulador_costos import SimuladorCostos, EscenarioCosto
+from .desprendibles import (
+    nominas_para_desprendible,
+    datos_desprendible,
+    generar_zip_periodo,
+    generar_pdf_periodo,
 )
-from .services import CalculadorNomina
 
 
 class EmpleadoModelTest(TestCase):
@@ -306,3 +342,1292 @@ class CalculadorNominaTest(TestCase):
         
         # Las deducciones de salud y pensión deberían calcularse
         self.assertGreater(resumen['total_deducciones'], 0)
+
+
+class NominaPeriodoTestMixin:
+    """Datos comunes: organización con normativa completa y nóminas de enero 2026."""
+    
+    PERIODO = (date(2026, 1, 1), date(2026, 1, 31))
+    
+    def setUp(self):
+        self.organization = Organizacion.objects.create(
+            nombre='Test Org Lote',
+            codigo='TESTLOTE',
+            activa=True
+        )
+        
+        parametros = [
+            ('SMMLV', {'valor_fijo': Decimal('1300000.00')}),
+            ('AUXILIO_TRANSPORTE', {'valor_fijo': Decimal('162000.00')}),
+            ('SALUD', {'porcentaje_total': Decimal('12.50'), 'porcentaje_empleado': Decimal('4.00'),
+                       'porcentaje_empleador': Decimal('8.50')}),
+            ('PENSION', {'porcentaje_total': Decimal('16.00'), 'porcentaje_empleado': Decimal('4.00'),
+                         'porcentaje_empleador': Decimal('12.00')}),
+            ('ARL_NIVEL_I', {'porcentaje_total': Decimal('0.522')}),
+            ('CAJA_COMPENSACION', {'porcentaje_total': Decimal('4.00')}),
+            ('SENA', {'porcentaje_total': Decimal('2.00')}),
+            ('ICBF', {'porcentaje_total': Decimal('3.00')}),
+        ]
+        for concepto, valores in parametros:
+            ParametroLegal.objects.create(
+                organization=self.organization,
+                concepto=concepto,
+                vigente_desde=date(2026, 1, 1),
+                **valores
+            )
+        ParametroLegal.objects.create(
+            organization=self.organization,
+            concepto='CESANTIAS',
+            porcentaje_total=Decimal('8.33'),
+            porcentaje_empleador=Decimal('8.33'),
+            vigente_desde=date(2026, 1, 1)
+        )
+        
+        self.tipo_contrato = TipoContrato.objects.create(
+            organization=self.organization,
+            nombre='Término Indefinido',
+            codigo='INDEFINIDO',
+            aplica_salud=True,
+            aplica_pension=True,
+            aplica_arl=True,
+            aplica_parafiscales=True,
+            ibc_porcentaje=Decimal('100.00')
+        )
+    
+    def _crear_nomina(self, documento, salario):
+        empleado = Empleado.objects.create(
+            organization=self.organization,
+            tipo_documento='CC',
+            numero_documento=documento,
+            primer_nombre='Empleado',
+            primer_apellido=documento,
+            fecha_nacimiento=date(1990, 1, 1),
+            fecha_ingreso=date(2024, 1, 1),
+        )
+        contrato = Contrato.objects.create(
+            organization=self.organization,
+            empleado=empleado,
+            tipo_contrato=self.tipo_contrato,
+            salario=salario,
+            nivel_arl='I',
+            fecha_inicio=date(2024, 1, 1),
+            activo=True
+        )
+        return NominaSimple.objects.create(
+            organization=self.organization,
+            contrato=contrato,
+            periodo_inicio=self.PERIODO[0],
+            periodo_fin=self.PERIODO[1]
+        )
+
+    def _configurar_contabilidad(self):
+        """Configuración contable activa y cuentas PUC para contabilizar pagos."""
+        from django.contrib.auth import get_user_model
+        from configuracion.models import ConfiguracionGeneral
+        from contabilidad.models import PlanCuentas
+        from core.middleware.tenant import set_current_tenant
+
+        # La contabilización busca la configuración con el manager del tenant en contexto
+        set_current_tenant(self.organization)
+        self.addCleanup(set_current_tenant, None)
+
+        # ComprobanteContable.creado_por toma por defecto el usuario 1
+        self.usuario_contable = get_user_model().objects.create_user(
+            id=1,
+            username='contador',
+            email='contador@test.com',
+            password='test-password-123',
+            organization=self.organization
+        )
+
+        cuentas = [
+            ('1105', 'Caja', 'activo', 'debito'),
+            ('1365', 'Cuentas por cobrar a trabajadores', 'activo', 'debito'),
+            ('2370', 'Retenciones y aportes de nómina', 'pasivo', 'credito'),
+            ('237005', 'Aportes a EPS', 'pasivo', 'credito'),
+            ('2380', 'Acreedores varios', 'pasivo', 'credito'),
+            ('238030', 'Fondos de pensiones', 'pasivo', 'credito'),
+            ('421005', 'Intereses', 'ingreso', 'credito'),
+            ('421010', 'Intereses de mora', 'ingreso', 'credito'),
+            ('5105', 'Gastos de personal', 'gasto', 'debito'),
+        ]
+        for codigo, nombre, tipo_cuenta, naturaleza in cuentas:
+            PlanCuentas.objects.create(
+                organization=self.organization,
+                codigo=codigo,
+                nombre=nombre,
+                tipo_cuenta=tipo_cuenta,
+                naturaleza=naturaleza
+            )
+
+        return ConfiguracionGeneral.objects.create(
+            organization=self.organization,
+            nombre_empresa=self.organization.nombre,
+            nit='900123456-7',
+            direccion='Calle 1 # 2-3',
+            telefono='6011234567',
+            email='contabilidad@test.com',
+            cuenta_efectivo_defecto='1105',
+            cuenta_nomina_defecto='5105',
+            cuenta_prestamos_defecto='1365',
+            cuenta_intereses_prestamo_defecto='421005',
+            cuenta_mora_prestamo_defecto='421010',
+            cuenta_otras_deducciones_defecto='2370'
+        )
+
+
+class CalculadorNominaLoteTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el cálculo de nómina por lotes (período completo)."""
+    
+    def _calcular_lote(self):
+        return CalculadorNominaLote.para_periodo(self.organization, *self.PERIODO).calcular()
+    
+    def test_lote_coincide_con_calculo_individual(self):
+        """El lote produce los mismos totales y conceptos que el cálculo individual."""
+        nomina_individual = self._crear_nomina('10010', Decimal('2000000.00'))
+        CalculadorNomina(nomina_individual).calcular()
+        esperado = {
+            campo: getattr(nomina_individual, campo)
+            for campo in ('total_devengado', 'total_deducciones', 'total_pagar', 'aporte_arl')
+        }
+        conceptos = NominaConcepto.objects.for_tenant(self.organization).filter(nomina=nomina_individual)
+        conceptos_esperados = sorted(conceptos.values_list('concepto__codigo', 'valor'))
+        self.assertTrue(conceptos_esperados)
+        
+        resultado = self._calcular_lote()
+        nomina_individual.refresh_from_db()
+        
+        self.assertEqual(resultado['calculadas'], 1)
+        self.assertEqual(resultado['errores'], [])
+        for campo, valor in esperado.items():
+            self.assertEqual(getattr(nomina_individual, campo), valor)
+        self.assertEqual(sorted(conceptos.values_list('concepto__codigo', 'valor')), conceptos_esperados)
+    
+    def test_numero_de_consultas_no_depende_del_tamano(self):
+        """Calcular 1 o 5 nóminas del período usa la misma cantidad de consultas."""
+        self._crear_nomina('20010', Decimal('1500000.00'))
+        obtener_snapshot(self.organization)
+        with CaptureQueriesContext(connection) as una:
+            self._calcular_lote()
+        
+        for i in range(4):
+            self._crear_nomina(f'3000{i}', Decimal('1800000.00'))
+        # Todas se recalculan, como en la primera medición
+        NominaSimple.objects.for_tenant(self.organization).update(estado='borrador')
+        with CaptureQueriesContext(connection) as varias:
+            resultado = self._calcular_lote()
+        
+        self.assertEqual(resultado['calculadas'], 5)
+        self.assertEqual(len(una.captured_queries), len(varias.captured_queries))
+    
+    def test_errores_de_validacion_no_detienen_el_lote(self):
+        """Una nómina sin parámetros ARL se reporta y las demás se calculan."""
+        self._crear_nomina('40010', Decimal('1500000.00'))
+        nomina_error = self._crear_nomina('40020', Decimal('1500000.00'))
+        nomina_error.contrato.nivel_arl = 'V'
+        nomina_error.contrato.save()
+        
+        resultado = self._calcular_lote()
+        
+        self.assertEqual(resultado['calculadas'], 1)
+        self.assertEqual(len(resultado['errores']), 1)
+        self.assertEqual(resultado['errores'][0]['nomina_id'], str(nomina_error.id))
+    
+    def test_pago_periodo_solo_nominas_aprobadas_validas(self):
+        """El pago por lote ignora nóminas no aprobadas y reporta las inválidas."""
+        self._crear_nomina('50010', Decimal('1500000.00'))
+        nomina_invalida = self._crear_nomina('50020', Decimal('1500000.00'))
+        NominaSimple.objects.for_tenant(self.organization).filter(pk=nomina_invalida.pk).update(
+            estado='aprobada',
+            total_devengado=Decimal('100000.00'),
+            total_deducciones=Decimal('200000.00'),
+        )
+        
+        resultado = PagadorNominaLote(self.organization, None, *self.PERIODO).pagar()
+        
+        self.assertEqual(resultado['total'], 1)
+        self.assertEqual(resultado['pagadas'], 0)
+        self.assertIsNone(resultado['comprobante'])
+        self.assertEqual(resultado['errores'][0]['nomina_id'], str(nomina_invalida.id))
+        nomina_invalida.refresh_from_db()
+        self.assertEqual(nomina_invalida.estado, 'aprobada')
+    
+    def test_recalcular_sin_cambios_conserva_lineas(self):
+        """Recalcular sin cambios no reescribe las líneas de conceptos."""
+        nomina = self._crear_nomina('60010', Decimal('1700000.00'))
+        CalculadorNomina(nomina).calcular()
+        conceptos = NominaConcepto.objects.for_tenant(self.organization).filter(nomina=nomina)
+        lineas = dict(conceptos.values_list('concepto__codigo', 'id'))
+        self.assertTrue(lineas)
+        
+        nomina.refresh_from_db()
+        calculador = CalculadorNomina(nomina)
+        calculador.aplicar_reglas()
+        cambios = sincronizar_lineas(self.organization, [calculador])
+        
+        self.assertEqual(cambios, {'insertadas': 0, 'actualizadas': 0, 'eliminadas': 0})
+        self.assertEqual(dict(conceptos.values_list('concepto__codigo', 'id')), lineas)
+    
+    def test_recalcular_actualiza_solo_lineas_modificadas(self):
+        """Un cambio de salario actualiza las líneas existentes en lugar de recrearlas."""
+        nomina = self._crear_nomina('60020', Decimal('1700000.00'))
+        CalculadorNomina(nomina).calcular()
+        conceptos = NominaConcepto.objects.for_tenant(self.organization).filter(nomina=nomina)
+        lineas = set(conceptos.values_list('id', flat=True))
+        self.assertTrue(lineas)
+        
+        Contrato.objects.for_tenant(self.organization).filter(pk=nomina.contrato_id).update(
+            salario=Decimal('1900000.00')
+        )
+        nomina = NominaSimple.objects.for_tenant(self.organization).get(pk=nomina.pk)
+        CalculadorNomina(nomina).calcular()
+        
+        self.assertEqual(set(conceptos.values_list('id', flat=True)), lineas)
+    
+    def test_calcular_periodo_resume_costo_recalculado(self):
+        """El resumen del endpoint refleja el costo después de recalcular, no el anotado antes."""
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from .views import NominaSimpleViewSet
+        
+        nomina = self._crear_nomina('60030', Decimal('1700000.00'))
+        CalculadorNomina(nomina).calcular()
+        nomina.refresh_from_db()
+        costo_anterior = nomina.costo_total_empleador
+        Contrato.objects.for_tenant(self.organization).filter(pk=nomina.contrato_id).update(
+            salario=Decimal('2500000.00')
+        )
+        
+        usuario = get_user_model().objects.create_superuser(
+            username='admin_lote', email='admin@lote.co', password='x', organization=self.organization
+        )
+        request = APIRequestFactory().post(
+            '/nominas/calcular_periodo/',
+            {'periodo_inicio': '2026-01-01', 'periodo_fin': '2026-01-31'},
+            format='json',
+        )
+        force_authenticate(request, user=usuario)
+        response = NominaSimpleViewSet.as_view({'post': 'calcular_periodo'})(request)
+        
+        self.assertEqual(response.status_code, 200)
+        nomina = NominaSimple.objects.for_tenant(self.organization).get(pk=nomina.pk)
+        self.assertGreater(nomina.costo_total_empleador, costo_anterior)
+        resumen, = response.data['resumenes']
+        self.assertEqual(resumen['costo_total_empleador'], nomina.costo_total_empleador)
+
+
+class PagadorNominaLoteTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el pago por lotes con descuentos de préstamos."""
+    
+    def setUp(self):
+        super().setUp()
+        from prestamos.models import TipoPrestamo
+        
+        self._configurar_contabilidad()
+        self.tipo_prestamo = TipoPrestamo.objects.create(
+            organization=self.organization,
+            nombre='Libre inversión',
+            codigo='LIBRE',
+            monto_minimo=Decimal('100000.00'),
+            monto_maximo=Decimal('10000000.00')
+        )
+    
+    def _prestamo(self, nomina, estado, saldo_pendiente, total_pagado):
+        from prestamos.models import Prestamo
+        
+        return Prestamo.objects.create(
+            organization=self.organization,
+            empleado=nomina.contrato.empleado,
+            tipo_prestamo=self.tipo_prestamo,
+            monto_solicitado=Decimal('1000000.00'),
+            monto_aprobado=Decimal('1000000.00'),
+            tasa_interes=Decimal('0.00'),
+            plazo_meses=10,
+            cuota_mensual=Decimal('100000.00'),
+            fecha_solicitud=date(2025, 12, 1),
+            fecha_aprobacion=date(2025, 12, 1),
+            fecha_desembolso=date(2025, 12, 15),
+            fecha_primer_pago=date(2026, 1, 15),
+            estado=estado,
+            saldo_pendiente=saldo_pendiente,
+            total_pagado=total_pagado,
+            solicitado_por=self.usuario_contable
+        )
+    
+    def _calcular_y_aprobar(self):
+        CalculadorNominaLote.para_periodo(self.organization, *self.PERIODO).calcular()
+        NominaSimple.objects.for_tenant(self.organization).update(estado='aprobada')
+    
+    def test_pago_registra_cuotas_y_comprobante_consolidado(self):
+        """Cada cuota genera su pago, actualiza el préstamo y se acredita en el comprobante del período."""
+        from contabilidad.models import ComprobanteContable, MovimientoContable
+        from prestamos.models import PagoPrestamo
+        
+        en_mora = self._prestamo(
+            self._crear_nomina('70010', Decimal('1800000.00')),
+            'en_mora', Decimal('800000.00'), Decimal('200000.00')
+        )
+        ultima_cuota = self._prestamo(
+            self._crear_nomina('70020', Decimal('1800000.00')),
+            'activo', Decimal('100000.00'), Decimal('900000.00')
+        )
+        self._calcular_y_aprobar()
+        
+        resultado = PagadorNominaLote(self.organization, self.usuario_contable, *self.PERIODO).pagar()
+        
+        self.assertEqual((resultado['pagadas'], resultado['pagos_prestamo']), (2, 2))
+        self.assertEqual(resultado['errores'], [])
+        pagos = {
+            pago.prestamo_id: pago
+            for pago in PagoPrestamo.objects.for_tenant(self.organization)
+        }
+        self.assertEqual(set(pagos), {en_mora.id, ultima_cuota.id})
+        for prestamo, saldo_anterior in ((en_mora, Decimal('800000.00')), (ultima_cuota, Decimal('100000.00'))):
+            pago = pagos[prestamo.id]
+            self.assertEqual(pago.numero_pago, f'PAG-{prestamo.numero_prestamo}-001')
+            self.assertEqual((pago.monto_pago, pago.monto_capital), (Decimal('100000.00'), Decimal('100000.00')))
+            self.assertEqual((pago.saldo_anterior, pago.saldo_nuevo), (saldo_anterior, saldo_anterior - pago.monto_pago))
+            self.assertEqual(pago.comprobante, resultado['comprobante'])
+        
+        en_mora.refresh_from_db()
+        self.assertEqual(
+            (en_mora.estado, en_mora.saldo_pendiente, en_mora.total_pagado),
+            ('en_mora', Decimal('700000.00'), Decimal('300000.00'))
+        )
+        self.assertEqual(en_mora.fecha_primer_pago, date(2026, 2, 15))
+        ultima_cuota.refresh_from_db()
+        self.assertEqual(
+            (ultima_cuota.estado, ultima_cuota.saldo_pendiente, ultima_cuota.total_pagado),
+            ('completado', Decimal('0.00'), ultima_cuota.monto_final)
+        )
+        
+        comprobante = ComprobanteContable.objects.for_tenant(self.organization).get(numero=resultado['comprobante'])
+        self.assertEqual(comprobante.nominas_consolidadas.count(), 2)
+        credito_prestamos = MovimientoContable.objects.for_tenant(self.organization).get(
+            comprobante=comprobante, cuenta__codigo='1365'
+        ).valor_credito
+        self.assertEqual(credito_prestamos, Decimal('200000.00'))
+    
+    def test_cuota_limitada_al_saldo_pendiente(self):
+        """Una cuota mayor al saldo solo descuenta el saldo y no supera el monto del préstamo."""
+        from prestamos.models import PagoPrestamo
+        
+        prestamo = self._prestamo(
+            self._crear_nomina('70030', Decimal('1800000.00')),
+            'activo', Decimal('60000.00'), Decimal('940000.00')
+        )
+        self._calcular_y_aprobar()
+        
+        PagadorNominaLote(self.organization, self.usuario_contable, *self.PERIODO).pagar()
+        
+        pago = PagoPrestamo.objects.for_tenant(self.organization).get(prestamo=prestamo)
+        self.assertEqual((pago.monto_pago, pago.saldo_nuevo), (Decimal('60000.00'), Decimal('0.00')))
+        prestamo.refresh_from_db()
+        self.assertEqual(
+            (prestamo.estado, prestamo.saldo_pendiente, prestamo.total_pagado),
+            ('completado', Decimal('0.00'), prestamo.monto_final)
+        )
+    
+    def test_pago_individual_y_por_lote_aplican_la_cuota_igual(self):
+        """Con una cuota mayor al saldo, ambos caminos registran el mismo pago y estado."""
+        from types import SimpleNamespace
+        from prestamos.models import PagoPrestamo
+        from .views import NominaSimpleViewSet
+        
+        individual = self._crear_nomina('70040', Decimal('1800000.00'))
+        prestamos = {
+            'individual': self._prestamo(individual, 'activo', Decimal('60000.00'), Decimal('940000.00')),
+            'lote': self._prestamo(
+                self._crear_nomina('70050', Decimal('1800000.00')),
+                'activo', Decimal('60000.00'), Decimal('940000.00')
+            ),
+        }
+        self._calcular_y_aprobar()
+        
+        individual = NominaSimple.objects.for_tenant(self.organization).get(pk=individual.pk)
+        codigo, _ = NominaSimpleViewSet()._pagar(individual, SimpleNamespace(user=self.usuario_contable))
+        self.assertEqual(codigo, 200)
+        PagadorNominaLote(self.organization, self.usuario_contable, *self.PERIODO).pagar()
+        
+        resultados = {}
+        for camino, prestamo in prestamos.items():
+            pago = PagoPrestamo.objects.for_tenant(self.organization).get(prestamo=prestamo)
+            prestamo.refresh_from_db()
+            resultados[camino] = (
+                pago.monto_pago, pago.saldo_anterior, pago.saldo_nuevo,
+                prestamo.estado, prestamo.saldo_pendiente, prestamo.total_pagado,
+            )
+        self.assertEqual(
+            resultados['individual'],
+            (Decimal('60000.00'), Decimal('60000.00'), Decimal('0.00'),
+             'completado', Decimal('0.00'), Decimal('1000000.00'))
+        )
+        self.assertEqual(resultados['lote'], resultados['individual'])
+
+
+class HuellaCalculoTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la omisión de recálculos con las mismas entradas."""
+    
+    def _recargar(self, nomina):
+        return NominaSimple.objects.for_tenant(self.organization).get(pk=nomina.pk)
+    
+    def test_recalculo_sin_cambios_no_escribe(self):
+        """Con la misma huella no hay escrituras ni reglas; un cambio del contrato recalcula."""
+        from unittest import mock
+        
+        nomina = self._crear_nomina('15010', Decimal('1800000.00'))
+        calculado = CalculadorNomina(nomina).calcular()
+        nomina = self._recargar(nomina)
+        self.assertTrue(nomina.huella_calculo)
+        
+        with CaptureQueriesContext(connection) as ctx, \
+                mock.patch.object(CalculadorNomina, 'aplicar_reglas') as aplicar_reglas:
+            resumen = CalculadorNomina(nomina).calcular()
+        escrituras = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(escrituras, [])
+        aplicar_reglas.assert_not_called()
+        self.assertTrue(resumen.pop('sin_cambios'))
+        # El resumen armado con lo guardado coincide con el del cálculo
+        # (las advertencias solo las producen las reglas)
+        calculado.pop('advertencias', None)
+        self.assertEqual(resumen, calculado)
+        
+        contrato = nomina.contrato
+        contrato.salario = Decimal('1900000.00')
+        contrato.save()
+        resumen = CalculadorNomina(self._recargar(nomina)).calcular()
+        self.assertNotIn('sin_cambios', resumen)
+        self.assertEqual(self._recargar(nomina).salario_base, Decimal('1900000.00'))
+    
+    def test_lote_omite_nominas_sin_cambios(self):
+        """Recalcular el período solo reescribe las nóminas cuyas entradas cambiaron."""
+        for documento in ('15110', '15120'):
+            self._crear_nomina(documento, Decimal('1600000.00'))
+        lote = lambda: CalculadorNominaLote.para_periodo(self.organization, *self.PERIODO).calcular()
+        
+        from unittest import mock
+        
+        primero = lote()
+        self.assertEqual(primero['sin_cambios'], 0)
+        with mock.patch.object(CalculadorNomina, 'aplicar_reglas') as aplicar_reglas:
+            resultado = lote()
+        self.assertEqual((resultado['calculadas'], resultado['sin_cambios']), (2, 2))
+        aplicar_reglas.assert_not_called()
+        # Los resúmenes se arman desde las líneas guardadas y coinciden con el cálculo
+        por_numero = lambda resumenes: sorted(
+            ({k: v for k, v in r.items() if k != 'advertencias'} for r in resumenes),
+            key=lambda r: r['numero']
+        )
+        self.assertEqual(por_numero(resultado['resumenes']), por_numero(primero['resumenes']))
+
+
+class SimulacionNominaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la simulación (dry-run) de nómina."""
+    
+    def test_simulacion_no_escribe_en_bd(self):
+        """La simulación devuelve el resumen completo sin INSERT/UPDATE/DELETE."""
+        nomina = self._crear_nomina('70010', Decimal('1500000.00'))
+        
+        with CaptureQueriesContext(connection) as consultas:
+            resumen = simular_nomina(nomina.contrato, *self.PERIODO)
+        
+        escrituras = [
+            q['sql'] for q in consultas.captured_queries
+            if q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(escrituras, [])
+        self.assertGreater(resumen['total_devengado'], 0)
+        self.assertGreater(resumen['aportes_empleador']['total'], 0)
+        self.assertGreater(resumen['provisiones']['cesantias'], 0)
+        self.assertEqual(
+            resumen['total_pagar'],
+            resumen['total_devengado'] - resumen['total_deducciones'] - resumen['total_prestamos']
+        )
+        self.assertEqual(NominaSimple.objects.for_tenant(self.organization).count(), 1)
+        self.assertFalse(NominaConcepto.objects.for_tenant(self.organization).filter(nomina=nomina).exists())
+
+
+class SimuladorCostosTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el simulador vectorizado de costo empleador."""
+    
+    def setUp(self):
+        super().setUp()
+        self._crear_nomina('80010', Decimal('1300000.00'))
+        self._crear_nomina('80020', Decimal('4000000.00'))
+    
+    def test_escenario_sin_cambios_no_tiene_diferencia(self):
+        """El escenario vacío reproduce el costo actual."""
+        resultado = SimuladorCostos(self.organization, fecha=self.PERIODO[1]).evaluar([EscenarioCosto()])[0]
+        
+        self.assertEqual(resultado['contratos'], 2)
+        self.assertEqual(resultado['diferencia_mensual'], Decimal('0.00'))
+        self.assertEqual(resultado['desglose']['salarios'], Decimal('5300000.00'))
+    
+    def test_nuevo_smmlv_indexa_salario_minimo(self):
+        """Un nuevo SMMLV sube solo a quienes ganan el mínimo."""
+        simulador = SimuladorCostos(self.organization, fecha=self.PERIODO[1])
+        resultado = simulador.evaluar([
+            EscenarioCosto(nombre='Decreto', smmlv=Decimal('1400000.00')),
+            EscenarioCosto(nombre='Riesgo V', nivel_arl='V', porcentajes={'ARL_NIVEL_V': Decimal('6.96')}),
+        ])
+        
+        self.assertEqual(resultado[0]['desglose']['salarios'], Decimal('5400000.00'))
+        self.assertGreater(resultado[0]['diferencia_mensual'], 0)
+        self.assertGreater(resultado[1]['desglose']['arl'], Decimal('0.00'))
+        self.assertGreater(resultado[1]['diferencia_mensual'], 0)
+
+
+class DesprendiblesPeriodoTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la generación en bloque de desprendibles del período."""
+    
+    def setUp(self):
+        super().setUp()
+        for documento in ('90010', '90020', '90030'):
+            self._crear_nomina(documento, Decimal('1500000.00'))
+        CalculadorNominaLote.para_periodo(self.organization, *self.PERIODO).calcular()
+    
+    def _datos(self):
+        nominas = nominas_para_desprendible(
+            NominaSimple.objects.for_tenant(self.organization).order_by('numero')
+        )
+        return [datos_desprendible(nomina) for nomina in nominas]
+    
+    def test_datos_con_consultas_constantes(self):
+        """Extraer los datos del período no hace una consulta por nómina."""
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self._datos()
+        
+        self.assertEqual(len(datos), 3)
+        self.assertLessEqual(len(consultas.captured_queries), 3)
+        self.assertTrue(all(d['deducciones'] for d in datos))
+    
+    def test_zip_y_pdf_combinado(self):
+        """El ZIP trae un PDF por nómina y el PDF combinado todas las páginas."""
+        import io
+        import zipfile
+        from PyPDF2 import PdfReader
+        
+        datos = self._datos()
+        contenido = b''.join(generar_zip_periodo(datos))
+        with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+            nombres = zf.namelist()
+            self.assertEqual(len(nombres), 3)
+            self.assertTrue(zf.read(nombres[0]).startswith(b'%PDF'))
+        
+        combinado = PdfReader(io.BytesIO(generar_pdf_periodo(datos)))
+        self.assertGreaterEqual(len(combinado.pages), 3)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    NOMINA_TRABAJO_TAMANO_BLOQUE=2,
+    # Celery lee estas claves de settings (namespace CELERY): modo eager y
+    # resultados en memoria en lugar de Redis
+    CELERY_TASK_ALWAYS_EAGER=True,
+    CELERY_TASK_EAGER_PROPAGATES=True,
+    CELERY_RESULT_BACKEND='cache+memory://',
+)
+class TrabajoCalculoNominaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el cálculo del período en segundo plano (Celery en modo eager)."""
+    
+    def test_calcula_por_bloques_y_publica_avance(self):
+        """Cinco nóminas en bloques de dos: tres bloques y avance al 100%."""
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        
+        for documento in ('11010', '11020', '11030', '11040', '11050'):
+            self._crear_nomina(documento, Decimal('1500000.00'))
+        
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            trabajo = iniciar_trabajo_calculo(self.organization, None, *self.PERIODO)
+        async_to_sync(channel_layer.group_add)(trabajo.grupo_ws, canal)
+        for callback in callbacks:
+            callback()
+        
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual((trabajo.total, trabajo.calculadas), (5, 5))
+        self.assertEqual(trabajo.bloques_completados, 3)
+        self.assertEqual(
+            NominaSimple.objects.for_tenant(self.organization).filter(estado='calculada').count(), 5
+        )
+        
+        mensajes = [async_to_sync(channel_layer.receive)(canal) for _ in range(4)]
+        self.assertEqual(mensajes[-1]['type'], 'nomina_progreso')
+        self.assertEqual(mensajes[-1]['data']['porcentaje'], 100.0)
+        self.assertEqual(mensajes[-1]['data']['eta_segundos'], 0)
+
+
+class ResumenPeriodoNominaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el resumen materializado por período."""
+    
+    CAMPOS = ('nominas', 'anuladas', 'total_devengado', 'total_pagar', 'costo_total_empleador',
+              'por_estado', 'conceptos')
+    
+    def _resumen(self):
+        return ResumenPeriodoNomina.objects.for_tenant(self.organization).values(*self.CAMPOS).get()
+    
+    def assertResumenIgualAReconstruido(self):
+        incremental = self._resumen()
+        reconstruir_resumen(self.organization)
+        self.assertEqual(incremental, self._resumen())
+    
+    def test_resumen_incremental_coincide_con_reconstruccion(self):
+        """Calcular, aprobar y anular mantienen el resumen igual a recalcularlo desde cero."""
+        nominas = [self._crear_nomina(doc, Decimal('1600000.00')) for doc in ('12010', '12020', '12030')]
+        CalculadorNominaLote.para_periodo(self.organization, *self.PERIODO).calcular()
+        self.assertResumenIgualAReconstruido()
+        
+        resumen = self._resumen()
+        self.assertEqual(resumen['nominas'], 3)
+        self.assertEqual(resumen['por_estado']['calculada']['cantidad'], 3)
+        self.assertTrue(resumen['conceptos'])
+        
+        aprobada, anulada = (NominaSimple.objects.for_tenant(self.organization).get(pk=n.pk) for n in nominas[:2])
+        aprobada.estado = 'aprobada'
+        aprobada.save()
+        anulada.estado = 'anulada'
+        anulada.save()
+        self.assertResumenIgualAReconstruido()
+        
+        resumen = self._resumen()
+        self.assertEqual((resumen['nominas'], resumen['anuladas']), (2, 1))
+        self.assertEqual(resumen['por_estado']['aprobada']['cantidad'], 1)
+
+
+class PilaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la planilla PILA en streaming."""
+    
+    def _campos(self, linea):
+        campos, posicion = {}, 0
+        for campo, longitud, _ in REGISTRO_COTIZANTE:
+            campos[campo] = linea[posicion:posicion + longitud]
+            posicion += longitud
+        return campos
+    
+    def test_planilla_usa_reglas_del_calculador(self):
+        """Las cotizaciones coinciden con lo calculado (empleado + empleador) y excluye anuladas."""
+        calculada = self._crear_nomina('13010', Decimal('2000000.00'))
+        CalculadorNomina(calculada).calcular()
+        self._crear_nomina('13020', Decimal('1500000.00'))
+        anulada = self._crear_nomina('13030', Decimal('1500000.00'))
+        anulada.estado = 'anulada'
+        anulada.save()
+        
+        contenido = b''.join(GeneradorPila(self.organization, *self.PERIODO, tamano_bloque=1).stream())
+        lineas = contenido.decode('ascii').split('\r\n')[:-1]
+        
+        self.assertEqual(len(lineas), 3)
+        self.assertTrue(lineas[0].startswith('01'))
+        longitud = sum(longitud for _, longitud, _ in REGISTRO_COTIZANTE)
+        self.assertTrue(all(len(linea) == longitud for linea in lineas[1:]))
+        
+        campos = self._campos(lineas[1])
+        self.assertEqual(campos['numero_documento'].strip(), '13010')
+        self.assertEqual(campos['dias_salud'], '30')
+        self.assertEqual(int(campos['ibc_salud']), 2000000)
+        self.assertEqual(campos['tarifa_pension'], '0.16000')
+        self.assertEqual(int(campos['cotizacion_pension']), 320000)
+        self.assertEqual(int(campos['cotizacion_salud']), 250000)
+        self.assertEqual(int(campos['cotizacion_arl']), int(calculada.aporte_arl))
+        self.assertEqual(int(campos['valor_caja']), int(calculada.aporte_caja))
+        
+        # Nómina en borrador: IBC del contrato
+        self.assertEqual(int(self._campos(lineas[2])['ibc_pension']), 1500000)
+
+
+class NominaElectronicaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la generación en bloque de XML de nómina electrónica."""
+    
+    def test_zip_con_documentos_validos_de_nominas_pagadas(self):
+        """Solo las pagadas generan XML y los documentos pasan el XSD local."""
+        import io
+        import zipfile
+        
+        self.organization.nit = '900123456-7'
+        self.organization.save()
+        self._configurar_contabilidad()
+        pagada = self._crear_nomina('14010', Decimal('2000000.00'))
+        CalculadorNomina(pagada).calcular()
+        pagada.estado = 'pagada'
+        pagada.fecha_pago = self.PERIODO[1]
+        pagada.save()
+        self._crear_nomina('14020', Decimal('1500000.00'))
+        
+        with self.assertNumQueries(3):
+            documentos = documentos_periodo(self.organization, *self.PERIODO)
+        self.assertEqual(len(documentos), 1)
+        
+        xml, errores = generar_documento(documentos[0])
+        self.assertEqual(errores, [])
+        self.assertIn(f'<ComprobanteTotal>{pagada.total_pagar}</ComprobanteTotal>'.encode(), xml)
+        
+        contenido = b''.join(generar_zip_documentos(documentos))
+        with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+            self.assertEqual(zf.namelist(), [f'{pagada.numero}_14010.xml'])
+
+
+class LibroPrestacionesTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el libro incremental de prestaciones sociales."""
+    
+    def test_pagar_causa_provisiones_del_calculador(self):
+        """Pagar causa las mismas provisiones del cálculo, una sola vez."""
+        self._configurar_contabilidad()
+        nomina = self._crear_nomina('15010', Decimal('1600000.00'))
+        calculador = CalculadorNomina(nomina)
+        calculador.calcular()
+        nomina.estado = 'pagada'
+        nomina.save()
+        
+        saldo = SaldoPrestacion.objects.for_tenant(self.organization).get(concepto='cesantias')
+        self.assertEqual(saldo.saldo, calculador.provisiones['cesantias'])
+        self.assertEqual(registrar_causaciones(self.organization, [nomina.pk]), 0)
+        
+        registrar_pago(self.organization, saldo.empleado_id, 'cesantias', saldo.saldo, self.PERIODO[1])
+        saldo.refresh_from_db()
+        self.assertEqual((saldo.saldo, saldo.pagado), (Decimal('0.00'), calculador.provisiones['cesantias']))
+        # Antes del fin del período no hay nada causado
+        self.assertEqual(saldos_a_fecha(self.organization, self.PERIODO[0]), {})
+        
+        movimientos = list(
+            MovimientoPrestacion.objects.for_tenant(self.organization)
+            .order_by('secuencia').values_list('tipo', 'saldo')
+        )
+        reconstruir_prestaciones(self.organization)
+        self.assertEqual(
+            list(MovimientoPrestacion.objects.for_tenant(self.organization)
+                 .order_by('secuencia').values_list('tipo', 'saldo')),
+            movimientos
+        )
+
+
+class CierrePeriodoTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el cierre de período con snapshot y archivo de detalle."""
+    
+    def _detalle(self, nomina):
+        """Detalle tal como lo recibe el cliente (JSON)."""
+        import json
+        from rest_framework.renderers import JSONRenderer
+        
+        datos = json.loads(JSONRenderer().render(
+            NominaSimpleDetailSerializer(NominaSimple.objects.get(pk=nomina.pk)).data
+        ))
+        datos.pop('cerrada')
+        return datos
+    
+    def test_cerrar_archiva_detalle_y_reproduce_la_nomina(self):
+        """El detalle sale de las tablas de trabajo y la nómina se sirve igual desde el snapshot."""
+        self._configurar_contabilidad()
+        pagada = self._crear_nomina('16010', Decimal('1600000.00'))
+        pendiente = self._crear_nomina('16020', Decimal('1600000.00'))
+        CalculadorNominaLote.para_periodo(self.organization, *self.PERIODO).calcular()
+        
+        with self.assertRaises(CierrePeriodoError):
+            cerrar_periodo(self.organization, None, *self.PERIODO)
+        
+        pagada.refresh_from_db()
+        pagada.estado = 'pagada'
+        pagada.save()
+        pendiente.refresh_from_db()
+        pendiente.estado = 'anulada'
+        pendiente.save()
+        antes = self._detalle(pagada)
+        lineas = NominaConcepto.objects.for_tenant(self.organization).count()
+        
+        resultado = cerrar_periodo(self.organization, None, *self.PERIODO)
+        
+        self.assertEqual(resultado['nominas'], 2)
+        self.assertEqual(resultado['archivadas']['nominaconcepto'], lineas)
+        self.assertFalse(NominaConcepto.objects.for_tenant(self.organization).exists())
+        self.assertEqual(NominaConceptoArchivo.objects.for_tenant(self.organization).count(), lineas)
+        self.assertEqual(self._detalle(pagada), antes)
+        
+        # El resumen reconstruido incluye las líneas archivadas
+        resumen = ResumenPeriodoNomina.objects.for_tenant(self.organization).values('conceptos').get()
+        reconstruir_resumen(self.organization)
+        self.assertEqual(
+            ResumenPeriodoNomina.objects.for_tenant(self.organization).values('conceptos').get(), resumen
+        )
+        
+        reabrir_periodo(self.organization, *self.PERIODO)
+        self.assertEqual(NominaConcepto.objects.for_tenant(self.organization).count(), lineas)
+        self.assertFalse(NominaConceptoArchivo.objects.for_tenant(self.organization).exists())
+        self.assertEqual(self._detalle(pagada), antes)
+
+
+class ExportacionColumnarTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la exportación columnar del histórico."""
+    
+    def test_csv_particionado_por_anio_y_mes(self):
+        """Una fila por línea de concepto, en la partición del fin del período."""
+        import csv
+        import os
+        import tempfile
+        
+        enero = self._crear_nomina('17010', Decimal('1600000.00'))
+        febrero = self._crear_nomina('17020', Decimal('1600000.00'))
+        febrero.periodo_inicio, febrero.periodo_fin = date(2026, 2, 1), date(2026, 2, 28)
+        febrero.save()
+        for nomina in (enero, febrero):
+            CalculadorNomina(nomina).calcular()
+        lineas = NominaConcepto.objects.for_tenant(self.organization)
+        
+        with tempfile.TemporaryDirectory() as destino:
+            # Bloques pequeños para escribir cada partición en varias partes
+            resultado = exportar_historico(self.organization, destino, formato='csv', tamano_bloque=2)
+            
+            self.assertEqual(resultado['filas'], lineas.count())
+            self.assertEqual(resultado['particiones'], {
+                os.path.join('anio=2026', 'mes=01'): lineas.filter(nomina=enero).count(),
+                os.path.join('anio=2026', 'mes=02'): lineas.filter(nomina=febrero).count(),
+            })
+            with open(os.path.join(destino, 'anio=2026', 'mes=02', 'part-0000.csv'), encoding='utf-8') as archivo:
+                filas = list(csv.DictReader(archivo))
+        
+        self.assertEqual(list(filas[0]), [columna for columna, _, _ in COLUMNAS])
+        self.assertEqual({fila['numero'] for fila in filas}, {febrero.numero})
+        self.assertEqual(
+            sum(Decimal(fila['valor']) for fila in filas),
+            sum(linea.valor for linea in lineas.filter(nomina=febrero))
+        )
+
+
+class VariacionesPeriodosTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el reporte de variaciones entre períodos."""
+    
+    FEBRERO = (date(2026, 2, 1), date(2026, 2, 28))
+    
+    def test_marca_variaciones_con_una_consulta_agrupada(self):
+        """Solo se marcan las líneas del empleado con aumento; una consulta de líneas."""
+        con_aumento = self._crear_nomina('18010', Decimal('1600000.00'))
+        sin_cambio = self._crear_nomina('18020', Decimal('1600000.00'))
+        for nomina in (con_aumento, sin_cambio):
+            CalculadorNomina(nomina).calcular()
+        
+        con_aumento.contrato.salario = Decimal('2000000.00')
+        con_aumento.contrato.save()
+        for nomina in (con_aumento, sin_cambio):
+            CalculadorNomina(NominaSimple.objects.create(
+                organization=self.organization,
+                contrato=nomina.contrato,
+                periodo_inicio=self.FEBRERO[0],
+                periodo_fin=self.FEBRERO[1],
+            )).calcular()
+        
+        # Cierres del período + líneas
+        with self.assertNumQueries(2):
+            reporte = variaciones_periodos(self.organization, [self.FEBRERO, self.PERIODO])
+        
+        self.assertEqual([p['periodo_inicio'] for p in reporte['periodos']], [self.PERIODO[0], self.FEBRERO[0]])
+        self.assertGreater(reporte['filas_marcadas'], 0)
+        marcadas = [fila for fila in reporte['filas'] if fila['marcada']]
+        self.assertEqual({fila['documento'] for fila in marcadas}, {'18010'})
+        self.assertEqual(reporte['filas'][0]['documento'], '18010')
+        self.assertTrue(all(
+            fila['diferencia'] == 0 for fila in reporte['filas'] if fila['documento'] == '18020'
+        ))
+        
+        with self.assertRaises(ValueError):
+            variaciones_periodos(self.organization, [self.PERIODO])
+
+
+class CostosEmpleadorQuerySetTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el costo del empleador anotado en SQL."""
+    
+    def test_anotaciones_coinciden_con_el_calculo(self):
+        """Costo y provisiones anotados igualan la propiedad y el calculador; se ordena en SQL."""
+        baja = self._crear_nomina('19010', Decimal('1600000.00'))
+        alta = self._crear_nomina('19020', Decimal('3000000.00'))
+        # Un parámetro anterior aún abierto: vale el más reciente
+        ParametroLegal.objects.create(
+            organization=self.organization,
+            concepto='CESANTIAS',
+            porcentaje_total=Decimal('9.00'),
+            porcentaje_empleador=Decimal('9.00'),
+            vigente_desde=date(2025, 1, 1)
+        )
+        ParametroLegal.objects.create(
+            organization=self.organization,
+            concepto='PRIMA_SERVICIOS',
+            porcentaje_total=Decimal('8.33'),
+            porcentaje_empleador=Decimal('8.33'),
+            vigente_desde=date(2026, 1, 1)
+        )
+        provisiones = {}
+        for nomina in (baja, alta):
+            calculador = CalculadorNomina(nomina)
+            calculador.calcular()
+            provisiones[nomina.pk] = calculador.provisiones
+        baja.refresh_from_db()
+        
+        nominas = NominaSimple.objects.for_tenant(self.organization).con_costos()
+        for nomina in nominas:
+            esperado = NominaSimple.objects.for_tenant(self.organization).get(pk=nomina.pk)
+            self.assertEqual(nomina.costo_empleador, esperado.costo_total_empleador)
+            self.assertEqual(nomina.provisiones_empleador, sum(provisiones[nomina.pk].values()))
+        # Auxilio y porcentajes se consultan una vez por anotación, no por provisión
+        self.assertLessEqual(str(nominas.query).count('SELECT'), 10)
+        
+        self.assertEqual(
+            list(nominas.order_by('-costo_empleador').values_list('pk', flat=True)), [alta.pk, baja.pk]
+        )
+        self.assertEqual(
+            list(nominas.filter(costo_empleador__gt=baja.costo_total_empleador).values_list('pk', flat=True)),
+            [alta.pk]
+        )
+        totales = nominas.totales_costos()
+        self.assertEqual(
+            totales['costo_empleador'],
+            sum(n.costo_total_empleador for n in NominaSimple.objects.for_tenant(self.organization))
+        )
+        self.assertEqual(
+            totales['provisiones_empleador'],
+            sum(sum(valores.values()) for valores in provisiones.values())
+        )
+
+
+class TransicionIdempotenteTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para las transiciones de estado con clave de idempotencia."""
+    
+    def test_reintento_devuelve_la_respuesta_guardada(self):
+        """La misma clave no repite la transición; un 5xx libera la clave."""
+        nomina = self._crear_nomina('20010', Decimal('1600000.00'))
+        ejecuciones = []
+        
+        def aprobar(bloqueada):
+            ejecuciones.append(bloqueada.pk)
+            bloqueada.estado = 'aprobada'
+            bloqueada.save()
+            return 200, {'estado': bloqueada.estado, 'id': bloqueada.pk}
+        
+        primera = ejecutar_transicion(nomina, 'aprobar', aprobar, clave='clave-1')
+        repetida = ejecutar_transicion(nomina, 'aprobar', aprobar, clave='clave-1')
+        
+        self.assertEqual(len(ejecuciones), 1)
+        self.assertFalse(primera[2])
+        self.assertEqual(repetida, (200, {'estado': 'aprobada', 'id': str(nomina.pk)}, True))
+        with self.assertRaises(ClaveIdempotenciaInvalida):
+            ejecutar_transicion(nomina, 'pagar', aprobar, clave='clave-1')
+        
+        # Error interno: se revierte y la clave queda libre para reintentar
+        def fallar(bloqueada):
+            bloqueada.estado = 'anulada'
+            bloqueada.save()
+            return 500, {'error': 'fallo'}
+        
+        self.assertEqual(ejecutar_transicion(nomina, 'anular', fallar, clave='clave-2')[0], 500)
+        nomina.refresh_from_db()
+        self.assertEqual(nomina.estado, 'aprobada')
+        self.assertFalse(TransicionNomina.objects.for_tenant(self.organization).filter(clave='clave-2').exists())
+
+
+class DispersionBancariaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el archivo de dispersión bancaria."""
+    
+    def _nomina_aprobada(self, documento, banco='Bancolombia', numero_cuenta='12345678901'):
+        nomina = self._crear_nomina(documento, Decimal('1600000.00'))
+        empleado = nomina.contrato.empleado
+        empleado.banco, empleado.tipo_cuenta, empleado.numero_cuenta = banco, 'ahorros', numero_cuenta
+        empleado.save()
+        CalculadorNomina(nomina).calcular()
+        nomina.estado = 'aprobada'
+        nomina.save()
+        return nomina
+    
+    def test_csv_y_ancho_fijo(self):
+        """Un registro por nómina con cuenta; las demás se cuentan aparte."""
+        import csv
+        
+        con_cuenta = self._nomina_aprobada('21010')
+        self._nomina_aprobada('21020', banco='', numero_cuenta='')
+        
+        generador = GeneradorDispersion(self.organization, *self.PERIODO, 'csv', tamano_bloque=1)
+        filas = list(csv.DictReader(b''.join(generador.stream()).decode('ascii').splitlines()))
+        self.assertEqual(generador.sin_cuenta(), 1)
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['numero_documento'], '21010')
+        self.assertEqual(filas[0]['codigo_banco'], '1007')
+        self.assertEqual(Decimal(filas[0]['valor']), con_cuenta.total_pagar)
+        
+        generador = GeneradorDispersion(self.organization, *self.PERIODO, 'bancolombia_pab', cuenta_origen='999')
+        encabezado, detalle = b''.join(generador.stream()).decode('ascii').split('\r\n')[:2]
+        layout = LAYOUTS['bancolombia_pab']
+        self.assertEqual(len(encabezado), sum(longitud for _, longitud, _ in layout['encabezado']))
+        self.assertEqual(len(detalle), sum(longitud for _, longitud, _ in layout['detalle']))
+        valor = int(con_cuenta.total_pagar * 100)
+        self.assertIn(str(valor).zfill(17), encabezado)
+        self.assertIn(str(valor).zfill(17), detalle)
+        
+        with self.assertRaises(ValueError):
+            GeneradorDispersion(self.organization, *self.PERIODO, 'no_existe')
+
+
+class AcumuladoCertificadoTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para los acumulados de certificados de ingresos y retenciones."""
+    
+    def test_pagar_y_revertir_actualiza_el_acumulado(self):
+        """Pagar suma una sola vez; dejar de estar pagada resta."""
+        self._configurar_contabilidad()
+        nomina = self._crear_nomina('22010', Decimal('1600000.00'))
+        CalculadorNomina(nomina).calcular()
+        nomina.estado = 'pagada'
+        nomina.save()
+        salud = NominaConcepto.objects.for_tenant(self.organization).get(
+            nomina=nomina, concepto__codigo='SALUD_EMPLEADO'
+        ).valor
+        
+        acumulado = AcumuladoCertificado.objects.for_tenant(self.organization).get()
+        self.assertEqual(acumulado.anio, 2026)
+        self.assertEqual(acumulado.ingresos_brutos, nomina.total_devengado)
+        self.assertEqual(acumulado.aportes_salud, salud)
+        self.assertEqual(acumulado.nominas, 1)
+        self.assertEqual(registrar_pagos(self.organization, [nomina.pk]), 0)
+        
+        certificados = datos_certificados(self.organization, acumulado.anio)
+        self.assertEqual([c['empleado_documento'] for c in certificados], ['22010'])
+        self.assertEqual(certificados[0]['ingresos_brutos'], nomina.total_devengado)
+        
+        reconstruir_certificados(self.organization)
+        acumulado_reconstruido = AcumuladoCertificado.objects.for_tenant(self.organization).get()
+        self.assertEqual(acumulado_reconstruido.ingresos_brutos, acumulado.ingresos_brutos)
+        self.assertEqual(acumulado_reconstruido.rentas_exentas, acumulado.rentas_exentas)
+        
+        nomina.refresh_from_db()
+        nomina.estado = 'aprobada'
+        nomina.save()
+        acumulado_reconstruido.refresh_from_db()
+        self.assertEqual(
+            (acumulado_reconstruido.ingresos_brutos, acumulado_reconstruido.nominas), (Decimal('0.00'), 0)
+        )
+        self.assertEqual(datos_certificados(self.organization, acumulado.anio), [])
+
+
+class ImportacionNovedadesTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la importación masiva de novedades del período."""
+    
+    def test_importa_filas_validas_y_reporta_errores(self):
+        """Items y conceptos válidos se cargan en bloque; el resto va al reporte."""
+        import io
+        from items.models import Item
+        
+        nomina = self._crear_nomina('23010', Decimal('1600000.00'))
+        Item.objects.create(
+            organization=self.organization, nombre='Excavación manual', codigo='EXC',
+            precio_unitario=Decimal('15000.00'), tipo_cantidad='m3',
+        )
+        bono = ConceptoLaboral.objects.create(
+            organization=self.organization, codigo='BONO_OBRA', nombre='Bono obra', tipo='DEVENGADO'
+        )
+        archivo = io.BytesIO(
+            'Documento,Código,Cantidad,Valor unitario\n'
+            '23010,EXC,"2,5",\n'
+            '23010,bono_obra,,\n'
+            '23010,SALUD_EMPLEADO,,\n'
+            '23010,NO_EXISTE,1,\n'
+            '99990,EXC,1,\n'
+            '23010,EXC,0,\n'.encode('utf-8')
+        )
+        
+        with self.assertNumQueries(4):
+            importador = ImportadorNovedades(self.organization, *self.PERIODO)
+        resultado = importador.importar(leer_filas(archivo, 'novedades.csv'))
+        
+        self.assertEqual((resultado['items_creados'], resultado['conceptos_agregados']), (1, 1))
+        self.assertEqual([error['fila'] for error in resultado['errores']], [4, 5, 6, 7])
+        item = NominaItem.objects.for_tenant(self.organization).get(nomina=nomina)
+        self.assertEqual((item.cantidad, item.valor_total), (Decimal('2.50'), Decimal('37500.00')))
+        nomina.refresh_from_db()
+        self.assertEqual(nomina.conceptos_seleccionados, [str(bono.pk)])
+
+
+class AperturaPeriodoTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para la apertura del período en bloque."""
+    
+    def test_crea_borradores_solo_para_contratos_sin_nomina(self):
+        """Una nómina por contrato activo sin nómina solapada; repetir no duplica."""
+        existente = self._crear_nomina('24010', Decimal('1600000.00'))
+        sin_nomina = self._crear_nomina('24020', Decimal('1800000.00'))
+        contrato = sin_nomina.contrato
+        sin_nomina.delete()
+        
+        resultado = abrir_periodo(self.organization, *self.PERIODO)
+        
+        self.assertEqual((resultado['creadas'], resultado['omitidas']), (1, 1))
+        creada = NominaSimple.objects.for_tenant(self.organization).get(contrato=contrato)
+        self.assertEqual((creada.estado, creada.salario_base), ('borrador', Decimal('1800000.00')))
+        self.assertEqual(creada.numero, resultado['numero_desde'])
+        self.assertNotEqual(creada.numero, existente.numero)
+        resumen = ResumenPeriodoNomina.objects.for_tenant(self.organization).get(
+            periodo_inicio=self.PERIODO[0], periodo_fin=self.PERIODO[1]
+        )
+        self.assertEqual(resumen.nominas, 2)
+        
+        self.assertEqual(abrir_periodo(self.organization, *self.PERIODO)['creadas'], 0)
+    
+    def test_segunda_apertura_bloquea_antes_de_buscar_nominas(self):
+        """La segunda apertura no crea nada; el EXISTS corre después del bloqueo, en otra consulta."""
+        self._crear_nomina('24030', Decimal('1600000.00')).delete()
+        self._crear_nomina('24040', Decimal('1700000.00')).delete()
+        self.assertEqual(abrir_periodo(self.organization, *self.PERIODO)['creadas'], 2)
+        nominas = NominaSimple.objects.for_tenant(self.organization)
+        
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = abrir_periodo(self.organization, *self.PERIODO)
+        
+        self.assertEqual((resultado['creadas'], resultado['omitidas']), (0, 2))
+        self.assertEqual(nominas.count(), 2)
+        sentencias = [consulta['sql'] for consulta in consultas.captured_queries]
+        bloqueo = next(i for i, sql in enumerate(sentencias) if 'FOR UPDATE' in sql)
+        self.assertNotIn('EXISTS', sentencias[bloqueo])
+        self.assertTrue(any('EXISTS' in sql for sql in sentencias[bloqueo + 1:]))
+
+
+class NumeracionNominaTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el número de nómina asignado al guardar."""
+    
+    def test_guardado_fallido_no_consume_numero(self):
+        """Si el INSERT falla, el consecutivo se revierte con él."""
+        primera = self._crear_nomina('26010', Decimal('1500000.00'))
+        invalida = NominaSimple(
+            organization=self.organization,
+            contrato=primera.contrato,
+            periodo_inicio=self.PERIODO[1],
+            periodo_fin=self.PERIODO[0]
+        )
+        
+        with self.assertRaises(ValidationError):
+            invalida.save()
+        
+        self.assertEqual(invalida.numero, '')
+        segunda = self._crear_nomina('26020', Decimal('1500000.00'))
+        prefijo, consecutivo = primera.numero.rsplit('-', 1)
+        self.assertEqual(segunda.numero, f"{prefijo}-{int(consecutivo) + 1:06d}")
+
+
+class ContratoActualEmpleadoTest(NominaPeriodoTestMixin, TestCase):
+    """Tests para el contrato vigente desnormalizado en el empleado."""
+    
+    def test_puntero_sigue_al_contrato_activo(self):
+        """Crear, terminar y eliminar contratos actualiza contrato_actual."""
+        anterior = self._crear_nomina('25010', Decimal('1500000.00')).contrato
+        empleado = Empleado.objects.for_tenant(self.organization).get(pk=anterior.empleado_id)
+        self.assertEqual(empleado.contrato_actual_id, anterior.pk)
+        
+        nuevo = Contrato.objects.create(
+            organization=self.organization,
+            empleado=empleado,
+            tipo_contrato=self.tipo_contrato,
+            salario=Decimal('1700000.00'),
+            fecha_inicio=date(2026, 2, 1),
+            activo=True
+        )
+        empleado.refresh_from_db()
+        self.assertEqual(empleado.contrato_actual_id, nuevo.pk)
+        
+        nuevo.activo = False
+        nuevo.save()
+        empleado.refresh_from_db()
+        self.assertIsNone(empleado.contrato_actual_id)
+        
+        anterior.refresh_from_db()
+        anterior.activo = True
+        anterior.save()
+        empleado.refresh_from_db()
+        self.assertEqual(empleado.contrato_actual_id, anterior.pk)
+        
+        # Activar el nuevo desactiva el anterior (que tiene nómina y no se elimina)
+        nuevo.activo = True
+        nuevo.save()
+        anterior.refresh_from_db()
+        self.assertFalse(anterior.activo)
+        nuevo.delete()
+        empleado.refresh_from_db()
+        self.assertIsNone(empleado.contrato_actual_id)
+    
+    def test_listado_sin_consultas_por_fila(self):
+        """Serializar el listado cuesta las mismas consultas con 1 o 5 empleados."""
+        def listar():
+            empleados = Empleado.objects.for_tenant(self.organization).con_contrato_actual()
+            with CaptureQueriesContext(connection) as consultas:
+                datos = EmpleadoListSerializer(empleados, many=True).data
+            return datos, len(consultas)
+        
+        self._crear_nomina('25110', Decimal('1500000.00'))
+        datos, una = listar()
+        self.assertEqual(datos[0]['contrato_activo']['salario'], '1500000.00')
+        for documento in ('25120', '25130', '25140', '25150'):
+            self._crear_nomina(documento, Decimal('1500000.00'))
+        datos, varias = listar()
+        self.assertEqual(len(datos), 5)
+        self.assertEqual(una, varias)
+
+
+class CacheNormativaTest(TestCase):
+    """Tests para la caché versionada de parámetros legales y conceptos."""
+    
+    def setUp(self):
+        self.organization = Organizacion.objects.create(
+            nombre='Test Org Cache',
+            codigo='TESTCACHE',
+            activa=True
+        )
+        self.smmlv_2025 = ParametroLegal.objects.create(
+            organization=self.organization,
+            concepto='SMMLV',
+            valor_fijo=Decimal('1423500.00'),
+            vigente_desde=date(2025, 1, 1),
+            vigente_hasta=date(2025, 12, 31)
+        )
+        self.smmlv_2026 = ParametroLegal.objects.create(
+            organization=self.organization,
+            concepto='SMMLV',
+            valor_fijo=Decimal('1500000.00'),
+            vigente_desde=date(2026, 1, 1)
+        )
+    
+    def test_resuelve_parametro_vigente_por_fecha(self):
+        """Cada fecha obtiene el parámetro de su intervalo de vigencia."""
+        self.assertEqual(
+            ParametroLegal.obtener_vigente(self.organization, 'SMMLV', date(2025, 6, 1)),
+            self.smmlv_2025
+        )
+        self.assertEqual(
+            ParametroLegal.obtener_vigente(self.organization, 'SMMLV', date(2026, 6, 1)),
+            self.smmlv_2026
+        )
+        self.assertIsNone(
+            ParametroLegal.obtener_vigente(self.organization, 'SMMLV', date(2024, 6, 1))
+        )
+    
+    def test_consultas_repetidas_no_van_a_bd(self):
+        """Con el snapshot cargado, las búsquedas no consultan la BD."""
+        obtener_snapshot(self.organization)
+        with self.assertNumQueries(0):
+            ParametroLegal.obtener_vigente(self.organization, 'SMMLV', date(2026, 6, 1))
+            obtener_snapshot(self.organization).concepto(('SALUD_EMPLEADO',))
+    
+    def test_guardar_invalida_snapshot(self):
+        """Guardar un parámetro o concepto incrementa la versión y recarga."""
+        version = obtener_version(self.organization)
+        self.smmlv_2026.valor_fijo = Decimal('1600000.00')
+        self.smmlv_2026.save()
+        
+        self.assertNotEqual(obtener_version(self.organization), version)
+        parametro = ParametroLegal.obtener_vigente(self.organization, 'SMMLV', date(2026, 6, 1))
+        self.assertEqual(parametro.valor_fijo, Decimal('1600000.00'))
+        
+        version = obtener_version(self.organization)
+        ConceptoLaboral.objects.create(
+            organization=self.organization,
+            codigo='BONO_TEST',
+            nombre='Bono test',
+            tipo='DEVENGADO'
+        )
+        self.assertNotEqual(obtener_version(self.organization), version)
+        self.assertIsNotNone(obtener_snapshot(self.organization).concepto(('BONO_TEST',)))
@@ -0,0 +1,154 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║            TRANSICIONES DE ESTADO IDEMPOTENTES Y CON BLOQUEO                  ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Ejecuta calcular, aprobar, pagar y anular de forma segura ante dobles clics
+y reintentos:
+
+1. Clave de idempotencia (cabecera ``Idempotency-Key``, opcional): la
+   primera petición registra una ``TransicionNomina`` en proceso; al
+   terminar guarda el código y el JSON de la respuesta. Un reintento con la
+   misma clave recibe esa respuesta sin repetir el trabajo, y mientras la
+   primera sigue en curso recibe 409.
+2. Bloqueo de fila: la nómina se bloquea con ``SELECT ... FOR UPDATE
+   NOWAIT``. Una transición concurrente sobre la misma nómina (con o sin
+   clave) se rechaza con 409 de inmediato en lugar de esperar el bloqueo y
+   repetir el camino pesado; el estado se valida ya con la fila bloqueada.
+
+Las respuestas 5xx no se guardan: la transición se revierte y la clave
+queda libre para reintentar. Una transición en proceso que supera
+``NOMINA_TRANSICION_TIMEOUT`` segundos (proceso caído) se puede retomar.
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+
+from .models import NominaSimple, TransicionNomina
+
+logger = logging.getLogger(__name__)
+
+
+class TransicionEnCurso(Exception):
+    """Otra transición sobre la misma nómina (o con la misma clave) está en curso."""
+    pass
+
+
+class ClaveIdempotenciaInvalida(Exception):
+    """La clave ya se usó para otra nómina o acción."""
+    pass
+
+
+def _timeout() -> int:
+    return getattr(settings, 'NOMINA_TRANSICION_TIMEOUT', 300)
+
+
+def _reservar_clave(nomina, accion, clave, usuario):
+    """
+    Registra la transición en proceso (en su propia transacción, visible
+    para las peticiones concurrentes).
+
+    Returns:
+        (TransicionNomina, bool): registro y si es una repetición completada
+    """
+    for _ in range(2):
+        existente = TransicionNomina.objects.for_tenant(nomina.organization_id).filter(clave=clave).first()
+        if existente is not None:
+            if existente.nomina_id != nomina.pk or existente.accion != accion:
+                raise ClaveIdempotenciaInvalida(
+                    'La clave de idempotencia ya se usó para otra nómina u operación'
+                )
+            if existente.estado == 'completada':
+                return existente, True
+            if existente.created_at > timezone.now() - timedelta(seconds=_timeout()):
+                raise TransicionEnCurso('La operación con esta clave de idempotencia está en curso')
+            # En proceso vencida (proceso caído): se retoma
+            logger.warning('Retomando transición %s abandonada (%s)', existente.pk, clave)
+            TransicionNomina.objects.for_tenant(nomina.organization_id).filter(
+                pk=existente.pk, estado='en_proceso'
+            ).update(created_at=timezone.now(), usuario=usuario)
+            return existente, False
+        try:
+            with transaction.atomic():
+                return TransicionNomina.objects.create(
+                    organization_id=nomina.organization_id,
+                    nomina=nomina,
+                    accion=accion,
+                    clave=clave,
+                    usuario=usuario,
+                ), False
+        except IntegrityError:
+            # Otra petición registró la misma clave: se vuelve a leer
+            continue
+    raise TransicionEnCurso('La operación con esta clave de idempotencia está en curso')
+
+
+def ejecutar_transicion(nomina, accion, ejecutar, clave=None, usuario=None):
+    """
+    Ejecuta una transición de estado con bloqueo de la nómina.
+
+    Args:
+        nomina: nómina (ya autorizada) sobre la que se opera
+        accion: 'calcular', 'aprobar', 'pagar' o 'anular'
+        ejecutar: función que recibe la nómina bloqueada y retorna
+            ``(codigo_http, datos)``
+        clave: clave de idempotencia del cliente (opcional)
+
+    Raises:
+        TransicionEnCurso: otra transición sobre la nómina está en curso
+        ClaveIdempotenciaInvalida: la clave pertenece a otra operación
+
+    Returns:
+        (codigo_http, datos, repetida)
+    """
+    registro = None
+    if clave:
+        registro, repetida = _reservar_clave(nomina, accion, clave, usuario)
+        if repetida:
+            return registro.codigo_respuesta, registro.respuesta, True
+
+    try:
+        with transaction.atomic():
+            try:
+                bloqueada = NominaSimple.objects.for_tenant(nomina.organization_id).select_for_update(
+                    nowait=True, of=('self',)
+                ).select_related('contrato__empleado', 'contrato__tipo_contrato').get(pk=nomina.pk)
+            except OperationalError:
+                raise TransicionEnCurso(
+                    f'La nómina {nomina.numero} se está procesando en otra operación. Intente de nuevo.'
+                )
+
+            codigo, datos = ejecutar(bloqueada)
+            if codigo >= 500:
+                transaction.set_rollback(True)
+            elif registro is not None:
+                # JSON tal como lo recibe el cliente, para repetirlo idéntico
+                from rest_framework.renderers import JSONRenderer
+
+                TransicionNomina.objects.for_tenant(nomina.organization_id).filter(pk=registro.pk).update(
+                    estado='completada',
+                    codigo_respuesta=codigo,
+                    respuesta=json.loads(JSONRenderer().render(datos)),
+                    completada_at=timezone.now(),
+                )
+    except BaseException:
+        _liberar(registro)
+        raise
+
+    if codigo >= 500:
+        _liberar(registro)
+    return codigo, datos, False
+
+
+def _liberar(registro):
+    """Borra la transición en proceso para que la clave se pueda reintentar."""
+    if registro is not None:
+        TransicionNomina.objects.for_tenant(registro.organization_id).filter(
+            pk=registro.pk, estado='en_proceso'
+        ).delete()
@@ -69,6 +69,7 @@ GET    /api/nomina/empleados/{id}/         - Detalle de empleado
 PUT    /api/nomina/empleados/{id}/         - Actualizar empleado
 DELETE /api/nomina/empleados/{id}/         - Eliminar empleado
 GET    /api/nomina/empleados/activos/      - Solo empleados activos
+GET    /api/nomina/empleados/{id}/prestaciones/ - Saldos y movimientos de prestaciones sociales
 
 TIPOS DE CONTRATO:
 ------------------
@@ -118,7 +119,26 @@ POST   /api/nomina/nominas/{id}/calcular/  - ⭐ CALCULAR NÓMINA
 POST   /api/nomina/nominas/{id}/aprobar/   - Aprobar nómina
 POST   /api/nomina/nominas/{id}/pagar/     - Marcar como pagada
 POST   /api/nomina/nominas/{id}/anular/    - Anular nómina
-GET    /api/nomina/nominas/por_periodo/?periodo_inicio=X&periodo_fin=Y
+       (calcular/aprobar/pagar/anular aceptan la cabecera Idempotency-Key; 409 si la nómina está en proceso)
+GET    /api/nomina/nominas/por_periodo/?periodo_inicio=X&periodo_fin=Y[&incluir_resumen=true]
+GET    /api/nomina/nominas/variaciones/?periodos=I1:F1,I2:F2[&umbral=20&limite=200] - Variaciones por empleado y concepto
+POST   /api/nomina/nominas/abrir_periodo/     - Crear en bloque las nóminas en borrador de los contratos activos
+POST   /api/nomina/nominas/importar_novedades/ - Novedades del período desde Excel/CSV (reporte de errores por fila)
+POST   /api/nomina/nominas/calcular_periodo/ - Calcular en bloque un período
+POST   /api/nomina/nominas/calcular_periodo_async/ - Calcular el período en segundo plano (Celery)
+GET    /api/nomina/nominas/trabajo_calculo/?trabajo=ID - Avance del cálculo (también por ws/nomina/trabajos/ID/)
+POST   /api/nomina/nominas/pagar_periodo/    - Pagar en bloque las aprobadas del período
+POST   /api/nomina/nominas/cerrar_periodo/   - Cerrar período (snapshot por nómina y detalle archivado)
+POST   /api/nomina/nominas/reabrir_periodo/  - Reabrir un período cerrado
+POST   /api/nomina/nominas/simular/          - Simular nómina sin guardar (dry-run)
+POST   /api/nomina/nominas/simular_costos/   - Escenarios what-if de costo empleador
+GET    /api/nomina/nominas/desprendibles_periodo/?periodo_inicio=X&periodo_fin=Y&formato=zip|pdf
+GET    /api/nomina/nominas/pila/?periodo_inicio=X&periodo_fin=Y - Planilla PILA (archivo plano, streaming)
+GET    /api/nomina/nominas/dispersion_bancaria/?periodo_inicio=X&periodo_fin=Y[&layout=csv|bancolombia_pab|davivienda&estado=aprobada|pagada] - Archivo de pagos al banco (streaming)
+GET    /api/nomina/nominas/nomina_electronica/?periodo_inicio=X&periodo_fin=Y - ZIP de XML de nómina electrónica (pagadas)
+GET    /api/nomina/nominas/provisiones_prestaciones/[?fecha=X] - Pasivo de prestaciones sociales a la fecha
+GET    /api/nomina/nominas/certificados_ingresos/?anio=AAAA[&empleados=ID,ID&formato=zip|pdf|json] - Certificados de ingresos y retenciones (acumulados anuales)
+GET    /api/nomina/nominas/export_columnar/[?formato=parquet|csv&desde=X&hasta=Y] - Histórico de conceptos particionado por año/mes (ZIP)
 
 ITEMS DE NÓMINA:
 ----------------
@@ -0,0 +1,161 @@
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║            VARIACIONES DE NÓMINA ENTRE PERÍODOS (REVISIÓN PREVIA)             ║
+║                Sistema de Nómina para Construcción                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Compara dos o más períodos por empleado y concepto para revisar la nómina
+antes de aprobarla, sin abrir las nóminas una por una.
+
+Los valores de todos los períodos salen de una consulta agrupada por
+empleado y concepto con agregación condicional (una columna
+``SUM(valor) FILTER (WHERE período = X)`` por período). Las líneas de los
+períodos cerrados están en ``NominaConceptoArchivo``; si se comparan
+períodos cerrados y abiertos se hace la misma consulta sobre cada tabla.
+
+La variación se mide entre los dos últimos períodos (en orden
+cronológico): diferencia absoluta y porcentual. Las filas se ordenan por
+la diferencia absoluta y se marcan las que superan el umbral porcentual.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import Q, Sum
+
+
+CERO = Decimal('0.00')
+MAX_PERIODOS = 12
+
+
+def _umbral_porcentaje() -> Decimal:
+    return Decimal(str(getattr(settings, 'NOMINA_VARIACION_UMBRAL_PORCENTAJE', 20)))
+
+
+def _consulta_periodos(modelo, organization, periodos, proyecto=None) -> list:
+    """
+    Valores por empleado, concepto y período de una tabla de líneas, en una
+    consulta agrupada.
+    """
+    filtro_periodos = Q()
+    columnas = {}
+    for indice, (inicio, fin) in enumerate(periodos):
+        del_periodo = Q(nomina__periodo_inicio=inicio, nomina__periodo_fin=fin)
+        filtro_periodos |= del_periodo
+        columnas[f'p{indice}'] = Sum('valor', filter=del_periodo)
+
+    lineas = modelo.objects.for_tenant(organization).filter(filtro_periodos).exclude(
+        nomina__estado='anulada'
+    )
+    if proyecto:
+        lineas = lineas.filter(nomina__proyecto=proyecto)
+    # order_by() vacío: el ordering del modelo no debe entrar en el GROUP BY
+    return list(
+        lineas.order_by().values(
+            'nomina__contrato__empleado_id',
+            'nomina__contrato__empleado__numero_documento',
+            'nomina__contrato__empleado__primer_apellido',
+            'nomina__contrato__empleado__segundo_apellido',
+            'nomina__contrato__empleado__primer_nombre',
+            'nomina__contrato__empleado__segundo_nombre',
+            'concepto__codigo',
+            'concepto__nombre',
+            'tipo',
+        ).annotate(**columnas)
+    )
+
+
+def _porcentaje(anterior, actual):
+    if not anterior:
+        return None
+    return ((actual - anterior) / abs(anterior) * 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def variaciones_periodos(organization, periodos, proyecto=None, umbral=None, limite=None) -> dict:
+    """
+    Compara los períodos indicados por empleado y concepto.
+
+    Args:
+        periodos: lista de (periodo_inicio, periodo_fin); se ordena
+            cronológicamente
+        umbral: variación porcentual a partir de la cual se marca una fila
+            (por defecto ``NOMINA_VARIACION_UMBRAL_PORCENTAJE``)
+        limite: máximo de filas a retornar (las de mayor diferencia)
+
+    Raises:
+        ValueError: menos de dos períodos o más de ``MAX_PERIODOS``
+
+    Returns:
+        dict: períodos comparados, totales por período y filas con valores
+        por período, diferencia, variación porcentual y marca
+    """
+    from .models import CierrePeriodoNomina, NominaConcepto, NominaConceptoArchivo
+
+    periodos = sorted(set(periodos))
+    if len(periodos) < 2:
+        raise ValueError('Se requieren al menos dos períodos distintos')
+    if len(periodos) > MAX_PERIODOS:
+        raise ValueError(f'Se pueden comparar máximo {MAX_PERIODOS} períodos')
+    umbral = _umbral_porcentaje() if umbral is None else Decimal(str(umbral))
+
+    cerrados = set(
+        CierrePeriodoNomina.objects.for_tenant(organization).filter(
+            periodo_inicio__in=[inicio for inicio, _ in periodos],
+            periodo_fin__in=[fin for _, fin in periodos],
+        ).values_list('periodo_inicio', 'periodo_fin')
+    )
+
+    # Cada período está completo en una sola tabla (trabajo o archivo)
+    filas = {}
+    for modelo, incluidos in (
+        (NominaConcepto, [p not in cerrados for p in periodos]),
+        (NominaConceptoArchivo, [p in cerrados for p in periodos]),
+    ):
+        consultar = [p for p, incluido in zip(periodos, incluidos) if incluido]
+        if not consultar:
+            continue
+        indices = [i for i, incluido in enumerate(incluidos) if incluido]
+        for fila in _consulta_periodos(modelo, organization, consultar, proyecto):
+            clave = (fila['nomina__contrato__empleado_id'], fila['concepto__codigo'], fila['tipo'])
+            acumulada = filas.setdefault(clave, {
+                'empleado_id': str(fila['nomina__contrato__empleado_id']),
+                'documento': fila['nomina__contrato__empleado__numero_documento'],
+                'empleado': ' '.join(filter(None, [
+                    fila['nomina__contrato__empleado__primer_nombre'],
+                    fila['nomina__contrato__empleado__segundo_nombre'],
+                    fila['nomina__contrato__empleado__primer_apellido'],
+                    fila['nomina__contrato__empleado__segundo_apellido'],
+                ])),
+                'concepto_codigo': fila['concepto__codigo'],
+                'concepto_nombre': fila['concepto__nombre'],
+                'tipo': fila['tipo'],
+                'valores': [CERO] * len(periodos),
+            })
+            for posicion, indice in enumerate(indices):
+                acumulada['valores'][indice] += fila[f'p{posicion}'] or CERO
+
+    totales = {}
+    for fila in filas.values():
+        anterior, actual = fila['valores'][-2], fila['valores'][-1]
+        fila['diferencia'] = actual - anterior
+        fila['variacion_porcentual'] = _porcentaje(anterior, actual)
+        # Conceptos nuevos o que desaparecen también se marcan
+        fila['marcada'] = bool(fila['diferencia']) and (
+            fila['variacion_porcentual'] is None or abs(fila['variacion_porcentual']) >= umbral
+        )
+        por_tipo = totales.setdefault(fila['tipo'], [CERO] * len(periodos))
+        for indice, valor in enumerate(fila['valores']):
+            por_tipo[indice] += valor
+
+    ordenadas = sorted(
+        filas.values(),
+        key=lambda f: (-abs(f['diferencia']), f['documento'], f['concepto_codigo']),
+    )
+    return {
+        'periodos': [{'periodo_inicio': inicio, 'periodo_fin': fin} for inicio, fin in periodos],
+        'umbral_porcentaje': umbral,
+        'totales': totales,
+        'filas_total': len(ordenadas),
+        'filas_marcadas': sum(1 for f in ordenadas if f['marcada']),
+        'filas': ordenadas[:limite] if limite else ordenadas,
+    }
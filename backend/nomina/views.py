@@ -19,6 +19,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.db.models.deletion import ProtectedError
+import django_filters
 
 from core.mixins import MultiTenantViewSetMixin
 
@@ -31,6 +32,8 @@ from .models import (
     NominaSimple,
     NominaItem,
     NominaConcepto,
+    TrabajoCalculoNomina,
+    ResumenPeriodoNomina,
 )
 from .serializers import (
     EmpleadoListSerializer,
@@ -48,9 +51,16 @@ from .serializers import (
     NominaItemCreateSerializer,
     NominaConceptoSerializer,
     CalculoNominaSerializer,
+    SimulacionNominaSerializer,
+    SimulacionCostosSerializer,
+    TrabajoCalculoNominaSerializer,
+    ResumenPeriodoNominaSerializer,
+    SaldoPrestacionSerializer,
+    MovimientoPrestacionSerializer,
+    CierrePeriodoNominaSerializer,
 )
 from .services import NominaValidationError
-from .services import calcular_nomina
+from .services import calcular_nomina, simular_nomina
 from .policies import (
     EmpleadoAccessPolicy,
     ContratoAccessPolicy,
@@ -101,7 +111,7 @@ class EmpleadoViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
         description="Retorna solo empleados en estado activo"
     )
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().con_contrato_actual()
         project = _get_active_project_for_request(self.request)
         if project:
             from dashboard.models import AsignacionProyecto
@@ -118,6 +128,38 @@ class EmpleadoViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
         serializer = EmpleadoListSerializer(queryset, many=True)
         return Response(serializer.data)
 
+    @extend_schema(
+        summary="Prestaciones sociales del empleado",
+        description="Saldos del libro de prestaciones y sus últimos movimientos",
+        parameters=[
+            OpenApiParameter(name='movimientos', description='Cantidad de movimientos (máx. 200)', required=False, type=int),
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def prestaciones(self, request, pk=None):
+        """Saldos y movimientos recientes de prestaciones del empleado"""
+        from .models import MovimientoPrestacion, SaldoPrestacion
+
+        empleado = self.get_object()
+        try:
+            limite = min(int(request.query_params.get('movimientos', 50)), 200)
+        except ValueError:
+            return Response(
+                {'error': 'movimientos debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        saldos = SaldoPrestacion.objects.for_tenant(empleado.organization).filter(empleado=empleado)
+        movimientos = MovimientoPrestacion.objects.for_tenant(empleado.organization).filter(
+            empleado=empleado
+        ).order_by('-fecha', '-secuencia')[:max(limite, 0)]
+
+        return Response({
+            'empleado': str(empleado.id),
+            'saldos': SaldoPrestacionSerializer(saldos, many=True).data,
+            'movimientos': MovimientoPrestacionSerializer(movimientos, many=True).data,
+        })
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # VIEWSET: TIPO DE CONTRATO
@@ -353,6 +395,31 @@ class ConceptoLaboralViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
 # VIEWSET: NÓMINA SIMPLE
 # ══════════════════════════════════════════════════════════════════════════════
 
+# Cabecera opcional de las transiciones de estado (ver nomina/transiciones.py)
+PARAMETRO_IDEMPOTENCIA = OpenApiParameter(
+    name='Idempotency-Key',
+    location=OpenApiParameter.HEADER,
+    required=False,
+    type=str,
+    description='Clave única por operación; un reintento con la misma clave recibe la respuesta original',
+)
+
+
+class NominaSimpleFilter(django_filters.FilterSet):
+    """Filtros para nóminas (los de costo usan las anotaciones de ``con_costos``)"""
+    
+    periodo_desde = django_filters.DateFilter(field_name='periodo_fin', lookup_expr='gte')
+    periodo_hasta = django_filters.DateFilter(field_name='periodo_fin', lookup_expr='lte')
+    costo_min = django_filters.NumberFilter(field_name='costo_empleador', lookup_expr='gte')
+    costo_max = django_filters.NumberFilter(field_name='costo_empleador', lookup_expr='lte')
+    provisiones_min = django_filters.NumberFilter(field_name='provisiones_empleador', lookup_expr='gte')
+    provisiones_max = django_filters.NumberFilter(field_name='provisiones_empleador', lookup_expr='lte')
+    
+    class Meta:
+        model = NominaSimple
+        fields = ['contrato', 'contrato__empleado', 'estado', 'proyecto']
+
+
 @extend_schema(tags=['Nómina - Principal'])
 class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
     """
@@ -371,13 +438,21 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
     ).prefetch_related('items', 'conceptos', 'prestamos').all()
     permission_classes = [NominaAccessPolicy]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['contrato', 'contrato__empleado', 'estado', 'proyecto']
+    filterset_class = NominaSimpleFilter
     search_fields = ['numero', 'contrato__empleado__primer_nombre', 'contrato__empleado__numero_documento']
-    ordering_fields = ['periodo_fin', 'created_at', 'total_pagar']
+    ordering_fields = [
+        'periodo_fin', 'created_at', 'total_pagar',
+        'aportes_empleador', 'costo_empleador', 'provisiones_empleador', 'costo_empleador_con_provisiones',
+    ]
     ordering = ['-periodo_fin', '-created_at']
 
+    # Acciones que filtran/ordenan por costo: anotan también las provisiones
+    ACCIONES_CON_PROVISIONES = ('list', 'export_excel')
+
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().con_costos(
+            provisiones=self.action in self.ACCIONES_CON_PROVISIONES
+        )
         project = _get_active_project_for_request(self.request)
         if project:
             queryset = queryset.filter(proyecto=project)
@@ -390,11 +465,22 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
             return NominaSimpleCreateSerializer
         return NominaSimpleDetailSerializer
     
+    def perform_destroy(self, instance):
+        """Impide eliminar nóminas de períodos cerrados."""
+        if instance.cerrada:
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({
+                'detail': f'La nómina {instance.numero} pertenece a un período cerrado. '
+                          f'Reabra el período para modificarla.'
+            })
+        instance.delete()
+    
     @extend_schema(
         summary="Calcular nómina",
         description="Calcula automáticamente todos los valores de la nómina",
         request=CalculoNominaSerializer,
-        responses={200: NominaSimpleDetailSerializer}
+        responses={200: NominaSimpleDetailSerializer},
+        parameters=[PARAMETRO_IDEMPOTENCIA],
     )
     @action(detail=True, methods=['post'])
     def calcular(self, request, pk=None):
@@ -410,17 +496,15 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
         - Descuentos de préstamos
         - Totales
         """
-        nomina = self.get_object()
-        
+        return self._transicion(request, 'calcular', self._calcular)
+    
+    def _calcular(self, nomina, request):
         if nomina.estado not in ['borrador', 'calculada']:
-            return Response(
-                {'error': f'No se puede calcular una nómina en estado {nomina.estado}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return status.HTTP_400_BAD_REQUEST, {
+                'error': f'No se puede calcular una nómina en estado {nomina.estado}'
+            }
         
         try:
-            # Refrescar desde BD para obtener datos más recientes
-            nomina.refresh_from_db()
             resumen = calcular_nomina(nomina)
             
             response_data = {
@@ -433,72 +517,340 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
             if resumen.get('advertencias'):
                 response_data['advertencias'] = resumen['advertencias']
             
-            return Response(response_data)
+            return status.HTTP_200_OK, response_data
         except NominaValidationError as e:
+            return status.HTTP_422_UNPROCESSABLE_ENTITY, {'error': str(e), 'tipo': 'validacion'}
+        except ValueError as e:
+            return status.HTTP_400_BAD_REQUEST, {'error': str(e)}
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.exception(f'Error calculando nómina {nomina.id}')
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {
+                'error': 'Error interno al calcular la nómina. Contacte al administrador.'
+            }
+    
+    def _transicion(self, request, accion, ejecutar):
+        """
+        Ejecuta una transición de estado con la nómina bloqueada y, si llega
+        ``Idempotency-Key``, devuelve la respuesta guardada en los reintentos.
+        """
+        from .transiciones import ClaveIdempotenciaInvalida, TransicionEnCurso, ejecutar_transicion
+        
+        clave = request.headers.get('Idempotency-Key', '').strip()
+        if len(clave) > 255:
             return Response(
-                {'error': str(e), 'tipo': 'validacion'},
-                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                {'error': 'Idempotency-Key admite máximo 255 caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        except ValueError as e:
+        
+        nomina = self.get_object()
+        try:
+            codigo, datos, repetida = ejecutar_transicion(
+                nomina,
+                accion,
+                lambda bloqueada: ejecutar(bloqueada, request),
+                clave=clave or None,
+                usuario=request.user,
+            )
+        except TransicionEnCurso as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except ClaveIdempotenciaInvalida as e:
+            return Response({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        
+        response = Response(datos, status=codigo)
+        if repetida:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+    
+    @extend_schema(
+        summary="Importar novedades del período",
+        description=(
+            "Carga desde Excel (.xlsx) o CSV los items de trabajo y conceptos laborales (horas extra, "
+            "bonificaciones, descuentos) de las nóminas del período, con reporte de errores por fila. "
+            "Columnas: documento, codigo, cantidad, valor_unitario, observaciones"
+        ),
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'archivo': {'type': 'string', 'format': 'binary'},
+                    'periodo_inicio': {'type': 'string', 'format': 'date'},
+                    'periodo_fin': {'type': 'string', 'format': 'date'},
+                    'reemplazar': {'type': 'boolean'},
+                    'simular': {'type': 'boolean'},
+                },
+                'required': ['archivo', 'periodo_inicio', 'periodo_fin'],
+            }
+        },
+    )
+    @action(detail=False, methods=['post'])
+    def importar_novedades(self, request):
+        """Importación masiva de novedades (items y conceptos) del período"""
+        from django.utils.dateparse import parse_date
+        from .cierre_periodo import periodo_cerrado
+        from .importacion_novedades import ArchivoNovedadesInvalido, ImportadorNovedades, leer_filas
+
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': 'No se proporcionó archivo'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            periodo_inicio = parse_date(request.data.get('periodo_inicio') or '')
+            periodo_fin = parse_date(request.data.get('periodo_fin') or '')
+        except ValueError:
+            periodo_inicio = periodo_fin = None
+        if not periodo_inicio or not periodo_fin:
             return Response(
-                {'error': str(e)},
+                {'error': 'Se requieren periodo_inicio y periodo_fin (AAAA-MM-DD)'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
+
+        organization = request.user.organization
+        if periodo_cerrado(organization, periodo_inicio, periodo_fin):
+            return Response({'error': 'El período está cerrado.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def bandera(nombre):
+            return str(request.data.get(nombre, '')).lower() in ('true', '1', 'yes', 'si')
+
+        importador = ImportadorNovedades(
+            organization,
+            periodo_inicio,
+            periodo_fin,
+            proyecto=_get_active_project_for_request(request),
+        )
+        try:
+            resultado = importador.importar(
+                leer_filas(archivo),
+                reemplazar=bandera('reemplazar'),
+                simular=bandera('simular'),
+            )
+        except ArchivoNovedadesInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado['mensaje'] = (
+            f"{resultado['items_creados']} items y {resultado['conceptos_agregados']} conceptos "
+            f"en {resultado['nominas_afectadas']} nóminas; {resultado['filas_con_error']} filas con error"
+        )
+        return Response(resultado)
+
+    @extend_schema(
+        summary="Calcular nóminas del período",
+        description="Calcula en bloque todas las nóminas en borrador o calculadas de un período",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['post'])
+    def calcular_periodo(self, request):
+        """
+        Calcula todas las nóminas calculables del período con un número fijo
+        de consultas. Las nóminas con errores de validación se reportan sin
+        detener el resto del lote.
+        """
+        from .calculo_lote import CalculadorNominaLote
+        
+        periodo_inicio = request.data.get('periodo_inicio') or request.query_params.get('periodo_inicio')
+        periodo_fin = request.data.get('periodo_fin') or request.query_params.get('periodo_fin')
+        
+        if not periodo_inicio or not periodo_fin:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Sin las anotaciones de costo: el resumen se arma tras recalcular
+        queryset = NominaSimple.objects.for_tenant(request.user.organization).filter(
+            periodo_inicio=periodo_inicio,
+            periodo_fin=periodo_fin
+        )
+        project = _get_active_project_for_request(request)
+        if project:
+            queryset = queryset.filter(proyecto=project)
+        
+        try:
+            resultado = CalculadorNominaLote(request.user.organization, queryset).calcular()
+        except Exception:
             import logging
             logger = logging.getLogger(__name__)
-            logger.exception(f'Error calculando nómina {nomina.id}')
+            logger.exception(f'Error calculando nóminas del período {periodo_inicio} - {periodo_fin}')
             return Response(
-                {'error': 'Error interno al calcular la nómina. Contacte al administrador.'},
+                {'error': 'Error interno al calcular las nóminas del período. Contacte al administrador.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        resultado['mensaje'] = (
+            f"{resultado['calculadas']} de {resultado['total']} nóminas calculadas"
+        )
+        return Response(resultado)
+    
+    @extend_schema(
+        summary="Calcular período en segundo plano",
+        description="Encola el cálculo del período en bloques paralelos; el avance se publica en ws_url",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['post'])
+    def calcular_periodo_async(self, request):
+        """
+        Crea un trabajo de cálculo del período y responde de inmediato (202).
+        El avance, los errores y el tiempo restante se consultan en
+        ``trabajo_calculo`` o por WebSocket.
+        """
+        from .tasks import iniciar_trabajo_calculo
+        
+        periodo_inicio = request.data.get('periodo_inicio') or request.query_params.get('periodo_inicio')
+        periodo_fin = request.data.get('periodo_fin') or request.query_params.get('periodo_fin')
+        
+        if not periodo_inicio or not periodo_fin:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        trabajo = iniciar_trabajo_calculo(
+            request.user.organization,
+            request.user,
+            periodo_inicio,
+            periodo_fin,
+            proyecto=_get_active_project_for_request(request),
+        )
+        trabajo.refresh_from_db()
+        return Response(TrabajoCalculoNominaSerializer(trabajo).data, status=status.HTTP_202_ACCEPTED)
+    
+    @extend_schema(
+        summary="Estado de un cálculo en segundo plano",
+        parameters=[
+            OpenApiParameter(name='trabajo', description='ID del trabajo', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def trabajo_calculo(self, request):
+        """Avance de un trabajo de cálculo de período"""
+        trabajo_id = request.query_params.get('trabajo')
+        if not trabajo_id:
+            return Response(
+                {'error': 'Se requiere el parámetro trabajo'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        trabajo = TrabajoCalculoNomina.objects.for_tenant(request.user.organization).filter(
+            id=trabajo_id
+        ).first()
+        if trabajo is None:
+            return Response(
+                {'error': 'Trabajo no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(TrabajoCalculoNominaSerializer(trabajo).data)
+    
+    @extend_schema(
+        summary="Simular nómina",
+        description="Calcula una nómina hipotética para un contrato y período sin guardar nada",
+        request=SimulacionNominaSerializer,
+    )
+    @action(detail=False, methods=['post'])
+    def simular(self, request):
+        """
+        Simulación (dry-run) del cálculo de nómina.
+        
+        Devuelve devengados, deducciones, aportes del empleador, provisiones
+        y neto a pagar. No abre transacciones de escritura ni crea registros.
+        """
+        serializer = SimulacionNominaSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        datos = dict(serializer.validated_data)
+        
+        try:
+            resumen = simular_nomina(
+                datos.pop('contrato'),
+                datos.pop('periodo_inicio'),
+                datos.pop('periodo_fin'),
+                items=datos.pop('items', None),
+                **datos
+            )
+        except NominaValidationError as e:
+            return Response(
+                {'error': str(e), 'tipo': 'validacion'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        
+        return Response({'simulacion': True, 'resumen': resumen})
+    
+    @extend_schema(
+        summary="Simular costo empleador",
+        description="Proyecta el costo empleador de todos los contratos activos bajo escenarios hipotéticos",
+        request=SimulacionCostosSerializer,
+    )
+    @action(detail=False, methods=['post'])
+    def simular_costos(self, request):
+        """
+        Simulador what-if del costo empleador (SMMLV, porcentajes, ARL,
+        incrementos salariales). Evalúa todos los escenarios sobre una sola
+        carga de datos.
+        """
+        from .simulador_costos import SimuladorCostos, EscenarioCosto
+        
+        serializer = SimulacionCostosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        simulador = SimuladorCostos(
+            request.user.organization,
+            fecha=serializer.validated_data.get('fecha')
+        )
+        escenarios = [EscenarioCosto(**datos) for datos in serializer.validated_data['escenarios']]
+        
+        return Response({
+            'fecha': simulador.fecha,
+            'contratos': simulador.total_contratos,
+            'escenarios': simulador.evaluar(escenarios),
+        })
     
     @extend_schema(
         summary="Aprobar nómina",
-        description="Cambia el estado de la nómina a aprobada"
+        description="Cambia el estado de la nómina a aprobada",
+        parameters=[PARAMETRO_IDEMPOTENCIA],
     )
     @action(detail=True, methods=['post'])
     def aprobar(self, request, pk=None):
         """Aprueba la nómina"""
-        nomina = self.get_object()
-        
+        return self._transicion(request, 'aprobar', self._aprobar)
+    
+    def _aprobar(self, nomina, request):
         if nomina.estado != 'calculada':
-            return Response(
-                {'error': 'Solo se pueden aprobar nóminas calculadas'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return status.HTTP_400_BAD_REQUEST, {'error': 'Solo se pueden aprobar nóminas calculadas'}
         
         nomina.estado = 'aprobada'
         nomina.save()
         
-        return Response({
+        return status.HTTP_200_OK, {
             'mensaje': 'Nómina aprobada exitosamente',
             'nomina': NominaSimpleDetailSerializer(nomina).data
-        })
+        }
     
     @extend_schema(
         summary="Marcar como pagada",
-        description="Cambia el estado de la nómina a pagada"
+        description="Cambia el estado de la nómina a pagada",
+        parameters=[PARAMETRO_IDEMPOTENCIA],
     )
     @action(detail=True, methods=['post'])
     def pagar(self, request, pk=None):
         """Marca la nómina como pagada"""
-        nomina = self.get_object()
-
+        return self._transicion(request, 'pagar', self._pagar)
+    
+    def _pagar(self, nomina, request):
         if nomina.estado != 'aprobada':
-            return Response(
-                {'error': 'Solo se pueden pagar nóminas aprobadas'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return status.HTTP_400_BAD_REQUEST, {'error': 'Solo se pueden pagar nóminas aprobadas'}
 
         # Validar que las deducciones no excedan el total devengado
         from decimal import Decimal
         total_deducciones = (nomina.total_deducciones or Decimal('0')) + (nomina.total_prestamos or Decimal('0'))
         if total_deducciones > nomina.total_devengado:
-            return Response(
-                {'error': 'Las deducciones totales exceden el total devengado. Revise los montos.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return status.HTTP_400_BAD_REQUEST, {
+                'error': 'Las deducciones totales exceden el total devengado. Revise los montos.'
+            }
 
         from django.utils import timezone
         nomina.estado = 'pagada'
@@ -508,8 +860,16 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
         # Actualizar cuotas de préstamos y crear pagos
         from prestamos.models import Prestamo, PagoPrestamo
 
-        for nomina_prestamo in nomina.prestamos.all():
-            prestamo = nomina_prestamo.prestamo
+        descuentos = list(nomina.prestamos.all())
+        # Préstamos bloqueados: otra nómina del mismo deudor no pisa el saldo
+        prestamos = {
+            p.id: p
+            for p in Prestamo.objects.select_for_update().filter(
+                id__in={d.prestamo_id for d in descuentos if d.prestamo_id}
+            ).order_by('id')
+        }
+        for nomina_prestamo in descuentos:
+            prestamo = prestamos.get(nomina_prestamo.prestamo_id)
             if not prestamo:
                 continue
 
@@ -522,18 +882,21 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
             if pago_existe:
                 continue
 
-            saldo_anterior = prestamo.saldo_pendiente or Decimal('0.00')
-            saldo_nuevo = max(saldo_anterior - nomina_prestamo.valor_cuota, Decimal('0.00'))
+            # Mismas reglas de saldo y estado que el pago por lotes
+            fecha_pago = nomina.fecha_pago or timezone.now().date()
+            monto, saldo_anterior, saldo_nuevo = prestamo.aplicar_cuota(nomina_prestamo.valor_cuota, fecha_pago)
+            if monto <= Decimal('0.00'):
+                continue
 
             PagoPrestamo.objects.create(
                 organization=nomina.organization,
                 prestamo=prestamo,
                 numero_pago=numero_pago,
-                fecha_pago=nomina.fecha_pago or timezone.now().date(),
+                fecha_pago=fecha_pago,
                 tipo_pago='cuota',
                 metodo_pago='descuento_nomina',
-                monto_pago=nomina_prestamo.valor_cuota,
-                monto_capital=nomina_prestamo.valor_cuota,
+                monto_pago=monto,
+                monto_capital=monto,
                 monto_interes=Decimal('0.00'),
                 monto_mora=Decimal('0.00'),
                 saldo_anterior=saldo_anterior,
@@ -543,17 +906,18 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
             )
 
             Prestamo.objects.filter(pk=prestamo.pk).update(
-                saldo_pendiente=saldo_nuevo,
-                total_pagado=(prestamo.total_pagado or Decimal('0.00')) + nomina_prestamo.valor_cuota,
-                estado='liquidado' if saldo_nuevo == Decimal('0.00') else 'activo'
+                saldo_pendiente=prestamo.saldo_pendiente,
+                total_pagado=prestamo.total_pagado,
+                fecha_ultimo_pago=prestamo.fecha_ultimo_pago,
+                estado=prestamo.estado
             )
         
         # Avanzar la fecha de primer pago de los préstamos descontados
         # (esto se hace SOLO al pagar, no al calcular, para evitar desplazar fechas al recalcular)
         from dateutil.relativedelta import relativedelta
         prestamos_procesados = set()
-        for nomina_prestamo in nomina.prestamos.all():
-            prestamo = nomina_prestamo.prestamo
+        for nomina_prestamo in descuentos:
+            prestamo = prestamos.get(nomina_prestamo.prestamo_id)
             if not prestamo or prestamo.id in prestamos_procesados:
                 continue
             prestamos_procesados.add(prestamo.id)
@@ -566,39 +930,210 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
                     fecha_primer_pago=nueva_fecha
                 )
         
-        return Response({
+        return status.HTTP_200_OK, {
             'mensaje': 'Nómina marcada como pagada',
             'nomina': NominaSimpleDetailSerializer(nomina).data
-        })
+        }
     
     @extend_schema(
-        summary="Anular nómina",
-        description="Anula la nómina (no se puede deshacer)"
+        summary="Pagar nóminas del período",
+        description="Marca como pagadas todas las nóminas aprobadas de un período con un comprobante consolidado",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
     )
-    @action(detail=True, methods=['post'])
-    def anular(self, request, pk=None):
-        """Anula la nómina"""
-        nomina = self.get_object()
+    @action(detail=False, methods=['post'])
+    def pagar_periodo(self, request):
+        """
+        Paga en una sola transacción las nóminas aprobadas del período:
+        cuotas de préstamo en bloque y un único comprobante contable.
+        """
+        from django.core.exceptions import ValidationError
+        from .pago_lote import PagadorNominaLote
         
-        if nomina.estado == 'anulada':
+        periodo_inicio = request.data.get('periodo_inicio') or request.query_params.get('periodo_inicio')
+        periodo_fin = request.data.get('periodo_fin') or request.query_params.get('periodo_fin')
+        
+        if not periodo_inicio or not periodo_fin:
             return Response(
-                {'error': 'La nómina ya está anulada'},
+                {'error': 'Se requieren periodo_inicio y periodo_fin'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        pagador = PagadorNominaLote(
+            request.user.organization,
+            request.user,
+            periodo_inicio,
+            periodo_fin,
+            proyecto=_get_active_project_for_request(request),
+        )
+        try:
+            resultado = pagador.pagar()
+        except ValidationError as e:
+            return Response(
+                {'error': ' '.join(e.messages), 'tipo': 'validacion'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        
+        resultado['mensaje'] = f"{resultado['pagadas']} de {resultado['total']} nóminas pagadas"
+        return Response(resultado)
+    
+    def _periodo_de_request(self, request):
+        """(periodo_inicio, periodo_fin) del cuerpo o la URL; None si faltan o son inválidos."""
+        from django.utils.dateparse import parse_date
+        
+        try:
+            periodo_inicio = parse_date(
+                request.data.get('periodo_inicio') or request.query_params.get('periodo_inicio') or ''
+            )
+            periodo_fin = parse_date(
+                request.data.get('periodo_fin') or request.query_params.get('periodo_fin') or ''
+            )
+        except ValueError:
+            return None
+        if not periodo_inicio or not periodo_fin:
+            return None
+        return periodo_inicio, periodo_fin
+    
+    @extend_schema(
+        summary="Abrir período",
+        description=(
+            "Crea en bloque la nómina en borrador de cada contrato activo (del proyecto activo, si hay) "
+            "que no tenga ya una nómina solapada con el período"
+        ),
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+            OpenApiParameter(name='fecha_pago', description='Fecha de pago prevista', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['post'])
+    def abrir_periodo(self, request):
+        """Crea las nóminas en borrador del período para todos los contratos activos"""
+        from django.utils.dateparse import parse_date
+        from .apertura_periodo import AperturaPeriodoError, abrir_periodo
+
+        periodo = self._periodo_de_request(request)
+        if periodo is None:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fecha_pago = request.data.get('fecha_pago') or request.query_params.get('fecha_pago')
+        if fecha_pago:
+            try:
+                fecha_pago = parse_date(fecha_pago)
+            except ValueError:
+                fecha_pago = None
+            if not fecha_pago:
+                return Response(
+                    {'error': 'fecha_pago debe tener el formato AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        if nomina.estado == 'pagada':
+        try:
+            resultado = abrir_periodo(
+                request.user.organization,
+                *periodo,
+                proyecto=_get_active_project_for_request(request),
+                fecha_pago=fecha_pago or None,
+            )
+        except AperturaPeriodoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado['mensaje'] = (
+            f"{resultado['creadas']} nóminas creadas; "
+            f"{resultado['omitidas']} contratos ya tenían nómina en el período"
+        )
+        codigo = status.HTTP_201_CREATED if resultado['creadas'] else status.HTTP_200_OK
+        return Response(resultado, status=codigo)
+
+    @extend_schema(
+        summary="Cerrar período",
+        description="Congela las nóminas del período en snapshots y archiva su detalle (conceptos, items y préstamos)",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['post'])
+    def cerrar_periodo(self, request):
+        """Cierra el período: snapshot por nómina y detalle a las tablas de archivo"""
+        from .cierre_periodo import CierrePeriodoError, cerrar_periodo
+        
+        periodo = self._periodo_de_request(request)
+        if periodo is None:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            resultado = cerrar_periodo(request.user.organization, request.user, *periodo)
+        except CierrePeriodoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'mensaje': f"Período cerrado: {resultado['nominas']} nóminas",
+            'cierre': CierrePeriodoNominaSerializer(resultado['cierre']).data,
+            'archivadas': resultado['archivadas'],
+        })
+    
+    @extend_schema(
+        summary="Reabrir período",
+        description="Devuelve el detalle archivado a las tablas de trabajo y elimina los snapshots del período",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['post'])
+    def reabrir_periodo(self, request):
+        """Reabre un período cerrado"""
+        from .cierre_periodo import CierrePeriodoError, reabrir_periodo
+        
+        periodo = self._periodo_de_request(request)
+        if periodo is None:
             return Response(
-                {'error': 'No se puede anular una nómina ya pagada. Debe crear una nómina de ajuste.'},
+                {'error': 'Se requieren periodo_inicio y periodo_fin (AAAA-MM-DD)'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        try:
+            resultado = reabrir_periodo(request.user.organization, *periodo)
+        except CierrePeriodoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        resultado['mensaje'] = f"Período reabierto: {resultado['nominas']} nóminas"
+        return Response(resultado)
+    
+    @extend_schema(
+        summary="Anular nómina",
+        description="Anula la nómina (no se puede deshacer)",
+        parameters=[PARAMETRO_IDEMPOTENCIA],
+    )
+    @action(detail=True, methods=['post'])
+    def anular(self, request, pk=None):
+        """Anula la nómina"""
+        return self._transicion(request, 'anular', self._anular)
+    
+    def _anular(self, nomina, request):
+        if nomina.estado == 'anulada':
+            return status.HTTP_400_BAD_REQUEST, {'error': 'La nómina ya está anulada'}
+
+        if nomina.estado == 'pagada':
+            return status.HTTP_400_BAD_REQUEST, {
+                'error': 'No se puede anular una nómina ya pagada. Debe crear una nómina de ajuste.'
+            }
 
         nomina.estado = 'anulada'
         nomina.save()
         
-        return Response({
+        return status.HTTP_200_OK, {
             'mensaje': 'Nómina anulada exitosamente',
             'nomina': NominaSimpleDetailSerializer(nomina).data
-        })
+        }
 
     @extend_schema(
         summary="Descargar desprendible",
@@ -607,183 +1142,216 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def desprendible(self, request, pk=None):
         """Genera PDF del desprendible de nómina"""
-        from io import BytesIO
-        from decimal import Decimal
         from django.http import HttpResponse
         from django.utils.encoding import escape_uri_path
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
+        from .desprendibles import datos_desprendible, renderizar_desprendible
 
         nomina = self.get_object()
+        pdf = renderizar_desprendible(datos_desprendible(nomina))
 
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        page_w, page_h = letter
-        margin = 40
-        left = margin
-        right = page_w - margin
-        top = page_h - margin
-        y = top
-
-        def fmt(valor):
-            if valor is None:
-                return "0"
-            if isinstance(valor, Decimal):
-                return f"{valor:,.2f}"
-            return f"{valor}"
-
-        def draw_title(text):
-            nonlocal y
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(left, y, text)
-            y -= 18
-
-        def draw_section_title(text):
-            nonlocal y
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(left, y, text)
-            y -= 12
-            c.setLineWidth(0.5)
-            c.line(left, y, right, y)
-            y -= 8
-
-        def draw_kv(x, y_pos, label, value):
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(x, y_pos, f"{label}:")
-            c.setFont("Helvetica", 9)
-            c.drawString(x + 90, y_pos, str(value))
-
-        def draw_table(x, y_pos, width, title, rows):
-            row_h = 14
-            header_h = 16
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(x, y_pos, title)
-            y_pos -= 6
-            c.setLineWidth(0.5)
-            c.rect(x, y_pos - header_h, width, header_h, stroke=1, fill=0)
-            c.setFont("Helvetica-Bold", 8)
-            c.drawString(x + 4, y_pos - 12, "Concepto")
-            c.drawString(x + width * 0.62, y_pos - 12, "Cantidad")
-            c.drawRightString(x + width - 4, y_pos - 12, "Valor")
-            y_pos -= header_h
-
-            c.setFont("Helvetica", 8)
-            for concepto, cantidad, valor in rows:
-                c.rect(x, y_pos - row_h, width, row_h, stroke=1, fill=0)
-                c.drawString(x + 4, y_pos - 11, str(concepto))
-                c.drawString(x + width * 0.62, y_pos - 11, str(cantidad) if cantidad else "-")
-                c.drawRightString(x + width - 4, y_pos - 11, fmt(valor))
-                y_pos -= row_h
-            return y_pos
-
-        # Encabezado
-        draw_title(f"Desprendible de Nómina {nomina.numero}")
-        c.setFont("Helvetica", 10)
-        c.drawString(left, y, f"Período: {nomina.periodo_inicio} a {nomina.periodo_fin}")
-        y -= 12
-        c.drawString(left, y, f"Fecha de Pago: {nomina.fecha_pago or ''}")
-        y -= 12
-        c.drawString(left, y, f"Estado: {nomina.get_estado_display()}")
-        y -= 18
-
-        # Información del empleado y contrato en dos columnas
-        col_gap = 20
-        col_w = (right - left - col_gap) / 2
-        col1_x = left
-        col2_x = left + col_w + col_gap
-        info_y = y
-
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(col1_x, info_y, "Empleado")
-        c.drawString(col2_x, info_y, "Contrato")
-        info_y -= 12
-
-        draw_kv(col1_x, info_y, "Nombre", nomina.empleado.nombre_completo)
-        draw_kv(col2_x, info_y, "Tipo", nomina.contrato.tipo_contrato.nombre)
-        info_y -= 12
-        draw_kv(col1_x, info_y, "Documento", nomina.empleado.numero_documento)
-        draw_kv(col2_x, info_y, "Salario Base", fmt(nomina.salario_base))
-        info_y -= 12
-        contrato_vigencia = (
-            f"{nomina.contrato.fecha_inicio} - {nomina.contrato.fecha_fin}"
-            if nomina.contrato.fecha_fin
-            else "Indefinido"
-        )
-        draw_kv(col1_x, info_y, "Contrato", contrato_vigencia)
-        draw_kv(col2_x, info_y, "Incluye Salario", "Sí" if nomina.incluir_salario_base else "No")
-        info_y -= 18
-
-        y = info_y
-        draw_section_title("Ingresos y Deducciones")
-
-        # Construcción de filas
-        ingresos_rows = []
-        total_items_qty = sum((item.cantidad or 0) for item in nomina.items.all())
-        if nomina.total_items and nomina.total_items > 0:
-            ingresos_rows.append(("Items de trabajo", total_items_qty, nomina.total_items))
-        if nomina.incluir_salario_base or nomina.total_items == 0:
-            ingresos_rows.append(("Salario base", "1", nomina.salario_base))
-
-        devengados = nomina.conceptos.filter(tipo='DEVENGADO')
-        for cpto in devengados:
-            cantidad = f"{cpto.porcentaje_aplicado}%" if cpto.porcentaje_aplicado and cpto.porcentaje_aplicado > 0 else "1"
-            ingresos_rows.append((cpto.concepto.nombre, cantidad, cpto.valor))
-
-        deducciones_rows = []
-        deducciones = nomina.conceptos.filter(tipo='DEDUCCION')
-        for cpto in deducciones:
-            cantidad = f"{cpto.porcentaje_aplicado}%" if cpto.porcentaje_aplicado and cpto.porcentaje_aplicado > 0 else "1"
-            deducciones_rows.append((cpto.concepto.nombre, cantidad, cpto.valor))
-        if nomina.total_prestamos and nomina.total_prestamos > 0:
-            deducciones_rows.append(("Préstamos", "1", nomina.total_prestamos))
-
-        table_top = y
-        left_table_x = left
-        right_table_x = left + col_w + col_gap
-        table_width = col_w
-
-        y_left = draw_table(left_table_x, table_top, table_width, "Ingresos", ingresos_rows)
-        y_right = draw_table(right_table_x, table_top, table_width, "Deducciones", deducciones_rows)
-        y = min(y_left, y_right) - 14
-
-        # Totales
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(left, y, f"Total Ingresos: {fmt(nomina.total_devengado)}")
-        c.drawRightString(right, y, f"Total Deducciones: {fmt(nomina.total_deducciones)}")
-        y -= 18
-        c.setFont("Helvetica-Bold", 12)
-        c.drawRightString(right, y, f"NETO A PAGAR: {fmt(nomina.total_pagar)}")
-        y -= 20
-
-        # Detalle de items
-        if y < 120:
-            c.showPage()
-            y = top
-        draw_section_title("Detalle de Items")
-        for item in nomina.items.all():
-            if y < 80:
-                c.showPage()
-                y = top
-            c.setFont("Helvetica", 9)
-            c.drawString(left, y, f"{item.item.nombre}")
-            c.drawRightString(right - 120, y, f"Cantidad: {item.cantidad}")
-            c.drawRightString(right, y, f"Total: {fmt(item.valor_total)}")
-            y -= 12
-
-        c.showPage()
-        c.save()
-
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         safe_name = f"desprendible_{nomina.numero}.pdf"
         response['Content-Disposition'] = f"attachment; filename*=UTF-8''{escape_uri_path(safe_name)}"
         return response
-    
+
+    @extend_schema(
+        summary="Desprendibles del período",
+        description="Genera los desprendibles de todas las nóminas del período en un ZIP (un PDF por empleado) o en un solo PDF",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+            OpenApiParameter(name='formato', description='zip (por defecto) o pdf', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def desprendibles_periodo(self, request):
+        """Desprendibles en bloque de un período"""
+        from django.http import HttpResponse, StreamingHttpResponse
+        from django.utils.encoding import escape_uri_path
+        from .desprendibles import (
+            nominas_para_desprendible,
+            datos_desprendible,
+            generar_zip_periodo,
+            generar_pdf_periodo,
+        )
+
+        periodo_inicio = request.query_params.get('periodo_inicio')
+        periodo_fin = request.query_params.get('periodo_fin')
+        formato = request.query_params.get('formato', 'zip')
+
+        if not periodo_inicio or not periodo_fin:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if formato not in ('zip', 'pdf'):
+            return Response(
+                {'error': 'El formato debe ser zip o pdf'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        nominas = nominas_para_desprendible(
+            self.get_queryset().filter(
+                periodo_inicio=periodo_inicio,
+                periodo_fin=periodo_fin
+            ).exclude(estado='anulada').order_by('numero')
+        )
+        # Datos planos: el renderizado en otros procesos no toca la BD
+        lista_datos = [datos_desprendible(nomina) for nomina in nominas]
+
+        if not lista_datos:
+            return Response(
+                {'error': 'No hay nóminas en el período indicado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        nombre = f"desprendibles_{periodo_inicio}_{periodo_fin}.{formato}"
+        if formato == 'pdf':
+            response = HttpResponse(generar_pdf_periodo(lista_datos), content_type='application/pdf')
+        else:
+            response = StreamingHttpResponse(generar_zip_periodo(lista_datos), content_type='application/zip')
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{escape_uri_path(nombre)}"
+        return response
+
+    @extend_schema(
+        summary="Nómina electrónica del período",
+        description="Genera en un ZIP (streaming) el XML de nómina electrónica de cada nómina pagada del período, validado contra el XSD local",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def nomina_electronica(self, request):
+        """XML de nómina electrónica en bloque de un período"""
+        from django.http import StreamingHttpResponse
+        from .nomina_electronica import documentos_periodo, generar_zip_documentos
+
+        periodo_inicio = request.query_params.get('periodo_inicio')
+        periodo_fin = request.query_params.get('periodo_fin')
+
+        if not periodo_inicio or not periodo_fin:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        documentos = documentos_periodo(
+            request.user.organization,
+            periodo_inicio,
+            periodo_fin,
+            proyecto=_get_active_project_for_request(request),
+        )
+        if not documentos:
+            return Response(
+                {'error': 'No hay nóminas pagadas en el período indicado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        response = StreamingHttpResponse(generar_zip_documentos(documentos), content_type='application/zip')
+        response['Content-Disposition'] = (
+            f'attachment; filename=nomina_electronica_{periodo_inicio}_{periodo_fin}.zip'
+        )
+        return response
+
+    @extend_schema(
+        summary="Planilla PILA del período",
+        description="Archivo plano de aportes a seguridad social y parafiscales del período, generado en streaming",
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def pila(self, request):
+        """Planilla PILA (archivo plano) del período"""
+        from django.http import StreamingHttpResponse
+        from django.utils.dateparse import parse_date
+        from .pila import GeneradorPila
+
+        try:
+            periodo_inicio = parse_date(request.query_params.get('periodo_inicio') or '')
+            periodo_fin = parse_date(request.query_params.get('periodo_fin') or '')
+        except ValueError:
+            periodo_inicio = periodo_fin = None
+
+        if not periodo_inicio or not periodo_fin:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        generador = GeneradorPila(
+            request.user.organization,
+            periodo_inicio,
+            periodo_fin,
+            proyecto=_get_active_project_for_request(request),
+        )
+        response = StreamingHttpResponse(generador.stream(), content_type='text/plain; charset=ascii')
+        response['Content-Disposition'] = f'attachment; filename={generador.nombre_archivo}'
+        return response
+
+    @extend_schema(
+        summary="Archivo de dispersión bancaria del período",
+        description=(
+            "Archivo de pagos por transferencia del neto de las nóminas del período en el layout "
+            "del banco (ancho fijo o CSV), generado en streaming. Las nóminas de empleados sin "
+            "cuenta registrada no se incluyen; su cantidad va en la cabecera X-Nominas-Sin-Cuenta."
+        ),
+        parameters=[
+            OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
+            OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+            OpenApiParameter(name='layout', description='Layout del banco (csv, bancolombia_pab, davivienda, ...)', required=False, type=str),
+            OpenApiParameter(name='estado', description='aprobada (por defecto) o pagada', required=False, type=str),
+            OpenApiParameter(name='cuenta_origen', description='Cuenta de la empresa que paga', required=False, type=str),
+            OpenApiParameter(name='tipo_cuenta_origen', description='ahorros (por defecto) o corriente', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def dispersion_bancaria(self, request):
+        """Archivo de dispersión bancaria (pago del neto) del período"""
+        from django.http import StreamingHttpResponse
+        from django.utils.dateparse import parse_date
+        from .dispersion import GeneradorDispersion
+
+        try:
+            periodo_inicio = parse_date(request.query_params.get('periodo_inicio') or '')
+            periodo_fin = parse_date(request.query_params.get('periodo_fin') or '')
+        except ValueError:
+            periodo_inicio = periodo_fin = None
+
+        if not periodo_inicio or not periodo_fin:
+            return Response(
+                {'error': 'Se requieren periodo_inicio y periodo_fin (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            generador = GeneradorDispersion(
+                request.user.organization,
+                periodo_inicio,
+                periodo_fin,
+                request.query_params.get('layout') or 'csv',
+                proyecto=_get_active_project_for_request(request),
+                estado=request.query_params.get('estado') or 'aprobada',
+                cuenta_origen=request.query_params.get('cuenta_origen', ''),
+                tipo_cuenta_origen=request.query_params.get('tipo_cuenta_origen') or 'ahorros',
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = 'text/csv; charset=ascii' if generador.layout['formato'] == 'csv' else 'text/plain; charset=ascii'
+        response = StreamingHttpResponse(generador.stream(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename={generador.nombre_archivo}'
+        response['X-Nominas-Sin-Cuenta'] = str(generador.sin_cuenta())
+        return response
+
     @extend_schema(
         summary="Nóminas por período",
         parameters=[
             OpenApiParameter(name='periodo_inicio', description='Fecha inicio', required=True, type=str),
             OpenApiParameter(name='periodo_fin', description='Fecha fin', required=True, type=str),
+            OpenApiParameter(name='incluir_resumen', description='true para incluir los totales del período', required=False, type=bool),
         ]
     )
     @action(detail=False, methods=['get'])
@@ -798,13 +1366,196 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # El listado no usa items, conceptos ni préstamos
         queryset = self.get_queryset().filter(
             periodo_inicio=periodo_inicio,
             periodo_fin=periodo_fin
-        ).exclude(estado='anulada')
+        ).exclude(estado='anulada').prefetch_related(None)
         
         serializer = NominaSimpleListSerializer(queryset, many=True)
-        return Response(serializer.data)
+        if request.query_params.get('incluir_resumen', '').lower() not in ('true', '1'):
+            return Response(serializer.data)
+        
+        resumenes = self._resumenes().filter(periodo_inicio=periodo_inicio, periodo_fin=periodo_fin)
+        return Response({
+            'resumen': ResumenPeriodoNominaSerializer(resumenes, many=True).data,
+            'nominas': serializer.data,
+        })
+    
+    def _resumenes(self):
+        """Filas del resumen materializado visibles para el usuario (proyecto activo)."""
+        resumenes = ResumenPeriodoNomina.objects.for_tenant(self.request.user.organization)
+        project = _get_active_project_for_request(self.request)
+        if project:
+            resumenes = resumenes.filter(proyecto=project)
+        return resumenes
+
+    @extend_schema(
+        summary="Pasivo de prestaciones sociales",
+        description="Saldo acumulado por prestación a una fecha, desde el libro de prestaciones",
+        parameters=[
+            OpenApiParameter(name='fecha', description='Fecha de corte (por defecto hoy)', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def provisiones_prestaciones(self, request):
+        """Pasivo de prestaciones sociales a una fecha de corte"""
+        from django.utils import timezone
+        from django.utils.dateparse import parse_date
+        from .prestaciones import saldos_a_fecha, totales_a_fecha
+
+        fecha = request.query_params.get('fecha')
+        if fecha:
+            try:
+                fecha = parse_date(fecha)
+            except ValueError:
+                fecha = None
+            if not fecha:
+                return Response(
+                    {'error': 'fecha debe tener el formato AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            fecha = timezone.now().date()
+
+        organization = request.user.organization
+        totales = totales_a_fecha(organization, fecha)
+        return Response({
+            'fecha': str(fecha),
+            'empleados': len(saldos_a_fecha(organization, fecha)),
+            'por_prestacion': {concepto: float(valor) for concepto, valor in totales.items()},
+            'total': float(sum(totales.values())),
+        })
+
+    @extend_schema(
+        summary="Certificados de ingresos y retenciones",
+        description=(
+            "Certificados del año gravable de todos los empleados (o de los indicados), generados "
+            "desde los acumulados anuales: ZIP en streaming (un PDF por empleado), un solo PDF o JSON"
+        ),
+        parameters=[
+            OpenApiParameter(name='anio', description='Año gravable', required=True, type=int),
+            OpenApiParameter(name='empleados', description='IDs de empleados separados por coma', required=False, type=str),
+            OpenApiParameter(name='formato', description='zip (por defecto), pdf o json', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def certificados_ingresos(self, request):
+        """Certificados de ingresos y retenciones en bloque de un año"""
+        from django.core.exceptions import ValidationError as DjangoValidationError
+        from django.http import HttpResponse, StreamingHttpResponse
+        from .certificados import datos_certificados, generar_pdf_certificados, generar_zip_certificados
+
+        try:
+            anio = int(request.query_params.get('anio', ''))
+        except ValueError:
+            return Response({'error': 'Se requiere el año gravable (anio)'}, status=status.HTTP_400_BAD_REQUEST)
+        formato = request.query_params.get('formato', 'zip')
+        if formato not in ('zip', 'pdf', 'json'):
+            return Response(
+                {'error': 'El formato debe ser zip, pdf o json'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        empleados = [e for e in request.query_params.get('empleados', '').split(',') if e.strip()]
+
+        try:
+            certificados = datos_certificados(request.user.organization, anio, empleados=empleados or None)
+        except DjangoValidationError:
+            return Response({'error': 'IDs de empleados inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not certificados:
+            return Response(
+                {'error': f'No hay nóminas pagadas en {anio}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if formato == 'json':
+            return Response({'anio': anio, 'total': len(certificados), 'certificados': certificados})
+        nombre = f"certificados_ingresos_{anio}.{formato}"
+        if formato == 'pdf':
+            response = HttpResponse(generar_pdf_certificados(certificados), content_type='application/pdf')
+        else:
+            response = StreamingHttpResponse(generar_zip_certificados(certificados), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename={nombre}'
+        return response
+
+    @extend_schema(
+        summary="Variaciones entre períodos",
+        description=(
+            "Compara dos o más períodos por empleado y concepto (una consulta agrupada) "
+            "y marca las mayores variaciones entre los dos últimos"
+        ),
+        parameters=[
+            OpenApiParameter(
+                name='periodos', required=True, type=str,
+                description='Períodos separados por coma: AAAA-MM-DD:AAAA-MM-DD,AAAA-MM-DD:AAAA-MM-DD'
+            ),
+            OpenApiParameter(name='umbral', description='Variación porcentual a marcar', required=False, type=float),
+            OpenApiParameter(name='limite', description='Máximo de filas (por defecto 200)', required=False, type=int),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def variaciones(self, request):
+        """Variaciones por empleado y concepto entre períodos"""
+        from decimal import Decimal, InvalidOperation
+        from django.utils.dateparse import parse_date
+        from .variaciones import variaciones_periodos
+
+        periodos = []
+        try:
+            for texto in (request.query_params.get('periodos') or '').split(','):
+                inicio, fin = (parse_date(parte.strip()) for parte in texto.split(':'))
+                if not inicio or not fin or inicio > fin:
+                    raise ValueError(texto)
+                periodos.append((inicio, fin))
+        except ValueError:
+            return Response(
+                {'error': 'periodos debe tener el formato AAAA-MM-DD:AAAA-MM-DD separados por coma'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            umbral = request.query_params.get('umbral')
+            umbral = Decimal(umbral) if umbral else None
+            limite = min(int(request.query_params.get('limite', 200)), 5000)
+        except (InvalidOperation, ValueError):
+            return Response(
+                {'error': 'umbral y limite deben ser numéricos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            reporte = variaciones_periodos(
+                request.user.organization,
+                periodos,
+                proyecto=_get_active_project_for_request(request),
+                umbral=umbral,
+                limite=limite,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'periodos': [
+                {clave: str(fecha) for clave, fecha in periodo.items()} for periodo in reporte['periodos']
+            ],
+            'umbral_porcentaje': float(reporte['umbral_porcentaje']),
+            'totales': {
+                tipo: [float(valor) for valor in valores] for tipo, valores in reporte['totales'].items()
+            },
+            'filas_total': reporte['filas_total'],
+            'filas_marcadas': reporte['filas_marcadas'],
+            'filas': [
+                {
+                    **fila,
+                    'valores': [float(valor) for valor in fila['valores']],
+                    'diferencia': float(fila['diferencia']),
+                    'variacion_porcentual': (
+                        None if fila['variacion_porcentual'] is None else float(fila['variacion_porcentual'])
+                    ),
+                }
+                for fila in reporte['filas']
+            ],
+        })
 
     @extend_schema(
         summary="Estadísticas de nóminas",
@@ -813,29 +1564,40 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
         """Retorna estadísticas de nóminas"""
-        from django.db.models import Sum, Avg, Count
+        from django.db.models import Sum
         from django.db.models.functions import Coalesce
         from decimal import Decimal
         
-        queryset = self.get_queryset().exclude(estado='anulada')
-        
-        # Calcular estadísticas
-        stats = queryset.aggregate(
-            total_nominas=Count('id'),
+        # Totales desde el resumen materializado (una fila por período)
+        resumenes = self._resumenes()
+        stats = resumenes.aggregate(
+            total_nominas=Coalesce(Sum('nominas'), 0),
             total_pagado=Coalesce(Sum('total_pagar'), Decimal('0')),
-            promedio_por_nomina=Coalesce(Avg('total_pagar'), Decimal('0')),
             total_devengado=Coalesce(Sum('total_devengado'), Decimal('0')),
             total_deducciones=Coalesce(Sum('total_deducciones'), Decimal('0')),
         )
+        stats['promedio_por_nomina'] = (
+            stats['total_pagado'] / stats['total_nominas'] if stats['total_nominas'] else Decimal('0')
+        )
+        
+        # Provisiones de prestaciones (no están en el resumen): agregadas en SQL
+        provisiones = self.get_queryset().exclude(estado='anulada').totales_costos()['provisiones_empleador']
         
         # Empleados/contratos con nómina
-        empleados_con_nomina = queryset.values('contrato__empleado').distinct().count()
+        empleados_con_nomina = self.get_queryset().exclude(
+            estado='anulada'
+        ).values('contrato__empleado').distinct().count()
         
         # Estadísticas por estado
-        por_estado = queryset.values('estado').annotate(
-            cantidad=Count('id'),
-            total=Coalesce(Sum('total_pagar'), Decimal('0'))
-        )
+        totales_estado = {}
+        for por_estado_periodo in resumenes.values_list('por_estado', flat=True):
+            for estado, valores in por_estado_periodo.items():
+                acumulado = totales_estado.setdefault(estado, {'cantidad': 0, 'total': Decimal('0')})
+                acumulado['cantidad'] += valores['cantidad']
+                acumulado['total'] += Decimal(valores['total_pagar'])
+        por_estado = [
+            {'estado': estado, **valores} for estado, valores in sorted(totales_estado.items())
+        ]
         
         return Response({
             'total_nominas': stats['total_nominas'],
@@ -843,10 +1605,67 @@ class NominaSimpleViewSet(MultiTenantViewSetMixin, viewsets.ModelViewSet):
             'promedio_por_nomina': float(stats['promedio_por_nomina']),
             'total_devengado': float(stats['total_devengado']),
             'total_deducciones': float(stats['total_deducciones']),
+            'total_provisiones': float(provisiones),
             'empleados_con_nomina': empleados_con_nomina,
             'por_estado': list(por_estado)
         })
 
+    @extend_schema(
+        summary="Exportar histórico columnar",
+        description=(
+            "ZIP con una fila por línea de concepto, particionado por año y mes "
+            "(Parquet si pyarrow está instalado; si no, CSV)"
+        ),
+        parameters=[
+            OpenApiParameter(name='formato', description='parquet o csv', required=False, type=str),
+            OpenApiParameter(name='desde', description='Fin de período desde (AAAA-MM-DD)', required=False, type=str),
+            OpenApiParameter(name='hasta', description='Fin de período hasta (AAAA-MM-DD)', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def export_columnar(self, request):
+        """Exportar el histórico de conceptos en formato columnar particionado"""
+        import tempfile
+        from django.http import FileResponse
+        from django.utils.dateparse import parse_date
+        from .exportacion_columnar import comprimir_directorio, exportar_historico
+
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            valor = request.query_params.get(nombre)
+            if not valor:
+                fechas[nombre] = None
+                continue
+            try:
+                fechas[nombre] = parse_date(valor)
+            except ValueError:
+                fechas[nombre] = None
+            if not fechas[nombre]:
+                return Response(
+                    {'error': f'{nombre} debe tener el formato AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        with tempfile.TemporaryDirectory() as directorio:
+            resultado = exportar_historico(
+                request.user.organization,
+                directorio,
+                formato=request.query_params.get('formato'),
+                desde=fechas['desde'],
+                hasta=fechas['hasta'],
+                proyecto=_get_active_project_for_request(request),
+            )
+            archivo = comprimir_directorio(directorio)
+
+        response = FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=f"nomina_historico_{resultado['formato']}.zip",
+            content_type='application/zip',
+        )
+        response['X-Filas-Exportadas'] = str(resultado['filas'])
+        return response
+
     @extend_schema(
         summary="Exportar nóminas a Excel",
         description="Exporta el listado de nóminas filtrado a Excel"
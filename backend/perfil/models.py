@@ -611,7 +611,7 @@ from django.dispatch import receiver
 def crear_perfil_usuario(sender, instance, created, **kwargs):
     """Crea automáticamente un perfil cuando se crea un usuario"""
     if created:
-        perfil = Perfil.objects.create(usuario=instance)
+        perfil = Perfil.objects.create(usuario=instance, organization=instance.organization)
         ConfiguracionNotificaciones.objects.create(perfil=perfil)
 
 @receiver(post_save, sender=User)
@@ -87,6 +87,7 @@ MODULOS_PERMISOS = [
             ('aprobar', 'WRITE', 'Aprobar nomina'),
             ('pagar', 'WRITE', 'Pagar nomina'),
             ('anular', 'WRITE', 'Anular nomina'),
+            ('cerrar', 'WRITE', 'Cerrar periodo de nomina'),
         ],
     },
     {
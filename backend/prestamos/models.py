@@ -627,24 +627,23 @@ class Prestamo(TenantAwareModel):
     
     def generar_numero_prestamo(self):
         """Genera un número único de préstamo (debe llamarse dentro de transaction.atomic)"""
+        from core.secuencias import siguiente_numero, ultimo_consecutivo
+
         year = timezone.now().year
-        # Obtener último número del año para esta organización
-        # select_for_update() bloquea las filas para evitar números duplicados
-        ultimo_prestamo = Prestamo.objects.select_for_update().filter(
-            organization=self.organization,
-            numero_prestamo__startswith=f'PR{year}'
-        ).exclude(numero_prestamo='').order_by('-numero_prestamo').first()
-        
-        if ultimo_prestamo and ultimo_prestamo.numero_prestamo:
-            try:
-                ultimo_numero = int(ultimo_prestamo.numero_prestamo[-4:])
-                nuevo_numero = ultimo_numero + 1
-            except (ValueError, IndexError):
-                nuevo_numero = 1
-        else:
-            nuevo_numero = 1
-        
-        return f'PR{year}{nuevo_numero:04d}'
+        prefix = f'PR{year}'
+
+        def semilla():
+            # Último número emitido antes de usar la secuencia
+            return ultimo_consecutivo(
+                Prestamo.objects.all_tenants().filter(
+                    organization_id=self.organization_id,
+                    numero_prestamo__startswith=prefix
+                ).values_list('numero_prestamo', flat=True),
+                prefix
+            )
+
+        nuevo_numero = siguiente_numero(self.organization_id, 'PR', anio=year, semilla=semilla)
+        return f'{prefix}{nuevo_numero:04d}'
     
     def calcular_cuota_mensual(self):
         """Calcula la cuota mensual del préstamo"""
@@ -738,6 +737,29 @@ class Prestamo(TenantAwareModel):
             self.fecha_primer_pago = self.fecha_desembolso + datetime.timedelta(days=30)
         self.save()
     
+    def aplicar_cuota(self, valor_cuota, fecha_pago):
+        """
+        Aplica a los saldos una cuota descontada por nómina (sin guardar).
+
+        Compartido por el pago individual y el pago por lotes de nóminas: la
+        cuota se limita al saldo pendiente, el total pagado no supera el
+        monto del préstamo y al quedar en cero pasa a ``completado``.
+
+        Returns:
+            tuple: (monto aplicado, saldo anterior, saldo nuevo); el monto es
+            cero si el préstamo no tiene saldo
+        """
+        saldo_anterior = self.saldo_pendiente or Decimal('0.00')
+        monto = max(min(valor_cuota, saldo_anterior), Decimal('0.00'))
+        saldo_nuevo = saldo_anterior - monto
+        if monto > Decimal('0.00'):
+            self.saldo_pendiente = saldo_nuevo
+            self.total_pagado = min((self.total_pagado or Decimal('0.00')) + monto, self.monto_final)
+            self.fecha_ultimo_pago = fecha_pago
+            if saldo_nuevo == Decimal('0.00'):
+                self.estado = 'completado'
+        return monto, saldo_anterior, saldo_nuevo
+    
     def get_absolute_url(self):
         """URL del préstamo"""
         return reverse('prestamos:detail', kwargs={'pk': self.pk})
@@ -943,18 +965,19 @@ class PagoPrestamo(TenantAwareModel):
     
     def generar_numero_pago(self):
         """Genera número secuencial de pago (debe llamarse dentro de transaction.atomic)"""
-        # select_for_update() bloquea las filas para evitar números duplicados
-        ultimo_pago = PagoPrestamo.objects.select_for_update().filter(
-            prestamo=self.prestamo
-        ).order_by('-numero_pago').first()
-        
-        if ultimo_pago:
-            try:
-                ultimo_numero = int(ultimo_pago.numero_pago.split('-')[-1])
-                nuevo_numero = ultimo_numero + 1
-            except (ValueError, IndexError):
-                nuevo_numero = 1
-        else:
-            nuevo_numero = 1
-        
-        return f"{self.prestamo.numero_prestamo}-P{nuevo_numero:03d}"
+        from core.secuencias import siguiente_numero, ultimo_consecutivo
+
+        prefix = f"{self.prestamo.numero_prestamo}-P"
+
+        def semilla():
+            return ultimo_consecutivo(
+                PagoPrestamo.objects.all_tenants().filter(
+                    prestamo=self.prestamo,
+                    numero_pago__startswith=prefix
+                ).values_list('numero_pago', flat=True),
+                prefix
+            )
+
+        # Consecutivo por préstamo (no reinicia por año)
+        nuevo_numero = siguiente_numero(self.prestamo.organization_id, prefix, semilla=semilla)
+        return f"{prefix}{nuevo_numero:03d}"
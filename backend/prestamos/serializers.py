@@ -326,11 +326,11 @@ class PrestamoListSerializer(serializers.ModelSerializer):
             total_cuotas = int(obj.plazo_meses or 0)
             cuotas_pagadas = obj.pagos.count() if hasattr(obj, 'pagos') else 0
             if cuotas_pagadas == 0:
-                from nomina.models import NominaPrestamo
-                cuotas_pagadas = NominaPrestamo.objects.filter(
-                    prestamo=obj,
-                    nomina__estado='pagada'
-                ).count()
+                from nomina.models import NominaPrestamo, NominaPrestamoArchivo
+                cuotas_pagadas = sum(
+                    modelo.objects.filter(prestamo=obj, nomina__estado='pagada').count()
+                    for modelo in (NominaPrestamo, NominaPrestamoArchivo)
+                )
             return max(total_cuotas - cuotas_pagadas, 0)
         except (TypeError, ValueError, AttributeError):
             return 0
@@ -343,11 +343,16 @@ class PrestamoListSerializer(serializers.ModelSerializer):
             if pagos_total > 0:
                 return float(pagos_total)
 
-            from nomina.models import NominaPrestamo
-            descuentos_total = NominaPrestamo.objects.filter(
-                prestamo=obj,
-                nomina__estado='pagada'
-            ).aggregate(total=Sum('valor_cuota'))['total'] or Decimal('0.00')
+            from nomina.models import NominaPrestamo, NominaPrestamoArchivo
+            descuentos_total = sum(
+                (
+                    modelo.objects.filter(prestamo=obj, nomina__estado='pagada').aggregate(
+                        total=Sum('valor_cuota')
+                    )['total'] or Decimal('0.00')
+                    for modelo in (NominaPrestamo, NominaPrestamoArchivo)
+                ),
+                Decimal('0.00')
+            )
             return float(descuentos_total)
         except (TypeError, ValueError, AttributeError):
             return 0.0